@@ -0,0 +1,1028 @@
+##########benchmark_wechat_monitor.py: [微信监控性能基准测试] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建基准测试脚本，测量指标端点被抓取时对检查吞吐的影响]########
+# 变更记录: [2026-10-16] @李祥光 [添加可配置的假wxautox后端，测量各检查入口的吞吐、CPU、内存分配和日志开销，支持JSON输出和结果对比]########
+# 变更记录: [2026-10-16] @李祥光 [添加进程查找基准，对比全量遍历和PID跟踪在1k/10k进程下的开销]########
+# 变更记录: [2026-10-16] @李祥光 [进程查找基准加入/proc后端，对比原实现的耗时和内存分配]########
+# 变更记录: [2026-10-16] @李祥光 [添加登录检测基准，统计LoginWatcher检测到登录的延迟分布]########
+# 变更记录: [2026-10-16] @李祥光 [添加多目标调度基准，测量1k/10k模拟目标下DeadlineScheduler的调度开销和派发延迟]########
+# 变更记录: [2026-10-16] @李祥光 [添加WeChatMonitor.tick基准目标，以虚拟时间驱动状态机，每次tick都执行一个动作]########
+# 变更记录: [2026-10-16] @李祥光 [添加最近检查环形缓冲基准，测量100万条记录的内存占用、记录吞吐和滚动成功率查询耗时]########
+# 输入: 命令行参数 | 输出: 基准测试结果（控制台表格，可选JSON文件）###############
+
+
+###########################文件下的所有函数###########################
+"""
+FakeBackendConfig：假wxautox后端的可调参数（各调用延迟、失败率、会话数量、随机种子）
+build_fake_wxautox：按参数构造假的wxautox模块（WeChat/LoginWnd）
+install_fake_wxautox：把假模块注入sys.modules，必须在导入监控模块之前调用
+BenchLogging：基准运行期间的日志配置（none/sync/async），结束后恢复
+InMemoryConnection：内存中的假微信连接，IsOnline/GetSession立即返回，只测量监控自身开销
+run_checks：在给定时长内连续执行探测并记录计数器，返回每秒检查次数
+scrape_worker：独立进程中的抓取客户端，按给定频率请求 /metrics 并返回抓取耗时
+bench_metrics_scrape：对比无端点、端点空闲、不同抓取频率下的检查吞吐和抓取耗时
+run_check_wechat_status：基准目标，连续调用check_wechat_status
+run_wechat_monitor_check_status：基准目标，连续调用WeChatMonitor.check_status
+run_wechat_monitor_tick：基准目标，以虚拟时间连续推进WeChatMonitor的状态机
+run_monitor_loop：基准目标，以零等待间隔运行monitor_loop，到时通过唤醒器关闭
+measure_target：测量一个基准目标在指定日志模式下的吞吐、CPU、内存分配和日志输出量
+bench_check_suite：对所有基准目标和日志模式执行测量
+compare_results：与之前保存的JSON结果对比，输出变化百分比
+build_fake_procfs：生成指定进程数量的模拟/proc目录（仅Linux），供psutil读取
+full_scan：原有的全量遍历查找方式，作为进程查找基准的对照
+bench_process_scan：对比原实现、psutil后端和/proc后端的全量遍历及PID跟踪在不同进程数量下的耗时和内存分配
+bench_login_detect：模拟用户在随机时刻完成扫码，统计LoginWatcher从登录完成到检测到的延迟分布
+sweep_due：逐个遍历全部目标找出到期目标的对照实现（每个周期O(n)）
+bench_schedule：模拟大量监控目标，测量DeadlineScheduler的派发吞吐、每次派发的调度开销和派发延迟，并与逐个遍历对照
+bench_recent_checks：向RecentChecks写入100万条检查记录，测量内存占用、每次记录耗时和滚动成功率查询耗时，并与每次检查一个dict对照
+main：基准测试入口函数
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main] --> B[install_fake_wxautox注入假后端]
+    B --> C{选择基准}
+    C -->|checks| D[bench_check_suite]
+    D --> E[measure_target]
+    E --> F[BenchLogging配置日志模式]
+    E --> G[run_check_wechat_status / run_wechat_monitor_check_status / run_wechat_monitor_tick / run_monitor_loop]
+    E --> H[tracemalloc测量内存分配]
+    C -->|scrape| I[bench_metrics_scrape]
+    C -->|process| M[bench_process_scan]
+    M --> N[build_fake_procfs生成1k/10k进程]
+    N --> O[full_scan对照 / PsutilBackend / ProcFSBackend / ProcessTracker]
+    C -->|login| P[bench_login_detect]
+    P --> Q[LoginWatcher.wait + 随机登录时刻]
+    C -->|schedule| S[bench_schedule]
+    S --> T[DeadlineScheduler + 1k/10k模拟目标]
+    S --> U[sweep_due逐个遍历对照]
+    C -->|ring| V[bench_recent_checks]
+    V --> W[RecentChecks 100万条 + tracemalloc / 每次检查一个dict对照]
+    I --> J[run_checks + scrape_worker独立进程抓取]
+    D --> K[写入JSON结果]
+    K --> L[compare_results与基线对比]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import sys
+import json
+import time
+import types
+import random
+import logging
+import platform
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+import multiprocessing
+import urllib.request
+from datetime import datetime
+
+import psutil
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from wechat_probe import ProbePipeline
+from wechat_metrics import LatencyHistogram, get_latency_recorder, get_monitor_stats
+from wechat_exporter import MetricsServer
+from wechat_process import ProcessTracker, PsutilBackend, ProcFSBackend
+
+# 假后端中可配置延迟和失败率的调用
+FAKE_CALLS = ('connect', 'online', 'session', 'login')
+
+# 支持的日志模式：none=关闭日志, sync=同步写文件, async=异步日志管道写文件
+LOGGING_MODES = ('none', 'sync', 'async')
+
+# 基准目标：名称 -> 运行函数名
+CHECK_TARGETS = ('check_wechat_status', 'WeChatMonitor.check_status', 'WeChatMonitor.tick', 'monitor_loop')
+
+
+class FakeBackendConfig:
+    """
+    FakeBackendConfig 功能说明:
+    # 假wxautox后端的可调参数，运行期间可修改，下一次调用立即生效
+    # 输入: latency_ms (dict: connect/online/session/login -> 毫秒),
+    #       failure_rate (dict: 同上 -> 0~1), sessions (GetSession返回的会话数量), seed (随机种子) | 输出: 无
+    """
+
+    def __init__(self, latency_ms=None, failure_rate=None, sessions=20, seed=42):
+        self.latency_ms = {call: 0.0 for call in FAKE_CALLS}
+        self.latency_ms.update(latency_ms or {})
+        self.failure_rate = {call: 0.0 for call in FAKE_CALLS}
+        self.failure_rate.update(failure_rate or {})
+        self.sessions = sessions
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def apply(self, call):
+        """模拟一次调用：按配置延迟，并按失败率决定本次是否失败（返回True表示应失败）"""
+        latency = self.latency_ms.get(call, 0.0)
+        if latency:
+            time.sleep(latency / 1000.0)
+        rate = self.failure_rate.get(call, 0.0)
+        return bool(rate) and self.rng.random() < rate
+
+    def to_dict(self):
+        return {
+            'latency_ms': dict(self.latency_ms),
+            'failure_rate': dict(self.failure_rate),
+            'sessions': self.sessions,
+            'seed': self.seed,
+        }
+
+
+def build_fake_wxautox(backend):
+    """
+    build_fake_wxautox 功能说明:
+    # 构造假的wxautox模块，接口与监控程序用到的部分一致：
+    # WeChat() / WeChat.IsOnline() / WeChat.GetSession() / LoginWnd().login(timeout)
+    # 失败时WeChat/IsOnline/GetSession抛出异常，LoginWnd.login返回success=False
+    # 输入: backend (FakeBackendConfig) | 输出: types.ModuleType 假模块
+    """
+    module = types.ModuleType('wxautox')
+    module.__doc__ = "基准测试用的假wxautox后端"
+    module.backend = backend
+
+    class WeChat:
+        def __init__(self):
+            if backend.apply('connect'):
+                raise RuntimeError("模拟连接微信失败")
+
+        def IsOnline(self):
+            if backend.apply('online'):
+                raise RuntimeError("模拟IsOnline调用失败")
+            return True
+
+        def GetSession(self):
+            if backend.apply('session'):
+                raise RuntimeError("模拟GetSession调用失败")
+            return [f"会话{i}" for i in range(backend.sessions)]
+
+    class LoginResult:
+        def __init__(self, success):
+            self.success = success
+
+    class LoginWnd:
+        def login(self, timeout=60):
+            return LoginResult(not backend.apply('login'))
+
+    module.WeChat = WeChat
+    module.LoginWnd = LoginWnd
+    return module
+
+
+def install_fake_wxautox(backend):
+    """
+    install_fake_wxautox 功能说明:
+    # 把假模块注入sys.modules['wxautox']，之后导入的监控模块都会使用它
+    # 必须在导入wechat_connection/wechat_utils/wechat_auto_login之前调用
+    # 输入: backend (FakeBackendConfig) | 输出: 假模块
+    """
+    module = build_fake_wxautox(backend)
+    sys.modules['wxautox'] = module
+    return module
+
+
+class BenchLogging:
+    """
+    BenchLogging 功能说明:
+    # 基准运行期间的日志配置上下文：none关闭日志；sync同步写入临时文件；async经异步日志管道写入临时文件
+    # 退出时恢复根日志器原有的处理器和级别，并记录写入的日志字节数
+    # 输入: mode (none/sync/async), level (日志级别) | 输出: 上下文对象，bytes_written为写入字节数
+    """
+
+    def __init__(self, mode, level=logging.INFO):
+        self.mode = mode
+        self.level = level
+        self.bytes_written = 0
+        self._path = None
+
+    def __enter__(self):
+        from wechat_logging import start_async_logging
+
+        root = logging.getLogger()
+        self._saved = (list(root.handlers), root.level)
+        for handler in self._saved[0]:
+            root.removeHandler(handler)
+        root.setLevel(self.level)
+
+        if self.mode == 'none':
+            logging.disable(logging.CRITICAL)
+            return self
+
+        fd, self._path = tempfile.mkstemp(prefix='wechat_bench_', suffix='.log')
+        os.close(fd)
+        handler = logging.FileHandler(self._path, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                                               datefmt='%Y-%m-%d %H:%M:%S'))
+        root.addHandler(handler)
+        if self.mode == 'async':
+            start_async_logging()
+        return self
+
+    def __exit__(self, *exc):
+        from wechat_logging import stop_async_logging
+
+        root = logging.getLogger()
+        if self.mode == 'none':
+            logging.disable(logging.NOTSET)
+        else:
+            stop_async_logging()
+            for handler in list(root.handlers):
+                handler.close()
+                root.removeHandler(handler)
+            self.bytes_written = os.path.getsize(self._path)
+            os.remove(self._path)
+        for handler in self._saved[0]:
+            root.addHandler(handler)
+        root.setLevel(self._saved[1])
+        return False
+
+
+class InMemoryConnection:
+    """
+    InMemoryConnection 功能说明:
+    # 内存中的假微信连接，IsOnline/GetSession立即返回，只测量监控自身的开销
+    # 输入: session_count (GetSession返回的会话数量) | 输出: 提供get/invalidate方法
+    """
+
+    connect_count = 1
+
+    def __init__(self, session_count=20):
+        sessions = [f"会话{i}" for i in range(session_count)]
+
+        class _WeChat:
+            def IsOnline(self):
+                return True
+
+            def GetSession(self):
+                return sessions
+
+        self._wx = _WeChat()
+
+    def get(self):
+        return self._wx
+
+    def invalidate(self, reason=None):
+        pass
+
+
+def run_checks(duration):
+    """
+    run_checks 功能说明:
+    # 在给定时长内连续执行分级探测并记录检查计数，模拟监控线程的记录路径
+    # 输入: duration (秒) | 输出: float 每秒检查次数
+    """
+    pipeline = ProbePipeline(InMemoryConnection(), stage_config={'session': {'every': 10}})
+    stats = get_monitor_stats()
+    checks = 0
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        stats.record_check(pipeline.run().ok)
+        checks += 1
+    return checks / (time.perf_counter() - started)
+
+
+def scrape_worker(url, rate, duration, results):
+    """
+    scrape_worker 功能说明:
+    # 在独立进程中按给定频率抓取指标端点，模拟Prometheus，抓取客户端自身的CPU不计入被测进程
+    # 输入: url (指标地址), rate (每秒抓取次数，0表示不间断抓取), duration (秒),
+    #       results (multiprocessing队列，用于返回各次抓取耗时) | 输出: 无
+    """
+    timings = []
+    interval = 1.0 / rate if rate else 0.0
+    deadline = time.perf_counter() + duration
+    next_at = time.perf_counter()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        with urllib.request.urlopen(url, timeout=5) as response:
+            response.read()
+        timings.append(time.perf_counter() - started)
+        if interval:
+            next_at += interval
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+    results.put(timings)
+
+
+def bench_metrics_scrape(duration=3.0, rates=(1, 10, 0)):
+    """
+    bench_metrics_scrape 功能说明:
+    # 对比以下场景的检查吞吐：无指标端点（基线）、端点已启动但无人抓取、按不同频率抓取
+    # 同时统计抓取耗时和响应大小，说明端点对监控循环的影响
+    # 输入: duration (每个场景的运行秒数), rates (抓取频率列表，0表示不间断抓取) | 输出: dict 结果
+    """
+    # 先填充计数器和直方图，使抓取内容接近真实运行时的大小
+    recorder = get_latency_recorder()
+    for stage in ('process', 'connect', 'online', 'session', 'check', 'login_window', 'login_poll', 'login'):
+        for i in range(200):
+            recorder.observe(stage, (i % 50) / 1000.0)
+
+    results = {'baseline_checks_per_sec': run_checks(duration)}
+    print(f"基线（无指标端点）: {results['baseline_checks_per_sec']:.0f} 次检查/秒")
+
+    server = MetricsServer('127.0.0.1', 0)
+    host, port = server.start()
+    url = f"http://{host}:{port}/metrics"
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            results['response_bytes'] = len(response.read())
+
+        idle = run_checks(duration)
+        results['idle_checks_per_sec'] = idle
+        print(f"端点空闲: {idle:.0f} 次检查/秒 "
+              f"({(idle / results['baseline_checks_per_sec'] - 1) * 100:+.1f}%)")
+
+        results['scrape'] = []
+        for rate in rates:
+            queue = multiprocessing.Queue()
+            worker = multiprocessing.Process(target=scrape_worker, args=(url, rate, duration, queue))
+            worker.start()
+            under_load = run_checks(duration)
+            timings = queue.get(timeout=duration + 30)
+            worker.join()
+
+            histogram = LatencyHistogram()
+            for seconds in timings:
+                histogram.observe(seconds)
+            summary = histogram.summary()
+            entry = {
+                'rate': rate or 'max',
+                'scrapes': len(timings),
+                'checks_per_sec': under_load,
+                'overhead_pct': (1 - under_load / results['baseline_checks_per_sec']) * 100,
+                'scrape_p50_ms': summary['p50_ms'],
+                'scrape_p99_ms': summary['p99_ms'],
+            }
+            results['scrape'].append(entry)
+            print(f"抓取频率 {entry['rate']}/秒: {under_load:.0f} 次检查/秒 "
+                  f"(开销 {entry['overhead_pct']:+.1f}%), 抓取 {entry['scrapes']} 次, "
+                  f"抓取耗时 p50={entry['scrape_p50_ms']}ms p99={entry['scrape_p99_ms']}ms")
+    finally:
+        server.stop()
+
+    print(f"指标响应大小: {results['response_bytes']} 字节")
+    return results
+
+
+def run_check_wechat_status(duration):
+    """
+    run_check_wechat_status 功能说明:
+    # 基准目标：在给定时长内连续调用check_wechat_status
+    # 输入: duration (秒) | 输出: int 检查次数
+    """
+    from wechat_auto_login import check_wechat_status
+
+    checks = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        check_wechat_status()
+        checks += 1
+    return checks
+
+
+def run_wechat_monitor_check_status(duration):
+    """
+    run_wechat_monitor_check_status 功能说明:
+    # 基准目标：在给定时长内连续调用WeChatMonitor.check_status
+    # 输入: duration (秒) | 输出: int 检查次数
+    """
+    from wechat_utils import WeChatMonitor
+
+    monitor = WeChatMonitor()
+    checks = 0
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            monitor.check_status()
+            checks += 1
+    finally:
+        monitor.notification_manager.close()
+    return checks
+
+
+def run_wechat_monitor_tick(duration):
+    """
+    run_wechat_monitor_tick 功能说明:
+    # 基准目标：连续调用WeChatMonitor.tick，每次传入的虚拟时间都等于状态机的下一次到期时间，
+    # 因此每次tick都执行一个动作（检查或登录），结果与调度间隔和抖动无关，可重复
+    # 输入: duration (秒) | 输出: int 检查次数
+    """
+    from wechat_utils import WeChatMonitor
+
+    monitor = WeChatMonitor()
+    machine = monitor.state_machine
+    try:
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            monitor.tick(machine.next_due)
+    finally:
+        monitor.notification_manager.close()
+    return machine.checks
+
+
+def run_monitor_loop(duration):
+    """
+    run_monitor_loop 功能说明:
+    # 基准目标：以零等待间隔运行增强版monitor_loop，到时通过唤醒器请求关闭
+    # 调度相关的间隔配置临时设为0，只测量每次检查本身的开销，结束后恢复
+    # 输入: duration (秒) | 输出: int 检查次数（由进程级计数器统计）
+    """
+    import wechat_monitor_enhanced
+    from config import MONITOR_CONFIG
+    from wechat_scheduler import MonitorWakeup
+
+    overrides = {
+        'check_interval': 0, 'min_check_interval': 0, 'fast_reprobe_interval': 0,
+        'retry_interval': 0, 'check_jitter_ratio': 0,
+    }
+    saved = {key: MONITOR_CONFIG.get(key) for key in overrides}
+    MONITOR_CONFIG.update(overrides)
+    wakeup = MonitorWakeup()
+    wechat_monitor_enhanced.wakeup = wakeup
+    timer = threading.Timer(duration, wakeup.notify, args=(MonitorWakeup.SHUTDOWN,))
+
+    stats = get_monitor_stats()
+    before = stats.snapshot()['checks']
+    try:
+        timer.start()
+        wechat_monitor_enhanced.monitor_loop(dict(MONITOR_CONFIG, max_retry_count=3))
+    finally:
+        timer.cancel()
+        MONITOR_CONFIG.update(saved)
+    return stats.snapshot()['checks'] - before
+
+
+TARGET_RUNNERS = {
+    'check_wechat_status': run_check_wechat_status,
+    'WeChatMonitor.check_status': run_wechat_monitor_check_status,
+    'WeChatMonitor.tick': run_wechat_monitor_tick,
+    'monitor_loop': run_monitor_loop,
+}
+
+
+def measure_target(name, logging_mode, duration, log_level=logging.INFO):
+    """
+    measure_target 功能说明:
+    # 测量一个基准目标在指定日志模式下的表现：
+    # 1. 吞吐：每秒检查次数
+    # 2. CPU：每次检查消耗的进程CPU时间（包含异步日志等后台线程）
+    # 3. 内存分配：另行在tracemalloc下运行，统计分配峰值和每次检查净增的内存
+    # 4. 日志开销：每次检查写入的日志字节数（与none模式的耗时差即为日志开销）
+    # 输入: name (目标名称), logging_mode (none/sync/async), duration (秒), log_level | 输出: dict
+    """
+    runner = TARGET_RUNNERS[name]
+
+    with BenchLogging(logging_mode, log_level) as bench_logging:
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        checks = runner(duration)
+        cpu = time.process_time() - cpu_started
+        wall = time.perf_counter() - wall_started
+    checks = max(1, checks)
+
+    # tracemalloc会明显拖慢执行，单独运行较短时间只用于统计内存
+    with BenchLogging(logging_mode, log_level):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        traced_checks = max(1, runner(max(0.2, duration / 4)))
+        after, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        'target': name,
+        'logging': logging_mode,
+        'checks': checks,
+        'checks_per_sec': round(checks / wall, 1),
+        'wall_us_per_check': round(wall / checks * 1e6, 1),
+        'cpu_us_per_check': round(cpu / checks * 1e6, 1),
+        'alloc_peak_kb': round((peak - before) / 1024, 1),
+        'retained_bytes_per_check': round((after - before) / traced_checks, 1),
+        'log_bytes_per_check': round(bench_logging.bytes_written / checks, 1),
+    }
+
+
+def bench_check_suite(targets, logging_modes, duration, log_level=logging.INFO):
+    """
+    bench_check_suite 功能说明:
+    # 对每个基准目标和日志模式执行measure_target，并输出表格
+    # 日志开销 = 有日志时每次检查耗时 - none模式下每次检查耗时
+    # 输入: targets (目标名称列表), logging_modes (日志模式列表), duration (秒), log_level | 输出: list[dict]
+    """
+    results = []
+    print(f"{'目标':<28}{'日志':<7}{'检查/秒':>10}{'耗时us':>10}{'CPUus':>10}"
+          f"{'分配峰值KB':>12}{'净增B/次':>10}{'日志B/次':>10}{'日志开销us':>12}")
+    for name in targets:
+        baseline_wall = None
+        for mode in logging_modes:
+            result = measure_target(name, mode, duration, log_level)
+            if mode == 'none':
+                baseline_wall = result['wall_us_per_check']
+            if baseline_wall is not None and mode != 'none':
+                result['logging_cost_us_per_check'] = round(result['wall_us_per_check'] - baseline_wall, 1)
+            results.append(result)
+            print(f"{name:<28}{mode:<7}{result['checks_per_sec']:>10}{result['wall_us_per_check']:>10}"
+                  f"{result['cpu_us_per_check']:>10}{result['alloc_peak_kb']:>12}"
+                  f"{result['retained_bytes_per_check']:>10}{result['log_bytes_per_check']:>10}"
+                  f"{result.get('logging_cost_us_per_check', '-'):>12}")
+    return results
+
+
+def compare_results(current, baseline):
+    """
+    compare_results 功能说明:
+    # 按(目标, 日志模式)匹配两次运行的结果，输出主要指标的变化百分比
+    # 检查/秒越高越好，其余指标越低越好
+    # 输入: current / baseline (JSON结果中的checks列表) | 输出: list[dict] 对比结果
+    """
+    metrics = ('checks_per_sec', 'cpu_us_per_check', 'alloc_peak_kb', 'log_bytes_per_check')
+    indexed = {(r['target'], r['logging']): r for r in baseline}
+    rows = []
+    print(f"\n{'目标':<28}{'日志':<7}" + ''.join(f"{m:>28}" for m in metrics))
+    for result in current:
+        old = indexed.get((result['target'], result['logging']))
+        if old is None:
+            continue
+        row = {'target': result['target'], 'logging': result['logging']}
+        cells = []
+        for metric in metrics:
+            before, after = old.get(metric, 0), result.get(metric, 0)
+            change = (after - before) / before * 100 if before else 0.0
+            row[metric] = {'baseline': before, 'current': after, 'change_pct': round(change, 1)}
+            cells.append(f"{before}->{after} ({change:+.1f}%)")
+        rows.append(row)
+        print(f"{result['target']:<28}{result['logging']:<7}" + ''.join(f"{c:>28}" for c in cells))
+    return rows
+
+
+def build_fake_procfs(root, count, target_name, first_pid=1000):
+    """
+    build_fake_procfs 功能说明:
+    # 在root下生成count个进程的模拟/proc目录（stat/comm文件和系统stat），最后一个进程名为target_name
+    # 把psutil.PROCFS_PATH指向该目录后，psutil按真实方式逐个读取进程信息，开销与同等规模的主机一致
+    # 输入: root (目录), count (进程数量), target_name (目标进程名), first_pid (起始PID) | 输出: int 目标进程PID
+    """
+    shutil.copyfile('/proc/stat', os.path.join(root, 'stat'))
+    target_pid = first_pid + count - 1
+    for pid in range(first_pid, first_pid + count):
+        name = target_name if pid == target_pid else f"proc{pid}"
+        directory = os.path.join(root, str(pid))
+        os.mkdir(directory)
+        with open(os.path.join(directory, 'stat'), 'w') as f:
+            f.write(f"{pid} ({name}) S 1 {pid} {pid} 0 -1 4194560 100 0 0 0 1 1 0 0 20 0 1 0 "
+                    f"{pid * 10} 1000000 100 18446744073709551615 0 0 0 0 0 0 0 0 0 0 0 0 17 0 0 0 0 0 0\n")
+        with open(os.path.join(directory, 'comm'), 'w') as f:
+            f.write(name[:15] + "\n")
+    return target_pid
+
+
+def full_scan(process_name):
+    """
+    full_scan 功能说明:
+    # 原有实现：每次检查都用psutil.process_iter(['name'])遍历全部进程并比较名称
+    # 输入: process_name (进程名称) | 输出: bool 是否找到
+    """
+    key = process_name.lower()
+    for proc in psutil.process_iter(['name']):
+        try:
+            name = proc.info['name']
+            if name and name.lower() == key:
+                return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            continue
+    return False
+
+
+def _time_per_call(func, repeat):
+    """重复调用func，返回每次调用的耗时分位数（毫秒）"""
+    histogram = LatencyHistogram(buckets_ms=[0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000])
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        histogram.observe(time.perf_counter() - started)
+    summary = histogram.summary()
+    return {'avg_ms': round(histogram.total / histogram.count * 1000, 3),
+            'p50_ms': summary['p50_ms'], 'p99_ms': summary['p99_ms']}
+
+
+def _alloc_per_call(func):
+    """在tracemalloc下调用一次func，返回分配峰值（KB）"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round((peak - before) / 1024, 1)
+
+
+def bench_process_scan(counts=(1000, 10000), repeat=50, target_name='WeChat.exe'):
+    """
+    bench_process_scan 功能说明:
+    # 在模拟的1k/10k进程环境下对比各种进程查找方式的每次检查耗时和内存分配：
+    # 1. full_scan：原有的全量遍历（psutil.process_iter）
+    # 2. psutil_scan / procfs_scan：两种后端的一次全量遍历（缓存为空或目标进程未运行时的开销）
+    # 3. psutil_tracked / procfs_tracked：PID跟踪器命中缓存，只验证一个PID
+    # 4. rescan：缓存PID失效（进程重启，创建时间变化）后的一次查找
+    # 输入: counts (进程数量列表), repeat (每种情况重复次数), target_name (目标进程名) | 输出: list[dict]
+    """
+    if not sys.platform.startswith('linux'):
+        print("进程查找基准需要Linux（通过模拟/proc目录构造大量进程），跳过")
+        return []
+
+    results = []
+    saved_procfs = psutil.PROCFS_PATH
+    try:
+        for count in counts:
+            root = tempfile.mkdtemp(prefix='wechat_bench_proc_')
+            try:
+                target_pid = build_fake_procfs(root, count, target_name)
+                psutil.PROCFS_PATH = root
+                if hasattr(psutil.process_iter, 'cache_clear'):
+                    psutil.process_iter.cache_clear()
+                backends = {'psutil': PsutilBackend(), 'procfs': ProcFSBackend(root)}
+                scan_repeat = max(3, repeat // 10) if count > 5000 else repeat
+                key = target_name.lower()
+
+                # 预热一次，使psutil内部的进程对象缓存与长期运行的监控程序一致
+                assert full_scan(target_name), "模拟进程环境中应能找到目标进程"
+                entry = {
+                    'processes': count,
+                    'full_scan': _time_per_call(lambda: full_scan(target_name), scan_repeat),
+                    'full_scan_alloc_kb': _alloc_per_call(lambda: full_scan(target_name)),
+                }
+
+                for name, backend in backends.items():
+                    assert backend.scan(key)[0], f"{name}后端应能找到目标进程"
+                    entry[f'{name}_scan'] = _time_per_call(lambda: backend.scan(key), scan_repeat)
+                    entry[f'{name}_scan_alloc_kb'] = _alloc_per_call(lambda: backend.scan(key))
+
+                    tracker = ProcessTracker(backend)
+                    tracker.find_pids(target_name)
+                    entry[f'{name}_tracked'] = _time_per_call(lambda: tracker.find_pids(target_name), repeat)
+
+                    # 模拟目标进程重启：创建时间变化，缓存的PID失效后必须重新遍历
+                    stat_path = os.path.join(root, str(target_pid), 'stat')
+                    rescans = []
+                    for restart in range(3):
+                        with open(stat_path) as f:
+                            fields = f.read().split(' ')
+                        fields[21] = str(int(fields[21]) + 100)
+                        with open(stat_path, 'w') as f:
+                            f.write(' '.join(fields))
+                        scans_before = tracker.scan_count
+                        started = time.perf_counter()
+                        assert tracker.find_pids(target_name) == [target_pid], "进程重启后应重新找到"
+                        rescans.append(time.perf_counter() - started)
+                        assert tracker.scan_count == scans_before + 1, "创建时间变化后应重新全量遍历"
+                    entry[f'{name}_rescan_avg_ms'] = round(sum(rescans) / len(rescans) * 1000, 3)
+
+                results.append(entry)
+                print(f"{count:>6} 个进程:")
+                print(f"  原实现全量遍历  avg={entry['full_scan']['avg_ms']}ms p99={entry['full_scan']['p99_ms']}ms "
+                      f"分配峰值={entry['full_scan_alloc_kb']}KB")
+                for name in backends:
+                    scan = entry[f'{name}_scan']
+                    tracked = entry[f'{name}_tracked']
+                    print(f"  {name:<6} 全量遍历 avg={scan['avg_ms']}ms p99={scan['p99_ms']}ms "
+                          f"分配峰值={entry[f'{name}_scan_alloc_kb']}KB | "
+                          f"PID跟踪 avg={tracked['avg_ms']}ms p99={tracked['p99_ms']}ms | "
+                          f"失效后重扫 avg={entry[f'{name}_rescan_avg_ms']}ms")
+            finally:
+                psutil.PROCFS_PATH = saved_procfs
+                if hasattr(psutil.process_iter, 'cache_clear'):
+                    psutil.process_iter.cache_clear()
+                shutil.rmtree(root, ignore_errors=True)
+    finally:
+        psutil.PROCFS_PATH = saved_procfs
+    return results
+
+
+def bench_login_detect(trials=20, max_login_delay=2.0, seed=42):
+    """
+    bench_login_detect 功能说明:
+    # 模拟用户在开始等待后的随机时刻完成扫码（IsOnline开始返回True），
+    # 统计LoginWatcher从登录完成到检测到的延迟分布，并按原有固定2秒轮询计算同一批时刻的检测延迟作为对照
+    # 输入: trials (试验次数), max_login_delay (登录时刻上限，秒), seed (随机种子) | 输出: dict
+    """
+    from wechat_login import LoginWatcher
+
+    class ScanConnection:
+        def __init__(self, login_at):
+            self.login_at = login_at
+
+        def get(self):
+            return self
+
+        def IsOnline(self):
+            return time.monotonic() >= self.login_at
+
+        def invalidate(self, reason=None):
+            pass
+
+    rng = random.Random(seed)
+    watcher_lag = LatencyHistogram()
+    fixed_lag = LatencyHistogram()
+    polls = 0
+    for _ in range(trials):
+        delay = rng.uniform(0.05, max_login_delay)
+        started = time.monotonic()
+        result = LoginWatcher(ScanConnection(started + delay)).wait(max_login_delay + 5)
+        assert result['online'], "模拟登录应被检测到"
+        watcher_lag.observe(result['elapsed'] - delay)
+        polls += result['polls']
+        # 原实现每2秒检查一次，登录在下一次检查时才被发现
+        fixed_lag.observe((int(delay // 2) + 1) * 2 - delay)
+
+    results = {
+        'trials': trials,
+        'watcher_lag': watcher_lag.summary(),
+        'fixed_2s_lag': fixed_lag.summary(),
+        'polls_per_login': round(polls / trials, 1),
+    }
+    for name, label in (('watcher_lag', 'LoginWatcher'), ('fixed_2s_lag', '固定2秒轮询')):
+        summary = results[name]
+        print(f"{label:<14} 检测延迟 avg={summary['avg_ms']}ms p50={summary['p50_ms']}ms "
+              f"p95={summary['p95_ms']}ms max={summary['max_ms']}ms")
+    print(f"LoginWatcher 平均每次登录轮询 {results['polls_per_login']} 次")
+    return results
+
+
+def sweep_due(dues, now):
+    """
+    sweep_due 功能说明:
+    # 对照实现：每个周期遍历全部目标，找出已到期的目标
+    # 输入: dues (各目标的到期时间列表), now (当前时间) | 输出: list 到期目标的下标
+    """
+    return [index for index, due in enumerate(dues) if due <= now]
+
+
+def bench_schedule(counts=(1000, 10000), duration=3.0, workers=8, min_interval=2.0, max_interval=10.0,
+                   work_ms=0.0, seed=42):
+    """
+    bench_schedule 功能说明:
+    # 模拟大量监控目标，每个目标有各自的检查间隔（min_interval~max_interval之间随机），首次到期时间在一个间隔内均匀分布：
+    # 1. DeadlineScheduler：统计派发次数、每次派发的调度记账耗时、派发延迟（实际派发-到期）分布、进程CPU占用
+    # 2. 对照：逐个遍历全部目标的一次扫描耗时（10ms周期的循环每个周期都要付出这部分开销）
+    # 输入: counts (目标数量列表), duration (每种数量的运行秒数), workers (工作线程数),
+    #       min_interval / max_interval (目标检查间隔范围，秒), work_ms (每次模拟检查耗时，毫秒), seed (随机种子)
+    # 输出: list[dict]
+    """
+    from wechat_scheduler import DeadlineScheduler
+
+    results = []
+    for count in counts:
+        rng = random.Random(seed)
+        scheduler = DeadlineScheduler(max_workers=workers, name='BenchScheduler')
+        work = work_ms / 1000.0
+
+        def make_target(interval):
+            def run():
+                if work:
+                    time.sleep(work)
+                return interval
+            return run
+
+        intervals = [rng.uniform(min_interval, max_interval) for _ in range(count)]
+        for index, interval in enumerate(intervals):
+            scheduler.add(index, make_target(interval), delay=rng.uniform(0, interval))
+
+        cpu_before = time.process_time()
+        scheduler.start()
+        time.sleep(duration)
+        scheduler.stop(timeout=2)
+        cpu = time.process_time() - cpu_before
+        stats = scheduler.stats()
+
+        # 对照：逐个遍历全部目标一次的耗时
+        dues = [rng.uniform(0, interval) for interval in intervals]
+        sweep = _time_per_call(lambda: sweep_due(dues, max_interval / 2), 20)
+
+        entry = {
+            'targets': count,
+            'workers': workers,
+            'duration': duration,
+            'dispatched': stats['dispatched'],
+            'expected_dispatches': round(sum(duration / interval for interval in intervals)),
+            'dispatch_per_sec': round(stats['dispatched'] / duration, 1),
+            'overhead_us_per_dispatch': stats['overhead_us_per_dispatch'],
+            'cpu_ms_per_sec': round(cpu / duration * 1000, 2),
+            'lag': stats['lag'],
+            'sweep_per_tick': sweep,
+        }
+        results.append(entry)
+        lag = entry['lag']
+        print(f"{count:>6} 个目标: 派发 {entry['dispatched']} 次 (期望约 {entry['expected_dispatches']}), "
+              f"{entry['dispatch_per_sec']}/秒, 每次派发调度开销 {entry['overhead_us_per_dispatch']}us, "
+              f"CPU {entry['cpu_ms_per_sec']}ms/秒")
+        print(f"         派发延迟 avg={lag['avg_ms']}ms p50={lag['p50_ms']}ms p95={lag['p95_ms']}ms "
+              f"p99={lag['p99_ms']}ms max={lag['max_ms']}ms | "
+              f"逐个遍历对照每周期 avg={sweep['avg_ms']}ms")
+    return results
+
+
+def bench_recent_checks(entries=1000000, interval=0.1, dict_entries=100000, queries=1000):
+    """
+    bench_recent_checks 功能说明:
+    # 以虚拟时间向RecentChecks写入entries条检查记录（每interval秒一条，约10%失败），测量：
+    # 1. tracemalloc下的内存分配峰值和缓冲数据字节数
+    # 2. 每次记录的平均耗时（含各窗口的过期处理）
+    # 3. 5m/1h/24h滚动成功率查询的平均耗时
+    # 对照：每次检查保存一个dict（dict_entries条，按条数线性推算到entries条）
+    # 输入: entries (记录条数，也是缓冲容量), interval (记录间隔秒数), dict_entries (对照的dict条数),
+    #       queries (查询次数) | 输出: dict
+    """
+    from wechat_metrics import RecentChecks
+
+    rng = random.Random(42)
+    statuses = [rng.random() >= 0.1 for _ in range(1000)]
+    latencies = [rng.uniform(0.001, 0.05) for _ in range(1000)]
+    start = time.time() - entries * interval
+
+    def fill(ring):
+        record = ring.record
+        for i in range(entries):
+            record(statuses[i % 1000], latencies[i % 1000], start + i * interval)
+
+    tracemalloc.start()
+    ring = RecentChecks(capacity=entries)
+    fill(ring)
+    ring_bytes, ring_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ring = RecentChecks(capacity=entries)
+    started = time.perf_counter()
+    fill(ring)
+    record_us = (time.perf_counter() - started) / entries * 1e6
+
+    now = start + entries * interval
+    started = time.perf_counter()
+    for _ in range(queries):
+        summary = ring.summary(now)
+    query_us = (time.perf_counter() - started) / queries * 1e6
+
+    tracemalloc.start()
+    records = [{'ts': start + i * interval, 'ok': statuses[i % 1000], 'latency': latencies[i % 1000]}
+               for i in range(dict_entries)]
+    dict_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+
+    result = {
+        'entries': entries,
+        'ring_mb': round(ring_bytes / 1048576, 1),
+        'ring_peak_mb': round(ring_peak / 1048576, 1),
+        'buffer_mb': round(ring.memory_bytes() / 1048576, 1),
+        'record_us': round(record_us, 2),
+        'query_us': round(query_us, 2),
+        'dict_mb_estimated': round(dict_bytes / dict_entries * entries / 1048576, 1),
+        'windows': {label: {'checks': data['checks'], 'rate': round(data['rate'], 4) if data['rate'] is not None else None,
+                            'flaps': data['flaps']} for label, data in summary.items()},
+    }
+    print(f"{entries} 条记录: 内存 {result['ring_mb']}MB (峰值 {result['ring_peak_mb']}MB, 缓冲数据 {result['buffer_mb']}MB), "
+          f"每次记录 {result['record_us']}us, 查询5m/1h/24h {result['query_us']}us")
+    print(f"对照: 每次检查一个dict约 {result['dict_mb_estimated']}MB (按 {dict_entries} 条推算)")
+    for label, data in result['windows'].items():
+        print(f"  {label}: {data['checks']} 次检查, 成功率 {data['rate']}, 翻转 {data['flaps']} 次")
+    return result
+
+
+def _parse_knobs(values, cast=float):
+    """解析 key=value 形式的参数列表，例如 ['online=5', 'session=20']"""
+    knobs = {}
+    for item in values or []:
+        for part in item.split(','):
+            if not part.strip():
+                continue
+            key, _, value = part.partition('=')
+            if key.strip() not in FAKE_CALLS:
+                raise argparse.ArgumentTypeError(f"未知调用 {key}，可选: {', '.join(FAKE_CALLS)}")
+            knobs[key.strip()] = cast(value)
+    return knobs
+
+
+def main():
+    """
+    main 功能说明:
+    # 基准测试入口：注入假wxautox后端，运行选定的基准，可保存JSON结果并与之前的结果对比
+    # 输入: 命令行参数 | 输出: 无
+    """
+    parser = argparse.ArgumentParser(
+        description="微信监控性能基准测试（使用假wxautox后端，无需真实微信客户端）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法:
+  python benchmark_wechat_monitor.py                                  # 运行全部检查基准
+  python benchmark_wechat_monitor.py --latency-ms online=5,session=30 # 模拟较慢的IsOnline/GetSession
+  python benchmark_wechat_monitor.py --failure-rate online=0.1        # 10%的IsOnline调用失败
+  python benchmark_wechat_monitor.py --output new.json --compare old.json
+  python benchmark_wechat_monitor.py --bench scrape                   # 指标端点抓取负载基准
+  python benchmark_wechat_monitor.py --bench process                  # 1k/10k进程下的进程查找开销
+  python benchmark_wechat_monitor.py --bench login                    # 登录检测延迟分布
+  python benchmark_wechat_monitor.py --bench schedule                 # 1k/10k目标的调度开销和派发延迟
+  python benchmark_wechat_monitor.py --bench ring                     # 100万条最近检查记录的内存和查询耗时
+        """
+    )
+    parser.add_argument('--bench', choices=['checks', 'scrape', 'process', 'login', 'schedule', 'ring', 'all'],
+                        default='checks',
+                        help='要运行的基准 (默认: checks)')
+    parser.add_argument('--duration', type=float, default=3.0, help='每个场景的运行秒数 (默认: 3)')
+    parser.add_argument('--targets', nargs='+', choices=CHECK_TARGETS, default=list(CHECK_TARGETS),
+                        help='检查基准目标 (默认: 全部)')
+    parser.add_argument('--logging', nargs='+', choices=LOGGING_MODES, default=list(LOGGING_MODES),
+                        dest='logging_modes', help='日志模式 (默认: none sync async)')
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='INFO',
+                        help='日志级别 (默认: INFO)')
+    parser.add_argument('--log-mode', choices=['transition', 'verbose'],
+                        help='覆盖LOG_CONFIG中的日志模式')
+    parser.add_argument('--latency-ms', action='append', metavar='CALL=MS',
+                        help='假后端调用延迟，CALL可选 connect/online/session/login')
+    parser.add_argument('--failure-rate', action='append', metavar='CALL=RATE',
+                        help='假后端调用失败率(0~1)，CALL同上')
+    parser.add_argument('--sessions', type=int, default=20, help='GetSession返回的会话数量 (默认: 20)')
+    parser.add_argument('--seed', type=int, default=42, help='失败率随机种子 (默认: 42)')
+    parser.add_argument('--process-name', help='进程检查使用的进程名（默认使用当前Python进程名，保证进程检查通过）')
+    parser.add_argument('--process-counts', type=int, nargs='+', default=[1000, 10000],
+                        help='进程查找基准的模拟进程数量 (默认: 1000 10000)')
+    parser.add_argument('--schedule-targets', type=int, nargs='+', default=[1000, 10000],
+                        help='调度基准的模拟目标数量 (默认: 1000 10000)')
+    parser.add_argument('--schedule-workers', type=int, default=8, help='调度基准的工作线程数 (默认: 8)')
+    parser.add_argument('--schedule-work-ms', type=float, default=0.0,
+                        help='调度基准中每次模拟检查的耗时，毫秒 (默认: 0)')
+    parser.add_argument('--ring-entries', type=int, default=1000000,
+                        help='环形缓冲基准的记录条数 (默认: 1000000)')
+    parser.add_argument('--output', help='把结果写入JSON文件')
+    parser.add_argument('--compare', help='与之前保存的JSON结果对比')
+    args = parser.parse_args()
+
+    backend = FakeBackendConfig(
+        latency_ms=_parse_knobs(args.latency_ms),
+        failure_rate=_parse_knobs(args.failure_rate),
+        sessions=args.sessions,
+        seed=args.seed,
+    )
+    install_fake_wxautox(backend)
+
+    # 进程检查使用真实的psutil遍历，默认匹配当前进程，保证检查能走到IsOnline/GetSession
+    from config import WECHAT_CONFIG, LOG_CONFIG
+    WECHAT_CONFIG['process_name'] = args.process_name or psutil.Process().name()
+    WECHAT_CONFIG['auto_start_wechat'] = False
+    if args.log_mode:
+        LOG_CONFIG['log_mode'] = args.log_mode
+
+    report = {
+        'meta': {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'duration': args.duration,
+            'log_level': args.log_level,
+            'log_mode': LOG_CONFIG.get('log_mode'),
+            'process_name': WECHAT_CONFIG['process_name'],
+            'backend': backend.to_dict(),
+        }
+    }
+
+    if args.bench in ('checks', 'all'):
+        print("=== 检查开销基准（假wxautox后端） ===")
+        report['checks'] = bench_check_suite(args.targets, args.logging_modes, args.duration,
+                                             getattr(logging, args.log_level))
+    if args.bench in ('scrape', 'all'):
+        print("\n=== 指标端点抓取负载基准 ===")
+        report['scrape'] = bench_metrics_scrape(duration=args.duration)
+    if args.bench in ('process', 'all'):
+        print("\n=== 进程查找基准（原实现 vs psutil/procfs后端 vs PID跟踪） ===")
+        report['process'] = bench_process_scan(counts=args.process_counts)
+    if args.bench in ('login', 'all'):
+        print("\n=== 登录检测延迟基准（LoginWatcher vs 固定2秒轮询） ===")
+        report['login'] = bench_login_detect()
+    if args.bench in ('schedule', 'all'):
+        print("\n=== 多目标调度基准（DeadlineScheduler vs 逐个遍历） ===")
+        report['schedule'] = bench_schedule(counts=args.schedule_targets, duration=args.duration,
+                                            workers=args.schedule_workers, work_ms=args.schedule_work_ms)
+    if args.bench in ('ring', 'all'):
+        print("\n=== 最近检查环形缓冲基准（RecentChecks vs 每次检查一个dict） ===")
+        report['ring'] = bench_recent_checks(entries=args.ring_entries)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n结果已写入: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if 'checks' in report and 'checks' in baseline:
+            print(f"\n=== 与 {args.compare} 对比 ===")
+            report['comparison'] = compare_results(report['checks'], baseline['checks'])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,13 @@
 ##########config.py: 微信自动登录监控程序配置文件 ##################
 # 变更记录: [2025-06-24] @李祥光 [创建配置文件]########
+# 变更记录: [2026-10-16] @李祥光 [添加多账号监管配置ACCOUNTS_CONFIG]########
+# 变更记录: [2026-10-16] @李祥光 [多账号监管添加工作线程数上限max_workers]########
+# 变更记录: [2026-10-16] @李祥光 [添加wxautox调用期限和后端调用线程池配置]########
+# 变更记录: [2026-10-16] @李祥光 [添加检查历史存储配置HISTORY_CONFIG]########
+# 变更记录: [2026-10-16] @李祥光 [添加最近检查环形缓冲容量和滚动成功率窗口配置]########
+# 变更记录: [2026-10-16] @李祥光 [添加日志目录总大小上限log_dir_max_size_mb]########
+# 变更记录: [2026-10-16] @李祥光 [添加日志后台压缩配置log_compression和log_compress_min_idle]########
+# 变更记录: [2026-10-17] @李祥光 [backend_call_timeouts添加alive窗口存活检查期限]########
 # 输入: 无 | 输出: 配置参数###############
 
 
@@ -29,7 +37,81 @@ MONITOR_CONFIG = {
     'retry_interval': 10,
     
     # 最大重试次数
-    'max_retry_count': 3
+    'max_retry_count': 3,
+    
+    # 微信连接最长复用时间（秒），超过后强制重连，0表示不限制
+    'connection_max_age': 1800,
+    
+    # 分级探测阶段调度：every表示每N次检查执行一次该阶段
+    # process=进程检查, online=登录状态检查, session=会话列表检查（开销最大）
+    'probe_stages': {
+        'process': {'enabled': True, 'every': 1},
+        'online': {'enabled': True, 'every': 1},
+        'session': {'enabled': True, 'every': 10}
+    },
+    
+    # 在线检查耗时超过该值（毫秒）视为可疑，立即执行会话列表检查
+    'probe_suspicious_latency_ms': 2000,
+    
+    # 自适应调度：检查间隔的上下限（秒）
+    'min_check_interval': 5,
+    'max_check_interval': 120,
+    
+    # 连续正常达到该次数后开始拉长间隔，每次正常按该倍数增长
+    'healthy_stretch_after': 3,
+    'healthy_interval_growth': 1.5,
+    
+    # 首次失败或登录成功后的快速复查间隔（秒）
+    'fast_reprobe_interval': 5,
+    
+    # 登录连续失败时的指数退避倍数和最长退避时间（秒），起始值为retry_interval
+    'login_backoff_factor': 2.0,
+    'max_login_backoff': 600,
+    
+    # 等待时间随机抖动比例（0.1表示±10%）
+    'check_jitter_ratio': 0.1,
+    
+    # 各阶段耗时直方图的分桶上界（毫秒），用于估算p50/p95/p99
+    'latency_buckets_ms': [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000, 120000],
+    
+    # 内存中保留的最近检查次数（每次约13字节），按最短检查间隔5秒可覆盖24小时
+    'recent_checks_capacity': 20000,
+    
+    # 滚动成功率窗口（秒）：5分钟、1小时、24小时
+    'availability_windows': [300, 3600, 86400],
+    
+    # 进程查找后端: auto=Linux下读取/proc，其他平台使用psutil; procfs=强制/proc; psutil=始终使用psutil
+    'process_backend': 'auto',
+    
+    # 终止进程时等待正常退出的期限（秒），所有匹配进程共用，到期后强制结束
+    'process_terminate_timeout': 5,
+    
+    # 自动启动微信后等待客户端就绪（进程出现且能连接）的最长时间（秒）
+    'startup_ready_timeout': 60,
+    
+    # 就绪轮询的起始间隔和最大间隔（秒），间隔按1.5倍递增
+    'startup_poll_interval': 0.25,
+    'startup_poll_max_interval': 2.0,
+    
+    # 等待扫码登录时的轮询间隔：从起始间隔开始按倍数增长，不超过最大间隔（秒）
+    'login_poll_interval': 0.2,
+    'login_poll_max_interval': 2.0,
+    'login_poll_backoff': 1.5,
+    
+    # wxautox调用期限（秒），超过后按失败处理，0表示不限制
+    # connect=创建WeChat实例, online=IsOnline, session=GetSession, login_window=在LoginWnd.login自身超时之外额外允许的秒数
+    # alive=复用连接前检查主窗口是否存在(UiaAPI.Exists)
+    'backend_call_timeouts': {
+        'connect': 20,
+        'online': 10,
+        'session': 30,
+        'login_window': 30,
+        'alive': 5
+    },
+    
+    # 执行wxautox调用的工作线程数；超时卡住的线程由新线程替换，最多同时保留backend_max_hung_workers个卡住线程
+    'backend_workers': 4,
+    'backend_max_hung_workers': 8
 }
 
 # 日志配置
@@ -40,8 +122,35 @@ LOG_CONFIG = {
     # 日志文件保存天数
     'log_retention_days': 7,
     
-    # 日志文件大小限制（MB）
-    'log_file_max_size': 10
+    # 日志文件大小限制（MB），增强版日志按该大小轮转
+    'log_file_max_size': 10,
+    
+    # 日志目录中所有日志文件的总大小上限（MB），超过后从最旧的日志开始删除，0表示不限制
+    'log_dir_max_size_mb': 500,
+    
+    # 后台压缩轮转后的日志和前一天及更早的日志：auto=安装了zstandard时用zstd否则gzip, gzip, zstd, none=不压缩
+    'log_compression': 'auto',
+    
+    # 日志文件最后修改后至少经过该时间（秒）才压缩，避免压缩仍在写入的文件
+    'log_compress_min_idle': 60,
+    
+    # 是否启用异步日志（监控线程只入队，后台线程负责格式化和写入）
+    'async_logging': True,
+    
+    # 异步日志队列容量
+    'log_queue_size': 10000,
+    
+    # 队列满时的溢出策略：drop_new=丢弃新日志, drop_oldest=丢弃最旧日志, block=限时阻塞等待
+    'log_overflow_policy': 'drop_oldest',
+    
+    # block策略下的最长等待时间（秒），超时后丢弃
+    'log_block_timeout': 0.5,
+    
+    # 日志模式：transition=只在状态变化时输出完整信息，重复状态折叠为周期汇总; verbose=每次检查都输出完整信息
+    'log_mode': 'transition',
+    
+    # transition模式下重复状态的汇总间隔（秒）
+    'log_summary_interval': 300
 }
 
 # 微信配置
@@ -65,5 +174,77 @@ NOTIFICATION_CONFIG = {
     'enable_sound_alert': False,
     
     # 通知标题
-    'notification_title': '微信监控提醒'
-}
\ No newline at end of file
+    'notification_title': '微信监控提醒',
+    
+    # 是否由后台线程投递通知（不阻塞监控线程）
+    'async_dispatch': True,
+    
+    # 通知队列容量，队列满时丢弃新通知
+    'queue_size': 100,
+    
+    # 合并窗口（秒），窗口内标题相同的通知合并为一条
+    'coalesce_window': 60,
+    
+    # 令牌桶限流：每分钟最多发送条数和允许的突发条数
+    'rate_limit_per_minute': 6,
+    'rate_limit_burst': 3
+}
+
+# 指标端点配置
+METRICS_CONFIG = {
+    # 是否启动本地Prometheus指标端点（也可通过 --metrics-port 启用）
+    'enabled': False,
+    
+    # 监听地址，默认只监听本机
+    'host': '127.0.0.1',
+    
+    # 监听端口
+    'port': 9464
+}
+
+# 多账号监管配置
+ACCOUNTS_CONFIG = {
+    # 是否启用多账号监管模式（也可通过 --supervisor 或 --accounts 启用）
+    'enabled': False,
+    
+    # 账号定义列表，每个账号必须有唯一的name；未填写的字段取WECHAT_CONFIG/MONITOR_CONFIG中的值
+    # 可选字段: process_name, install_path, auto_start_wechat, nickname(传给wxautox.WeChat区分多开实例),
+    #          auto_login(是否为该账号自动登录), 以及check_interval、max_retry_count、login_timeout等MONITOR_CONFIG键
+    'accounts': [
+        # {'name': '客服1', 'nickname': '客服1'},
+        # {'name': '客服2', 'nickname': '客服2', 'check_interval': 60},
+    ],
+    
+    # 执行各账号检查的工作线程数上限，与账号数量无关；卡住的账号各占一个工作线程
+    'max_workers': 8,
+    
+    # 单次检查超过该时间（秒）未返回视为卡住并告警，登录时另加login_timeout；只影响该账号
+    'hang_timeout': 120,
+    
+    # 各账号状态汇总日志的输出间隔（秒）
+    'summary_interval': 300
+}
+
+# 检查历史存储配置（SQLite WAL，后台线程批量写入）
+HISTORY_CONFIG = {
+    # 是否记录检查、阶段耗时、登录和通知历史（也可通过 --history-db 启用）
+    'enabled': True,
+    
+    # 历史数据库路径
+    'path': 'logs/history.db',
+    
+    # 每批最多写入的记录数，一批在一个事务中提交
+    'batch_size': 500,
+    
+    # 一批记录最长等待时间（秒），不足batch_size条时到期也写入
+    'flush_interval': 1.0,
+    
+    # 待写入记录队列上限，写入跟不上时丢弃新记录而不阻塞监控线程
+    'queue_size': 10000,
+    
+    # 历史记录保留天数，0表示不清理
+    'retention_days': 30,
+    
+    # 清理过期记录的间隔（秒）
+    'purge_interval': 3600
+}
@@ -9,6 +9,29 @@ test_config_loading：测试配置加载
 test_notification_manager：测试通知管理器
 test_process_manager：测试进程管理器
 test_log_rotator：测试日志轮转器
+test_wechat_connection：测试微信连接复用
+test_probe_pipeline：测试分级探测流水线
+test_check_scheduler：测试自适应检查调度器
+test_monitor_wakeup：测试事件唤醒等待
+test_notification_dispatcher：测试后台通知投递
+test_async_logging：测试异步日志管道
+test_state_transition_logger：测试状态变化日志折叠
+test_latency_histogram：测试阶段耗时直方图
+test_metrics_endpoint：测试Prometheus指标端点
+test_process_tracker：测试PID跟踪器
+test_terminate_processes：测试批量终止进程
+test_client_readiness：测试启动就绪等待
+test_login_watcher：测试登录等待器
+test_account_supervisor：测试多账号监管
+test_deadline_scheduler：测试多目标到期调度器
+test_backend_call_pool：测试后端调用线程池的调用期限、卡住线程替换和调用计数
+test_async_engine：测试asyncio监控引擎的线程池检查、登录任务、通知任务和可取消等待
+test_state_machine：测试统一监控状态机的状态转换和tick(now)节奏
+test_history_store：测试检查历史存储（WAL、批量写入、可用率和登录记录查询、保留清理）
+test_recent_checks：测试最近检查环形缓冲（滚动窗口统计、覆盖最早记录、滚动成功率）
+test_log_analyzer：测试日志分析工具的区间重建、可用率、MTTR和登录成功率
+test_log_dir_rotation：测试日志目录按保留天数和总大小上限清理，以及日志文件跨零点切换
+test_log_compression：测试日志后台压缩的文件选择、命名、修改时间保留和节省空间统计
 run_all_tests：运行所有测试
 main：测试主入口函数
 """
@@ -23,10 +46,56 @@ flowchart TD
     C --> E[test_notification_manager测试通知]
     C --> F[test_process_manager测试进程]
     C --> G[test_log_rotator测试日志]
+    C --> I[test_wechat_connection测试连接复用]
+    C --> J[test_probe_pipeline测试分级探测]
+    C --> K[test_check_scheduler测试自适应调度]
+    C --> L[test_monitor_wakeup测试事件唤醒]
+    C --> M[test_notification_dispatcher测试通知投递]
+    C --> N[test_async_logging测试异步日志]
+    C --> O[test_state_transition_logger测试状态变化日志]
+    C --> P[test_latency_histogram测试耗时直方图]
+    C --> Q[test_metrics_endpoint测试指标端点]
+    C --> R[test_process_tracker测试PID跟踪]
+    C --> S[test_terminate_processes测试批量终止]
+    C --> T[test_client_readiness测试就绪等待]
+    C --> U[test_login_watcher测试登录等待]
+    C --> V[test_account_supervisor测试多账号监管]
+    C --> W[test_deadline_scheduler测试多目标到期调度器]
+    C --> X[test_backend_call_pool测试调用超时]
+    C --> Y[test_async_engine测试asyncio引擎]
+    C --> Z[test_state_machine统一监控状态机测试]
+    C --> AA[test_history_store检查历史存储]
+    C --> AB[test_recent_checks最近检查环形缓冲]
+    C --> AC[test_log_analyzer: 可用率/MTTR/登录成功率]
+    C --> AD[test_log_dir_rotation: 保留天数/总大小上限/零点切换]
+    C --> AE[test_log_compression: gzip/空闲检查/节省空间]
     D --> H[输出测试结果]
     E --> H
     F --> H
     G --> H
+    I --> H
+    J --> H
+    K --> H
+    L --> H
+    M --> H
+    N --> H
+    O --> H
+    P --> H
+    Q --> H
+    R --> H
+    S --> H
+    T --> H
+    U --> H
+    V --> H
+    W --> H
+    X --> H
+    Y --> H
+    Z --> H
+    AA --> H
+    AB --> H
+    AC --> H
+    AD --> H
+    AE --> H
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
 
@@ -34,6 +103,7 @@ import os
 import sys
 import time
 import logging
+import threading
 from datetime import datetime
 
 # 添加项目根目录到Python路径
@@ -41,7 +111,40 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 try:
     from config import MONITOR_CONFIG, LOG_CONFIG, WECHAT_CONFIG, NOTIFICATION_CONFIG
-    from wechat_utils import NotificationManager, ProcessManager, LogRotator
+    from wechat_utils import NotificationManager, NotificationDispatcher, ProcessManager, LogRotator, WeChatMonitor
+    import wechat_connection
+    import wechat_login
+    from wechat_connection import WeChatConnection, wait_for_client_ready
+    from wechat_probe import ProbePipeline, ProbeResult
+    from wechat_metrics import LatencyHistogram, LatencyRecorder, MonitorStats, get_latency_recorder
+    from wechat_exporter import MetricsServer, render_metrics
+    import urllib.request
+    import urllib.error
+    from wechat_scheduler import CheckScheduler, MonitorWakeup
+    import queue
+    from wechat_logging import BoundedQueueHandler, start_async_logging, stop_async_logging, StateTransitionLogger
+    import subprocess
+    import psutil
+    from wechat_process import ProcessTracker, PsutilBackend, ProcFSBackend, terminate_processes, get_process_tracker
+    from wechat_login import LoginWatcher
+    import json
+    import shutil
+    import tempfile
+    from wechat_supervisor import AccountMonitor, AccountSupervisor, load_accounts
+    from wechat_metrics import get_monitor_stats
+    from wechat_scheduler import DeadlineScheduler
+    from wechat_backend import BackendCallPool, CallTimeout, backend_pool_stats, call_login_window
+    import types
+    import asyncio
+    from wechat_async import AsyncMonitorEngine
+    from wechat_supervisor import default_account
+    from wechat_state import MonitorStateMachine, probe_state, UNKNOWN, ONLINE, DEGRADED, OFFLINE, LOGGING_IN, BACKOFF
+    import sqlite3
+    from wechat_history import HistoryStore
+    from wechat_metrics import RecentChecks
+    from wechat_log_analyzer import analyze_logs, format_report
+    from wechat_logging import rotate_log_dir, schedule_log_rotation, wait_log_rotation, DailyFileHandler
+    from wechat_logging import compress_logs, log_compression_stats, format_compression_result
 except ImportError as e:
     print(f"导入模块失败: {e}")
     print("请确保所有必要的文件都在正确的位置")
@@ -197,6 +300,1765 @@ def test_log_rotator():
         print(f"✗ 日志轮转器测试失败: {e}")
         return False
 
+def test_wechat_connection():
+    """
+    test_wechat_connection 功能说明:
+    # 测试微信连接持有者的复用、失效重连和统计功能，以及窗口存活检查超过alive期限时按失效重连
+    # 使用临时替换的WeChat类，不依赖真实微信客户端
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试微信连接复用 ===")
+    
+    class DummyWeChat:
+        def IsOnline(self):
+            return True
+    
+    original_wechat = wechat_connection.wxautox.WeChat
+    original_timeouts = MONITOR_CONFIG.get('backend_call_timeouts')
+    try:
+        wechat_connection.wxautox.WeChat = DummyWeChat
+        connection = WeChatConnection(max_age=0)
+        
+        # 连续获取两次应复用同一个实例
+        first = connection.get()
+        second = connection.get()
+        assert first is second
+        assert connection.connect_count == 1
+        assert connection.reuse_count == 1
+        print("✓ 实例复用正常")
+        
+        # 标记失效后应重新连接
+        connection.invalidate("测试")
+        third = connection.get()
+        assert third is not first
+        assert connection.reconnect_count == 1
+        print("✓ 失效后重连正常")
+        
+        stats = connection.stats()
+        assert stats['connects'] == 2
+        assert stats['reuses'] == 1
+        print(f"✓ 连接统计正常: {stats}")
+        
+        # 主窗口存活检查卡住超过alive期限时，实例按失效处理并重新连接
+        class HangingWindow:
+            def Exists(self, max_search_seconds, search_interval):
+                time.sleep(0.5)
+                return True
+        third.UiaAPI = HangingWindow()
+        MONITOR_CONFIG['backend_call_timeouts'] = {'alive': 0.05}
+        started = time.time()
+        fourth = connection.get()
+        assert fourth is not third and time.time() - started < 0.4
+        assert connection.reconnect_count == 2
+        print("✓ 窗口存活检查超过期限时重新连接")
+        
+        print("✓ 微信连接复用测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 微信连接复用测试失败: {e}")
+        return False
+    finally:
+        wechat_connection.wxautox.WeChat = original_wechat
+        if original_timeouts is None:
+            MONITOR_CONFIG.pop('backend_call_timeouts', None)
+        else:
+            MONITOR_CONFIG['backend_call_timeouts'] = original_timeouts
+
+def test_probe_pipeline():
+    """
+    test_probe_pipeline 功能说明:
+    # 测试分级探测流水线的阶段调度：会话检查按间隔执行，失败后立即执行
+    # 使用临时替换的WeChat类，不依赖真实微信客户端
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试分级探测流水线 ===")
+    
+    class DummyWeChat:
+        online = True
+        def IsOnline(self):
+            return DummyWeChat.online
+        def GetSession(self):
+            return ['文件传输助手']
+    
+    class DummyProcessManager:
+        def is_process_running(self, process_name):
+            return True
+    
+    original_wechat = wechat_connection.wxautox.WeChat
+    try:
+        wechat_connection.wxautox.WeChat = DummyWeChat
+        stages = {'session': {'every': 3}}
+        pipeline = ProbePipeline(WeChatConnection(max_age=0), DummyProcessManager(), stage_config=stages)
+        
+        # 第一次探测会执行全部阶段，之后会话检查每3次执行一次
+        runs = [pipeline.run().stages_run for _ in range(4)]
+        assert runs[0] == ['process', 'online', 'session']
+        assert runs[1] == ['process', 'online']
+        assert runs[2] == ['process', 'online']
+        assert runs[3] == ['process', 'online', 'session']
+        print("✓ 会话检查按间隔执行")
+        
+        # 在线检查失败后，下一次探测立即执行会话检查
+        DummyWeChat.online = False
+        result = pipeline.run()
+        assert not result.ok and result.failed_stage == 'online'
+        DummyWeChat.online = True
+        result = pipeline.run()
+        assert result.ok and 'session' in result.stages_run and result.suspicious
+        print("✓ 可疑迹象触发会话检查")
+        
+        stats = pipeline.stage_stats()
+        assert stats['online']['runs'] == 6
+        assert stats['online']['failures'] == 1
+        print(f"✓ 阶段耗时统计正常: {stats['session']}")
+        
+        print("✓ 分级探测流水线测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 分级探测流水线测试失败: {e}")
+        return False
+    finally:
+        wechat_connection.wxautox.WeChat = original_wechat
+
+def test_check_scheduler():
+    """
+    test_check_scheduler 功能说明:
+    # 测试自适应调度器：健康拉长间隔、首次失败快速复查、登录失败指数退避、抖动范围
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试自适应检查调度器 ===")
+    
+    try:
+        config = {
+            'check_interval': 30, 'min_check_interval': 5, 'max_check_interval': 120,
+            'healthy_stretch_after': 2, 'healthy_interval_growth': 2.0,
+            'fast_reprobe_interval': 5, 'retry_interval': 10,
+            'login_backoff_factor': 2.0, 'max_login_backoff': 60, 'check_jitter_ratio': 0
+        }
+        scheduler = CheckScheduler(config)
+        
+        # 持续健康时逐步拉长，不超过上限
+        scheduler.on_check(True)
+        assert scheduler.next_delay() == 30
+        scheduler.on_check(True)
+        assert scheduler.next_delay() == 60
+        for _ in range(5):
+            scheduler.on_check(True)
+        assert scheduler.next_delay() == 120
+        print("✓ 持续健康时间隔逐步拉长")
+        
+        # 首次失败快速复查
+        scheduler.on_check(False)
+        assert scheduler.next_delay() == 5
+        print("✓ 首次失败快速复查")
+        
+        # 登录连续失败指数退避
+        delays = []
+        for _ in range(4):
+            scheduler.on_login(False)
+            delays.append(scheduler.next_delay())
+        assert delays == [10, 20, 40, 60]
+        scheduler.on_login(True)
+        assert scheduler.next_delay() == 5
+        print("✓ 登录失败指数退避，成功后快速复查")
+        
+        # 抖动保持在配置比例内
+        config['check_jitter_ratio'] = 0.1
+        jittered = CheckScheduler(config)
+        samples = [jittered.next_delay() for _ in range(50)]
+        assert all(27 <= d <= 33 for d in samples) and len(set(samples)) > 1
+        print("✓ 随机抖动在±10%范围内")
+        
+        print("✓ 自适应检查调度器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 自适应检查调度器测试失败: {e}")
+        return False
+
+def test_monitor_wakeup():
+    """
+    test_monitor_wakeup 功能说明:
+    # 测试事件唤醒等待：超时返回None、外部请求立即唤醒并给出原因、关闭为粘滞状态
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试事件唤醒等待 ===")
+    
+    try:
+        wakeup = MonitorWakeup()
+        
+        # 无请求时等满超时
+        assert wakeup.wait(0.05) is None
+        print("✓ 无请求时等待超时返回")
+        
+        # 其他线程发出立即检查请求，等待应立即返回
+        timer = threading.Timer(0.1, wakeup.notify, args=(MonitorWakeup.CHECK_NOW,))
+        started = time.monotonic()
+        timer.start()
+        reason = wakeup.wait(10)
+        elapsed = time.monotonic() - started
+        assert reason == MonitorWakeup.CHECK_NOW and elapsed < 2
+        print(f"✓ 立即检查请求唤醒等待，耗时 {elapsed:.2f}秒")
+        
+        # 重复请求去重，关闭请求优先且保持有效
+        wakeup.notify(MonitorWakeup.RELOAD)
+        wakeup.notify(MonitorWakeup.RELOAD)
+        assert wakeup.wait(1) == MonitorWakeup.RELOAD
+        assert wakeup.wait(0) is None
+        wakeup.notify(MonitorWakeup.SHUTDOWN)
+        assert wakeup.wait(10) == MonitorWakeup.SHUTDOWN
+        assert wakeup.wait(10) == MonitorWakeup.SHUTDOWN and wakeup.is_shutdown
+        print("✓ 关闭请求立即生效且保持有效")
+        
+        print("✓ 事件唤醒等待测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 事件唤醒等待测试失败: {e}")
+        return False
+
+def test_notification_dispatcher():
+    """
+    test_notification_dispatcher 功能说明:
+    # 测试后台通知投递：慢速发送不阻塞提交、同标题合并、令牌桶限流、队列满丢弃
+    # 使用替代的发送函数，不弹出真实桌面通知
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试后台通知投递 ===")
+    
+    try:
+        sent = []
+        def slow_deliver(title, message):
+            time.sleep(0.2)  # 模拟很慢的通知后端
+            sent.append((title, message))
+            return True
+        
+        dispatcher = NotificationDispatcher(slow_deliver, queue_size=50, coalesce_window=30,
+                                            rate_per_minute=0, burst=1)
+        
+        # 慢速后端不应阻塞提交
+        started = time.monotonic()
+        for i in range(5):
+            dispatcher.submit("微信状态异常", f"第 {i + 1} 次检查失败")
+        dispatcher.submit("微信登录成功", "已恢复")
+        assert time.monotonic() - started < 0.1
+        print("✓ 提交通知不阻塞调用方")
+        
+        # 第一条立即发送，其余同标题通知合并为一条
+        dispatcher.stop(timeout=5)
+        titles = [title for title, _ in sent]
+        assert titles.count("微信状态异常") == 2 and titles.count("微信登录成功") == 1
+        assert "共 4 条" in [m for t, m in sent if t == "微信状态异常"][-1]
+        metrics = dispatcher.metrics()
+        assert metrics['coalesced'] == 3 and metrics['delivered'] == 3
+        print(f"✓ 同标题通知合并正常: {metrics['coalesced']} 条被合并")
+        
+        # 令牌桶限流：突发1条后，其余不同标题的通知被推迟
+        sent.clear()
+        limited = NotificationDispatcher(lambda t, m: sent.append(t) or True, queue_size=10,
+                                         coalesce_window=0, rate_per_minute=1, burst=1)
+        for i in range(3):
+            limited.submit(f"通知{i}", "内容")
+        time.sleep(0.3)
+        # 两条被推迟的通知各计一次，不随投递线程的重试次数增长
+        assert len(sent) == 1 and limited.metrics()['rate_limited'] == 2, limited.metrics()
+        limited.stop(timeout=2)
+        assert len(sent) == 3  # 退出前剩余通知全部发送
+        print("✓ 令牌桶限流正常，退出时发送剩余通知")
+        
+        # 队列满时丢弃并计数
+        blocker = threading.Event()
+        full = NotificationDispatcher(lambda t, m: blocker.wait(2) or True, queue_size=1,
+                                      coalesce_window=0, rate_per_minute=0)
+        results = [full.submit(f"通知{i}", "内容") for i in range(5)]
+        assert not all(results) and full.metrics()['dropped'] >= 1
+        blocker.set()
+        full.stop(timeout=2)
+        print(f"✓ 队列满时丢弃新通知: {full.metrics()['dropped']} 条")
+        
+        print("✓ 后台通知投递测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 后台通知投递测试失败: {e}")
+        return False
+
+def test_async_logging():
+    """
+    test_async_logging 功能说明:
+    # 测试异步日志管道：记录由后台线程写入、停止后处理器还原、三种溢出策略的丢弃计数
+    # 使用临时的根日志器处理器，测试结束后恢复原处理器
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试异步日志管道 ===")
+    
+    root = logging.getLogger()
+    saved_handlers = list(root.handlers)
+    saved_level = root.level
+    try:
+        # 用一个记录写入线程的处理器替换根日志器的处理器
+        records = []
+        class CollectHandler(logging.Handler):
+            def emit(self, record):
+                records.append((record.getMessage(), threading.current_thread().name))
+        
+        collector = CollectHandler()
+        for handler in saved_handlers:
+            root.removeHandler(handler)
+        root.addHandler(collector)
+        root.setLevel(logging.INFO)
+        
+        assert start_async_logging(queue_size=100, overflow_policy='drop_oldest')
+        assert collector not in root.handlers  # 根日志器只保留队列处理器
+        for i in range(20):
+            logging.info(f"异步日志 {i}")
+        stats = stop_async_logging()
+        assert stats['enqueued'] >= 20 and stats['dropped'] == 0
+        assert root.handlers == [collector]
+        messages = [m for m, _ in records if m.startswith("异步日志")]
+        assert len(messages) == 20
+        assert all(name != threading.current_thread().name for _, name in records)
+        print(f"✓ 日志由后台线程写入，停止后处理器已还原: {len(messages)} 条")
+        
+        # 溢出策略：不启动监听线程，直接观察队列满时的行为
+        def make_record(i):
+            return logging.LogRecord('test', logging.INFO, __file__, 0, f"记录 {i}", None, None)
+        
+        drop_new = BoundedQueueHandler(queue.Queue(maxsize=3), 'drop_new')
+        for i in range(5):
+            drop_new.handle(make_record(i))
+        kept = [drop_new.queue.get_nowait().getMessage() for _ in range(3)]
+        assert drop_new.dropped == 2 and kept == ["记录 0", "记录 1", "记录 2"]
+        print("✓ drop_new 策略丢弃新记录")
+        
+        drop_oldest = BoundedQueueHandler(queue.Queue(maxsize=3), 'drop_oldest')
+        for i in range(5):
+            drop_oldest.handle(make_record(i))
+        kept = [drop_oldest.queue.get_nowait().getMessage() for _ in range(3)]
+        assert drop_oldest.dropped == 2 and kept == ["记录 2", "记录 3", "记录 4"]
+        print("✓ drop_oldest 策略丢弃最旧记录")
+        
+        block = BoundedQueueHandler(queue.Queue(maxsize=1), 'block', block_timeout=0.05)
+        started = time.monotonic()
+        block.handle(make_record(0))
+        block.handle(make_record(1))
+        assert block.dropped == 1 and time.monotonic() - started >= 0.05
+        print("✓ block 策略限时等待后丢弃")
+        
+        print("✓ 异步日志管道测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 异步日志管道测试失败: {e}")
+        return False
+    
+    finally:
+        stop_async_logging()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+
+def test_state_transition_logger():
+    """
+    test_state_transition_logger 功能说明:
+    # 测试状态变化日志：状态变化完整输出、重复状态折叠、按间隔汇总、恢复时补充计数、verbose模式不折叠
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试状态变化日志 ===")
+    
+    root = logging.getLogger()
+    saved_level = root.level
+    messages = []
+    class CollectHandler(logging.Handler):
+        def emit(self, record):
+            messages.append((record.levelno, record.getMessage()))
+    collector = CollectHandler()
+    root.addHandler(collector)
+    root.setLevel(logging.INFO)
+    try:
+        state_log = StateTransitionLogger(mode='transition', summary_interval=3600)
+        
+        # 第一次出现完整输出，相同错误重复时折叠
+        for _ in range(5):
+            state_log.log('status', 'error:超时', logging.ERROR, "检查失败: 超时", "建议检查网络")
+        assert messages == [(logging.ERROR, "检查失败: 超时"), (logging.ERROR, "建议检查网络")]
+        assert state_log.suppressed == 4
+        print("✓ 相同错误只完整输出一次，其余折叠")
+        
+        # 不同的错误是状态变化：先补充上一状态的重复次数，再完整输出
+        messages.clear()
+        assert state_log.log('status', 'error:拒绝访问', logging.ERROR, "检查失败: 拒绝访问")
+        assert len(messages) == 2 and "已重复 4 次" in messages[0][1]
+        assert messages[1][1] == "检查失败: 拒绝访问"
+        print("✓ 状态变化时补充重复汇总并完整输出")
+        
+        # 例行日志在transition模式下降为DEBUG
+        messages.clear()
+        state_log.routine("第 1 次状态检查开始...")
+        assert messages == []
+        print("✓ 例行日志降为DEBUG")
+        
+        # 到达汇总间隔时输出一条汇总
+        periodic = StateTransitionLogger(mode='transition', summary_interval=0)
+        messages.clear()
+        periodic.log('status', 'offline', logging.INFO, "微信离线")
+        periodic.log('status', 'offline', logging.INFO, "微信离线")
+        assert len(messages) == 2 and "已重复 1 次" in messages[1][1]
+        print("✓ 到达汇总间隔输出周期汇总")
+        
+        # 恢复时输出未汇总的计数和恢复信息，之后相同状态重新完整输出
+        messages.clear()
+        state_log.log('status', 'error:拒绝访问', logging.ERROR, "检查失败: 拒绝访问")
+        state_log.recovered('status', "微信状态已恢复")
+        assert [m for _, m in messages][-1] == "微信状态已恢复" and "已重复 1 次" in messages[0][1]
+        messages.clear()
+        assert state_log.log('status', 'error:拒绝访问', logging.ERROR, "检查失败: 拒绝访问")
+        print("✓ 恢复后状态重新开始记录")
+        
+        # verbose模式保持原有行为
+        verbose = StateTransitionLogger(mode='verbose')
+        messages.clear()
+        for _ in range(3):
+            verbose.log('status', 'offline', logging.INFO, "微信离线")
+        verbose.routine("例行日志")
+        assert len(messages) == 4 and verbose.suppressed == 0
+        print("✓ verbose模式不折叠日志")
+        
+        print("✓ 状态变化日志测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 状态变化日志测试失败: {e}")
+        return False
+    
+    finally:
+        root.removeHandler(collector)
+        root.setLevel(saved_level)
+
+def test_latency_histogram():
+    """
+    test_latency_histogram 功能说明:
+    # 测试阶段耗时直方图：分位数估算、最大值、计时上下文，以及探测流水线记录各阶段耗时
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试阶段耗时直方图 ===")
+    
+    try:
+        # 1~100毫秒均匀分布，分位数估算误差不超过所在桶的宽度
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000.0)
+        stats = histogram.summary()
+        assert stats['count'] == 100 and stats['max_ms'] == 100.0
+        assert 40 <= stats['p50_ms'] <= 60
+        assert 90 <= stats['p95_ms'] <= 100 and stats['p95_ms'] <= stats['p99_ms'] <= 100
+        print(f"✓ 分位数估算正常: p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms")
+        
+        # 超出最大分桶的耗时进入溢出桶，分位数不超过实际最大值
+        overflow = LatencyHistogram(buckets_ms=[1, 10])
+        overflow.observe(5.0)
+        assert overflow.summary()['p99_ms'] == 5000.0 and LatencyHistogram().summary()['count'] == 0
+        print("✓ 溢出桶和空直方图处理正常")
+        
+        # 计时上下文在异常时也会记录
+        recorder = LatencyRecorder()
+        with recorder.timer('process'):
+            time.sleep(0.01)
+        try:
+            with recorder.timer('login_window'):
+                raise RuntimeError("模拟登录窗口异常")
+        except RuntimeError:
+            pass
+        summary = recorder.summary()
+        assert summary['process']['count'] == 1 and summary['process']['max_ms'] >= 10
+        assert summary['login_window']['count'] == 1
+        assert "进程检查 p50=" in recorder.format_summary()
+        print(f"✓ 计时上下文正常: {recorder.format_summary()}")
+        
+        # 探测流水线把IsOnline、GetSession和整次检查耗时记入共享记录器
+        class DummyWeChat:
+            def IsOnline(self):
+                return True
+            def GetSession(self):
+                return ['会话']
+        class DummyConnection:
+            connect_count = 1
+            def get(self):
+                return DummyWeChat()
+            def invalidate(self, reason=None):
+                pass
+        shared = get_latency_recorder()
+        shared.reset()
+        pipeline = ProbePipeline(DummyConnection(), stage_config={'session': {'every': 1}})
+        for _ in range(3):
+            pipeline.run()
+        summary = shared.summary()
+        assert summary['online']['count'] == 3 and summary['session']['count'] == 3
+        assert summary['check']['count'] == 3
+        shared.reset()
+        print("✓ 探测流水线记录各阶段耗时")
+        
+        print("✓ 阶段耗时直方图测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 阶段耗时直方图测试失败: {e}")
+        return False
+
+def test_metrics_endpoint():
+    """
+    test_metrics_endpoint 功能说明:
+    # 测试Prometheus指标端点：计数器、登录结果、阶段耗时直方图、进程资源，以及HTTP服务和404处理
+    # 端口随机分配，只监听本机
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试Prometheus指标端点 ===")
+    
+    server = None
+    try:
+        stats = MonitorStats()
+        for ok in (True, True, False, False):
+            stats.record_check(ok)
+        stats.record_login('success')
+        stats.record_login('error')
+        recorder = LatencyRecorder(buckets_ms=[10, 100])
+        recorder.observe('online', 0.005)
+        recorder.observe('online', 0.05)
+        recorder.observe('online', 0.5)
+        
+        text = render_metrics(recorder, stats)
+        assert "wechat_monitor_checks_total 4" in text
+        assert "wechat_monitor_checks_success_total 2" in text
+        assert "wechat_monitor_consecutive_failures 2" in text
+        assert "wechat_monitor_login_attempts_total 2" in text
+        assert 'wechat_monitor_login_outcomes_total{outcome="error"} 1' in text
+        assert 'wechat_monitor_stage_latency_seconds_bucket{stage="online",le="0.01"} 1' in text
+        assert 'wechat_monitor_stage_latency_seconds_bucket{stage="online",le="0.1"} 2' in text
+        assert 'wechat_monitor_stage_latency_seconds_bucket{stage="online",le="+Inf"} 3' in text
+        assert 'wechat_monitor_stage_latency_seconds_count{stage="online"} 3' in text
+        assert "process_resident_memory_bytes" in text and "process_cpu_seconds_total" in text
+        last_success = [l for l in text.splitlines() if l.startswith("wechat_monitor_last_success_timestamp_seconds ")]
+        assert float(last_success[0].split()[1]) > 0
+        print("✓ 计数器、直方图和进程资源格式正确")
+        
+        server = MetricsServer('127.0.0.1', 0)
+        host, port = server.start()
+        with urllib.request.urlopen(f"http://{host}:{port}/metrics", timeout=5) as response:
+            body = response.read().decode('utf-8')
+            assert response.headers['Content-Type'].startswith('text/plain')
+        assert "# TYPE wechat_monitor_checks_total counter" in body
+        try:
+            urllib.request.urlopen(f"http://{host}:{port}/other", timeout=5)
+            assert False, "未知路径应返回404"
+        except urllib.error.HTTPError as e:
+            assert e.code == 404
+        print(f"✓ HTTP端点正常: http://{host}:{port}/metrics")
+        
+        print("✓ Prometheus指标端点测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ Prometheus指标端点测试失败: {e}")
+        return False
+    
+    finally:
+        if server:
+            server.stop()
+
+def test_process_tracker():
+    """
+    test_process_tracker 功能说明:
+    # 测试PID跟踪器：第二次查找只验证缓存PID不再全量遍历，缓存的进程退出后重新遍历
+    # psutil后端和/proc后端（仅Linux）分别测试
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试PID跟踪器 ===")
+    
+    child = None
+    try:
+        backends = [PsutilBackend()]
+        if ProcFSBackend.available():
+            backends.append(ProcFSBackend())
+        
+        for backend in backends:
+            child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+            name = psutil.Process(child.pid).name()
+            tracker = ProcessTracker(backend)
+            
+            assert child.pid in tracker.find_pids(name), "应找到子进程"
+            assert tracker.scan_count == 1
+            
+            found = tracker.find(name.upper())
+            assert child.pid in [proc.pid for proc in found]
+            assert tracker.scan_count == 1 and tracker.cache_hits == 1, "缓存PID有效时不应全量遍历"
+            print(f"✓ [{backend.name}] 缓存命中，全量遍历 {tracker.scan_count} 次")
+            
+            child.kill()
+            child.wait()
+            assert child.pid not in tracker.find_pids(name), "已退出的进程不应返回"
+            assert tracker.scan_count == 2, "缓存PID失效后应重新全量遍历"
+            print(f"✓ [{backend.name}] 缓存进程退出后重新遍历")
+            
+            assert tracker.find_pids('不存在的进程.exe') == []
+        
+        print("✓ PID跟踪器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ PID跟踪器测试失败: {e}")
+        return False
+    
+    finally:
+        if child and child.poll() is None:
+            child.kill()
+            child.wait()
+
+def test_terminate_processes():
+    """
+    test_terminate_processes 功能说明:
+    # 测试批量终止：多个进程共用一个等待期限，忽略terminate的进程到期后被强制结束，返回每个PID的结果；
+    # terminate_all全量遍历，PID缓存之后新启动的同名进程也被终止（仅Linux，通过符号链接设置唯一进程名）
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试批量终止进程 ===")
+    
+    children = []
+    try:
+        for _ in range(3):
+            children.append(subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)']))
+        # 忽略SIGTERM的进程，输出一行表示信号处理已设置
+        stubborn = subprocess.Popen(
+            [sys.executable, '-c',
+             'import signal, sys, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print("ready", flush=True); time.sleep(30)'],
+            stdout=subprocess.PIPE)
+        children.append(stubborn)
+        stubborn.stdout.readline()
+        
+        procs = [psutil.Process(child.pid) for child in children]
+        children[0].kill()
+        children[0].wait()
+        
+        started = time.time()
+        outcomes = terminate_processes(procs, timeout=1.0, kill_timeout=1.0)
+        elapsed = time.time() - started
+        
+        assert outcomes[children[0].pid] == 'gone', outcomes
+        assert outcomes[children[1].pid] == 'terminated' and outcomes[children[2].pid] == 'terminated', outcomes
+        expected = 'terminated' if sys.platform == 'win32' else 'killed'
+        assert outcomes[stubborn.pid] == expected, outcomes
+        assert elapsed < 2.5, f"总等待时间应只有一个期限，实际 {elapsed:.1f}秒"
+        assert all(child.poll() is not None for child in children)
+        print(f"✓ 4个进程批量终止耗时 {elapsed:.1f}秒: {sorted(outcomes.values())}")
+        
+        # terminate_all终止前全量遍历：PID缓存建立之后新启动的同名进程也被终止
+        if sys.platform.startswith('linux'):
+            link_dir = tempfile.mkdtemp()
+            try:
+                name = f"wxterm{os.getpid() % 100000}"
+                executable = os.path.join(link_dir, name)
+                os.symlink(sys.executable, executable)
+                first = subprocess.Popen([executable, '-c', 'import time; time.sleep(30)'])
+                children.append(first)
+                tracker = get_process_tracker()
+                deadline = time.time() + 5
+                while tracker.find_pids(name) != [first.pid] and time.time() < deadline:
+                    time.sleep(0.05)
+                assert tracker.find_pids(name) == [first.pid]
+                second = subprocess.Popen([executable, '-c', 'import time; time.sleep(30)'])
+                children.append(second)
+                while psutil.Process(second.pid).name() != name and time.time() < deadline:
+                    time.sleep(0.05)
+                assert tracker.find_pids(name) == [first.pid], "缓存仍有效时只返回已知PID"
+                outcomes = ProcessManager().terminate_all(name, timeout=2.0)
+                assert sorted(outcomes) == sorted([first.pid, second.pid]), outcomes
+                assert first.wait(5) is not None and second.wait(5) is not None
+                print(f"✓ terminate_all终止了缓存之后新启动的进程: {outcomes}")
+            finally:
+                shutil.rmtree(link_dir, ignore_errors=True)
+        
+        print("✓ 批量终止进程测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 批量终止进程测试失败: {e}")
+        return False
+    
+    finally:
+        for child in children:
+            if child.poll() is None:
+                child.kill()
+                child.wait()
+            if child.stdout:
+                child.stdout.close()
+
+def test_client_readiness():
+    """
+    test_client_readiness 功能说明:
+    # 测试启动就绪等待：进程出现后轮询连接，能连接时立即返回并记录冷启动耗时；进程未出现时到期返回；可被取消；
+    # WeChatMonitor自动启动微信后的就绪等待可被request_stop打断
+    # 使用临时替换的WeChat类，前两次连接失败模拟客户端正在初始化
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试启动就绪等待 ===")
+    
+    attempts = []
+    
+    class StartingWeChat:
+        def __init__(self):
+            attempts.append(time.monotonic())
+            if len(attempts) < 3:
+                raise RuntimeError("微信正在初始化")
+    
+    original_wechat = wechat_connection.wxautox.WeChat
+    saved = {key: MONITOR_CONFIG.get(key) for key in ('startup_poll_interval', 'startup_poll_max_interval',
+                                                      'startup_ready_timeout')}
+    saved_wechat = dict(WECHAT_CONFIG)
+    original_watcher = wechat_login._watcher
+    try:
+        wechat_connection.wxautox.WeChat = StartingWeChat
+        MONITOR_CONFIG.update({'startup_poll_interval': 0.01, 'startup_poll_max_interval': 0.05})
+        recorder = get_latency_recorder()
+        before = recorder.summary().get('cold_start', {}).get('count', 0)
+        
+        connection = WeChatConnection(max_age=0)
+        readiness = wait_for_client_ready(connection, psutil.Process().name(), timeout=5)
+        assert readiness['ready'] and readiness['stage'] == 'ready', readiness
+        assert len(attempts) == 3 and readiness['polls'] == 3, readiness
+        assert readiness['elapsed'] < 1, "客户端可用后应立即返回"
+        assert connection.connect_count == 1, "就绪时连接的实例应留给后续检查复用"
+        assert recorder.summary()['cold_start']['count'] == before + 1
+        print(f"✓ 第{readiness['polls']}次轮询就绪，耗时 {readiness['elapsed'] * 1000:.0f}ms")
+        
+        readiness = wait_for_client_ready(connection, '不存在的进程.exe', timeout=0.2)
+        assert not readiness['ready'] and readiness['stage'] == 'process', readiness
+        print(f"✓ 进程未出现时到期返回，轮询 {readiness['polls']} 次")
+        
+        cancel = threading.Event()
+        cancel.set()
+        readiness = wait_for_client_ready(connection, '不存在的进程.exe', timeout=5, cancel_event=cancel)
+        assert readiness['stage'] == 'cancelled' and readiness['elapsed'] < 1, readiness
+        print("✓ 取消后立即返回")
+        
+        # WeChatMonitor自动启动微信后等待就绪，关闭请求立即打断等待
+        class NotRunningProcessManager:
+            def is_process_running(self, process_name=None):
+                return False
+            def start_process(self, path=None):
+                return True
+        wechat_login._watcher = LoginWatcher(connection)  # request_stop会取消共享轮询器，测试使用单独的实例
+        monitor = WeChatMonitor()
+        monitor.process_manager = monitor.probe_pipeline.process_manager = NotRunningProcessManager()
+        WECHAT_CONFIG.update({'process_name': '不存在的进程.exe', 'auto_start_wechat': True, 'install_path': 'WeChat.exe'})
+        MONITOR_CONFIG['startup_ready_timeout'] = 5
+        threading.Timer(0.1, monitor.request_stop).start()
+        started = time.monotonic()
+        assert monitor.check_status() is False
+        assert time.monotonic() - started < 1, "关闭请求应立即打断就绪等待"
+        print("✓ WeChatMonitor的就绪等待被request_stop打断")
+        
+        print("✓ 启动就绪等待测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 启动就绪等待测试失败: {e}")
+        return False
+    finally:
+        wechat_connection.wxautox.WeChat = original_wechat
+        MONITOR_CONFIG.update(saved)
+        WECHAT_CONFIG.update(saved_wechat)
+        wechat_login._watcher = original_watcher
+
+def test_login_watcher():
+    """
+    test_login_watcher 功能说明:
+    # 测试登录等待器：多个等待方共用一次轮询、登录后快速检测、超时返回、关闭请求立即取消
+    # 使用假连接，IsOnline在指定时间后返回True模拟用户扫码完成
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试登录等待器 ===")
+    
+    class ScanConnection:
+        def __init__(self, login_after):
+            self.login_at = time.monotonic() + login_after
+            self.calls = 0
+        
+        def get(self):
+            return self
+        
+        def IsOnline(self):
+            self.calls += 1
+            return time.monotonic() >= self.login_at
+        
+        def invalidate(self, reason=None):
+            pass
+    
+    try:
+        connection = ScanConnection(login_after=0.3)
+        watcher = LoginWatcher(connection, initial_interval=0.02, max_interval=0.1, backoff=1.5)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(watcher.wait(5))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=5)
+        
+        assert len(results) == 3 and all(result['online'] for result in results), results
+        assert all(result['elapsed'] < 0.5 for result in results), "登录后应在一个最大间隔内检测到"
+        assert connection.calls == watcher.poll_count, "每次轮询只调用一次IsOnline"
+        assert max(result['polls'] for result in results) == watcher.poll_count, "所有等待方共用同一批轮询"
+        print(f"✓ 3个等待方共用 {watcher.poll_count} 次轮询，{results[0]['elapsed'] * 1000:.0f}ms 检测到登录")
+        
+        detect = get_latency_recorder().summary()
+        assert detect['login_detect']['count'] >= 3 and 'login_detect_lag' in detect
+        print(f"✓ 登录检测耗时已记录: p50={detect['login_detect']['p50_ms']}ms")
+        
+        result = LoginWatcher(ScanConnection(login_after=60), initial_interval=0.02, max_interval=0.05).wait(0.2)
+        assert not result['online'] and not result['cancelled'] and result['polls'] >= 2, result
+        print(f"✓ 未登录时到期返回，轮询 {result['polls']} 次")
+        
+        watcher = LoginWatcher(ScanConnection(login_after=60), initial_interval=1, max_interval=1)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(watcher.wait(30)))
+        thread.start()
+        time.sleep(0.1)
+        started = time.time()
+        watcher.cancel()
+        thread.join(timeout=2)
+        assert results and results[0]['cancelled'] and time.time() - started < 0.5, results
+        assert watcher.wait(30)['cancelled'], "取消后新的等待应立即返回"
+        print("✓ 关闭请求立即结束等待")
+        
+        print("✓ 登录等待器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 登录等待器测试失败: {e}")
+        return False
+
+def test_account_supervisor():
+    """
+    test_account_supervisor 功能说明:
+    # 测试多账号监管：账号定义校验、各账号独立的失败计数和状态、卡住的账号不影响其他账号、
+    # 结果同时计入账号计数器和共享计数器、指标端点按账号导出
+    # 使用假连接和假进程管理器，不需要真实的微信客户端
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试多账号监管 ===")
+    
+    class FakeConnection:
+        def __init__(self, online=True, block=None):
+            self.online = online
+            self.block = block  # 置位前IsOnline一直阻塞，模拟卡住的微信窗口
+            self.connect_count = 1
+        
+        def get(self):
+            return self
+        
+        def IsOnline(self):
+            if self.block is not None:
+                self.block.wait(10)
+            return self.online
+        
+        def GetSession(self):
+            return ['会话']
+        
+        def invalidate(self, reason=None):
+            pass
+    
+    class RunningProcess:
+        def is_process_running(self, process_name):
+            return True
+    
+    temp_dir = tempfile.mkdtemp()
+    release = threading.Event()
+    supervisor = None
+    try:
+        path = os.path.join(temp_dir, 'accounts.json')
+        fast = {'check_interval': 0.02, 'min_check_interval': 0.01, 'max_check_interval': 0.05,
+                'fast_reprobe_interval': 0.02, 'check_jitter_ratio': 0}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'accounts': [
+                dict(fast, name='正常账号'),
+                dict(fast, name='离线账号', auto_login=False, max_retry_count=2),
+                dict(fast, name='卡住账号'),
+            ]}, f, ensure_ascii=False)
+        accounts = load_accounts(path)
+        assert [account['name'] for account in accounts] == ['正常账号', '离线账号', '卡住账号']
+        assert accounts[0]['process_name'] == WECHAT_CONFIG['process_name'], "未填写的字段取WECHAT_CONFIG"
+        
+        for bad in ([{'name': 'a'}, {'name': 'a'}], [{'process_name': 'x'}], [{'name': 'a', 'unknown_key': 1}]):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(bad, f)
+            try:
+                load_accounts(path)
+                raise AssertionError(f"账号定义应校验失败: {bad}")
+            except ValueError:
+                pass
+        print("✓ 账号定义读取和校验正常")
+        
+        connections = [FakeConnection(), FakeConnection(online=False), FakeConnection(block=release)]
+        monitors = [AccountMonitor(account, connection=connection, process_manager=RunningProcess())
+                    for account, connection in zip(accounts, connections)]
+        healthy, offline, stuck = monitors
+        totals_before = get_monitor_stats().snapshot()['checks']
+        
+        supervisor = AccountSupervisor(monitors=monitors)
+        supervisor.hang_timeout = 0.2
+        supervisor.start()
+        time.sleep(0.5)
+        
+        assert healthy.stats.checks >= 5 and healthy.state == 'online' and healthy.failure_count == 0, \
+            healthy.snapshot()
+        assert offline.state == 'offline' and offline.failure_count >= 2, offline.snapshot()
+        assert offline.login_attempts == 0, "auto_login=False的账号不应自动登录"
+        assert stuck.activity == 'check' and stuck.stats.checks == 0, stuck.snapshot()
+        print(f"✓ 卡住的账号不影响其他账号: 正常账号检查 {healthy.stats.checks} 次，"
+              f"离线账号连续失败 {offline.failure_count} 次")
+        
+        assert supervisor.check_hung() == ['卡住账号'] and supervisor.check_hung() == [], "卡住只告警一次"
+        print("✓ 卡住的账号被检测到并只告警一次")
+        
+        totals = get_monitor_stats().snapshot()['checks'] - totals_before
+        assert totals >= healthy.stats.checks + offline.stats.checks, "账号结果应汇总到共享计数器"
+        text = render_metrics()
+        assert 'wechat_monitor_account_checks_total{account="正常账号"}' in text, "指标端点应按账号导出"
+        print(f"✓ 账号结果已汇总: {supervisor.format_summary()}")
+        
+        release.set()
+        started = time.time()
+        assert supervisor.stop(timeout=2) == [] and time.time() - started < 1, "关闭请求应立即结束所有账号线程"
+        supervisor = None
+        print("✓ 关闭请求结束所有账号线程")
+        
+        print("✓ 多账号监管测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 多账号监管测试失败: {e}")
+        return False
+    
+    finally:
+        release.set()
+        if supervisor is not None:
+            supervisor.stop(timeout=1)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_deadline_scheduler():
+    """
+    test_deadline_scheduler 功能说明:
+    # 测试多目标到期调度器：按各自间隔执行、并发不超过工作线程数、卡住的目标不阻塞其他目标、
+    # 立即执行请求、返回None和remove移除目标、重新加入正在执行的目标不会并发执行、停止时报告仍在执行的目标
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试多目标到期调度器 ===")
+    
+    scheduler = DeadlineScheduler(max_workers=2, name='TestScheduler')
+    readd_scheduler = DeadlineScheduler(max_workers=2, name='TestReadd')
+    release = threading.Event()
+    try:
+        counts = {'fast': 0, 'slow': 0, 'once': 0, 'stuck': 0}
+        active = [0, 0]  # 当前并发数, 最大并发数
+        lock = threading.Lock()
+        
+        def target(name, interval, work=0.0):
+            def run():
+                with lock:
+                    counts[name] += 1
+                    active[0] += 1
+                    active[1] = max(active[1], active[0])
+                if name == 'stuck':
+                    release.wait(5)
+                time.sleep(work)
+                with lock:
+                    active[0] -= 1
+                return interval
+            return run
+        
+        scheduler.add('fast', target('fast', 0.02))
+        scheduler.add('slow', target('slow', 0.2))
+        scheduler.add('once', target('once', None))
+        scheduler.add('stuck', target('stuck', 0.01), delay=0.05)
+        scheduler.start()
+        time.sleep(0.5)
+        
+        assert counts['fast'] >= 10 and 2 <= counts['slow'] <= 4, counts
+        assert counts['once'] == 1 and len(scheduler) == 3, "返回None的目标应被移除"
+        assert counts['stuck'] == 1 and active[1] <= 2, f"并发不应超过工作线程数: {active[1]}"
+        print(f"✓ 按各自间隔执行，卡住的目标不阻塞其他目标: {counts}, 最大并发 {active[1]}")
+        
+        before = counts['slow']
+        assert scheduler.reschedule('slow') and not scheduler.reschedule('missing')
+        time.sleep(0.05)
+        assert counts['slow'] == before + 1, "立即执行请求应提前到期"
+        assert scheduler.remove('fast') and not scheduler.remove('fast')
+        fast_count = counts['fast']
+        time.sleep(0.1)
+        assert counts['fast'] <= fast_count + 1, "移除后不应再执行"
+        print("✓ 立即执行和移除目标正常")
+        
+        stats = scheduler.stats()
+        assert stats['dispatched'] == sum(counts.values()) and stats['lag']['count'] == stats['dispatched'], stats
+        print(f"✓ 调度统计: 派发 {stats['dispatched']} 次, 派发延迟p99 {stats['lag']['p99_ms']}ms, "
+              f"每次派发记账 {stats['overhead_us_per_dispatch']}us")
+        
+        # 目标执行期间用add重新加入：新条目等旧任务结束后才执行，同一目标不会同时执行两个任务
+        readded = {'runs': 0, 'active': 0, 'max_active': 0}
+        first_started = threading.Event()
+        def readded_target():
+            with lock:
+                readded['runs'] += 1
+                readded['active'] += 1
+                readded['max_active'] = max(readded['max_active'], readded['active'])
+            first_started.set()
+            time.sleep(0.3)
+            with lock:
+                readded['active'] -= 1
+            return None
+        readd_scheduler.add('a', readded_target)
+        readd_scheduler.start()
+        assert first_started.wait(1), "目标应开始执行"
+        readd_scheduler.add('a', readded_target)
+        time.sleep(0.8)
+        assert readded['runs'] == 2 and readded['max_active'] == 1, readded
+        assert len(readd_scheduler) == 0, "重新加入的目标执行后返回None应被移除"
+        readd_scheduler.stop(timeout=1)
+        print(f"✓ 重新加入正在执行的目标不会并发执行: {readded}")
+        
+        started = time.time()
+        assert scheduler.stop(timeout=0.3) == ['stuck'], "停止时应报告卡住的目标"
+        assert time.time() - started < 1, "不应等待卡住的目标"
+        print("✓ 停止时不等待卡住的目标")
+        
+        print("✓ 多目标到期调度器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 多目标到期调度器测试失败: {e}")
+        return False
+    
+    finally:
+        release.set()
+        scheduler.stop(timeout=1)
+        readd_scheduler.stop(timeout=1)
+
+def test_backend_call_pool():
+    """
+    test_backend_call_pool 功能说明:
+    # 测试后端调用线程池：超过期限抛出CallTimeout并计数、卡住的线程被替换后继续服务、
+    # 调用异常原样抛出、排队中超时的任务被取消、探测流水线把调用超时按阶段失败处理、
+    # LoginWnd在后端工作线程内创建
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试后端调用线程池 ===")
+    
+    release = threading.Event()
+    original_timeouts = MONITOR_CONFIG.get('backend_call_timeouts')
+    original_wxautox = sys.modules.get('wxautox')
+    try:
+        pool = BackendCallPool(max_workers=1, max_hung=1, name='TestBackend')
+        assert pool.call('online', lambda: True, call_timeout=1) is True
+        
+        started = time.time()
+        try:
+            pool.call('online', release.wait, 5, call_timeout=0.1)
+            assert False, "超过期限应抛出CallTimeout"
+        except CallTimeout as e:
+            assert e.operation == 'online' and time.time() - started < 1
+        stats = pool.stats()
+        assert stats['hung_workers'] == 1 and stats['replaced'] == 1, stats
+        assert pool.call('online', lambda: 'ok', call_timeout=1) == 'ok', "替换线程应继续服务"
+        print(f"✓ 调用超时按失败处理，卡住的线程已替换: {stats}")
+        
+        try:
+            pool.call('session', lambda: 1 / 0, call_timeout=1)
+            assert False, "调用异常应原样抛出"
+        except ZeroDivisionError:
+            pass
+        
+        # 卡住线程数达到上限后不再替换，排队中的任务超时后被取消，不会在线程恢复后执行
+        try:
+            pool.call('online', release.wait, 5, call_timeout=0.1)
+        except CallTimeout:
+            pass
+        cancelled = []
+        try:
+            pool.call('connect', cancelled.append, 1, call_timeout=0.1)
+            assert False, "没有可用线程时应超时"
+        except CallTimeout:
+            pass
+        stats = pool.stats()
+        assert stats['hung_workers'] == 2 and stats['replaced'] == 1, stats
+        release.set()
+        assert pool.call('connect', lambda: 'back', call_timeout=1) == 'back', "卡住的线程返回后应恢复服务"
+        assert cancelled == [], "已取消的任务不应执行"
+        time.sleep(0.05)
+        operations = pool.stats()['operations']
+        assert operations['online']['calls'] == 4 and operations['online']['timeouts'] == 2, operations
+        assert operations['session']['errors'] == 1 and operations['connect']['timeouts'] == 1
+        assert pool.stats()['hung_workers'] == 0
+        print(f"✓ 各操作调用计数: {operations}")
+        
+        # 探测流水线：IsOnline卡住超过期限时按online阶段失败处理
+        class HangingWeChat:
+            def IsOnline(self):
+                time.sleep(0.5)
+                return True
+        class DummyConnection:
+            connect_count = 1
+            def get(self):
+                return HangingWeChat()
+            def invalidate(self, reason=None):
+                pass
+        MONITOR_CONFIG['backend_call_timeouts'] = {'online': 0.05}
+        started = time.time()
+        result = ProbePipeline(DummyConnection()).run()
+        assert not result.ok and result.failed_stage == 'online', result.reason
+        assert isinstance(result.error, CallTimeout) and time.time() - started < 0.4
+        assert backend_pool_stats()['operations']['online']['timeouts'] >= 1
+        print(f"✓ 探测流水线把调用超时按阶段失败处理: {result.reason}")
+        
+        # 登录窗口：LoginWnd的创建和login调用都在同一个后端工作线程中执行
+        created_in = []
+        class RecordingLoginWnd:
+            def __init__(self):
+                created_in.append(threading.current_thread())
+            def login(self, timeout=60):
+                created_in.append(threading.current_thread())
+                return types.SimpleNamespace(success=True, timeout=timeout)
+        fake_wxautox = types.ModuleType('wxautox')
+        fake_wxautox.LoginWnd = RecordingLoginWnd
+        sys.modules['wxautox'] = fake_wxautox
+        login_result = call_login_window(7)
+        assert login_result.success and login_result.timeout == 7
+        assert len(created_in) == 2 and created_in[0] is created_in[1], created_in
+        assert created_in[0] is not threading.current_thread()
+        print(f"✓ LoginWnd在后端工作线程 {created_in[0].name} 中创建并调用")
+        
+        print("✓ 后端调用线程池测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 后端调用线程池测试失败: {e}")
+        return False
+    
+    finally:
+        release.set()
+        if original_wxautox is None:
+            sys.modules.pop('wxautox', None)
+        else:
+            sys.modules['wxautox'] = original_wxautox
+        if original_timeouts is None:
+            MONITOR_CONFIG.pop('backend_call_timeouts', None)
+        else:
+            MONITOR_CONFIG['backend_call_timeouts'] = original_timeouts
+
+def test_async_engine():
+    """
+    test_async_engine 功能说明:
+    # 测试asyncio监控引擎：阻塞检查在线程池中执行不阻塞其他账号、失败后登录任务异步等待扫码、
+    # 通知由通知任务投递、立即检查和关闭请求立即打断等待、卡住的账号在关闭时被取消
+    # 使用假连接和假进程管理器，登录窗口用替身代替，不需要真实的微信客户端
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试asyncio监控引擎 ===")
+    
+    class FakeConnection:
+        def __init__(self, online=True, block=None):
+            self.online = online
+            self.block = block
+            self.connect_count = 1
+        
+        def get(self):
+            return self
+        
+        def IsOnline(self):
+            if self.block is not None:
+                self.block.wait(10)
+            return self.online
+        
+        def GetSession(self):
+            return ['会话']
+        
+        def invalidate(self, reason=None):
+            pass
+    
+    class RunningProcess:
+        def is_process_running(self, process_name):
+            return True
+    
+    class RecordingNotifier:
+        def __init__(self):
+            self.sent = []
+        
+        def send_notification(self, title, message):
+            self.sent.append(title)
+    
+    release = threading.Event()
+    try:
+        fast = {'check_interval': 0.02, 'min_check_interval': 0.01, 'max_check_interval': 0.05,
+                'fast_reprobe_interval': 0.02, 'check_jitter_ratio': 0, 'login_poll_interval': 0.01}
+        accounts = [dict(default_account('异步正常账号'), **fast),
+                    dict(default_account('异步登录账号'), **fast, max_retry_count=1, login_timeout=1),
+                    dict(default_account('异步空闲账号'), check_interval=5, min_check_interval=5, check_jitter_ratio=0),
+                    dict(default_account('异步卡住账号'), **fast)]
+        login_connection = FakeConnection(online=False)
+        connections = [FakeConnection(), login_connection, FakeConnection(), FakeConnection(block=release)]
+        notifier = RecordingNotifier()
+        monitors = [AccountMonitor(account, notifier, connection=connection, process_manager=RunningProcess())
+                    for account, connection in zip(accounts, connections)]
+        healthy, login, idle, stuck = monitors
+        
+        def open_login_window():
+            login_connection.online = True  # 模拟打开登录窗口后用户立即扫码
+            return True
+        login.open_login_window = open_login_window
+        
+        engine = AsyncMonitorEngine(notification_manager=notifier, monitors=monitors)
+        engine.stop_timeout = 0.2
+        wakeup = MonitorWakeup()
+        
+        async def scenario():
+            runner = asyncio.create_task(engine.run(wakeup))
+            await asyncio.sleep(0.4)
+            
+            assert healthy.stats.checks >= 5 and healthy.state == 'online', healthy.snapshot()
+            assert stuck.activity == "check" and stuck.stats.checks == 0, "卡住的检查应只占用一个线程"
+            print(f"✓ 卡住的账号不阻塞其他账号: 正常账号检查 {healthy.stats.checks} 次")
+            
+            assert login.stats.snapshot()['login_attempts'] == 1 and login.state == 'online', login.snapshot()
+            assert '[异步登录账号] ✅ 微信状态恢复' in notifier.sent, notifier.sent
+            print(f"✓ 登录任务异步等待扫码并恢复，通知已投递: {notifier.sent}")
+            
+            before = idle.stats.checks
+            wakeup.notify(MonitorWakeup.CHECK_NOW)
+            await asyncio.sleep(0.2)
+            assert idle.stats.checks == before + 1, "立即检查请求应打断等待"
+            print("✓ 立即检查请求打断等待")
+            
+            started = time.time()
+            wakeup.notify(MonitorWakeup.SHUTDOWN)
+            await asyncio.wait_for(runner, 2)
+            return time.time() - started
+        
+        elapsed = asyncio.run(scenario())
+        assert elapsed < 1 and engine.stuck == ['异步卡住账号'], (elapsed, engine.stuck)
+        print(f"✓ 关闭请求 {elapsed:.2f}秒 内结束，卡住的账号被取消: {engine.stuck}")
+        
+        print("✓ asyncio监控引擎测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ asyncio监控引擎测试失败: {e}")
+        return False
+    
+    finally:
+        release.set()
+
+def test_state_machine():
+    """
+    test_state_machine 功能说明:
+    # 测试统一监控状态机：用虚拟时间驱动tick(now)，依次经过UNKNOWN/ONLINE/DEGRADED/OFFLINE/LOGGING_IN/BACKOFF，
+    # 检查未到期时tick不执行动作、检查异常按失败处理、立即检查、禁止自动登录时只停留在OFFLINE、
+    # 配置重载保留显式基础间隔和登录退避
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试统一监控状态机 ===")
+    
+    try:
+        config = {
+            'check_interval': 30, 'min_check_interval': 5, 'max_check_interval': 120,
+            'healthy_stretch_after': 100, 'fast_reprobe_interval': 5, 'retry_interval': 10,
+            'login_backoff_factor': 2.0, 'max_login_backoff': 60, 'check_jitter_ratio': 0,
+            'max_retry_count': 2
+        }
+        clock = [0.0]
+        checks = [ONLINE, DEGRADED, False, OFFLINE, False, True]
+        logins = [False, True]
+        machine = MonitorStateMachine(check=lambda: checks.pop(0), login=lambda: logins.pop(0),
+                                      config=config, clock=lambda: clock[0])
+        transitions = []
+        machine.on_transition.append(lambda m, old, new: transitions.append(new))
+        
+        # 检查在线后按基础间隔到期，未到期时tick只返回剩余秒数
+        assert machine.state == UNKNOWN and machine.tick(0) == 30 and machine.state == ONLINE
+        assert machine.tick(10) == 20 and machine.checks == 1
+        print("✓ 未到期时tick不执行检查")
+        
+        # 会话检查失败为功能异常：快速复查，不计入连续失败
+        assert machine.tick(30) == 5 and machine.state == DEGRADED and machine.failure_count == 0
+        
+        # 连续失败达到max_retry_count后进入LOGGING_IN并立即到期，下一次tick执行登录
+        assert machine.tick(35) > 0 and machine.state == OFFLINE and machine.failure_count == 1
+        now = machine.next_due
+        assert machine.tick(now) == 0 and machine.state == LOGGING_IN and machine.next_action() == machine.LOGIN
+        assert machine.tick(now) == 10 and machine.state == BACKOFF and machine.login_attempts == 1
+        print("✓ 连续失败后自动登录，登录失败进入退避")
+        
+        # 退避到期后检查仍失败，再次登录；登录成功回到ONLINE并清零计数
+        assert machine.tick(now + 10) == 0 and machine.state == LOGGING_IN and machine.login_attempts == 2
+        assert machine.tick(now + 10) == 5 and machine.state == ONLINE
+        assert machine.failure_count == 0 and machine.login_attempts == 0 and machine.logins == 2
+        assert transitions == [ONLINE, DEGRADED, OFFLINE, LOGGING_IN, BACKOFF, LOGGING_IN, ONLINE], transitions
+        print(f"✓ 状态转换顺序正确: {' -> '.join(transitions)}")
+        
+        # 检查抛出异常按离线处理并保留异常；立即检查请求让下一次动作立即到期
+        machine.tick(now + 15)
+        assert machine.tick(machine.next_due) > 0 and machine.state == OFFLINE
+        assert isinstance(machine.last_error, IndexError)
+        machine.check_now(machine.next_due - 1)
+        assert machine.due_in(machine.next_due) == 0
+        print("✓ 检查异常按失败处理，立即检查请求生效")
+        
+        # 不允许自动登录时连续失败只停留在OFFLINE
+        manual = MonitorStateMachine(check=lambda: False, login=lambda: True, config=config,
+                                     auto_login=False, clock=lambda: clock[0])
+        for step in range(5):
+            manual.tick(manual.next_due)
+        assert manual.state == OFFLINE and manual.failure_count == 5 and manual.logins == 0
+        print("✓ auto_login=False时不自动登录")
+        
+        # 配置重载：调度器原地更新参数，显式传入的基础间隔和登录退避次数保留
+        scheduler = CheckScheduler(config, base_interval=5)
+        reloaded = MonitorStateMachine(check=lambda: False, login=lambda: False, config=config,
+                                       scheduler=scheduler, clock=lambda: clock[0])
+        scheduler.on_login(False)
+        scheduler.on_login(False)
+        reloaded.reload(dict(config, check_interval=30, max_login_backoff=600))
+        assert reloaded.scheduler is scheduler and scheduler.base_interval == 5.0, scheduler.base_interval
+        assert scheduler.login_failures == 2 and scheduler.max_backoff == 600
+        assert scheduler.next_delay() == 20, "重载后退避应继续，不应从头开始"
+        reloaded.reload(config, base_interval=15)
+        assert scheduler.base_interval == 15.0
+        print("✓ 配置重载保留显式基础间隔和登录退避")
+        
+        # 会话阶段失败的探测结果换算为功能异常
+        session_failed = ProbeResult().fail('session', "会话列表为空")
+        assert probe_state(True, session_failed) == DEGRADED and probe_state(False, session_failed) == DEGRADED
+        assert probe_state(False, ProbeResult().fail('online', "未登录")) == OFFLINE and probe_state(True) == ONLINE
+        print("✓ 探测结果换算为状态正常")
+        
+        print("✓ 统一监控状态机测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 统一监控状态机测试失败: {e}")
+        return False
+
+def test_history_store():
+    """
+    test_history_store 功能说明:
+    # 测试检查历史存储：WAL模式、批量写入、可用率和今天的登录记录查询、按时间保留清理、
+    # 队列满时丢弃不阻塞、阶段耗时监听，以及查询使用ts索引
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试检查历史存储 ===")
+    
+    temp_dir = tempfile.mkdtemp()
+    store = None
+    try:
+        path = os.path.join(temp_dir, 'history.db')
+        store = HistoryStore(path, batch_size=50, flush_interval=0.05, retention_days=1)
+        store.start()
+        
+        # 记录只入队，后台线程批量写入
+        base = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp() + 60
+        for i in range(100):
+            store.record_check(i % 4 != 0, ts=base + i)
+        store.record_check(False, account='历史账号', failed_stage='online', reason='未登录', duration=0.01, ts=base)
+        store.record_login('failure', 60.0, ts=base + 10)
+        store.record_login('success', 8.5, account='历史账号', ts=base + 20)
+        store.record_login('success', 1.0, ts=base - 86400)  # 昨天
+        store.record_notification("微信掉线提醒", "检测到微信离线", True, ts=base)
+        assert store.flush(5), "记录应在期限内写入"
+        stats = store.stats()
+        assert stats['written'] == 105 and stats['dropped'] == 0 and stats['batches'] >= 3, stats
+        
+        connection = sqlite3.connect(path)
+        try:
+            assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+            plan = ' '.join(str(row) for row in connection.execute(
+                "EXPLAIN QUERY PLAN SELECT COUNT(*), SUM(ok) FROM checks WHERE ts >= ? AND ts < ?", (0, 1)))
+            assert 'idx_checks_ts' in plan, plan
+        finally:
+            connection.close()
+        print(f"✓ WAL模式批量写入正常，可用率查询使用索引 ({stats['batches']} 批)")
+        
+        # 可用率：[base, base+40)内40次检查，每4次失败1次；按账号过滤
+        result = store.availability(base, base + 40, account='wechat')
+        assert result['checks'] == 40 and result['successes'] == 30 and result['availability'] == 0.75, result
+        assert store.availability(base, base + 1)['checks'] == 2
+        assert store.availability(datetime.fromtimestamp(base + 200), datetime.fromtimestamp(base + 300))['availability'] is None
+        print("✓ 时间段可用率查询正常")
+        
+        # 今天的登录记录（默认从今天0点开始），不含昨天的
+        attempts = store.login_attempts(end=base + 3600)
+        assert [attempt['outcome'] for attempt in attempts] == ['failure', 'success'], attempts
+        assert attempts[1]['account'] == '历史账号' and attempts[1]['duration_ms'] == 8500
+        assert len(store.login_attempts(account='wechat', end=base + 3600)) == 1
+        print("✓ 今天的登录记录查询正常")
+        
+        # 阶段耗时监听
+        recorder = LatencyRecorder()
+        recorder.add_listener(store.record_stage)
+        recorder.observe('probe', 0.002)
+        recorder.remove_listener(store.record_stage)
+        recorder.observe('probe', 0.003)
+        assert store.flush(5) and store.stats()['written'] == 106
+        print("✓ 阶段耗时监听写入正常")
+        
+        # 按保留时间清理：保留1天，昨天的登录记录被删除
+        removed = store.purge(now=base + 86400 - 30)
+        assert removed == 1 and len(store.login_attempts(start=0, end=base + 3600)) == 2, removed
+        print(f"✓ 过期记录清理正常 (删除 {removed} 条)")
+        
+        store.stop()
+        store = None
+        
+        # 队列满时丢弃新记录并计数，不阻塞调用方（写入线程未启动）
+        full = HistoryStore(os.path.join(temp_dir, 'full.db'), queue_size=5)
+        started = time.perf_counter()
+        for i in range(20):
+            full.record_check(True)
+        assert full.stats()['dropped'] == 15 and time.perf_counter() - started < 0.5
+        print("✓ 队列满时丢弃并计数，不阻塞")
+        
+        print("✓ 检查历史存储测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 检查历史存储测试失败: {e}")
+        return False
+    
+    finally:
+        if store is not None:
+            store.stop()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def test_recent_checks():
+    """
+    test_recent_checks 功能说明:
+    # 测试最近检查环形缓冲：以虚拟时间随机写入检查记录，各滚动窗口的检查次数、成功次数、翻转次数和平均耗时
+    # 与逐条遍历的结果一致；缓冲写满后覆盖最早记录、窗口标记为不完整；内存按每条13字节增长
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试最近检查环形缓冲 ===")
+    
+    try:
+        import random
+        rng = random.Random(7)
+        ring = RecentChecks(capacity=500, windows=[60, 300, 3600])
+        history = []
+        ts = 1000.0
+        for i in range(2000):
+            ts += rng.choice([0.5, 1, 5, 30])
+            ok = rng.random() > 0.3
+            latency = rng.uniform(0.001, 0.1) if i % 3 else None
+            ring.record(ok, latency, ts=ts)
+            history.append((ts, ok, latency))
+            if i % 97 == 0 or i == 1999:
+                retained = history[-500:]
+                for window in ring.windows:
+                    stats = ring.window_stats(window, now=ts)
+                    inside = [(j, entry) for j, entry in enumerate(history)
+                              if entry[0] > ts - window and j >= len(history) - 500]
+                    expected_flaps = sum(1 for j, entry in inside if j and history[j - 1][1] != entry[1])
+                    timed = [entry[2] for j, entry in inside if entry[2] is not None]
+                    assert stats['checks'] == len(inside), (i, window, stats)
+                    assert stats['successes'] == sum(1 for j, entry in inside if entry[1]), (i, window, stats)
+                    assert stats['flaps'] == expected_flaps, (i, window, stats)
+                    if timed:
+                        assert abs(stats['avg_latency_ms'] - sum(timed) / len(timed) * 1000) < 0.01, stats
+                    assert stats['complete'] == (len(history) <= 500 or history[-501][0] <= ts - window), stats
+        assert len(ring) == 500 and ring.memory_bytes() == 500 * 13
+        print("✓ 各滚动窗口统计与逐条遍历一致（含覆盖最早记录）")
+        
+        # 没有新检查时窗口随时间过期
+        assert ring.window_stats(60, now=ts + 61)['checks'] == 0 and ring.rate(60, now=ts + 61) is None
+        assert ring.window_stats(3600, now=ts + 61)['checks'] > 0
+        try:
+            ring.rate(120)
+            assert False, "未跟踪的窗口应抛出ValueError"
+        except ValueError:
+            pass
+        print("✓ 窗口过期和未跟踪窗口处理正常")
+        
+        # MonitorStats的滚动成功率
+        stats = MonitorStats()
+        for ok in (True, True, False, True):
+            stats.record_check(ok, ProbeResult())
+        rolling = stats.rolling()
+        assert list(rolling) == ['5m', '1h', '24h'] and rolling['5m']['rate'] == 0.75 and rolling['5m']['flaps'] == 2
+        assert stats.snapshot()['availability']['1h'] == 0.75
+        assert "5m 75.0%(4次, 翻转2次)" in stats.format_rolling(), stats.format_rolling()
+        print(f"✓ 滚动成功率: {stats.format_rolling()}")
+        
+        print("✓ 最近检查环形缓冲测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 最近检查环形缓冲测试失败: {e}")
+        return False
+
+def test_log_analyzer():
+    """
+    test_log_analyzer 功能说明:
+    # 测试日志分析工具：两种日志格式、按天命名/轮转/gzip压缩的日志文件按时间合并，
+    # 旧日志按消息识别状态、新日志按状态变化行重建区间，检查可用率、MTTR、最长故障、登录成功率和统计时间范围
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试日志分析工具 ===")
+    
+    log_dir = tempfile.mkdtemp()
+    try:
+        import gzip
+        base = time.mktime((2026, 10, 1, 8, 0, 0, 0, 0, -1))
+        day2 = base + 86400
+        
+        def basic(offset, message, level='INFO'):
+            return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(base + offset))},250 - {level} - {message}\n"
+        
+        def enhanced(offset, message, level='INFO'):
+            return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(day2 + offset))} - root - {level} - {message}\n"
+        
+        # 旧版日志（没有状态变化行），按消息识别
+        with open(os.path.join(log_dir, 'wechat_monitor_20261001.log'), 'w', encoding='utf-8') as f:
+            f.writelines([
+                basic(0, "🚀 微信自动登录监控程序启动"),
+                basic(1, "✅ 微信状态正常"),
+                basic(50, "📢 桌面通知: 微信监控提醒 - 微信状态异常"),
+                basic(101, "❌ 微信未登录或连接失败", 'WARNING'),
+                basic(131, "🔄 开始自动登录微信流程"),
+                basic(161, "⏰ 登录等待超时", 'ERROR'),
+                "Traceback (most recent call last):\n",
+                basic(191, "🔄 开始自动登录微信流程"),
+                basic(201, "✅ 微信登录成功"),
+                basic(301, "❌ 微信未登录或连接失败", 'WARNING'),
+                basic(361, "📊 监控循环结束统计:"),
+            ])
+        # 新版日志：轮转后压缩的文件和当前文件
+        with gzip.open(os.path.join(log_dir, 'wechat_monitor.log.1.gz'), 'wt', encoding='utf-8') as f:
+            f.writelines([
+                enhanced(0, "[客服A] 状态变化: 未知 -> 在线"),
+                enhanced(1000, "[客服A] 状态变化: 在线 -> 离线"),
+                enhanced(1010, "✅ 微信状态正常"),
+                enhanced(1030, "[客服A] 状态变化: 离线 -> 自动登录中"),
+                enhanced(1090, "[客服A] 状态变化: 自动登录中 -> 在线"),
+            ])
+        with open(os.path.join(log_dir, 'wechat_monitor.log'), 'w', encoding='utf-8') as f:
+            f.writelines([
+                enhanced(2000, "[客服A] 状态变化: 在线 -> 功能异常"),
+                enhanced(2100, "[客服A] 状态变化: 功能异常 -> 离线"),
+                enhanced(2110, "[客服A] 状态变化: 离线 -> 自动登录中"),
+                enhanced(2140, "[客服A] 状态变化: 自动登录中 -> 登录失败退避"),
+                enhanced(2440, "[客服A] 状态变化: 登录失败退避 -> 在线"),
+                enhanced(3000, "[客服A] 状态变化: 在线 -> 离线"),
+                enhanced(3600, "🔍 检查微信状态..."),
+            ])
+        
+        analyzer = analyze_logs([log_dir])
+        report = analyzer.report()
+        assert report['files'] == 3 and report['records'] == 22, report
+        accounts = {data['account']: data for data in report['accounts']}
+        assert sorted(accounts) == ['wechat', '客服A'], accounts
+        
+        legacy = accounts['wechat']
+        assert legacy['source'] == 'messages' and legacy['observed_seconds'] == 360, legacy
+        assert legacy['online_seconds'] == 200 and legacy['login_seconds'] == 40, legacy
+        assert abs(legacy['availability'] - 200 / 360) < 1e-9
+        assert legacy['outages'] == 1 and legacy['mttr_seconds'] == 100 and legacy['unresolved_outages'] == 1, legacy
+        assert legacy['longest_outage_seconds'] == 100 and legacy['longest_outage_start'] == base + 101.25, legacy
+        assert legacy['login_attempts'] == 2 and legacy['login_success_rate'] == 0.5, legacy
+        assert legacy['ongoing_outage'] is None
+        print("✓ 旧版日志按消息重建区间（通知内容和续行被忽略）")
+        
+        account = accounts['客服A']
+        assert account['source'] == 'transitions' and account['observed_seconds'] == 3600, account
+        assert account['online_seconds'] == 2570 and account['login_seconds'] == 90, account
+        assert account['outages'] == 2 and account['mttr_seconds'] == 215, account
+        assert account['ongoing_outage'] == {'start': day2 + 3000, 'seconds': 600}, account
+        assert account['longest_outage_seconds'] == 600 and account['longest_outage_start'] == day2 + 3000, account
+        assert account['login_attempts'] == 2 and account['login_successes'] == 1 and account['login_failures'] == 1
+        text = format_report(report)
+        assert "可用率: 71.39%" in text and "MTTR: 3分35秒" in text and "仍在故障中: 已持续 10分" in text, text
+        print("✓ 状态变化行重建区间（gzip压缩文件和当前文件按时间合并）")
+        
+        # 统计时间范围和区间回调
+        intervals = []
+        ranged = analyze_logs([log_dir], since=day2 + 2000, until=day2 + 2500, account='客服A',
+                              on_interval=lambda *interval: intervals.append(interval)).report()
+        assert [data['account'] for data in ranged['accounts']] == ['客服A'], ranged
+        data = ranged['accounts'][0]
+        assert data['observed_seconds'] == 500 and data['online_seconds'] == 160, data
+        assert data['outages'] == 1 and data['mttr_seconds'] == 340 and data['login_success_rate'] == 0, data
+        assert intervals[0] == ('客服A', 'online', day2 + 2000, day2 + 2100), intervals
+        assert intervals[-1] == ('客服A', 'online', day2 + 2440, day2 + 2500), intervals
+        print("✓ 统计时间范围和区间输出正常")
+        
+        print("✓ 日志分析工具测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 日志分析工具测试失败: {e}")
+        return False
+    finally:
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+def test_log_dir_rotation():
+    """
+    test_log_dir_rotation 功能说明:
+    # 测试日志目录清理和按天切换：超过保留天数的日志删除，总大小超过上限时从最旧的开始删除，
+    # 正在写入的日志和非日志文件不删除；DailyFileHandler跨过零点后写入新日期的文件
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试日志目录清理和按天切换 ===")
+    
+    log_dir = tempfile.mkdtemp()
+    active_handler = None
+    daily = None
+    try:
+        now = time.time()
+        ages = {'a.log': 10, 'active.log': 5, 'b.log.1': 3, 'c_20261001.log': 2, 'd.log.gz': 1, 'history.db': 30}
+        for name, days in ages.items():
+            path = os.path.join(log_dir, name)
+            with open(path, 'wb') as f:
+                f.write(b'x' * 400)
+            os.utime(path, (now - days * 86400, now - days * 86400))
+        
+        # 正在写入的日志文件只计入总大小，不删除
+        active_handler = logging.FileHandler(os.path.join(log_dir, 'active.log'))
+        active_handler.setLevel(logging.CRITICAL + 1)
+        logging.getLogger().addHandler(active_handler)
+        
+        result = rotate_log_dir(log_dir, retention_days=7, max_total_mb=1200 / 1024 / 1024, now=now)
+        remaining = sorted(os.listdir(log_dir))
+        assert remaining == ['active.log', 'c_20261001.log', 'd.log.gz', 'history.db'], remaining
+        assert result['scanned'] == 5 and result['deleted'] == 2, result
+        assert result['expired'] == 1 and result['over_budget'] == 1, result
+        assert result['freed_bytes'] == 800 and result['total_bytes'] == 1200, result
+        print("✓ 过期日志和超出总大小上限的最旧日志已删除，正在写入的日志和数据库保留")
+        
+        # 后台清理
+        assert schedule_log_rotation(log_dir)
+        assert wait_log_rotation(5)['scanned'] == 3
+        assert rotate_log_dir(os.path.join(log_dir, 'missing'))['scanned'] == 0
+        print("✓ 后台清理正常")
+        
+        # 跨过零点切换文件
+        daily = DailyFileHandler(log_dir, 'monitor', cleanup=False)
+        daily.setFormatter(logging.Formatter('%(message)s'))
+        first_file = daily.baseFilename
+        assert os.path.basename(first_file) == f"monitor_{time.strftime('%Y%m%d')}.log", first_file
+        daily.emit(logging.makeLogRecord({'msg': '零点前'}))
+        midnight = daily.rollover_at
+        record = logging.makeLogRecord({'msg': '零点后', 'created': midnight + 5})
+        daily.emit(record)
+        second_file = daily.baseFilename
+        assert daily.rollovers == 1 and second_file != first_file
+        assert os.path.basename(second_file) == f"monitor_{time.strftime('%Y%m%d', time.localtime(midnight + 5))}.log"
+        assert daily.rollover_at > midnight + 23 * 3600
+        daily.flush()
+        with open(first_file, encoding='utf-8') as f:
+            assert f.read() == "零点前\n"
+        with open(second_file, encoding='utf-8') as f:
+            assert f.read() == "零点后\n"
+        print(f"✓ 跨过零点切换到 {os.path.basename(second_file)}")
+        
+        print("✓ 日志目录清理和按天切换测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 日志目录清理和按天切换测试失败: {e}")
+        return False
+    finally:
+        if active_handler is not None:
+            logging.getLogger().removeHandler(active_handler)
+            active_handler.close()
+        if daily is not None:
+            daily.close()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
+def test_log_compression():
+    """
+    test_log_compression 功能说明:
+    # 测试日志后台压缩：轮转备份和前一天的日志压缩为gzip并保留修改时间，正在写入和其他进程刚修改的日志不压缩，
+    # 本进程处理器刚轮转出的备份不等待空闲，
+    # 轮转备份按修改时间重命名避免冲突，压缩中断留下的临时文件被删除，日志分析工具可直接读取压缩后的日志
+    # 输入: 无 | 输出: bool (True=成功, False=失败)
+    """
+    print("\n=== 测试日志后台压缩 ===")
+    
+    log_dir = tempfile.mkdtemp()
+    active_handler = None
+    try:
+        import gzip
+        from wechat_log_analyzer import iter_lines
+        now = time.time()
+        line = time.strftime('%Y-%m-%d %H:%M:%S') + " - root - INFO - ✅ 微信状态正常\n"
+        files = {
+            'wechat_monitor.log': 0,  # 正在写入
+            'wechat_monitor.log.1': 600,  # 轮转备份
+            'wechat_monitor.log.2': 5,  # 本进程刚轮转出的备份，已关闭
+            'other.log.1': 5,  # 其他进程刚轮转，未空闲
+            'wechat_monitor_20261001.log': 2 * 86400,  # 前一天的日志
+            'wechat_monitor_20261002.log.gz.tmp': 600,  # 上次压缩中断留下的临时文件
+            'history.db': 2 * 86400,
+        }
+        for name, age in files.items():
+            path = os.path.join(log_dir, name)
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(line * 2000)
+            os.utime(path, (now - age, now - age))
+        active_handler = logging.FileHandler(os.path.join(log_dir, 'wechat_monitor.log'), encoding='utf-8')
+        active_handler.setLevel(logging.CRITICAL + 1)
+        logging.getLogger().addHandler(active_handler)
+        
+        result = compress_logs(log_dir, codec='gzip', min_idle=60, now=now)
+        backup_name = f"wechat_monitor.log.{time.strftime('%Y%m%d-%H%M%S', time.localtime(now - 600))}.gz"
+        recent_name = f"wechat_monitor.log.{time.strftime('%Y%m%d-%H%M%S', time.localtime(now - 5))}.gz"
+        remaining = sorted(os.listdir(log_dir))
+        assert remaining == sorted(['wechat_monitor.log', 'other.log.1', 'wechat_monitor_20261001.log.gz',
+                                    backup_name, recent_name, 'history.db']), remaining
+        assert result['codec'] == 'gzip' and result['compressed'] == 3 and result['failed'] == 0, result
+        assert result['original_bytes'] == 3 * len(line.encode()) * 2000, result
+        assert result['saved_bytes'] > result['original_bytes'] * 0.9, result
+        compressed_path = os.path.join(log_dir, 'wechat_monitor_20261001.log.gz')
+        assert abs(os.path.getmtime(compressed_path) - (now - 2 * 86400)) < 1
+        with gzip.open(compressed_path, 'rt', encoding='utf-8') as f:
+            assert f.read() == line * 2000
+        assert sum(1 for _ in iter_lines(os.path.join(log_dir, backup_name))) == 2000
+        print(f"✓ 压缩完成（其他进程刚修改的日志未压缩）: {format_compression_result(result)}")
+        
+        # 再次轮转产生同名备份时不覆盖已压缩的文件
+        second = os.path.join(log_dir, 'wechat_monitor.log.1')
+        with open(second, 'w', encoding='utf-8') as f:
+            f.write(line)
+        os.utime(second, (now - 600, now - 600))
+        assert compress_logs(log_dir, codec='gzip', min_idle=60, now=now)['compressed'] == 1
+        assert os.path.exists(os.path.join(log_dir, backup_name.replace('.gz', '-1.gz')))
+        print("✓ 轮转备份按修改时间命名，不与已压缩的文件冲突")
+        
+        # 不压缩时不做任何处理；累计统计包含节省的空间
+        assert compress_logs(log_dir, codec='none', now=now + 86400)['compressed'] == 0
+        totals = log_compression_stats()
+        assert totals['files'] >= 4 and totals['saved_bytes'] > 0, totals
+        print("✓ 压缩统计正常")
+        
+        print("✓ 日志后台压缩测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"✗ 日志后台压缩测试失败: {e}")
+        return False
+    finally:
+        if active_handler is not None:
+            logging.getLogger().removeHandler(active_handler)
+            active_handler.close()
+        shutil.rmtree(log_dir, ignore_errors=True)
+
 def run_all_tests():
     """
     run_all_tests 功能说明:
@@ -210,7 +2072,30 @@ def run_all_tests():
         ('配置加载测试', test_config_loading),
         ('通知管理器测试', test_notification_manager),
         ('进程管理器测试', test_process_manager),
-        ('日志轮转器测试', test_log_rotator)
+        ('日志轮转器测试', test_log_rotator),
+        ('微信连接复用测试', test_wechat_connection),
+        ('分级探测流水线测试', test_probe_pipeline),
+        ('自适应调度器测试', test_check_scheduler),
+        ('事件唤醒等待测试', test_monitor_wakeup),
+        ('后台通知投递测试', test_notification_dispatcher),
+        ('异步日志管道测试', test_async_logging),
+        ('状态变化日志测试', test_state_transition_logger),
+        ('阶段耗时直方图测试', test_latency_histogram),
+        ('Prometheus指标端点测试', test_metrics_endpoint),
+        ('PID跟踪器测试', test_process_tracker),
+        ('批量终止进程测试', test_terminate_processes),
+        ('启动就绪等待测试', test_client_readiness),
+        ('登录等待器测试', test_login_watcher),
+        ('多账号监管测试', test_account_supervisor),
+        ('多目标到期调度器测试', test_deadline_scheduler),
+        ('后端调用超时', test_backend_call_pool),
+        ('asyncio监控引擎', test_async_engine),
+        ('统一监控状态机', test_state_machine),
+        ('检查历史存储测试', test_history_store),
+        ('最近检查环形缓冲测试', test_recent_checks),
+        ('日志分析工具', test_log_analyzer),
+        ('日志目录清理', test_log_dir_rotation),
+        ('日志后台压缩', test_log_compression)
     ]
     
     passed = 0
@@ -0,0 +1,391 @@
+##########wechat_async.py: [asyncio监控引擎] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建asyncio监控引擎：阻塞的wxautox调用放入线程池执行，等待可被取消，探测、登录等待和通知都是任务]########
+# 变更记录: [2026-10-16] @李祥光 [探测任务改由账号的MonitorStateMachine决定检查或登录]########
+# 输入: 账号定义列表（单账号模式为default_account）、通知管理器、MonitorWakeup | 输出: 各账号状态、计数器和通知###############
+
+
+###########################文件下的所有函数###########################
+"""
+QueuedNotifier：通知转发器，任意线程发出的通知都放入事件循环中的队列，由通知任务投递
+AsyncMonitorEngine：asyncio监控引擎，每个账号一个探测任务，登录等待、通知投递、卡住检测和唤醒请求各自是独立任务
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main --engine async] --> B[AsyncMonitorEngine.run]
+    B --> C[每个账号一个探测任务 _probe_task]
+    C --> C1{MonitorStateMachine.next_action}
+    C1 -->|检查| D[run_blocking: 线程池中执行AccountMonitor.check_state]
+    D --> E[MonitorStateMachine.on_check]
+    C1 -->|LOGGING_IN| F[登录任务 _login]
+    F --> F1[run_blocking: open_login_window]
+    F1 --> F2[wait_for_login: 先快后慢轮询，每次轮询在线程池中执行]
+    F2 --> F3[on_login_waited / end_login]
+    F3 --> E1[MonitorStateMachine.on_login]
+    E --> G[状态机返回等待时间，AccountMonitor.after_step输出失败进度]
+    E1 --> G
+    G --> H[_sleep: 等待到期，立即检查或关闭请求立即打断]
+    H --> C
+    B --> I[通知任务 _notifier_task: 队列中的通知在线程池中投递]
+    B --> J[监管任务 _watchdog_task: 卡住检测和周期汇总]
+    B --> K[唤醒任务 _wakeup_task: 转发MonitorWakeup的关闭/重载/立即检查]
+    K -->|关闭| L[request_stop]
+    L --> M[_shutdown: 等待各任务结束，超时取消，线程池不等待卡住的调用]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import ACCOUNTS_CONFIG
+from wechat_scheduler import MonitorWakeup
+from wechat_supervisor import AccountMonitor, AccountSupervisor
+from wechat_metrics import get_latency_recorder
+
+
+class QueuedNotifier:
+    """
+    QueuedNotifier 功能说明:
+    # 替代NotificationManager传给各账号监控器：send_notification只把通知放入事件循环中的队列立即返回，
+    # 可在事件循环线程和线程池线程中调用，实际投递由引擎的通知任务完成
+    # 输入: 无（事件循环启动后由引擎调用bind绑定） | 输出: 无
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+        self.dropped = 0
+
+    def bind(self, loop, queue):
+        """绑定事件循环和通知队列"""
+        self._loop = loop
+        self._queue = queue
+
+    def send_notification(self, title, message):
+        """
+        send_notification 功能说明:
+        # 把通知放入队列，线程安全；事件循环未启动或已关闭时丢弃并计数
+        # 输入: title (通知标题), message (通知内容) | 输出: 无
+        """
+        if self._loop is None or self._loop.is_closed():
+            self.dropped += 1
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (title, message))
+        except RuntimeError:
+            self.dropped += 1  # 事件循环正在关闭
+
+
+class AsyncMonitorEngine:
+    """
+    AsyncMonitorEngine 功能说明:
+    # asyncio监控引擎，与多账号监管器使用同一套AccountMonitor（检查、状态机、调度、登录步骤），
+    # 区别在于阻塞和等待的方式：
+    # 1. 所有阻塞调用（探测流水线、打开登录窗口、登录轮询、通知投递）都通过run_blocking放入线程池执行，
+    #    事件循环本身从不阻塞
+    # 2. 检查间隔和登录轮询间隔都是可取消的await，立即检查请求和关闭请求立即打断等待
+    # 3. 每个账号一个探测任务，自动登录时创建登录任务并等待其结束；通知、卡住检测、唤醒请求各自是独立任务
+    # 4. 关闭时等待各任务在stop_timeout内结束，仍卡在wxautox调用中的任务被取消，线程池不等待卡住的调用
+    # 输入: accounts (账号定义列表，默认单账号default_account由调用方提供), notification_manager (可选),
+    #       monitors (可选，直接传入AccountMonitor列表，主要用于测试),
+    #       max_workers (执行检查的线程数，默认min(ACCOUNTS_CONFIG['max_workers'], 账号数)) | 输出: 无
+
+    属性说明:
+    - monitors: {账号名: AccountMonitor}
+    - supervisor: 复用AccountSupervisor的卡住检测、快照和汇总（不启动它的调度线程）
+    - login_tasks: {账号名: 正在进行的登录任务}
+    - stuck: 关闭时未能按时结束、被取消的账号名列表
+    """
+
+    def __init__(self, accounts=None, notification_manager=None, monitors=None, max_workers=None):
+        self.notification_manager = notification_manager
+        self.notifier = QueuedNotifier() if notification_manager is not None else None
+        if monitors is None:
+            monitors = [AccountMonitor(account, self.notifier) for account in accounts or []]
+        for monitor in monitors:
+            if monitor.notification_manager is not None:
+                monitor.notification_manager = self.notifier
+        self.supervisor = AccountSupervisor(notification_manager=self.notifier, monitors=monitors)
+        self.monitors = self.supervisor.monitors
+        if max_workers is None:
+            max_workers = max(1, min(int(ACCOUNTS_CONFIG.get('max_workers', 8)), len(self.monitors)))
+        self.max_workers = max_workers + 1  # 额外一个线程留给通知投递和配置重载
+        self.stop_timeout = 5.0
+        self.login_tasks = {}
+        self.stuck = []
+
+        self._loop = None
+        self._executor = None
+        self._stop = None  # asyncio.Event，请求关闭
+        self._check_now = {}  # 账号名 -> asyncio.Event，立即检查或关闭时置位
+        self._stop_requested = threading.Event()  # 事件循环启动前收到的关闭请求
+
+    async def run(self, wakeup=None, on_reload=None):
+        """
+        run 功能说明:
+        # 引擎主协程：启动各任务，收到关闭请求后停止并返回
+        # 输入: wakeup (可选的MonitorWakeup，转发关闭/重载/立即检查请求), on_reload (可选的配置重载回调) | 输出: 无
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='AsyncEngine')
+        self._check_now = {name: asyncio.Event() for name in self.monitors}
+        notifications = asyncio.Queue()
+        if self.notifier is not None:
+            self.notifier.bind(self._loop, notifications)
+
+        probes = [asyncio.create_task(self._probe_task(monitor), name=f'probe:{name}')
+                  for name, monitor in self.monitors.items()]
+        helpers = [asyncio.create_task(self._notifier_task(notifications), name='notifier'),
+                   asyncio.create_task(self._watchdog_task(), name='watchdog')]
+        if wakeup is not None:
+            helpers.append(asyncio.create_task(self._wakeup_task(wakeup, on_reload), name='wakeup'))
+        logging.info(f"⚡ asyncio监控引擎已启动: {', '.join(self.monitors)} (线程池: {self.max_workers})")
+
+        try:
+            if self._stop_requested.is_set():
+                self._set_stop()
+            await self._stop.wait()
+        finally:
+            await self._shutdown(probes, helpers, notifications)
+
+    def request_stop(self):
+        """
+        request_stop 功能说明:
+        # 请求引擎关闭，可在任意线程和信号处理函数中调用：打断所有等待，各账号的阻塞等待同时取消
+        # 输入: 无 | 输出: 无
+        """
+        self._stop_requested.set()
+        self.supervisor.request_stop()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._set_stop)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+
+    def check_now(self):
+        """
+        check_now 功能说明:
+        # 请求所有账号立即检查，可在任意线程中调用
+        # 输入: 无 | 输出: 无
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake_all)
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """
+        run_blocking 功能说明:
+        # 在引擎线程池中执行阻塞调用并等待结果，事件循环在等待期间继续处理其他任务
+        # 输入: func及其参数 | 输出: func的返回值（异常原样抛出）
+        """
+        return await self._loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def wait_for_login(self, monitor, timeout):
+        """
+        wait_for_login 功能说明:
+        # LoginWatcher.wait的异步版本：轮询间隔从login_poll_interval开始按倍数增长，
+        # 每次轮询（账号连接的IsOnline）在线程池中执行，轮询之间的等待是可取消的await，关闭请求立即结束等待
+        # 检测到登录时同样记录login_detect和login_detect_lag
+        # 输入: monitor (AccountMonitor), timeout (最长等待秒数)
+        # 输出: dict {online, cancelled, elapsed, polls}，与LoginWatcher.wait相同
+        """
+        watcher = monitor.login_watcher
+        started = time.monotonic()
+        deadline = started + timeout
+        interval = watcher.initial_interval
+        last_poll = started
+        result = {'online': False, 'cancelled': False, 'elapsed': 0.0, 'polls': 0}
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if await self._pause(min(interval, remaining)):
+                result['cancelled'] = True
+                break
+            online = await self.run_blocking(watcher.poll)
+            now = time.monotonic()
+            result['polls'] += 1
+            lag, last_poll = now - last_poll, now
+            if online:
+                result['online'] = True
+                recorder = get_latency_recorder()
+                recorder.observe('login_detect', now - started)
+                recorder.observe('login_detect_lag', lag)
+                break
+            interval = min(interval * watcher.backoff, watcher.max_interval)
+        result['elapsed'] = time.monotonic() - started
+        return result
+
+    def snapshot(self):
+        """
+        snapshot 功能说明:
+        # 返回各账号状态快照，额外标出正在进行登录任务的账号
+        # 输入: 无 | 输出: dict {账号名: AccountMonitor.snapshot()}
+        """
+        snapshot = self.supervisor.snapshot()
+        for name, task in self.login_tasks.items():
+            snapshot[name]['login_task'] = not task.done()
+        return snapshot
+
+    def format_summary(self):
+        """把各账号状态格式化为一行日志"""
+        return self.supervisor.format_summary()
+
+    async def _probe_task(self, monitor):
+        """
+        _probe_task 功能说明:
+        # 单个账号的探测任务：按账号状态机的下一次动作执行检查或自动登录，结果交给状态机计算等待时间并等待，
+        # 直到请求关闭；进入自动登录状态时等待时间为0，立即创建登录任务
+        # 单轮的异常只影响本账号，记录后按重试间隔继续
+        # 输入: monitor (AccountMonitor) | 输出: 无
+        """
+        key = f'account.{monitor.name}.error'
+        machine = monitor.machine
+        while not self._stop.is_set():
+            try:
+                failures = monitor.failure_count
+                if machine.next_action() == machine.LOGIN:
+                    task = asyncio.create_task(self._login(monitor), name=f'login:{monitor.name}')
+                    self.login_tasks[monitor.name] = task
+                    delay = machine.on_login(await task)
+                else:
+                    delay = machine.on_check(await self.run_blocking(monitor.check_state))
+                monitor.after_step(failures)
+                monitor.state_log.reset(key)
+            except Exception as e:
+                delay = monitor.config.get('retry_interval', 10)
+                monitor.state_log.log(key, f"error:{type(e).__name__}:{e}", logging.ERROR,
+                                      f"💥 [{monitor.name}] 账号检查过程中发生错误: {e}")
+            finally:
+                monitor.end_activity()
+            if delay > 0:
+                await self._sleep(monitor.name, delay)
+
+    async def _login(self, monitor):
+        """
+        _login 功能说明:
+        # 登录任务：在线程池中打开登录窗口（账号间互斥），然后异步等待扫码完成
+        # 输入: monitor (AccountMonitor) | 输出: bool (True=登录成功)
+        """
+        started = monitor.begin_login()
+        outcome = 'failure'
+        try:
+            if await self.run_blocking(monitor.open_login_window):
+                waited = await self.wait_for_login(monitor, monitor.config.get('login_timeout', 60))
+                outcome = monitor.on_login_waited(waited)
+            return outcome == 'success'
+        except Exception as e:
+            outcome = 'error'
+            logging.error(f"[{monitor.name}] 自动登录微信时发生错误: {e}")
+            return False
+        finally:
+            monitor.end_login(outcome, started)
+
+    async def _notifier_task(self, notifications):
+        """通知任务：依次投递队列中的通知，投递在线程池中执行，失败只记录日志"""
+        while True:
+            title, message = await notifications.get()
+            try:
+                await self.run_blocking(self.notification_manager.send_notification, title, message)
+            except Exception as e:
+                logging.error(f"发送通知失败: {e}")
+
+    async def _watchdog_task(self):
+        """监管任务：定期检查卡住的账号并输出汇总，节奏与AccountSupervisor.run相同"""
+        supervisor = self.supervisor
+        tick = max(1.0, min(supervisor.summary_interval, supervisor.hang_timeout / 4))
+        next_summary = time.monotonic() + supervisor.summary_interval
+        while not await self._pause(tick):
+            supervisor.check_hung()
+            if time.monotonic() >= next_summary:
+                next_summary = time.monotonic() + supervisor.summary_interval
+                logging.info(f"👥 账号状态汇总 - {self.format_summary()}")
+
+    async def _wakeup_task(self, wakeup, on_reload):
+        """
+        _wakeup_task 功能说明:
+        # 把MonitorWakeup（信号处理函数使用的线程唤醒器）的请求转发到事件循环：
+        # 关闭请求停止引擎；立即检查唤醒所有账号；配置重载先调用on_reload，再让各账号按新配置更新调度器参数
+        # 等待在单独的线程中进行，不占用检查线程池
+        # 输入: wakeup (MonitorWakeup), on_reload (可选回调) | 输出: 无
+        """
+        waiter = ThreadPoolExecutor(1, thread_name_prefix='AsyncEngineWakeup')
+        try:
+            while not self._stop.is_set():
+                reason = await self._loop.run_in_executor(waiter, wakeup.wait, 1.0)
+                if reason is None:
+                    continue
+                logging.info(f"🔔 等待被唤醒: {wakeup.describe(reason)}")
+                if reason == MonitorWakeup.SHUTDOWN:
+                    self.request_stop()
+                    break
+                if reason == MonitorWakeup.RELOAD:
+                    if on_reload is not None:
+                        await self.run_blocking(on_reload)
+                    for monitor in self.monitors.values():
+                        monitor.reload()
+                else:
+                    self._wake_all()
+        finally:
+            waiter.shutdown(wait=False)
+
+    async def _sleep(self, name, delay):
+        """等待下一次检查，立即检查请求或关闭请求立即打断"""
+        event = self._check_now[name]
+        try:
+            await asyncio.wait_for(event.wait(), timeout=max(0.0, delay))
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    async def _pause(self, delay):
+        """等待指定秒数，返回是否在等待期间请求了关闭"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, delay))
+        except asyncio.TimeoutError:
+            pass
+        return self._stop.is_set()
+
+    def _set_stop(self):
+        self._stop.set()
+        self._wake_all()
+
+    def _wake_all(self):
+        for event in self._check_now.values():
+            event.set()
+
+    async def _shutdown(self, probes, helpers, notifications):
+        """
+        _shutdown 功能说明:
+        # 关闭引擎：等待探测任务在stop_timeout内结束，仍卡在wxautox调用中的任务被取消并记入stuck，
+        # 投递剩余通知后停止辅助任务，线程池不等待卡住的调用（其期限由后端调用线程池保证）
+        # 输入: probes (探测任务列表), helpers (辅助任务列表), notifications (通知队列) | 输出: 无
+        """
+        self._set_stop()
+        self.supervisor.request_stop()
+        done, pending = await asyncio.wait(probes, timeout=self.stop_timeout) if probes else (set(), set())
+        self.stuck = sorted(task.get_name().split(':', 1)[1] for task in pending)
+        for task in pending:
+            task.cancel()
+        for task in self.login_tasks.values():
+            task.cancel()
+        if self.stuck:
+            logging.warning(f"⚠️ 以下账号的检查未能按时结束（卡在微信调用中）: {', '.join(self.stuck)}")
+
+        # 剩余通知最多等待1秒投递完
+        deadline = time.monotonic() + 1.0
+        while not notifications.empty() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        for task in helpers:
+            task.cancel()
+        await asyncio.gather(*probes, *helpers, *self.login_tasks.values(), return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logging.info(f"⚡ asyncio监控引擎已停止 - {self.format_summary()}")
@@ -2,12 +2,25 @@
 # 变更记录: [2025-06-24] @李祥光 [创建微信自动登录监控程序]########
 # 变更记录: [2025-06-24] @李祥光 [修复API调用错误：使用IsOnline和LoginWnd类]########
 # 变更记录: [2025-06-24] @李祥光 [添加详细注释和错误处理机制]########
+# 变更记录: [2026-10-16] @李祥光 [复用持久化微信连接，不再每次检查都重新连接]########
+# 变更记录: [2026-10-16] @李祥光 [状态检查改为分级探测，会话列表检查按需执行]########
+# 变更记录: [2026-10-16] @李祥光 [监控循环改为自适应调度，支持退避和抖动]########
+# 变更记录: [2026-10-16] @李祥光 [状态检查、自动登录和监控循环改为状态变化日志，重复信息折叠为周期汇总]########
+# 变更记录: [2026-10-16] @李祥光 [自动登录各步骤记录耗时直方图，周期统计和退出汇总输出p50/p95/p99/max]########
+# 变更记录: [2026-10-16] @李祥光 [检查结果和登录结果计入进程级计数器，供指标端点导出]########
+# 变更记录: [2026-10-16] @李祥光 [登录等待改为共享LoginWatcher，先快后慢轮询，关闭请求立即结束等待]########
+# 变更记录: [2026-10-16] @李祥光 [LoginWnd.login经后端调用线程池执行，超过期限按登录失败处理]########
+# 变更记录: [2026-10-16] @李祥光 [监控循环改为驱动MonitorStateMachine.tick，会话检查失败按功能异常只快速复查]########
+# 变更记录: [2026-10-16] @李祥光 [检查结果和登录结果写入检查历史存储]########
+# 变更记录: [2026-10-16] @李祥光 [日志文件跨过零点切换到新日期，启动和切换后按保留天数和总大小上限清理日志目录]########
+# 变更记录: [2026-10-17] @李祥光 [LoginWnd改为在后端工作线程内创建，UIA对象不跨线程使用]########
 # 输入: 无命令行参数 | 输出: 持续监控日志和状态信息###############
 
 
 ###########################文件下的所有函数###########################
 """
 setup_logging：配置日志系统，创建日志目录和文件输出
+get_probe_pipeline：获取模块共享的分级探测流水线
 check_wechat_status：检查微信客户端在线状态和连接情况
 auto_login_wechat：自动触发微信登录流程，打开登录窗口供用户扫码
 monitor_wechat：微信状态监控主循环，7x24小时不间断监控
@@ -22,22 +35,34 @@ flowchart TD
     B --> C[显示程序信息]
     C --> D[setup_logging函数]
     D --> E[初始化日志系统]
+    E --> E1[DailyFileHandler: 跨过零点切换到wechat_monitor_YYYYMMDD.log]
+    E1 --> E2[schedule_log_rotation后台清理过期和超出总大小上限的日志]
     E --> F[monitor_wechat函数]
     F --> G[开始监控循环]
-    G --> H[check_wechat_status函数]
-    H --> I{微信状态检查}
+    G --> G1[MonitorStateMachine.tick决定检查或登录]
+    G1 --> H[check_wechat_status函数]
+    H --> H1[get_probe_pipeline分级探测]
+    H1 --> I{微信状态检查}
     I -->|在线正常| J[继续监控]
     I -->|离线异常| K[auto_login_wechat函数]
     K --> L[打开登录窗口]
     L --> M[等待用户扫码]
+    L --> L1[call_login_window: 工作线程内创建LoginWnd并在login_window期限内执行login]
+    K --> K1[LatencyRecorder记录login_window/login_poll/login耗时]
+    K --> K3[LoginWatcher.wait先快后慢轮询登录状态]
+    K --> K2[MonitorStats.record_login记录登录结果]
+    H --> H2[MonitorStats.record_check记录检查结果]
+    H2 --> H4[record_history_check / record_history_login写入检查历史]
+    K2 --> H4
+    H1 --> H3[probe_state: 会话阶段失败为功能异常，只快速复查不登录]
     M --> N{登录结果}
     N -->|成功| J
     N -->|失败| O[记录错误]
-    J --> P[等待检查间隔]
+    J --> P[CheckScheduler计算自适应等待间隔]
     O --> P
     P --> G
     G --> Q{用户中断?}
-    Q -->|是| R[优雅退出]
+    Q -->|是| R[StateTransitionLogger.flush输出未汇总计数后优雅退出]
     Q -->|否| G
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
@@ -45,19 +70,33 @@ flowchart TD
 import time
 import logging
 import os
-from datetime import datetime
 try:
     import wxautox
 except ImportError:
     print("请先安装wxautox库: pip install wxautox")
     exit(1)
 
+from config import MONITOR_CONFIG
+from wechat_connection import get_shared_connection
+from wechat_probe import ProbePipeline
+from wechat_scheduler import CheckScheduler, MonitorWakeup
+from wechat_utils import ProcessManager
+from wechat_logging import get_state_logger, DailyFileHandler, schedule_log_rotation
+from wechat_metrics import get_latency_recorder, get_monitor_stats
+from wechat_login import get_login_watcher
+from wechat_backend import call_login_window
+from wechat_state import MonitorStateMachine, probe_state, LOGGING_IN, ONLINE, BACKOFF
+from wechat_history import record_history_check, record_history_login
+
+# 模块共享的分级探测流水线，延迟创建
+_probe_pipeline = None
+
 def setup_logging():
     """
     setup_logging 功能说明:
     # 初始化日志系统，配置日志输出格式和存储位置
     # 创建日志目录，设置双重输出（文件+控制台）
-    # 按日期自动生成日志文件名，便于日志管理和查看
+    # 按日期自动生成日志文件名，便于日志管理和查看；长时间运行时跨过零点切换到新日期的文件
     # 输入: 无 | 输出: 无
     # 异常处理: 目录创建失败、文件权限不足等情况
     """
@@ -73,10 +112,10 @@ def setup_logging():
         # 包含时间戳、日志级别、具体消息内容
         log_format = '%(asctime)s - %(levelname)s - %(message)s'
         
-        # 第三步：生成按日期命名的日志文件
-        # 格式：wechat_monitor_YYYYMMDD.log
-        current_date = datetime.now().strftime("%Y%m%d")
-        log_filename = f'{logs_dir}/wechat_monitor_{current_date}.log'
+        # 第三步：按日期命名的日志文件处理器
+        # 格式：wechat_monitor_YYYYMMDD.log，跨过零点后写入新一天的文件并在后台清理旧日志
+        file_handler = DailyFileHandler(logs_dir, 'wechat_monitor', encoding='utf-8')
+        log_filename = os.path.relpath(file_handler.baseFilename)
         
         # 第四步：配置日志系统
         # 同时输出到文件和控制台，方便实时查看和历史追踪
@@ -84,8 +123,8 @@ def setup_logging():
             level=logging.INFO,           # 设置日志级别为INFO
             format=log_format,            # 应用日志格式
             handlers=[
-                # 文件处理器：保存到日志文件，使用UTF-8编码支持中文
-                logging.FileHandler(log_filename, encoding='utf-8'),
+                # 文件处理器：保存到当天的日志文件，使用UTF-8编码支持中文
+                file_handler,
                 # 控制台处理器：实时显示在终端
                 logging.StreamHandler()
             ]
@@ -93,6 +132,9 @@ def setup_logging():
         
         logging.info(f"📝 日志系统初始化完成，日志文件: {log_filename}")
         
+        # 第五步：后台清理超过保留天数和超出日志目录总大小上限的旧日志
+        schedule_log_rotation(logs_dir)
+        
     except Exception as e:
         # 日志系统初始化失败的处理
         print(f"❌ 日志系统初始化失败: {str(e)}")
@@ -100,43 +142,67 @@ def setup_logging():
         # 设置基本的控制台日志
         logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def get_probe_pipeline():
+    """
+    get_probe_pipeline 功能说明:
+    # 获取模块共享的分级探测流水线，第一次调用时创建
+    # 流水线复用共享微信连接，阶段调度来自MONITOR_CONFIG['probe_stages']
+    # 输入: 无 | 输出: ProbePipeline实例
+    """
+    global _probe_pipeline
+    if _probe_pipeline is None:
+        _probe_pipeline = ProbePipeline(get_shared_connection(), ProcessManager())
+    return _probe_pipeline
+
 def check_wechat_status():
     """
     check_wechat_status 功能说明:
     # 检查微信客户端的在线状态和连接情况
-    # 通过wxautox库连接微信实例，验证登录状态和会话可用性
+    # 通过分级探测流水线执行：进程检查和登录状态检查每次执行，
+    # 开销较大的会话列表检查按配置间隔执行，出现可疑迹象时立即执行
     # 这是监控系统的核心检查函数，用于判断是否需要自动登录
     # 输入: 无 | 输出: bool (True=微信在线且正常, False=微信离线或异常)
     # 异常处理: 微信未启动、连接失败、权限不足等情况
     """
+    status_ok = False  # 检查结果，退出时计入进程级计数器
     try:
-        # 第一步：创建微信实例连接
-        # wxautox.WeChat()会尝试连接到当前运行的微信客户端
-        logging.debug("正在连接微信客户端...")
-        wx = wxautox.WeChat()
+        # 第一步：执行分级探测
+        # 共享连接已有实例且仍然存活时直接复用，否则才重新连接微信客户端
+        logging.debug("正在执行分级状态探测...")
+        result = get_probe_pipeline().run()
+        
+        # 各分支只在状态变化时输出完整信息，相同状态和相同错误折叠为周期汇总
+        state_log = get_state_logger()
         
-        # 第二步：检查微信登录状态
-        # IsOnline()方法检查微信是否已成功登录
-        # 这是修复后的正确API调用方式
-        if not wx.IsOnline():
-            logging.info("❌ 微信未登录或连接失败")
-            logging.info("可能原因：1.微信未启动 2.未扫码登录 3.网络连接问题")
+        # 第二步：进程未运行，无需继续连接
+        if result.failed_stage == 'process':
+            state_log.log('wechat_status', 'process_down', logging.INFO,
+                          f"❌ {result.reason}",
+                          "可能原因：1.微信未启动 2.微信进程异常退出 3.进程名配置错误")
             return False
         
-        # 第三步：验证微信会话功能
-        # 尝试获取会话列表，确保微信功能正常
-        try:
-            sessions = wx.GetSession()
-            if sessions is not None:
-                logging.debug(f"微信会话检查通过，当前会话数: {len(sessions) if hasattr(sessions, '__len__') else '未知'}")
-            else:
-                logging.warning("⚠️ 微信会话列表为空，可能刚刚登录")
-        except Exception as session_error:
-            logging.warning(f"⚠️ 获取微信会话时出现问题: {str(session_error)}")
-            # 会话获取失败不一定意味着微信离线，继续检查
+        # 第三步：检查微信登录状态
+        # 连接或IsOnline()调用异常按错误处理，返回未登录按离线处理
+        if result.failed_stage == 'online':
+            if result.error is not None:
+                raise result.error
+            state_log.log('wechat_status', 'offline', logging.INFO,
+                          "❌ 微信未登录或连接失败",
+                          "可能原因：1.微信未启动 2.未扫码登录 3.网络连接问题")
+            return False
+        
+        # 第四步：验证微信会话功能
+        # 会话获取失败不一定意味着微信离线，只记录警告
+        if result.failed_stage == 'session':
+            state_log.log('wechat_session', result.reason, logging.WARNING,
+                          f"⚠️ 获取微信会话时出现问题: {result.reason}")
+        elif result.session_count is not None:
+            state_log.reset('wechat_session')
+            logging.debug(f"微信会话检查通过，当前会话数: {result.session_count}")
         
         # 微信状态检查通过
-        logging.info("✅ 微信状态正常，已在线且功能正常")
+        state_log.log('wechat_status', 'online', logging.INFO, "✅ 微信状态正常，已在线且功能正常")
+        status_ok = True
         return True
         
     except Exception as e:
@@ -146,88 +212,84 @@ def check_wechat_status():
         # 2. 微信版本不兼容 - API调用失败
         # 3. 权限不足 - 无法访问微信进程
         # 4. 系统资源不足 - 连接超时
-        logging.error(f"❌ 检查微信状态时发生错误: {str(e)}")
-        logging.error("建议检查：1.微信是否正常启动 2.wxautox版本兼容性 3.管理员权限")
+        get_shared_connection().invalidate(f"检查状态异常: {e}")
+        get_state_logger().log('wechat_status', f"error:{type(e).__name__}:{e}", logging.ERROR,
+                               f"❌ 检查微信状态时发生错误: {str(e)}",
+                               "建议检查：1.微信是否正常启动 2.wxautox版本兼容性 3.管理员权限")
         return False
+    
+    finally:
+        last_result = _probe_pipeline.last_result if _probe_pipeline is not None else None
+        get_monitor_stats().record_check(status_ok, last_result)
+        record_history_check(status_ok, last_result)
 
-def auto_login_wechat():
+def auto_login_wechat(wakeup=None):
     """
     auto_login_wechat 功能说明:
     # 自动触发微信登录流程，打开登录窗口供用户扫码
     # 使用wxautox的LoginWnd类实现自动化登录操作
     # 包含登录超时控制、状态轮询检查、错误重试机制
-    # 输入: 无 | 输出: bool (True=登录成功, False=登录失败或超时)
+    # 登录状态由共享的LoginWatcher先快后慢地轮询，扫码完成后立即返回，关闭请求会立即结束等待
+    # 输入: wakeup (可选的MonitorWakeup，请求关闭后放弃等待) | 输出: bool (True=登录成功, False=登录失败或超时)
     # 依赖: wxautox库的LoginWnd类和WeChat类
     # 注意: 需要用户手动扫码确认登录
+    # 日志: 失败信息只在结果变化时完整输出，连续相同的失败折叠为周期汇总，等待进度降为DEBUG
     """
+    state_log = get_state_logger()
+    recorder = get_latency_recorder()  # 记录各登录步骤耗时
+    login_started = time.perf_counter()
+    outcome = 'failure'  # 登录结果，退出时计入进程级计数器
     try:
         logging.info("🚀 开始自动登录微信流程...")
         
-        # 第一步：导入并初始化登录窗口类
-        # LoginWnd是wxautox提供的专门用于微信登录的类
-        from wxautox import LoginWnd
-        logging.debug("LoginWnd类导入成功")
-        
-        # 第二步：创建登录窗口实例
-        # 这个实例将负责打开微信登录界面
-        login_wnd = LoginWnd()
-        logging.debug("登录窗口实例创建完成")
-        
-        # 第三步：调用登录方法打开登录窗口
+        # 第一步：创建登录窗口实例并调用登录方法打开登录窗口
+        # LoginWnd是wxautox提供的专门用于微信登录的类，实例在后端工作线程内创建和使用
         # timeout=60: 设置登录窗口打开的超时时间为60秒
         # 这个操作会显示二维码供用户扫描
-        logging.info("正在打开微信登录窗口...")
-        login_result = login_wnd.login(timeout=60)
+        # 界面自动化卡住超过期限（60秒+宽限）时抛出CallTimeout，按登录异常处理
+        state_log.routine("正在打开微信登录窗口...")
+        with recorder.timer('login_window'):
+            login_result = call_login_window(60)
         
-        # 第四步：检查登录窗口是否成功打开
+        # 第二步：检查登录窗口是否成功打开
         # login_result包含登录操作的结果信息
         # 需要验证结果对象存在且success属性为True
         if login_result and hasattr(login_result, 'success') and login_result.success:
             logging.info("✅ 微信登录窗口已成功打开")
             logging.info("📱 请使用手机微信扫描二维码完成登录...")
             
-            # 第五步：轮询检查登录状态
-            # 设置等待参数：每2秒检查一次，最多等待60秒
-            wait_time = 0  # 已等待时间计数器
+            # 第三步：等待登录完成
+            # 最多等待60秒，LoginWatcher通过共享连接先快后慢地轮询IsOnline，
+            # 实例失效时才会重新连接，扫码完成后立即返回
             max_wait = 60  # 最大等待时间（秒）
-            check_interval = 2  # 检查间隔（秒）
-            
-            logging.info(f"开始轮询检查登录状态，最大等待时间: {max_wait}秒")
+            state_log.routine(f"开始等待登录完成，最大等待时间: {max_wait}秒")
+            waited = get_login_watcher().wait(max_wait, wakeup=wakeup)
             
-            # 轮询循环：持续检查直到登录成功或超时
-            while wait_time < max_wait:
-                time.sleep(check_interval)  # 等待检查间隔
-                wait_time += check_interval  # 更新等待时间计数
-                
-                # 第六步：验证登录状态
-                # 重新创建微信实例来检查最新的登录状态
-                # 这是必要的，因为登录状态可能在扫码后发生变化
-                try:
-                    wx = wxautox.WeChat()  # 创建新的微信实例
-                    if wx.IsOnline():  # 检查是否已成功登录
-                        logging.info("🎉 微信登录成功！用户已完成扫码验证")
-                        return True
-                except Exception as check_error:
-                    # 状态检查失败不一定意味着登录失败，继续等待
-                    logging.debug(f"状态检查时出现异常: {str(check_error)}")
-                    pass
-                    
-                # 显示等待进度信息
-                logging.info(f"⏳ 等待用户扫码登录... ({wait_time}/{max_wait}秒)")
+            # 第四步：验证登录状态
+            if waited['online']:
+                state_log.recovered('auto_login', "🎉 微信登录成功！用户已完成扫码验证",
+                                    f"检测耗时 {waited['elapsed']:.1f}秒，轮询 {waited['polls']} 次")
+                outcome = 'success'
+                return True
+            if waited['cancelled']:
+                logging.info("⏹️ 程序正在关闭，停止等待登录")
+                return False
             
-            # 第七步：登录超时处理
-            logging.warning("⏰ 登录等待超时！")
-            logging.warning("可能原因：1.用户未及时扫码 2.网络连接问题 3.二维码已过期")
-            logging.info("建议：请重新尝试登录操作")
+            # 第五步：登录超时处理
+            state_log.log('auto_login', 'timeout', logging.WARNING,
+                          "⏰ 登录等待超时！",
+                          "可能原因：1.用户未及时扫码 2.网络连接问题 3.二维码已过期",
+                          "建议：请重新尝试登录操作")
             return False
         else:
-            # 第八步：登录窗口打开失败处理
-            logging.error("❌ 无法打开微信登录窗口")
-            logging.error("可能原因：1.微信客户端异常 2.系统权限不足 3.wxautox版本问题")
+            # 第六步：登录窗口打开失败处理
+            state_log.log('auto_login', 'window_failed', logging.ERROR,
+                          "❌ 无法打开微信登录窗口",
+                          "可能原因：1.微信客户端异常 2.系统权限不足 3.wxautox版本问题")
             return False
             
     except Exception as e:
-        # 第九步：异常处理和错误分析
+        # 第七步：异常处理和错误分析
         # 捕获登录过程中的所有异常情况
         # 常见异常类型：
         # 1. ImportError: wxautox库导入失败或版本不兼容
@@ -235,84 +297,143 @@ def auto_login_wechat():
         # 3. TimeoutError: 登录窗口打开超时
         # 4. ConnectionError: 与微信客户端连接失败
         # 5. PermissionError: 系统权限不足
-        logging.error(f"❌ 自动登录微信时发生错误: {str(e)}")
-        logging.error("错误分析建议：")
-        logging.error("1. 检查wxautox库是否正确安装和版本兼容")
-        logging.error("2. 确认微信客户端是否正常运行")
-        logging.error("3. 验证程序是否具有足够的系统权限")
-        logging.error("4. 检查防火墙或安全软件是否阻止了操作")
+        outcome = 'error'
+        state_log.log('auto_login', f"error:{type(e).__name__}:{e}", logging.ERROR,
+                      f"❌ 自动登录微信时发生错误: {str(e)}",
+                      "错误分析建议：",
+                      "1. 检查wxautox库是否正确安装和版本兼容",
+                      "2. 确认微信客户端是否正常运行",
+                      "3. 验证程序是否具有足够的系统权限",
+                      "4. 检查防火墙或安全软件是否阻止了操作")
         return False
+    
+    finally:
+        # 整次登录耗时（打开窗口+等待扫码），无论成功、超时还是异常都记录
+        login_seconds = time.perf_counter() - login_started
+        recorder.observe('login', login_seconds)
+        get_monitor_stats().record_login(outcome)
+        record_history_login(outcome, login_seconds)
 
-def monitor_wechat(check_interval=30):
+def monitor_wechat(check_interval=30, wakeup=None):
     """
     monitor_wechat 功能说明:
     # 微信状态监控的主循环函数，实现7x24小时不间断监控
     # 核心功能：定期检查微信在线状态，自动处理掉线情况
     # 监控策略：状态检查 -> 异常检测 -> 自动登录 -> 状态恢复
     # 适用场景：需要保持微信长期在线的自动化应用
-    # 输入: check_interval (状态检查间隔，单位秒，默认30秒)
-    # 输出: 无返回值（持续运行直到手动停止）
+    # 状态管理：由MonitorStateMachine决定每一步是检查还是登录，本函数只负责按tick返回的秒数等待；
+    #          离线一次即自动登录（max_retry_count=1），会话检查失败（功能异常）只快速复查，不触发登录
+    # 调度策略：由CheckScheduler根据状态自适应调整等待间隔（健康时拉长、失败后快速复查、登录失败指数退避）
+    # 日志策略：LOG_CONFIG['log_mode']为transition时，每周期的例行日志降为DEBUG，
+    #          离线、登录结果和错误只在变化时完整输出，重复的折叠为周期汇总
+    # 输入: check_interval (基础状态检查间隔，单位秒，默认30秒),
+    #       wakeup (可选的MonitorWakeup，收到关闭请求时立即结束等待并返回)
+    # 输出: 无返回值（持续运行直到手动停止或wakeup请求关闭）
     # 异常处理: 包含完整的错误恢复机制
     """
     logging.info("🔄 启动微信状态监控服务")
     logging.info(f"📊 监控配置 - 检查间隔: {check_interval}秒")
     logging.info("💡 监控策略: 状态检查 -> 异常检测 -> 自动登录 -> 状态恢复")
     
-    # 监控统计变量
-    check_count = 0  # 检查次数计数器
-    login_attempts = 0  # 登录尝试次数
+    state_log = get_state_logger()  # 状态变化日志
+    
+    def on_transition(machine, old, new):
+        # 状态变化时输出离线和登录结果日志，相同结果由状态日志折叠
+        if new == LOGGING_IN:
+            state_log.log('monitor_login', 'started', logging.WARNING,
+                          f"⚠️ 检测到微信离线！开始第 {machine.login_attempts} 次自动登录尝试...")
+        elif old == LOGGING_IN and new == ONLINE:
+            state_log.reset('monitor_login')
+            state_log.recovered('monitor_login_result',
+                                "✅ 微信自动登录成功！状态已恢复，继续监控",
+                                f"📈 本次监控统计 - 总检查: {machine.checks}次, 登录尝试: {machine.logins}次")
+        elif new == BACKOFF:
+            state_log.log('monitor_login_result', 'failed', logging.ERROR,
+                          "❌ 微信自动登录失败",
+                          f"🔄 将按退避策略稍后重新尝试（连续失败 {machine.scheduler.login_failures} 次）",
+                          "建议检查：1.网络连接 2.微信客户端状态 3.系统权限")
     
-    # 主监控循环：无限循环直到程序被手动停止
-    while True:
+    # 监控状态机：检查结果区分在线、功能异常和离线，离线一次即自动登录
+    machine = MonitorStateMachine(
+        check=lambda: probe_state(check_wechat_status(), get_probe_pipeline().last_result),
+        login=lambda: auto_login_wechat(wakeup),
+        config=dict(MONITOR_CONFIG, max_retry_count=1),
+        scheduler=CheckScheduler(base_interval=check_interval),
+    )
+    machine.on_transition.append(on_transition)
+    
+    def log_summary():
+        state_log.flush()
+        logging.info(f"📊 监控统计总结 - 总检查次数: {machine.checks}, 登录尝试次数: {machine.logins}")
+    
+    # 主监控循环：无限循环直到程序被手动停止或收到关闭请求
+    while wakeup is None or not wakeup.is_shutdown:
         try:
-            check_count += 1  # 增加检查计数
-            logging.info(f"🔍 第 {check_count} 次状态检查开始...")
+            # 第一步：推进状态机，到期时执行一次检查或自动登录
+            checks_before = machine.checks
+            if machine.next_action() == machine.CHECK:
+                state_log.routine(f"🔍 第 {machine.checks + 1} 次状态检查开始...")
+            delay = machine.tick()
+            if machine.checks > checks_before and machine.state == ONLINE:
+                # 微信状态正常，记录正常状态（例行日志）
+                state_log.routine(f"✅ 微信状态正常 (第 {machine.checks} 次检查)")
+            state_log.reset('monitor_error')  # 本轮未出现未知错误
             
-            # 第一步：执行微信状态检查
-            # 调用check_wechat_status()检查微信是否在线
-            if not check_wechat_status():
-                # 检测到微信离线，开始自动恢复流程
-                login_attempts += 1
-                logging.warning(f"⚠️ 检测到微信离线！开始第 {login_attempts} 次自动登录尝试...")
-                
-                # 第二步：执行自动登录操作
-                # 调用auto_login_wechat()尝试恢复微信登录状态
-                if auto_login_wechat():
-                    logging.info("✅ 微信自动登录成功！状态已恢复，继续监控")
-                    logging.info(f"📈 本次监控统计 - 总检查: {check_count}次, 登录尝试: {login_attempts}次")
-                else:
-                    logging.error("❌ 微信自动登录失败")
-                    logging.error(f"🔄 将在 {check_interval} 秒后重新尝试")
-                    logging.warning("建议检查：1.网络连接 2.微信客户端状态 3.系统权限")
-            else:
-                # 微信状态正常，记录正常状态
-                logging.info(f"✅ 微信状态正常 (第 {check_count} 次检查)")
+            # 每10次检查输出一次各探测阶段的耗时统计和耗时分位数
+            if machine.checks > checks_before and machine.checks % 10 == 0:
+                logging.info(f"📊 探测阶段耗时统计: {get_probe_pipeline().stage_stats()}")
+                logging.info(f"⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
+            
+            # 第二步：进入自动登录状态时立即执行登录，不等待
+            if delay <= 0:
+                continue
             
             # 第三步：等待下次检查
-            # 使用sleep暂停指定时间，避免过于频繁的检查
-            logging.info(f"⏱️ 等待 {check_interval} 秒后进行下次状态检查...")
-            time.sleep(check_interval)
+            # 等待时间由调度器根据当前状态自适应计算，并带有随机抖动
+            state_log.routine(f"⏱️ 等待 {delay:.1f} 秒后进行下次状态检查... ({machine.scheduler.last_reason})")
+            if wakeup is None:
+                time.sleep(delay)
+                continue
+            
+            # 提供了唤醒器时，关闭或立即检查请求会立即打断等待
+            reason = wakeup.wait(delay)
+            if reason is not None:
+                logging.info(f"🔔 等待被唤醒: {wakeup.describe(reason)}")
+            if reason == MonitorWakeup.SHUTDOWN:
+                log_summary()
+                logging.info(f"⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
+                logging.info("👋 微信监控服务已安全停止")
+                break
+            if reason is not None:
+                machine.check_now()  # 重载或立即检查请求：下一次动作立即执行
             
         except KeyboardInterrupt:
             # 第四步：优雅处理用户中断
             # 捕获Ctrl+C信号，实现程序的优雅退出
             # 这是正常的程序终止方式，不记录为错误
             logging.info("🛑 收到用户中断信号 (Ctrl+C)，正在优雅停止监控服务...")
-            logging.info(f"📊 监控统计总结 - 总检查次数: {check_count}, 登录尝试次数: {login_attempts}")
+            log_summary()
+            logging.info(f"🔌 微信连接统计: {get_shared_connection().stats()}")
+            logging.info(f"📊 探测阶段耗时统计: {get_probe_pipeline().stage_stats()}")
+            logging.info(f"⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
             logging.info("👋 微信监控服务已安全停止")
             break  # 跳出while循环，结束监控
         except Exception as e:
             # 第五步：处理监控过程中的意外异常
             # 捕获所有其他未预期的异常，确保监控服务的稳定性
             # 常见异常：系统资源不足、网络中断、权限变更等
-            logging.error(f"❌ 监控过程中发生未知错误: {str(e)}")
-            logging.error("错误类型分析：")
-            logging.error("1. 系统资源不足 - 内存或CPU占用过高")
-            logging.error("2. 网络连接异常 - 网络中断或代理问题")
-            logging.error("3. 权限变更 - 系统权限被修改")
-            logging.error("4. 微信客户端崩溃 - 微信程序异常退出")
-            logging.info(f"🔄 监控服务将在 {check_interval} 秒后自动重试...")
-            time.sleep(check_interval)  # 等待后继续监控循环
+            state_log.log('monitor_error', f"error:{type(e).__name__}:{e}", logging.ERROR,
+                          f"❌ 监控过程中发生未知错误: {str(e)}",
+                          "错误类型分析：",
+                          "1. 系统资源不足 - 内存或CPU占用过高",
+                          "2. 网络连接异常 - 网络中断或代理问题",
+                          "3. 权限变更 - 系统权限被修改",
+                          "4. 微信客户端崩溃 - 微信程序异常退出")
+            state_log.routine(f"🔄 监控服务将在 {check_interval} 秒后自动重试...")
+            if wakeup is None:
+                time.sleep(check_interval)  # 等待后继续监控循环
+            else:
+                wakeup.wait(check_interval)  # 关闭请求会立即打断等待，由循环条件退出
 
 def main():
     """
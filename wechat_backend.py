@@ -0,0 +1,343 @@
+##########wechat_backend.py: [wxautox调用超时控制] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建后端调用线程池：每次wxautox调用都有按操作配置的期限，超时按失败处理并替换卡住的工作线程]########
+# 变更记录: [2026-10-17] @李祥光 [工作线程启动时初始化COM、退出时释放；新增call_login_window在工作线程内创建LoginWnd；新增alive期限]########
+# 输入: 操作名称、wxautox调用、MONITOR_CONFIG中的期限配置 | 输出: 调用结果或CallTimeout，各操作的调用/超时/异常计数###############
+
+
+###########################文件下的所有函数###########################
+"""
+CallTimeout：后端调用超过期限未返回时抛出的异常
+BackendCallPool：后端调用线程池，调用方按期限等待结果，超时的工作线程被标记为卡住并由新线程替换
+get_backend_pool：获取进程共享的后端调用线程池
+call_timeout_for：读取某个操作的调用期限（秒）
+backend_call：在共享线程池中按操作期限执行一次wxautox调用
+backend_pool_stats：返回共享线程池的统计，线程池尚未创建时返回None
+com_apartment：在当前线程初始化COM，退出时释放（非Windows或缺少依赖时不做任何事）
+call_login_window：在工作线程中创建LoginWnd并调用login，期限为登录超时加login_window配置
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[WeChatConnection._connect / ProbePipeline / LoginWatcher / 自动登录] --> B[backend_call]
+    B --> C[call_timeout_for读取操作期限]
+    B --> D[BackendCallPool.call提交任务]
+    D --> E[工作线程执行wxautox调用]
+    E0[工作线程启动] --> E1[com_apartment初始化COM] --> E
+    O[自动登录 / LoginWatcher] --> P[call_login_window] --> B
+    P --> E2[工作线程内创建LoginWnd并调用login]
+    D --> F{期限内返回?}
+    F -->|是| G[返回结果或原样抛出异常]
+    F -->|否| H[计入超时次数，抛出CallTimeout]
+    H --> I{任务已开始执行?}
+    I -->|是| J[标记工作线程卡住，启动替换线程（卡住线程数有上限）]
+    I -->|否| K[取消排队中的任务]
+    J --> L[卡住的线程返回后直接退出，结果丢弃]
+    M[指标端点/结束统计] --> N[BackendCallPool.stats各操作调用/超时/异常次数]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import sys
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+from config import MONITOR_CONFIG
+
+# COM初始化：uiautomation的UIAutomationInitializerInThread优先，缺少时用pythoncom
+uiautomation = None
+pythoncom = None
+if sys.platform == 'win32':
+    try:
+        import uiautomation
+    except ImportError:
+        uiautomation = None
+    try:
+        import pythoncom
+    except ImportError:
+        pythoncom = None
+
+# 各操作的默认调用期限（秒）；login_window为LoginWnd.login自身超时之外额外允许的秒数
+DEFAULT_CALL_TIMEOUTS = {
+    'connect': 20,
+    'online': 10,
+    'session': 30,
+    'login_window': 30,
+    'alive': 5,
+}
+
+# 进程共享的后端调用线程池，延迟创建
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class CallTimeout(TimeoutError):
+    """
+    CallTimeout 功能说明:
+    # 后端调用超过期限未返回，调用方按失败处理（与调用抛出异常相同）
+    # 输入: operation (操作名称), timeout (期限秒数) | 输出: 异常对象
+    """
+
+    def __init__(self, operation, timeout):
+        super().__init__(f"{operation} 调用超过 {timeout:g}秒 未返回")
+        self.operation = operation
+        self.timeout = timeout
+
+
+class _Job:
+    """一次后端调用：工作线程执行后通过事件通知调用方"""
+
+    __slots__ = ('func', 'args', 'kwargs', 'done', 'result', 'error', 'state', 'worker')
+
+    def __init__(self, func, args, kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.state = 'queued'  # queued / running / finished / cancelled
+        self.worker = None
+
+
+class BackendCallPool:
+    """
+    BackendCallPool 功能说明:
+    # 后端调用线程池，所有wxautox调用都经过这里，调用方不会被卡住的界面自动化无限阻塞：
+    # 1. 调用方提交任务后只等待到期限，超时抛出CallTimeout并计入该操作的超时次数
+    # 2. 已开始执行的任务超时，说明工作线程卡在调用中：标记为卡住并启动一个替换线程保持可用线程数；
+    #    卡住的线程返回后直接退出，结果丢弃
+    # 3. 还在排队的任务超时直接取消，工作线程取到时跳过
+    # 4. 卡住的线程数达到max_hung后不再替换，避免后端彻底失去响应时线程无限增长
+    # 输入: max_workers (可用工作线程数), max_hung (最多同时保留的卡住线程数), name (线程名前缀) | 输出: 无
+
+    属性说明:
+    - hung_workers: 当前卡在调用中的工作线程数
+    - replaced: 累计替换的工作线程数
+
+    说明:
+    - 工作线程是守护线程，卡住的线程不会阻止程序退出
+    """
+
+    def __init__(self, max_workers=4, max_hung=8, name='BackendCall'):
+        self.max_workers = max(1, int(max_workers))
+        self.max_hung = max(0, int(max_hung))
+        self.name = name
+        self._jobs = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._retired = set()  # 已有替换线程补位的卡住线程，返回后退出
+        self._stalled = set()  # 卡住线程数达到上限、没有补位的卡住线程，返回后继续工作
+        self._serial = 0
+        self._stats = {}  # 操作名 -> {calls, timeouts, errors, time_total}
+        self.hung_workers = 0
+        self.replaced = 0
+        for _ in range(self.max_workers):
+            self._spawn()
+
+    def call(self, operation, func, *args, call_timeout=None, **kwargs):
+        """
+        call 功能说明:
+        # 在工作线程中执行func(*args, **kwargs)，最多等待call_timeout秒
+        # 输入: operation (操作名称，用于统计), func (可调用对象), call_timeout (期限秒数，None表示不限) | 输出: func的返回值
+        # 异常处理: func抛出的异常原样抛出并计入errors；超过期限抛出CallTimeout并计入timeouts
+        """
+        job = _Job(func, args, kwargs)
+        started = time.monotonic()
+        self._jobs.put(job)
+        finished = job.done.wait(call_timeout)
+        elapsed = time.monotonic() - started
+
+        with self._lock:
+            stats = self._stats.setdefault(operation, {'calls': 0, 'timeouts': 0, 'errors': 0, 'time_total': 0.0})
+            stats['calls'] += 1
+            stats['time_total'] += elapsed
+            if not finished:
+                if job.state == 'finished':
+                    finished = True  # 期限到达的同时恰好完成
+                elif job.state == 'queued':
+                    job.state = 'cancelled'
+                else:
+                    self._retire(job.worker)
+            if not finished:
+                stats['timeouts'] += 1
+            elif job.error is not None:
+                stats['errors'] += 1
+
+        if not finished:
+            logging.warning(f"⏳ 后端调用 {operation} 超过 {call_timeout:g}秒 未返回，按失败处理")
+            raise CallTimeout(operation, call_timeout)
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stats(self):
+        """
+        stats 功能说明:
+        # 返回各操作的调用统计和线程状态
+        # 输入: 无 | 输出: dict {operations: {操作名: {calls, timeouts, errors, avg_ms}}, workers, hung_workers, replaced}
+        """
+        with self._lock:
+            operations = {
+                operation: {
+                    'calls': stats['calls'],
+                    'timeouts': stats['timeouts'],
+                    'errors': stats['errors'],
+                    'avg_ms': round(stats['time_total'] / stats['calls'] * 1000, 2) if stats['calls'] else 0.0,
+                }
+                for operation, stats in self._stats.items()
+            }
+            return {
+                'operations': operations,
+                'workers': self.max_workers,
+                'hung_workers': self.hung_workers,
+                'replaced': self.replaced,
+            }
+
+    def _spawn(self):
+        """启动一个工作线程（调用方持有锁或在初始化阶段）"""
+        self._serial += 1
+        thread = threading.Thread(target=self._worker, name=f'{self.name}-{self._serial}', daemon=True)
+        thread.start()
+
+    def _retire(self, worker):
+        """
+        _retire 功能说明:
+        # 标记卡住的工作线程，卡住线程数未达上限时启动替换线程（调用方持有锁）
+        # 输入: worker (卡住的线程) | 输出: 无
+        """
+        if worker in self._retired or worker in self._stalled:
+            return
+        self.hung_workers += 1
+        if self.hung_workers <= self.max_hung:
+            self._retired.add(worker)
+            self.replaced += 1
+            self._spawn()
+        else:
+            self._stalled.add(worker)
+            logging.error(f"💥 卡在后端调用中的线程已有 {self.hung_workers} 个，不再替换，等待其返回")
+
+    def _worker(self):
+        """工作线程：启动时初始化COM并在整个生命周期内保持，依次执行任务；被标记为卡住的线程在调用返回后退出"""
+        with com_apartment():
+            self._run_jobs()
+
+    def _run_jobs(self):
+        """工作线程的任务循环，线程退出时返回"""
+        current = threading.current_thread()
+        while True:
+            job = self._jobs.get()
+            with self._lock:
+                if job.state == 'cancelled':
+                    continue
+                job.state = 'running'
+                job.worker = current
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+            except Exception as e:
+                job.error = e
+            with self._lock:
+                job.state = 'finished'
+                job.done.set()
+                if current in self._stalled:
+                    self._stalled.discard(current)
+                    self.hung_workers -= 1
+                elif current in self._retired:
+                    self._retired.discard(current)
+                    self.hung_workers -= 1
+                    return
+
+
+@contextmanager
+def com_apartment():
+    """
+    com_apartment 功能说明:
+    # 在当前线程初始化COM，退出时释放；UIA对象只能在初始化过COM的线程中创建和使用
+    # 输入: 无 | 输出: 上下文管理器
+    # 异常处理: 初始化失败只记录日志，调用在该线程中照常执行（失败时由调用本身报错）
+    """
+    initializer = None
+    initialized = False
+    try:
+        if uiautomation is not None and hasattr(uiautomation, 'UIAutomationInitializerInThread'):
+            initializer = uiautomation.UIAutomationInitializerInThread()
+        elif pythoncom is not None:
+            pythoncom.CoInitialize()
+            initialized = True
+    except Exception as e:
+        logging.error(f"❌ 后端工作线程初始化COM失败: {e}")
+    try:
+        yield
+    finally:
+        if initializer is not None:
+            initializer.Uninitialize()
+        elif initialized:
+            pythoncom.CoUninitialize()
+
+
+def get_backend_pool():
+    """
+    get_backend_pool 功能说明:
+    # 获取进程共享的后端调用线程池，第一次调用时按MONITOR_CONFIG创建
+    # 输入: 无 | 输出: BackendCallPool实例
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BackendCallPool(MONITOR_CONFIG.get('backend_workers', 4),
+                                    MONITOR_CONFIG.get('backend_max_hung_workers', 8))
+        return _pool
+
+
+def call_timeout_for(operation, base=0.0):
+    """
+    call_timeout_for 功能说明:
+    # 读取操作的调用期限，MONITOR_CONFIG['backend_call_timeouts']覆盖默认值，0或None表示不限
+    # 调用本身带有超时参数时（如LoginWnd.login(timeout=...)），期限为该超时加上配置的秒数
+    # 输入: operation (操作名称), base (调用自身的超时秒数) | 输出: float 期限秒数，或None
+    """
+    timeouts = MONITOR_CONFIG.get('backend_call_timeouts') or {}
+    timeout = timeouts.get(operation, DEFAULT_CALL_TIMEOUTS.get(operation))
+    return base + float(timeout) if timeout else None
+
+
+def backend_call(operation, func, *args, call_timeout=None, **kwargs):
+    """
+    backend_call 功能说明:
+    # 在共享线程池中执行一次wxautox调用，期限默认取call_timeout_for(operation)
+    # 输入: operation (connect/online/session/login_window/alive等), func及其参数, call_timeout (可选，覆盖配置的期限)
+    # 输出: func的返回值
+    # 异常处理: 超过期限抛出CallTimeout，调用本身的异常原样抛出
+    """
+    if call_timeout is None:
+        call_timeout = call_timeout_for(operation)
+    return get_backend_pool().call(operation, func, *args, call_timeout=call_timeout, **kwargs)
+
+
+def call_login_window(timeout):
+    """
+    call_login_window 功能说明:
+    # 在后端工作线程中创建LoginWnd并调用login(timeout=...)，UIA对象不跨线程使用
+    # 期限为登录超时加上login_window配置的秒数
+    # 输入: timeout (LoginWnd.login的超时秒数) | 输出: login的返回值
+    # 异常处理: 超过期限抛出CallTimeout，导入或调用的异常原样抛出
+    """
+    def login():
+        from wxautox import LoginWnd
+        return LoginWnd().login(timeout=timeout)
+
+    return backend_call('login_window', login,
+                        call_timeout=call_timeout_for('login_window', timeout))
+
+
+def backend_pool_stats():
+    """
+    backend_pool_stats 功能说明:
+    # 返回共享线程池的统计，尚未发生任何后端调用时返回None（不为此创建线程池）
+    # 输入: 无 | 输出: dict（同BackendCallPool.stats）或None
+    """
+    with _pool_lock:
+        pool = _pool
+    return pool.stats() if pool is not None else None
@@ -0,0 +1,284 @@
+##########wechat_connection.py: [微信客户端连接管理] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建持久化微信连接管理类，复用wxautox.WeChat实例]########
+# 变更记录: [2026-10-16] @李祥光 [连接耗时计入connect阶段直方图]########
+# 变更记录: [2026-10-16] @李祥光 [添加启动就绪等待：启动微信后按递增间隔轮询进程和可连接的实例，替代固定等待]########
+# 变更记录: [2026-10-16] @李祥光 [支持连接参数，多账号监管时每个账号连接各自的微信实例]########
+# 变更记录: [2026-10-16] @李祥光 [创建wxautox.WeChat实例改为经后端调用线程池执行，超过期限按连接失败处理]########
+# 变更记录: [2026-10-17] @李祥光 [存活检查的UiaAPI.Exists经后端调用线程池执行，超过alive期限按连接失效处理]########
+# 输入: 无 | 输出: 可复用的wxautox.WeChat实例和连接统计###############
+
+
+###########################文件下的所有函数###########################
+"""
+WeChatConnection：微信连接持有者，保持单个wxautox.WeChat实例存活，过期时才重连
+get_shared_connection：获取进程内共享的微信连接持有者
+wait_for_client_ready：启动微信后等待客户端就绪（进程出现且能连接wxautox.WeChat实例），记录冷启动耗时
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[调用方] --> B[get_shared_connection]
+    B --> C[WeChatConnection.get]
+    C --> D{已有实例?}
+    D -->|否| F[_connect创建新实例]
+    D -->|是| E{_is_alive廉价检查}
+    E -->|存活| G[直接复用实例]
+    E -->|失效| F
+    E --> E1[backend_call: alive期限内检查UiaAPI.Exists]
+    F --> F1[backend_call: connect期限内创建wxautox.WeChat]
+    F1 --> H[记录连接次数和耗时，计入connect阶段直方图]
+    A --> I[WeChatConnection.invalidate标记失效]
+    A --> J[WeChatConnection.stats连接统计]
+    K[启动微信后] --> L[wait_for_client_ready]
+    L --> M{进程已出现?}
+    M -->|否| N[按递增间隔等待]
+    M -->|是| O{WeChatConnection.get能连接?}
+    O -->|否| N
+    N --> M
+    O -->|是| P[记录cold_start耗时，返回就绪]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import logging
+import threading
+
+from config import MONITOR_CONFIG, WECHAT_CONFIG
+from wechat_metrics import get_latency_recorder
+from wechat_process import get_process_tracker
+from wechat_backend import backend_call
+
+try:
+    import wxautox
+except ImportError:
+    print("请先安装wxautox库: pip install wxautox")
+    exit(1)
+
+
+class WeChatConnection:
+    """
+    WeChatConnection 功能说明:
+    # 持有一个长期存活的wxautox.WeChat实例，避免每次检查都重新连接微信客户端
+    # 复用前先做廉价的存活检查（实例年龄、窗口是否仍存在），只有失效时才重新连接
+    # 同时统计连接/重连次数和耗时，便于评估复用带来的收益
+    # 输入: max_age (实例最长复用时间，秒，0表示不限制),
+    #       connect_kwargs (创建wxautox.WeChat时的关键字参数，如多开时的nickname) | 输出: 提供get/invalidate/stats方法
+
+    属性说明:
+    - max_age: 实例最长复用时间，超过后强制重连
+    - connect_kwargs: 创建实例时传给wxautox.WeChat的关键字参数
+    - connect_count: 成功建立连接的总次数（首次连接+重连）
+    - reconnect_count: 因实例失效而重新连接的次数
+    - reuse_count: 直接复用已有实例的次数
+    - failure_count: 连接失败次数
+    - connect_time_total: 所有连接操作累计耗时（秒）
+    """
+
+    def __init__(self, max_age=None, connect_kwargs=None):
+        """
+        初始化连接持有者
+        实例采用延迟连接，第一次调用get时才真正连接微信
+        """
+        if max_age is None:
+            max_age = MONITOR_CONFIG.get('connection_max_age', 0)
+        self.max_age = max_age
+        self.connect_kwargs = dict(connect_kwargs or {})
+        self._instance = None  # 当前持有的wxautox.WeChat实例
+        self._connected_at = 0.0  # 当前实例的建立时间（monotonic）
+        self._stale_reason = None  # 实例被标记失效的原因
+        self._lock = threading.RLock()  # 多线程共享时保护实例替换
+
+        # 连接统计
+        self.connect_count = 0
+        self.reconnect_count = 0
+        self.reuse_count = 0
+        self.failure_count = 0
+        self.connect_time_total = 0.0
+        self.last_connect_time = 0.0
+
+    def get(self):
+        """
+        get 功能说明:
+        # 获取可用的微信实例：存活则直接复用，否则重新连接
+        # 输入: 无 | 输出: wxautox.WeChat实例
+        # 异常处理: 连接失败时抛出wxautox的原始异常，由调用方按原有逻辑处理
+        """
+        with self._lock:
+            if self._instance is not None:
+                if self._is_alive():
+                    self.reuse_count += 1
+                    return self._instance
+                logging.debug(f"微信实例已失效({self._stale_reason})，重新连接")
+                self._instance = None
+                self.reconnect_count += 1
+            return self._connect()
+
+    def invalidate(self, reason="调用方标记失效"):
+        """
+        invalidate 功能说明:
+        # 标记当前实例失效，下次get时重新连接
+        # 一般在实例方法调用抛出异常或返回离线结果时调用
+        # 输入: reason (失效原因，用于调试日志) | 输出: 无
+        """
+        with self._lock:
+            if self._instance is not None:
+                self._stale_reason = reason
+
+    def close(self):
+        """
+        close 功能说明:
+        # 丢弃当前持有的实例（不计入重连次数），用于程序退出或切换账号
+        # 输入: 无 | 输出: 无
+        """
+        with self._lock:
+            self._instance = None
+            self._stale_reason = None
+
+    def stats(self):
+        """
+        stats 功能说明:
+        # 返回连接统计信息，用于日志输出和性能评估
+        # 输入: 无 | 输出: dict (连接次数、重连次数、复用次数、平均连接耗时等)
+        """
+        with self._lock:
+            avg_ms = (self.connect_time_total / self.connect_count * 1000) if self.connect_count else 0.0
+            return {
+                'connects': self.connect_count,
+                'reconnects': self.reconnect_count,
+                'reuses': self.reuse_count,
+                'failures': self.failure_count,
+                'connect_time_total_ms': round(self.connect_time_total * 1000, 2),
+                'connect_time_avg_ms': round(avg_ms, 2),
+                'last_connect_time_ms': round(self.last_connect_time * 1000, 2),
+                # 复用节省的时间按平均连接耗时估算
+                'saved_time_ms': round(avg_ms * self.reuse_count, 2),
+            }
+
+    def _connect(self):
+        """
+        _connect 功能说明:
+        # 创建新的wxautox.WeChat实例并记录耗时，在后端调用线程池中执行，超过connect期限抛出CallTimeout
+        # 输入: 无 | 输出: wxautox.WeChat实例
+        """
+        started = time.perf_counter()
+        try:
+            instance = backend_call('connect', wxautox.WeChat, **self.connect_kwargs)
+        except Exception:
+            self.failure_count += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.connect_time_total += elapsed
+            self.last_connect_time = elapsed
+            get_latency_recorder().observe('connect', elapsed)
+
+        self._instance = instance
+        self._connected_at = time.monotonic()
+        self._stale_reason = None
+        self.connect_count += 1
+        logging.debug(f"微信实例连接成功，耗时 {elapsed * 1000:.1f}ms")
+        return instance
+
+    def _is_alive(self):
+        """
+        _is_alive 功能说明:
+        # 廉价的存活检查，不做任何会遍历界面的操作
+        # 1. 是否已被调用方标记失效
+        # 2. 实例是否超过最长复用时间
+        # 3. 如果实例暴露了UiaAPI窗口控件，只检查窗口是否仍然存在（不等待）
+        #    检查在后端工作线程中执行，超过alive期限（CallTimeout）同样按需要重连处理
+        # 输入: 无 | 输出: bool (True=可复用, False=需要重连)
+        """
+        if self._stale_reason is not None:
+            return False
+
+        if self.max_age and time.monotonic() - self._connected_at > self.max_age:
+            self._stale_reason = "超过最长复用时间"
+            return False
+
+        window = getattr(self._instance, 'UiaAPI', None)
+        if window is not None and hasattr(window, 'Exists'):
+            try:
+                if not backend_call('alive', window.Exists, 0, 0):
+                    self._stale_reason = "微信主窗口已不存在"
+                    return False
+            except Exception as e:
+                self._stale_reason = f"窗口检查失败: {e}"
+                return False
+
+        return True
+
+
+# 进程内共享的连接持有者，延迟创建
+_shared_connection = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_connection():
+    """
+    get_shared_connection 功能说明:
+    # 获取进程内共享的WeChatConnection实例
+    # wechat_auto_login和wechat_utils共用同一个连接，避免各自重复连接微信
+    # 输入: 无 | 输出: WeChatConnection实例
+    """
+    global _shared_connection
+    with _shared_lock:
+        if _shared_connection is None:
+            _shared_connection = WeChatConnection()
+        return _shared_connection
+
+
+def wait_for_client_ready(connection=None, process_name=None, timeout=None, started_at=None, cancel_event=None):
+    """
+    wait_for_client_ready 功能说明:
+    # 启动微信客户端后等待其可用，替代固定时长的sleep：
+    # 1. 轮询进程是否已出现（PID跟踪器查找）
+    # 2. 进程出现后轮询能否连接wxautox.WeChat实例，连接成功的实例留在连接持有者中供后续检查复用
+    # 轮询间隔从startup_poll_interval开始按1.5倍递增，不超过startup_poll_max_interval，
+    # 客户端一旦可用立即返回；从启动到就绪的耗时计入cold_start阶段直方图
+    # 输入: connection (WeChatConnection，默认共享连接), process_name (进程名，默认WECHAT_CONFIG['process_name']),
+    #       timeout (最长等待秒数，默认MONITOR_CONFIG['startup_ready_timeout']),
+    #       started_at (启动进程的时间，time.monotonic()，默认为调用时刻), cancel_event (threading.Event，置位时放弃等待)
+    # 输出: dict {ready: 是否就绪, stage: 就绪或停止时所处阶段(process/attach/ready/cancelled), elapsed: 秒, polls: 轮询次数}
+    """
+    connection = connection or get_shared_connection()
+    process_name = process_name or WECHAT_CONFIG['process_name']
+    if timeout is None:
+        timeout = MONITOR_CONFIG.get('startup_ready_timeout', 60)
+    started_at = time.monotonic() if started_at is None else started_at
+    interval = MONITOR_CONFIG.get('startup_poll_interval', 0.25)
+    max_interval = MONITOR_CONFIG.get('startup_poll_max_interval', 2.0)
+    deadline = started_at + timeout
+    tracker = get_process_tracker()
+    stage = 'process'
+    polls = 0
+
+    while True:
+        polls += 1
+        if stage == 'process' and tracker.find_pids(process_name):
+            stage = 'attach'
+        if stage == 'attach':
+            try:
+                connection.invalidate("等待客户端就绪")
+                connection.get()
+                stage = 'ready'
+            except Exception as e:
+                logging.debug(f"微信进程已出现，暂时无法连接: {e}")
+
+        elapsed = time.monotonic() - started_at
+        if stage == 'ready':
+            get_latency_recorder().observe('cold_start', elapsed)
+            return {'ready': True, 'stage': stage, 'elapsed': elapsed, 'polls': polls}
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return {'ready': False, 'stage': stage, 'elapsed': elapsed, 'polls': polls}
+        delay = min(interval, remaining)
+        if cancel_event is not None:
+            if cancel_event.wait(delay):
+                return {'ready': False, 'stage': 'cancelled', 'elapsed': time.monotonic() - started_at, 'polls': polls}
+        else:
+            time.sleep(delay)
+        interval = min(interval * 1.5, max_interval)
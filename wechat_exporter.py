@@ -0,0 +1,274 @@
+##########wechat_exporter.py: [本地Prometheus指标端点] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建本地指标端点，以Prometheus文本格式导出检查计数、阶段耗时直方图和进程资源]########
+# 变更记录: [2026-10-16] @李祥光 [多账号监管模式下按account标签导出各账号计数器]########
+# 变更记录: [2026-10-16] @李祥光 [按operation标签导出wxautox调用/超时/异常次数和卡住的工作线程数]########
+# 变更记录: [2026-10-16] @李祥光 [按window标签导出5分钟/1小时/24小时滚动成功率]########
+# 输入: MonitorStats计数器、LatencyRecorder直方图、当前进程资源 | 输出: HTTP /metrics 文本###############
+
+
+###########################文件下的所有函数###########################
+"""
+_label_value：转义Prometheus标签值中的反斜杠、双引号和换行
+render_metrics：把计数器、阶段耗时直方图和进程资源格式化为Prometheus文本格式
+MetricsServer：本地HTTP指标端点，后台守护线程提供服务，不阻塞监控循环
+start_metrics_server：按METRICS_CONFIG启动进程共享的指标端点
+stop_metrics_server：停止进程共享的指标端点
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main] --> B[start_metrics_server]
+    B --> C[MetricsServer.start后台线程]
+    D[Prometheus抓取 GET /metrics] --> C
+    C --> E[render_metrics]
+    E --> F[MonitorStats.snapshot检查/登录计数]
+    E --> G[LatencyRecorder.snapshot阶段耗时直方图]
+    E --> G1[account_stats_snapshot各账号计数器]
+    E --> G2[backend_pool_stats后端调用计数和卡住线程数]
+    E --> H[psutil读取RSS/CPU时间]
+    I[handle_shutdown] --> J[stop_metrics_server]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import psutil
+
+from config import METRICS_CONFIG
+from wechat_metrics import get_latency_recorder, get_monitor_stats, account_stats_snapshot
+from wechat_backend import backend_pool_stats
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 进程共享的指标端点
+_server = None
+_server_lock = threading.Lock()
+
+
+def _format_value(value):
+    """按Prometheus文本格式输出数值，整数不带小数点，浮点数保留完整精度"""
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def _label_value(value):
+    """按Prometheus文本格式转义标签值，账号名称可能包含任意字符"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(recorder=None, stats=None, accounts=None, backend=None):
+    """
+    render_metrics 功能说明:
+    # 生成Prometheus文本格式的指标内容
+    # 计数器和直方图先在各自的锁内复制快照，格式化在锁外完成，不会拖慢正在记录的监控线程
+    # 多账号监管模式下，共享计数器是所有账号的汇总，各账号计数器另外按account标签导出
+    # 输入: recorder (LatencyRecorder，默认共享实例), stats (MonitorStats，默认共享实例),
+    #       accounts (dict {账号名: 计数器快照}，默认account_stats_snapshot()),
+    #       backend (后端调用线程池统计，默认backend_pool_stats()) | 输出: str
+    """
+    recorder = recorder or get_latency_recorder()
+    stats = stats or get_monitor_stats()
+    counters = stats.snapshot()
+    accounts = account_stats_snapshot() if accounts is None else accounts
+    backend = backend_pool_stats() if backend is None else backend
+    histograms = recorder.snapshot()
+
+    lines = []
+
+    def metric(name, metric_type, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in samples:
+            lines.append(f"{name}{labels} {_format_value(value)}")
+
+    metric('wechat_monitor_checks_total', 'counter', '状态检查总次数',
+           [('', counters['checks'])])
+    metric('wechat_monitor_checks_success_total', 'counter', '状态检查成功次数',
+           [('', counters['successes'])])
+    metric('wechat_monitor_consecutive_failures', 'gauge', '当前连续检查失败次数',
+           [('', counters['consecutive_failures'])])
+    metric('wechat_monitor_last_success_timestamp_seconds', 'gauge', '最近一次检查成功的Unix时间戳，从未成功时为0',
+           [('', float(counters['last_success_time'] or 0))])
+    metric('wechat_monitor_login_attempts_total', 'counter', '自动登录尝试次数',
+           [('', counters['login_attempts'])])
+    metric('wechat_monitor_login_outcomes_total', 'counter', '自动登录结果次数（success/failure/error）',
+           [(f'{{outcome="{outcome}"}}', count) for outcome, count in counters['login_outcomes'].items()])
+    metric('wechat_monitor_availability_ratio', 'gauge', '滚动窗口内的检查成功率（0~1），窗口内没有检查时不输出',
+           [(f'{{window="{label}"}}', rate) for label, rate in counters['availability'].items() if rate is not None])
+
+    # 各账号计数器，未启用多账号监管时不输出
+    if accounts:
+        labelled = [(f'{{account="{_label_value(name)}"}}', snap) for name, snap in sorted(accounts.items())]
+        metric('wechat_monitor_account_checks_total', 'counter', '各账号状态检查总次数',
+               [(labels, snap['checks']) for labels, snap in labelled])
+        metric('wechat_monitor_account_checks_success_total', 'counter', '各账号状态检查成功次数',
+               [(labels, snap['successes']) for labels, snap in labelled])
+        metric('wechat_monitor_account_consecutive_failures', 'gauge', '各账号当前连续检查失败次数',
+               [(labels, snap['consecutive_failures']) for labels, snap in labelled])
+        metric('wechat_monitor_account_last_success_timestamp_seconds', 'gauge',
+               '各账号最近一次检查成功的Unix时间戳，从未成功时为0',
+               [(labels, float(snap['last_success_time'] or 0)) for labels, snap in labelled])
+        metric('wechat_monitor_account_login_attempts_total', 'counter', '各账号自动登录尝试次数',
+               [(labels, snap['login_attempts']) for labels, snap in labelled])
+        metric('wechat_monitor_account_availability_ratio', 'gauge', '各账号滚动窗口内的检查成功率（0~1）',
+               [(f'{labels[:-1]},window="{label}"}}', rate) for labels, snap in labelled
+                for label, rate in snap.get('availability', {}).items() if rate is not None])
+
+    # wxautox调用计数，还没有发生过后端调用时不输出
+    if backend:
+        operations = sorted(backend['operations'].items())
+        metric('wechat_monitor_backend_calls_total', 'counter', '各操作wxautox调用次数',
+               [(f'{{operation="{op}"}}', data['calls']) for op, data in operations])
+        metric('wechat_monitor_backend_timeouts_total', 'counter', '各操作wxautox调用超过期限次数',
+               [(f'{{operation="{op}"}}', data['timeouts']) for op, data in operations])
+        metric('wechat_monitor_backend_errors_total', 'counter', '各操作wxautox调用抛出异常次数',
+               [(f'{{operation="{op}"}}', data['errors']) for op, data in operations])
+        metric('wechat_monitor_backend_hung_workers', 'gauge', '当前卡在wxautox调用中的工作线程数',
+               [('', backend['hung_workers'])])
+        metric('wechat_monitor_backend_workers_replaced_total', 'counter', '因调用超时被替换的工作线程数',
+               [('', backend['replaced'])])
+    
+    # 阶段耗时直方图：分桶计数转换为Prometheus要求的累计计数
+    lines.append("# HELP wechat_monitor_stage_latency_seconds 各探测和登录阶段耗时（秒）")
+    lines.append("# TYPE wechat_monitor_stage_latency_seconds histogram")
+    for stage, data in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(data['bounds'], data['counts']):
+            cumulative += count
+            lines.append(f'wechat_monitor_stage_latency_seconds_bucket{{stage="{stage}",le="{bound!r}"}} {cumulative}')
+        lines.append(f'wechat_monitor_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {data["count"]}')
+        lines.append(f'wechat_monitor_stage_latency_seconds_sum{{stage="{stage}"}} {data["total"]!r}')
+        lines.append(f'wechat_monitor_stage_latency_seconds_count{{stage="{stage}"}} {data["count"]}')
+
+    # 监控程序自身的资源占用
+    try:
+        process = psutil.Process(os.getpid())
+        with process.oneshot():
+            rss = process.memory_info().rss
+            cpu = process.cpu_times()
+            created = process.create_time()
+        metric('process_resident_memory_bytes', 'gauge', '监控进程常驻内存（字节）', [('', rss)])
+        metric('process_cpu_seconds_total', 'counter', '监控进程累计CPU时间（秒）', [('', float(cpu.user + cpu.system))])
+        metric('process_start_time_seconds', 'gauge', '监控进程启动的Unix时间戳', [('', float(created))])
+    except (psutil.Error, OSError) as e:
+        logging.debug(f"读取进程资源信息失败: {e}")
+
+    return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """只响应 GET /metrics，其余路径返回404"""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        try:
+            body = render_metrics().encode('utf-8')
+        except Exception as e:
+            logging.debug(f"生成指标内容失败: {e}")
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求很频繁，不写入监控日志
+        pass
+
+
+class MetricsServer:
+    """
+    MetricsServer 功能说明:
+    # 本地HTTP指标端点，ThreadingHTTPServer运行在守护线程中，每个抓取请求独立线程处理
+    # 监控循环只更新内存中的计数器，不与端点线程直接交互，抓取不会阻塞或拖慢检查
+    # 输入: host (监听地址，默认只监听本机), port (端口，0表示随机分配) | 输出: 无
+
+    属性说明:
+    - address: 实际监听的(host, port)，启动后可用
+    """
+
+    def __init__(self, host='127.0.0.1', port=9464):
+        self.host = host
+        self.port = port
+        self.address = None
+        self._httpd = None
+        self._thread = None
+
+    def start(self):
+        """
+        start 功能说明:
+        # 绑定端口并在后台线程中开始服务
+        # 输入: 无 | 输出: (host, port) 实际监听地址
+        # 异常处理: 端口被占用等绑定失败时抛出OSError，由调用方决定是否继续运行
+        """
+        httpd = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+        httpd.daemon_threads = True
+        self._httpd = httpd
+        self.address = httpd.server_address[:2]
+        self._thread = threading.Thread(target=httpd.serve_forever, kwargs={'poll_interval': 0.5},
+                                        name='MetricsServer', daemon=True)
+        self._thread.start()
+        return self.address
+
+    def stop(self):
+        """
+        stop 功能说明:
+        # 停止服务并释放端口
+        # 输入: 无 | 输出: 无
+        """
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join(timeout=2)
+        self._httpd = None
+        self._thread = None
+
+
+def start_metrics_server(host=None, port=None):
+    """
+    start_metrics_server 功能说明:
+    # 启动进程共享的指标端点，参数默认取自METRICS_CONFIG，已启动时直接返回
+    # 输入: host (监听地址), port (端口) | 输出: MetricsServer实例，启动失败时返回None
+    """
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        server = MetricsServer(host or METRICS_CONFIG.get('host', '127.0.0.1'),
+                               METRICS_CONFIG.get('port', 9464) if port is None else port)
+        try:
+            host, port = server.start()
+        except OSError as e:
+            logging.warning(f"⚠️ 指标端点启动失败: {e}，继续运行但不提供指标")
+            return None
+        logging.info(f"📈 指标端点已启动: http://{host}:{port}/metrics")
+        _server = server
+        return server
+
+
+def stop_metrics_server():
+    """
+    stop_metrics_server 功能说明:
+    # 停止进程共享的指标端点，未启动时不做任何操作
+    # 输入: 无 | 输出: 无
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            return
+        _server.stop()
+        _server = None
@@ -0,0 +1,502 @@
+##########wechat_history.py: [检查历史存储] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建SQLite WAL检查历史存储：检查结果、阶段耗时、登录和通知由后台线程批量写入，按时间保留，提供可用率和登录记录查询]########
+# 输入: 检查结果、阶段耗时、登录结果、通知 | 输出: SQLite历史数据库、可用率和登录记录查询结果###############
+
+
+###########################文件下的所有函数###########################
+"""
+HistoryStore：检查历史存储，记录只入队不等待，后台写入线程按批次在一个事务中写入SQLite（WAL模式），并定期清理过期记录
+start_history_store：按HISTORY_CONFIG启动进程共享的历史存储，并订阅阶段耗时
+stop_history_store：写入剩余记录后停止进程共享的历史存储
+get_history_store：获取进程共享的历史存储，未启动时返回None
+history_store_stats：返回进程共享历史存储的写入统计，未启动时返回None
+record_history_check：记录一次检查结果（未启动历史存储时不做任何操作）
+record_history_login：记录一次自动登录结果（未启动历史存储时不做任何操作）
+record_history_notification：记录一次通知发送结果（未启动历史存储时不做任何操作）
+main：命令行查询：指定时间段的可用率、今天的登录记录
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main --history-db / HISTORY_CONFIG] --> B[start_history_store]
+    B --> C[HistoryStore.start: 建表建索引，开启WAL，启动写入线程]
+    B --> D[LatencyRecorder.add_listener订阅阶段耗时]
+    E[check_wechat_status / WeChatMonitor.check_status / AccountMonitor.check] --> F[record_history_check]
+    G[auto_login_wechat / WeChatMonitor.auto_login / AccountMonitor.end_login] --> H[record_history_login]
+    I[NotificationManager._deliver] --> J[record_history_notification]
+    D --> K[HistoryStore.record_stage]
+    F --> L[有界队列，满时丢弃并计数，不阻塞调用方]
+    H --> L
+    J --> L
+    K --> L
+    L --> M[写入线程: 凑满batch_size或等待flush_interval后，一个事务executemany写入]
+    M --> N[到达purge_interval时删除超过retention_days的记录]
+    O[HistoryStore.availability / login_attempts] --> P[只读连接按ts索引查询，WAL下不阻塞写入]
+    Q[handle_shutdown] --> R[stop_history_store写入剩余记录]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import sys
+import time
+import queue
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+
+from config import HISTORY_CONFIG
+from wechat_metrics import get_latency_recorder
+
+# 单账号模式下记录的账号名，与default_account()一致
+DEFAULT_ACCOUNT = 'wechat'
+
+# 表结构：时间戳均为time.time()秒数，耗时单位为毫秒
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS checks ("
+    "ts REAL NOT NULL, account TEXT NOT NULL, ok INTEGER NOT NULL, "
+    "failed_stage TEXT, reason TEXT, duration_ms REAL)",
+    "CREATE TABLE IF NOT EXISTS stages (ts REAL NOT NULL, stage TEXT NOT NULL, duration_ms REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS logins ("
+    "ts REAL NOT NULL, account TEXT NOT NULL, outcome TEXT NOT NULL, duration_ms REAL)",
+    "CREATE TABLE IF NOT EXISTS notifications ("
+    "ts REAL NOT NULL, title TEXT NOT NULL, message TEXT, delivered INTEGER NOT NULL)",
+    # 可用率查询按时间段（可选账号）统计，登录记录按时间段查询，清理按时间删除
+    "CREATE INDEX IF NOT EXISTS idx_checks_ts ON checks (ts, ok)",
+    "CREATE INDEX IF NOT EXISTS idx_checks_account_ts ON checks (account, ts, ok)",
+    "CREATE INDEX IF NOT EXISTS idx_stages_ts ON stages (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_logins_ts ON logins (ts)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_ts ON notifications (ts)",
+)
+
+# 各表的插入语句，写入线程按表分组executemany
+INSERTS = {
+    'checks': "INSERT INTO checks (ts, account, ok, failed_stage, reason, duration_ms) VALUES (?, ?, ?, ?, ?, ?)",
+    'stages': "INSERT INTO stages (ts, stage, duration_ms) VALUES (?, ?, ?)",
+    'logins': "INSERT INTO logins (ts, account, outcome, duration_ms) VALUES (?, ?, ?, ?)",
+    'notifications': "INSERT INTO notifications (ts, title, message, delivered) VALUES (?, ?, ?, ?)",
+}
+
+# 进程共享的历史存储
+_store = None
+_store_lock = threading.Lock()
+
+
+def _timestamp(value):
+    """把datetime、ISO格式字符串或秒数统一为time.time()秒数"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class HistoryStore:
+    """
+    HistoryStore 功能说明:
+    # 本地SQLite检查历史存储：
+    # 1. record_*只把记录放入有界队列立即返回，监控线程从不等待磁盘；队列满时丢弃新记录并计数
+    # 2. 后台写入线程凑满batch_size条或距第一条记录超过flush_interval秒后，在一个事务中按表executemany写入
+    # 3. 数据库使用WAL模式（synchronous=NORMAL），查询使用独立的只读连接，不阻塞写入
+    # 4. 写入线程每purge_interval秒删除超过retention_days天的记录
+    # 输入: path (数据库文件路径), batch_size, flush_interval (秒), queue_size, retention_days (天，0表示不清理),
+    #       purge_interval (秒) | 输出: availability/login_attempts查询结果
+
+    属性说明:
+    - written / dropped: 已写入和因队列满丢弃的记录数
+    - batches / last_batch_ms: 已提交的批次数和最近一批的写入耗时
+    - purged: 按保留时间删除的记录数
+    """
+
+    _STOP = object()  # 停止标记
+
+    def __init__(self, path, batch_size=500, flush_interval=1.0, queue_size=10000,
+                 retention_days=30, purge_interval=3600):
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.retention_days = float(retention_days or 0)
+        self.purge_interval = max(1.0, float(purge_interval))
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch_ms = 0.0
+        self.purged = 0
+
+    def start(self):
+        """
+        start 功能说明:
+        # 创建数据库目录、表和索引，开启WAL模式，启动后台写入线程
+        # 输入: 无 | 输出: 无
+        # 异常处理: 数据库无法创建时抛出sqlite3.Error/OSError，由调用方决定是否继续运行
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+        finally:
+            connection.close()
+        self._thread = threading.Thread(target=self._run, name='HistoryWriter', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        stop 功能说明:
+        # 写入队列中剩余的记录后停止写入线程
+        # 输入: timeout (最长等待秒数) | 输出: 无
+        """
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logging.warning(f"⚠️ 历史记录写入线程 {timeout}秒 内未结束，剩余记录可能未写入")
+        self._thread = None
+
+    def flush(self, timeout=5.0):
+        """
+        flush 功能说明:
+        # 等待此前入队的记录全部写入（用于查询前和测试）
+        # 输入: timeout (最长等待秒数) | 输出: bool 是否在期限内写入完成
+        """
+        if self._thread is None:
+            return False
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def record_check(self, ok, account=None, failed_stage=None, reason=None, duration=None, ts=None):
+        """
+        record_check 功能说明:
+        # 记录一次检查结果
+        # 输入: ok (检查是否通过), account (账号名，默认DEFAULT_ACCOUNT), failed_stage / reason (失败阶段和原因),
+        #       duration (检查耗时秒数), ts (时间戳，默认当前时间) | 输出: 无
+        """
+        self._put('checks', (time.time() if ts is None else ts, account or DEFAULT_ACCOUNT, 1 if ok else 0,
+                             failed_stage, reason, None if duration is None else duration * 1000))
+
+    def record_stage(self, stage, seconds, ts=None):
+        """
+        record_stage 功能说明:
+        # 记录一次阶段耗时，作为LatencyRecorder的监听函数
+        # 输入: stage (阶段名称), seconds (耗时秒数), ts (时间戳，默认当前时间) | 输出: 无
+        """
+        self._put('stages', (time.time() if ts is None else ts, stage, seconds * 1000))
+
+    def record_login(self, outcome, duration=None, account=None, ts=None):
+        """
+        record_login 功能说明:
+        # 记录一次自动登录结果
+        # 输入: outcome ('success'/'failure'/'error'), duration (整次登录耗时秒数), account, ts | 输出: 无
+        """
+        self._put('logins', (time.time() if ts is None else ts, account or DEFAULT_ACCOUNT, outcome,
+                             None if duration is None else duration * 1000))
+
+    def record_notification(self, title, message, delivered, ts=None):
+        """
+        record_notification 功能说明:
+        # 记录一次通知发送结果
+        # 输入: title, message, delivered (是否发送成功), ts | 输出: 无
+        """
+        self._put('notifications', (time.time() if ts is None else ts, title, message, 1 if delivered else 0))
+
+    def availability(self, start, end, account=None):
+        """
+        availability 功能说明:
+        # 统计时间段[start, end)内的检查次数、成功次数和可用率（成功次数/检查次数）
+        # 输入: start / end (datetime、ISO字符串或time.time()秒数), account (可选账号名，默认所有账号)
+        # 输出: dict {start, end, account, checks, successes, availability}，没有检查时availability为None
+        """
+        start, end = _timestamp(start), _timestamp(end)
+        sql = "SELECT COUNT(*), COALESCE(SUM(ok), 0) FROM checks WHERE ts >= ? AND ts < ?"
+        params = [start, end]
+        if account is not None:
+            sql = "SELECT COUNT(*), COALESCE(SUM(ok), 0) FROM checks WHERE account = ? AND ts >= ? AND ts < ?"
+            params.insert(0, account)
+        checks, successes = self._query(sql, params)[0]
+        return {
+            'start': start, 'end': end, 'account': account,
+            'checks': checks, 'successes': successes,
+            'availability': successes / checks if checks else None,
+        }
+
+    def login_attempts(self, start=None, end=None, account=None):
+        """
+        login_attempts 功能说明:
+        # 查询时间段[start, end)内的自动登录记录，按时间排序；未指定时为今天0点到现在
+        # 输入: start / end (datetime、ISO字符串或秒数), account (可选账号名)
+        # 输出: list[dict {ts, account, outcome, duration_ms}]
+        """
+        if start is None:
+            start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start, end = _timestamp(start), time.time() if end is None else _timestamp(end)
+        sql = "SELECT ts, account, outcome, duration_ms FROM logins WHERE ts >= ? AND ts < ?"
+        params = [start, end]
+        if account is not None:
+            sql += " AND account = ?"
+            params.append(account)
+        rows = self._query(sql + " ORDER BY ts", params)
+        return [{'ts': ts, 'account': name, 'outcome': outcome, 'duration_ms': duration}
+                for ts, name, outcome, duration in rows]
+
+    def purge(self, now=None):
+        """
+        purge 功能说明:
+        # 删除超过retention_days天的记录（写入线程定期调用，也可直接调用）
+        # 输入: now (可选的当前时间戳) | 输出: int 删除的记录数
+        """
+        if self.retention_days <= 0:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        connection = self._connect()
+        try:
+            with connection:
+                removed = sum(connection.execute(f"DELETE FROM {table} WHERE ts < ?", (cutoff,)).rowcount
+                              for table in INSERTS)
+        finally:
+            connection.close()
+        with self._lock:
+            self.purged += removed
+        if removed:
+            logging.info(f"🗄️ 已清理 {removed} 条超过 {self.retention_days:g} 天的历史记录")
+        return removed
+
+    def stats(self):
+        """
+        stats 功能说明:
+        # 返回写入统计
+        # 输入: 无 | 输出: dict
+        """
+        with self._lock:
+            return {
+                'path': self.path,
+                'queue_depth': self._queue.qsize(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'batches': self.batches,
+                'errors': self.errors,
+                'last_batch_ms': round(self.last_batch_ms, 2),
+                'purged': self.purged,
+            }
+
+    def _put(self, table, row):
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5.0)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _query(self, sql, params):
+        connection = self._connect()
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def _run(self):
+        """写入线程主循环：按批次写入，到期清理，收到停止标记时写入剩余记录后退出"""
+        connection = self._connect()
+        next_purge = time.monotonic()
+        try:
+            while True:
+                batch, waiters, stop = self._collect()
+                if batch:
+                    self._write(connection, batch)
+                for waiter in waiters:
+                    waiter.set()
+                if stop:
+                    break
+                if time.monotonic() >= next_purge:
+                    next_purge = time.monotonic() + self.purge_interval
+                    try:
+                        self.purge()
+                    except sqlite3.Error as e:
+                        logging.warning(f"⚠️ 清理历史记录失败: {e}")
+        finally:
+            connection.close()
+
+    def _collect(self):
+        """从队列取一批记录：凑满batch_size、距第一条记录超过flush_interval、遇到flush或停止标记时返回"""
+        batch, waiters = [], []
+        try:
+            item = self._queue.get(timeout=self.purge_interval)
+        except queue.Empty:
+            return batch, waiters, False
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is self._STOP:
+                return batch, waiters, True
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                return batch, waiters, False
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, waiters, False
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return batch, waiters, False
+
+    def _write(self, connection, batch):
+        """在一个事务中按表写入一批记录，写入失败时丢弃该批并计数，不影响后续批次"""
+        started = time.perf_counter()
+        rows = {}
+        for table, row in batch:
+            rows.setdefault(table, []).append(row)
+        try:
+            with connection:
+                for table, table_rows in rows.items():
+                    connection.executemany(INSERTS[table], table_rows)
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            logging.warning(f"⚠️ 写入历史记录失败，丢弃 {len(batch)} 条: {e}")
+            return
+        with self._lock:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+
+def start_history_store(path=None):
+    """
+    start_history_store 功能说明:
+    # 按HISTORY_CONFIG启动进程共享的历史存储并订阅阶段耗时，已启动时直接返回
+    # 输入: path (可选的数据库路径，默认HISTORY_CONFIG['path']) | 输出: HistoryStore实例，启动失败时返回None
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            return _store
+        store = HistoryStore(path or HISTORY_CONFIG.get('path', 'logs/history.db'),
+                             batch_size=HISTORY_CONFIG.get('batch_size', 500),
+                             flush_interval=HISTORY_CONFIG.get('flush_interval', 1.0),
+                             queue_size=HISTORY_CONFIG.get('queue_size', 10000),
+                             retention_days=HISTORY_CONFIG.get('retention_days', 30),
+                             purge_interval=HISTORY_CONFIG.get('purge_interval', 3600))
+        try:
+            store.start()
+        except (sqlite3.Error, OSError) as e:
+            logging.warning(f"⚠️ 历史记录存储启动失败: {e}，继续运行但不记录历史")
+            return None
+        get_latency_recorder().add_listener(store.record_stage)
+        logging.info(f"🗄️ 历史记录存储已启动: {store.path}")
+        _store = store
+        return store
+
+
+def stop_history_store(timeout=5.0):
+    """
+    stop_history_store 功能说明:
+    # 取消阶段耗时订阅，写入剩余记录后停止进程共享的历史存储，未启动时不做任何操作
+    # 输入: timeout (最长等待秒数) | 输出: dict 写入统计，未启动时返回None
+    """
+    global _store
+    with _store_lock:
+        store, _store = _store, None
+    if store is None:
+        return None
+    get_latency_recorder().remove_listener(store.record_stage)
+    store.stop(timeout)
+    return store.stats()
+
+
+def get_history_store():
+    """获取进程共享的历史存储，未启动时返回None"""
+    return _store
+
+
+def history_store_stats():
+    """返回进程共享历史存储的写入统计，未启动时返回None"""
+    store = _store
+    return store.stats() if store is not None else None
+
+
+def record_history_check(ok, result=None, account=None):
+    """
+    record_history_check 功能说明:
+    # 记录一次检查结果，未启动历史存储时不做任何操作
+    # 输入: ok (检查是否通过), result (可选的ProbeResult，提供失败阶段、原因和耗时), account (账号名) | 输出: 无
+    """
+    store = _store
+    if store is None:
+        return
+    if result is None:
+        store.record_check(ok, account)
+    else:
+        store.record_check(ok, account, result.failed_stage, result.reason, result.total_time)
+
+
+def record_history_login(outcome, duration=None, account=None):
+    """
+    record_history_login 功能说明:
+    # 记录一次自动登录结果，未启动历史存储时不做任何操作
+    # 输入: outcome ('success'/'failure'/'error'), duration (整次登录耗时秒数), account (账号名) | 输出: 无
+    """
+    store = _store
+    if store is not None:
+        store.record_login(outcome, duration, account)
+
+
+def record_history_notification(title, message, delivered):
+    """
+    record_history_notification 功能说明:
+    # 记录一次通知发送结果，未启动历史存储时不做任何操作
+    # 输入: title, message, delivered (是否发送成功) | 输出: 无
+    """
+    store = _store
+    if store is not None:
+        store.record_notification(title, message, delivered)
+
+
+def main():
+    """
+    main 功能说明:
+    # 命令行查询历史数据库：指定时间段的可用率，或今天的自动登录记录
+    # 输入: 命令行参数 | 输出: 查询结果打印到控制台
+    """
+    parser = argparse.ArgumentParser(description="查询微信监控检查历史")
+    parser.add_argument('--db', default=HISTORY_CONFIG.get('path', 'logs/history.db'),
+                        help='历史数据库路径 (默认: HISTORY_CONFIG[\'path\'])')
+    parser.add_argument('--account', help='只统计指定账号')
+    parser.add_argument('--availability', nargs=2, metavar=('START', 'END'),
+                        help='统计时间段内的可用率，时间为ISO格式，如 2026-10-16T00:00 2026-10-17T00:00')
+    parser.add_argument('--logins-today', action='store_true', help='列出今天的自动登录记录')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ 历史数据库不存在: {args.db}")
+        sys.exit(1)
+    store = HistoryStore(args.db)
+    if args.availability:
+        result = store.availability(*args.availability, account=args.account)
+        rate = f"{result['availability'] * 100:.2f}%" if result['availability'] is not None else '无检查记录'
+        print(f"可用率: {rate} (成功 {result['successes']}/{result['checks']} 次检查)")
+    if args.logins_today or not args.availability:
+        attempts = store.login_attempts(account=args.account)
+        print(f"今天的自动登录: {len(attempts)} 次")
+        for attempt in attempts:
+            duration = f"{attempt['duration_ms'] / 1000:.1f}秒" if attempt['duration_ms'] is not None else '-'
+            print(f"  {datetime.fromtimestamp(attempt['ts']):%H:%M:%S} {attempt['account']} "
+                  f"{attempt['outcome']} {duration}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,665 @@
+##########wechat_log_analyzer.py: [监控日志分析] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建流式日志分析工具：从现有日志重建在线/离线/登录区间，统计可用率、MTTR、最长故障和登录成功率]########
+# 变更记录: [2026-10-16] @李祥光 [识别后台压缩的日志文件，跳过压缩中的临时文件]########
+# 变更记录: [2026-10-17] @李祥光 [压缩文件按COMPRESSED_LOG_OPENERS（以COMPRESSED_LOG_SUFFIXES为键）选择解压方式]########
+# 输入: logs目录或日志文件（含轮转文件和.gz/.bz2/.xz/.zst压缩文件） | 输出: 各账号的可用率、故障和登录统计###############
+
+
+###########################文件下的所有函数###########################
+"""
+discover_log_files：展开目录和通配符，找出所有监控日志文件（按日期命名、轮转和压缩的文件）
+iter_lines：逐行读取日志文件，未压缩文件使用mmap，压缩文件流式解压，内存占用与文件大小无关
+parse_records：把日志行解析为(时间戳, 级别, 消息)，跳过续行（异常堆栈等）
+first_timestamp：读取日志文件第一条记录的时间戳，用于按时间排序和合并
+merge_records：按时间戳合并多个日志文件的记录，只同时打开时间范围重叠的文件
+extract_events：从日志记录中识别状态变化、登录和程序启停事件
+AccountTimeline：单个账号的状态区间累加器（在线/离线/登录时长、故障次数和时长、登录结果）
+LogAnalyzer：把事件流分发到各账号的AccountTimeline，生成统计报告
+analyze_logs：分析一组日志文件，返回LogAnalyzer
+format_report：把统计报告格式化为文本
+main：命令行入口
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main] --> B[discover_log_files: logs/wechat_monitor_YYYYMMDD.log, logs/wechat_monitor.log*]
+    B --> C[analyze_logs]
+    C --> D[merge_records: 按第一条记录时间排序，堆合并时间重叠的文件]
+    D --> E[iter_lines: mmap未压缩文件 / 按COMPRESSED_LOG_OPENERS流式解压.gz .bz2 .xz .lzma .zst]
+    E --> F[parse_records解析时间戳、级别和消息]
+    F --> D
+    D --> G[extract_events]
+    G -->|"[账号] 状态变化: A -> B"| H[精确状态事件]
+    G -->|旧日志的状态和登录消息| I[按消息识别的事件]
+    G -->|程序启动/关闭| J[启停事件: 中断期间不计入统计]
+    H --> K[LogAnalyzer.feed]
+    I --> K
+    J --> K
+    K --> L[AccountTimeline累加在线/离线/登录时长、故障和登录结果]
+    L --> M[LogAnalyzer.report可用率、MTTR、最长故障、登录成功率]
+    M --> N[format_report / --json输出]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import re
+import bz2
+import sys
+import glob
+import gzip
+import json
+import lzma
+import mmap
+import heapq
+import logging
+import argparse
+from datetime import datetime
+
+from wechat_state import STATE_NAMES, ONLINE, DEGRADED, OFFLINE, LOGGING_IN, BACKOFF
+from wechat_logging import COMPRESSED_LOG_SUFFIXES
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # 未安装时跳过.zst文件
+
+# 日志行格式: %(asctime)s - [%(name)s - ]%(levelname)s - %(message)s，asctime可带毫秒
+LINE_PATTERN = re.compile(
+    rb'(\d{4}-\d\d-\d\d \d\d:\d\d):(\d\d)(?:[,.](\d{1,6}))? - (?:\S+ - )?(DEBUG|INFO|WARNING|ERROR|CRITICAL) - ')
+
+# 消息中的账号名（多账号监管的日志带 [账号] 前缀）
+ACCOUNT_PATTERN = re.compile(r'^[^\[\w]*\[([^\]]+)\]'.encode())
+
+# 不是事件的日志：通知内容、重复汇总中引用的原消息
+SKIP_PATTERN = re.compile(r'桌面通知|—— 已重复|通知发送失败'.encode())
+
+# 日志事件，合并为一个表达式每行只搜索一次
+# state: 状态机的状态变化日志 "[账号] 状态变化: 旧状态 -> 新状态"，其余为按消息识别的事件（旧日志中没有状态变化行时使用）
+EVENT_PATTERNS = (
+    ('state', r'\[(?P<account>[^\]]+)\] 状态变化: (?P<old>\S+) -> (?P<new>\S+)'),
+    ('start', r'监控循环启动|微信自动登录监控程序启动|启动微信状态监控服务|多账号监管已启动|asyncio监控引擎已启动'),
+    ('stop', r'监控循环结束统计|微信监控服务已安全停止|asyncio监控引擎已停止|程序正常关闭|接收到关闭信号'),
+    ('login_success', r'微信登录成功|自动登录成功'),
+    ('login_failure', r'登录等待超时|无法打开微信登录窗口|自动登录微信时发生错误|自动登录过程中发生错误|自动登录失败'),
+    ('login_start', r'开始自动登录微信流程|次自动登录尝试|尝试自动登录恢复'),
+    ('online', r'微信状态正常|微信状态已恢复正常'),
+    ('offline', r'微信未登录或连接失败|微信已启动但用户未登录|微信状态异常|检查微信状态时发生错误|微信检查失败|'
+                r'微信进程 .* 未运行|检测到微信离线'),
+)
+
+EVENT_PATTERN = re.compile(b'|'.join(f'(?P<{kind}>{pattern})'.encode() for kind, pattern in EVENT_PATTERNS))
+
+# 出现状态变化行后只需识别状态变化和程序启停（各监控引擎都通过状态机输出状态变化行）
+PRECISE_EVENT_PATTERN = re.compile(b'|'.join(f'(?P<{kind}>{pattern})'.encode() for kind, pattern in EVENT_PATTERNS
+                                             if kind in ('state', 'start', 'stop')))
+
+# 状态机状态的日志描述 -> 区间类别：online=可用（在线或功能异常），offline=不可用，login=自动登录中（计入故障）
+STATE_CATEGORIES = {
+    STATE_NAMES[ONLINE]: 'online',
+    STATE_NAMES[DEGRADED]: 'online',
+    STATE_NAMES[OFFLINE]: 'offline',
+    STATE_NAMES[BACKOFF]: 'offline',
+    STATE_NAMES[LOGGING_IN]: 'login',
+}
+
+# 单账号模式的账号名，与MonitorStateMachine默认名称一致
+DEFAULT_ACCOUNT = 'wechat'
+
+# 未压缩日志每次映射的窗口大小（字节），必须是mmap.ALLOCATIONGRANULARITY的整数倍
+MMAP_WINDOW = 16 * 1024 * 1024
+
+# 压缩日志扩展名 -> 打开函数，键与wechat_logging.COMPRESSED_LOG_SUFFIXES一致；没有对应解压模块时为None（跳过该文件）
+_DECOMPRESSORS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+    '.zst': zstandard.open if zstandard is not None else None,
+}
+COMPRESSED_LOG_OPENERS = {suffix: _DECOMPRESSORS.get(suffix) for suffix in COMPRESSED_LOG_SUFFIXES}
+
+
+def discover_log_files(paths):
+    """
+    discover_log_files 功能说明:
+    # 展开目录和通配符：目录下取所有以wechat_monitor开头、名称中含.log的文件
+    # （wechat_monitor_YYYYMMDD.log、wechat_monitor.log、轮转的.log.1~.log.N及后台压缩后的.gz/.zst文件），跳过压缩中的临时文件
+    # 输入: paths (目录、文件或通配符列表) | 输出: list 去重后的文件路径
+    """
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            with os.scandir(path) as entries:
+                found.extend(entry.path for entry in entries
+                             if entry.is_file() and entry.name.startswith('wechat_monitor') and '.log' in entry.name
+                             and not entry.name.endswith('.tmp'))
+        elif any(char in path for char in '*?['):
+            found.extend(glob.glob(path))
+        elif os.path.isfile(path):
+            found.append(path)
+        else:
+            logging.warning(f"⚠️ 日志文件不存在: {path}")
+    return sorted(set(found))
+
+
+def iter_lines(path):
+    """
+    iter_lines 功能说明:
+    # 逐行读取日志文件（bytes）：未压缩文件按MMAP_WINDOW大小分段mmap后按行读取，
+    # 压缩文件按扩展名从COMPRESSED_LOG_OPENERS选择打开函数流式解压，内存占用与文件大小无关
+    # .zst文件需要安装zstandard，没有对应解压模块时跳过并警告
+    # 输入: path (日志文件路径) | 输出: 生成器，每次一行
+    """
+    suffix = os.path.splitext(path)[1]
+    if suffix in COMPRESSED_LOG_OPENERS:
+        opener = COMPRESSED_LOG_OPENERS[suffix]
+        if opener is None:
+            logging.warning(f"⚠️ 缺少{suffix}解压模块（.zst需要安装zstandard），跳过: {path}")
+            return
+        with opener(path, 'rb') as f:
+            yield from f
+    else:
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            offset = 0
+            carry = b''  # 跨窗口的半行
+            while offset < size:
+                length = min(MMAP_WINDOW, size - offset)
+                with mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=offset) as mapped:
+                    if hasattr(mapped, 'madvise'):
+                        mapped.madvise(mmap.MADV_SEQUENTIAL)
+                    for line in iter(mapped.readline, b''):
+                        if carry:
+                            line, carry = carry + line, b''
+                        if not line.endswith(b'\n') and offset + length < size:
+                            carry = line  # 窗口末尾的不完整行，与下一窗口开头拼接
+                            break
+                        yield line
+                offset += length
+
+
+def parse_records(lines):
+    """
+    parse_records 功能说明:
+    # 把日志行解析为(时间戳, 级别, 消息bytes)，时间戳按本地时间换算为秒数，同一分钟只换算一次，消息可能带行尾换行符
+    # 不符合日志格式的行（异常堆栈、多行消息的续行）跳过
+    # 输入: lines (bytes行的可迭代对象) | 输出: 生成器 (timestamp, level, message)
+    """
+    minute_key = None
+    minute_base = 0.0
+    match = LINE_PATTERN.match
+    for line in lines:
+        found = match(line)
+        if found is None:
+            continue
+        minute, second, fraction, level = found.groups()
+        if minute != minute_key:
+            minute_key = minute
+            minute_base = datetime.strptime(minute.decode(), '%Y-%m-%d %H:%M').timestamp()
+        ts = minute_base + int(second)
+        if fraction:
+            ts += int(fraction) / 10 ** len(fraction)
+        yield ts, level.decode(), line[found.end():]
+
+
+def first_timestamp(path):
+    """
+    first_timestamp 功能说明:
+    # 读取日志文件第一条记录的时间戳（只读取到第一条记录为止）
+    # 输入: path (日志文件路径) | 输出: float，没有记录或无法读取时为None
+    """
+    try:
+        for ts, level, message in parse_records(iter_lines(path)):
+            return ts
+    except (OSError, EOFError, ValueError, lzma.LZMAError) as e:
+        logging.warning(f"⚠️ 无法读取日志文件 {path}: {e}")
+    return None
+
+
+def merge_records(paths, stats=None):
+    """
+    merge_records 功能说明:
+    # 按时间戳合并多个日志文件的记录：文件按第一条记录的时间排序，堆中只放时间范围已开始的文件，
+    # 按天命名和轮转的文件基本不重叠，同一时刻通常只打开一两个文件；只有一个文件时直接读取，不经过堆
+    # 输入: paths (日志文件路径列表), stats (可选dict，累计files/records计数) | 输出: 生成器 (timestamp, level, message)
+    """
+    stats = {} if stats is None else stats
+    stats.setdefault('files', 0)
+    stats.setdefault('records', 0)
+    pending = []
+    for path in paths:
+        first = first_timestamp(path)
+        if first is not None:
+            pending.append((first, path))
+    pending.sort(reverse=True)  # 从末尾取出最早的文件
+
+    heap = []
+
+    def push(index, stream):
+        for record in stream:
+            heapq.heappush(heap, (record[0], index, record, stream))
+            return
+
+    opened = 0
+    while pending or heap:
+        while pending and (not heap or pending[-1][0] <= heap[0][0]):
+            first, path = pending.pop()
+            stats['files'] += 1
+            push(opened, parse_records(iter_lines(path)))
+            opened += 1
+        ts, index, record, stream = heapq.heappop(heap)
+        stats['records'] += 1
+        yield record
+        if heap:
+            push(index, stream)
+            continue
+        # 没有重叠的文件：直接读取到下一个文件开始为止
+        next_start = pending[-1][0] if pending else None
+        for record in stream:
+            if next_start is not None and record[0] >= next_start:
+                heapq.heappush(heap, (record[0], index, record, stream))
+                break
+            stats['records'] += 1
+            yield record
+
+
+def extract_events(records):
+    """
+    extract_events 功能说明:
+    # 从日志记录中识别事件：
+    # 1. 状态机的状态变化行（"[账号] 状态变化: 旧 -> 新"）：('state', 账号, (旧状态描述, 新状态描述))
+    # 2. 旧日志中的状态和登录消息：('online'/'offline'/'login_start'/'login_success'/'login_failure', 账号, None)
+    # 3. 程序启动和关闭：('start'/'stop', None, 上一条记录的时间戳)
+    # 日志按时间顺序处理，出现第一条状态变化行后只搜索状态变化和启停，不再按消息识别
+    # 输入: records (merge_records生成的记录) | 输出: 生成器 (timestamp, kind, account, detail)
+    """
+    previous_ts = None
+    search = EVENT_PATTERN.search
+    for ts, level, message in records:
+        last_ts, previous_ts = previous_ts, ts
+        found = search(message)
+        if found is None or SKIP_PATTERN.search(message):
+            continue
+        kind = found.lastgroup
+        if kind == 'state':
+            search = PRECISE_EVENT_PATTERN.search
+            account, old, new = (part.decode('utf-8', 'replace') for part in found.group('account', 'old', 'new'))
+            yield ts, 'state', account, (old, new)
+            continue
+        if kind in ('start', 'stop'):
+            yield ts, kind, None, last_ts if last_ts is not None else ts
+            continue
+        account = ACCOUNT_PATTERN.match(message)
+        yield ts, kind, account.group(1).decode('utf-8', 'replace') if account else DEFAULT_ACCOUNT, None
+
+
+class AccountTimeline:
+    """
+    AccountTimeline 功能说明:
+    # 单个账号的状态区间累加器，只保存当前区间和累计值，内存占用与日志长度无关
+    # 1. 在线（含功能异常）、离线、自动登录中三类区间的累计时长，只统计[since, until]范围内的部分
+    # 2. 故障：从离开在线开始，到回到在线结束；回到在线时计入MTTR，程序中断时记为未恢复的故障
+    # 3. 自动登录：开始后第一个结果生效，重复的开始和结果日志不重复计数
+    # 4. 出现过状态变化行后只使用状态变化行，不再按消息识别，避免同一次变化被计两次
+    # 输入: name (账号名), since / until (可选的统计时间范围), on_interval (可选的区间回调) | 输出: report()
+    """
+
+    def __init__(self, name, since=None, until=None, on_interval=None):
+        self.name = name
+        self.since = since
+        self.until = until
+        self.on_interval = on_interval
+        self.precise = False
+        self.state = None  # None表示未知（程序未运行或尚无记录）
+        self.state_start = None
+        self.durations = {'online': 0.0, 'offline': 0.0, 'login': 0.0}
+        self.outage_start = None
+        self.outages = 0
+        self.outage_total = 0.0
+        self.unresolved_outages = 0
+        self.longest_outage = (0.0, None)  # (时长, 开始时间)
+        self.login_open = False
+        self.login_outcomes = {'success': 0, 'failure': 0}
+        self.login_attempts = 0
+
+    def set_state(self, ts, state):
+        """
+        set_state 功能说明:
+        # 切换到新的区间类别（online/offline/login），None表示中断（未知）
+        # 输入: ts (时间戳), state (区间类别或None) | 输出: 无
+        """
+        if state == self.state:
+            return
+        self._close(ts)
+        if state in ('offline', 'login') and self.outage_start is None:
+            self.outage_start = ts
+        elif state == 'online' and self.outage_start is not None:
+            duration = ts - self.outage_start
+            if self._in_range(ts):
+                self.outages += 1
+                self.outage_total += duration
+                self._update_longest(duration, self.outage_start)
+            self.outage_start = None
+        elif state is None and self.outage_start is not None:
+            # 程序在故障期间中断，中断后的情况未知
+            if self._in_range(ts):
+                self.unresolved_outages += 1
+                self._update_longest(ts - self.outage_start, self.outage_start)
+            self.outage_start = None
+            self.login_open = False
+        self.state = state
+        self.state_start = ts
+
+    def login_started(self, ts):
+        """开始一次自动登录，已有未结束的登录时忽略"""
+        if not self.login_open:
+            self.login_open = True
+            if self._in_range(ts):
+                self.login_attempts += 1
+        self.set_state(ts, 'login')
+
+    def login_finished(self, ts, ok):
+        """结束自动登录：成功回到在线，失败回到离线；没有进行中的登录时只更新状态"""
+        if self.login_open:
+            self.login_open = False
+            if self._in_range(ts):
+                self.login_outcomes['success' if ok else 'failure'] += 1
+        self.set_state(ts, 'online' if ok else 'offline')
+
+    def finish(self, ts):
+        """日志结束：把当前区间累计到ts，进行中的故障保留为当前故障"""
+        self._close(ts)
+        self.state_start = ts
+
+    def report(self, end_ts=None):
+        """
+        report 功能说明:
+        # 返回该账号的统计
+        # 输入: end_ts (日志结束时间，用于计算进行中的故障时长) | 输出: dict
+        """
+        observed = sum(self.durations.values())
+        attempts = self.login_attempts
+        ongoing = None
+        if self.outage_start is not None and end_ts is not None:
+            ongoing = {'start': self.outage_start, 'seconds': round(end_ts - self.outage_start, 1)}
+        longest, longest_start = self.longest_outage
+        if ongoing and ongoing['seconds'] > longest:
+            longest, longest_start = ongoing['seconds'], ongoing['start']
+        return {
+            'account': self.name,
+            'observed_seconds': round(observed, 1),
+            'online_seconds': round(self.durations['online'], 1),
+            'offline_seconds': round(self.durations['offline'], 1),
+            'login_seconds': round(self.durations['login'], 1),
+            'availability': self.durations['online'] / observed if observed else None,
+            'outages': self.outages,
+            'mttr_seconds': round(self.outage_total / self.outages, 1) if self.outages else None,
+            'longest_outage_seconds': round(longest, 1) if longest_start is not None else None,
+            'longest_outage_start': longest_start,
+            'unresolved_outages': self.unresolved_outages,
+            'ongoing_outage': ongoing,
+            'login_attempts': attempts,
+            'login_successes': self.login_outcomes['success'],
+            'login_failures': self.login_outcomes['failure'],
+            'login_success_rate': self.login_outcomes['success'] / attempts if attempts else None,
+            'source': 'transitions' if self.precise else 'messages',
+        }
+
+    def _in_range(self, ts):
+        return (self.since is None or ts >= self.since) and (self.until is None or ts <= self.until)
+
+    def _update_longest(self, duration, start):
+        if self.longest_outage[1] is None or duration > self.longest_outage[0]:
+            self.longest_outage = (duration, start)
+
+    def _close(self, ts):
+        """把当前区间在统计范围内的部分累计到对应类别，并回调区间"""
+        if self.state is None or self.state_start is None:
+            return
+        start = self.state_start if self.since is None else max(self.state_start, self.since)
+        end = ts if self.until is None else min(ts, self.until)
+        if end > start:
+            self.durations[self.state] += end - start
+            if self.on_interval is not None:
+                self.on_interval(self.name, self.state, start, end)
+
+
+class LogAnalyzer:
+    """
+    LogAnalyzer 功能说明:
+    # 把extract_events的事件流分发到各账号的AccountTimeline：
+    # - 状态变化行直接给出区间类别，进入"自动登录中"计一次登录，从"自动登录中"到在线/退避计登录结果
+    # - 没有状态变化行的旧日志按消息识别在线、离线和登录事件
+    # - 程序启动时，上次运行未正常关闭的账号在上一条日志处结束（崩溃后的空白不计入统计）；程序关闭时所有账号结束
+    # 输入: since / until (可选的统计时间范围，时间戳), account (只统计指定账号), on_interval (可选的区间回调)
+    # 输出: report()
+
+    属性说明:
+    - events: 已处理的事件数
+    - first_ts / last_ts: 处理过的第一条和最后一条记录的时间
+    - stats: merge_records填写的文件数和记录数
+    """
+
+    def __init__(self, since=None, until=None, account=None, on_interval=None):
+        self.since = since
+        self.until = until
+        self.account = account
+        self.on_interval = on_interval
+        self.timelines = {}
+        self.events = 0
+        self.first_ts = None
+        self.last_ts = None
+        self.stats = {'files': 0, 'records': 0}
+
+    def run(self, paths):
+        """
+        run 功能说明:
+        # 流式分析一组日志文件，超过until后停止读取
+        # 输入: paths (日志文件路径列表) | 输出: 自身
+        """
+        records = merge_records(paths, self.stats)
+        for ts, kind, account, detail in extract_events(self._watch(records)):
+            if self.until is not None and ts > self.until:
+                break
+            self.feed(ts, kind, account, detail)
+        self.finish()
+        return self
+
+    def feed(self, ts, kind, account, detail):
+        """
+        feed 功能说明:
+        # 处理一个事件
+        # 输入: extract_events产生的(ts, kind, account, detail) | 输出: 无
+        """
+        self.events += 1
+        if kind == 'start':
+            for timeline in self.timelines.values():
+                if timeline.state is not None:
+                    timeline.set_state(detail, None)
+            return
+        if kind == 'stop':
+            for timeline in self.timelines.values():
+                timeline.set_state(ts, None)
+            return
+        if self.account is not None and account != self.account:
+            return
+
+        timeline = self.timelines.get(account)
+        if timeline is None:
+            timeline = self.timelines[account] = AccountTimeline(account, self.since, self.until, self.on_interval)
+
+        if kind == 'state':
+            old, new = detail
+            timeline.precise = True
+            category = STATE_CATEGORIES.get(new)
+            if category is None:
+                return
+            if category == 'login':
+                timeline.login_started(ts)
+            elif STATE_CATEGORIES.get(old) == 'login':
+                timeline.login_finished(ts, category == 'online')
+            else:
+                timeline.set_state(ts, category)
+            return
+
+        if timeline.precise:
+            return  # 已有状态变化行，消息只作为补充信息
+        if kind == 'login_start':
+            timeline.login_started(ts)
+        elif kind == 'login_success':
+            timeline.login_finished(ts, True)
+        elif kind == 'login_failure':
+            timeline.login_finished(ts, False)
+        elif kind == 'offline' and timeline.state == 'login':
+            pass  # 登录过程中的检查失败仍属于登录区间
+        else:
+            timeline.set_state(ts, kind)
+
+    def finish(self):
+        """日志结束：各账号的当前区间累计到最后一条记录"""
+        if self.last_ts is None:
+            return
+        for timeline in self.timelines.values():
+            timeline.finish(self.last_ts)
+
+    def report(self):
+        """
+        report 功能说明:
+        # 返回统计报告
+        # 输入: 无 | 输出: dict {files, records, events, first_ts, last_ts, accounts: [AccountTimeline.report()]}
+        """
+        return {
+            'files': self.stats['files'],
+            'records': self.stats['records'],
+            'events': self.events,
+            'first_ts': self.first_ts,
+            'last_ts': self.last_ts,
+            'accounts': [timeline.report(self.last_ts) for name, timeline in sorted(self.timelines.items())],
+        }
+
+    def _watch(self, records):
+        """记录第一条和最后一条记录的时间"""
+        for record in records:
+            if self.first_ts is None:
+                self.first_ts = record[0]
+            self.last_ts = record[0]
+            yield record
+
+
+def analyze_logs(paths, since=None, until=None, account=None, on_interval=None):
+    """
+    analyze_logs 功能说明:
+    # 分析一组日志文件或目录
+    # 输入: paths (目录、文件或通配符列表), since / until (可选的时间范围，时间戳), account (只统计指定账号),
+    #       on_interval (可选的区间回调 callback(账号, 类别, 开始, 结束)) | 输出: LogAnalyzer（已完成分析）
+    """
+    return LogAnalyzer(since, until, account, on_interval).run(discover_log_files(paths))
+
+
+def _format_duration(seconds):
+    """把秒数格式化为 1天2小时3分4秒 形式"""
+    if seconds is None:
+        return '-'
+    seconds = int(round(seconds))
+    parts = []
+    for unit, size in (('天', 86400), ('小时', 3600), ('分', 60)):
+        if seconds >= size:
+            parts.append(f"{seconds // size}{unit}")
+            seconds %= size
+    if seconds or not parts:
+        parts.append(f"{seconds}秒")
+    return ''.join(parts)
+
+
+def _format_time(ts):
+    return datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S') if ts is not None else '-'
+
+
+def format_report(report):
+    """
+    format_report 功能说明:
+    # 把统计报告格式化为文本
+    # 输入: report (LogAnalyzer.report()的结果) | 输出: str
+    """
+    lines = [f"📄 日志文件: {report['files']} 个, 记录: {report['records']} 条, 识别事件: {report['events']} 条",
+             f"🕒 时间范围: {_format_time(report['first_ts'])} ~ {_format_time(report['last_ts'])}"]
+    if not report['accounts']:
+        lines.append("⚠️ 没有识别到状态事件")
+    for data in report['accounts']:
+        availability = f"{data['availability'] * 100:.2f}%" if data['availability'] is not None else '-'
+        login_rate = f"{data['login_success_rate'] * 100:.1f}%" if data['login_success_rate'] is not None else '-'
+        source = '状态变化记录' if data['source'] == 'transitions' else '日志消息'
+        lines.append(f"[{data['account']}] (依据: {source})")
+        lines.append(f"  观测时长: {_format_duration(data['observed_seconds'])} "
+                     f"(在线 {_format_duration(data['online_seconds'])}, 离线 {_format_duration(data['offline_seconds'])}, "
+                     f"自动登录 {_format_duration(data['login_seconds'])})")
+        lines.append(f"  可用率: {availability}")
+        longest = _format_duration(data['longest_outage_seconds'])
+        if data['longest_outage_start'] is not None:
+            longest += f" (开始于 {_format_time(data['longest_outage_start'])})"
+        lines.append(f"  故障: {data['outages']} 次已恢复, MTTR: {_format_duration(data['mttr_seconds'])}, "
+                     f"最长故障: {longest}")
+        if data['unresolved_outages']:
+            lines.append(f"  程序中断时未恢复的故障: {data['unresolved_outages']} 次")
+        if data['ongoing_outage']:
+            lines.append(f"  日志结束时仍在故障中: 已持续 {_format_duration(data['ongoing_outage']['seconds'])}")
+        lines.append(f"  自动登录: {data['login_attempts']} 次, 成功 {data['login_successes']} 次, "
+                     f"失败 {data['login_failures']} 次, 成功率: {login_rate}")
+    return '\n'.join(lines)
+
+
+def _parse_time(value):
+    """命令行时间参数：ISO格式（2026-10-16 或 2026-10-16T08:00）"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析时间: {value}，请使用ISO格式，如 2026-10-16T08:00")
+
+
+def main():
+    """
+    main 功能说明:
+    # 命令行入口：分析日志并输出各账号的可用率、MTTR、最长故障和登录成功率
+    # 输入: 命令行参数 | 输出: 统计报告打印到控制台
+    """
+    parser = argparse.ArgumentParser(
+        description="微信监控日志分析：从日志重建在线/离线/登录区间，统计可用率、MTTR、最长故障和登录成功率",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法:
+  python wechat_log_analyzer.py                          # 分析logs目录下的所有监控日志（含轮转和压缩文件）
+  python wechat_log_analyzer.py logs/wechat_monitor_20261016.log
+  python wechat_log_analyzer.py --since 2026-10-01 --until 2026-10-16T12:00
+  python wechat_log_analyzer.py --account 客服1 --intervals
+        """
+    )
+    parser.add_argument('paths', nargs='*', default=['logs'], help='日志目录、文件或通配符 (默认: logs)')
+    parser.add_argument('--since', type=_parse_time, help='统计开始时间（ISO格式）')
+    parser.add_argument('--until', type=_parse_time, help='统计结束时间（ISO格式）')
+    parser.add_argument('--account', help='只统计指定账号（单账号模式为 wechat）')
+    parser.add_argument('--intervals', action='store_true', help='逐条输出重建的在线/离线/登录区间')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出统计报告')
+    args = parser.parse_args()
+
+    labels = {'online': '在线', 'offline': '离线', 'login': '自动登录'}
+
+    def print_interval(account, category, start, end):
+        print(f"  [{account}] {_format_time(start)} ~ {_format_time(end)} {labels[category]} "
+              f"({_format_duration(end - start)})")
+
+    paths = discover_log_files(args.paths)
+    if not paths:
+        print(f"❌ 没有找到日志文件: {' '.join(args.paths)}")
+        sys.exit(1)
+    analyzer = LogAnalyzer(args.since, args.until, args.account, print_interval if args.intervals else None)
+    report = analyzer.run(paths).report()
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
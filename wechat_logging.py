@@ -0,0 +1,785 @@
+##########wechat_logging.py: [日志系统扩展组件] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建异步日志管道：有界队列处理器+后台监听线程]########
+# 变更记录: [2026-10-16] @李祥光 [添加状态变化日志模式，相同状态和重复错误折叠为周期汇总]########
+# 变更记录: [2026-10-16] @李祥光 [添加日志目录清理（单次scandir，按保留天数和磁盘总量上限从最旧文件删除）和按天切换的日志处理器]########
+# 变更记录: [2026-10-16] @李祥光 [后台清理先压缩轮转后的日志和前一天及更早的日志（gzip，安装zstandard时可用zstd），统计节省空间]########
+# 输入: 已配置的日志处理器 | 输出: 异步日志管道、状态变化日志记录器###############
+
+
+###########################文件下的所有函数###########################
+"""
+BoundedQueueHandler：有界队列日志处理器，监控线程只入队，队列满时按溢出策略处理
+start_async_logging：把根日志器的处理器迁移到后台监听线程，启用异步日志
+stop_async_logging：清空队列并停止监听线程，把处理器还原到根日志器
+async_logging_stats：返回异步日志队列的统计信息
+StateTransitionLogger：状态变化日志记录器，只在状态变化时输出完整信息，重复状态折叠为周期汇总
+get_state_logger：获取进程共享的状态变化日志记录器
+rotate_log_dir：清理日志目录，一次scandir遍历，删除超过保留天数的日志，总大小超过上限时从最旧的开始删除
+schedule_log_rotation：在后台线程执行一次rotate_log_dir，已有清理在进行时跳过
+wait_log_rotation：等待后台清理结束，返回最近一次清理结果
+compress_logs：压缩日志目录中不再写入的日志（轮转备份和前一天及更早的日志），压缩期间文件有变化时放弃
+log_compression_stats：返回本进程累计的日志压缩统计（文件数、压缩前后大小、节省空间）
+format_compression_result：把压缩结果格式化为"N 个文件 X MB -> Y MB，节省 Z MB"
+rotate_then_clean：RotatingFileHandler的rotator，改名后在后台清理日志目录
+DailyFileHandler：按天命名的日志文件处理器（wechat_monitor_YYYYMMDD.log），跨过零点时切换到新文件
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[setup_enhanced_logging] --> B[start_async_logging]
+    B --> C[根日志器只挂BoundedQueueHandler]
+    B --> D[QueueListener后台线程]
+    E[监控线程logging.info] --> C
+    C -->|入队| Q[(有界队列)]
+    C -->|队列满| F{溢出策略}
+    F -->|drop_new| G[丢弃新记录]
+    F -->|drop_oldest| H[丢弃最旧记录]
+    F -->|block| I[限时阻塞等待]
+    Q --> D
+    D --> J[文件/控制台处理器格式化并写入]
+    K[handle_shutdown] --> L[stop_async_logging]
+    L --> M[清空队列并还原处理器]
+    N[状态检查/自动登录/监控循环] --> O[get_state_logger]
+    O --> P[StateTransitionLogger.log]
+    P -->|状态变化| Q1[输出完整信息并补充上一状态的重复汇总]
+    P -->|状态未变化| R1[计数，到达汇总间隔输出一条汇总]
+    N --> S[StateTransitionLogger.routine]
+    S -->|transition模式| T[降为DEBUG]
+    N --> U[StateTransitionLogger.recovered/reset]
+    U --> V[输出待汇总计数并清除状态]
+    W[DailyFileHandler跨过零点] --> X[切换到当天的日志文件]
+    X --> Y[schedule_log_rotation后台线程]
+    Z[RotatingFileHandler按大小轮转] --> Z1[rotate_then_clean] --> Y
+    Z2[程序启动 / LogRotator.rotate_logs] --> R2[rotate_log_dir]
+    Y --> C1[compress_logs: 空闲的轮转备份和前一天的日志压缩为.gz/.zst，保留原修改时间]
+    C1 --> C2[在对应处理器锁内确认文件未变化后替换，变化则放弃]
+    C1 --> R2
+    R2 --> R3[scandir一次取得所有日志文件的修改时间和大小]
+    R3 --> R4[从最旧的开始删除: 超过保留天数或总大小超过上限，跳过正在写入的文件]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import re
+import gzip
+import time
+import queue
+import shutil
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timedelta
+
+from config import LOG_CONFIG
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # 未安装时使用gzip
+
+# 支持的溢出策略
+OVERFLOW_POLICIES = ('drop_new', 'drop_oldest', 'block')
+
+# 支持的日志模式：transition=只在状态变化时输出完整信息, verbose=每次都输出完整信息
+LOG_MODES = ('transition', 'verbose')
+
+# 支持的日志压缩方式：auto=安装了zstandard时用zstd否则gzip, gzip, zstd, none=不压缩
+LOG_COMPRESSION_CODECS = ('auto', 'gzip', 'zstd', 'none')
+
+# 已压缩日志的扩展名（日志分析工具也识别这些扩展名）
+COMPRESSED_LOG_SUFFIXES = ('.gz', '.bz2', '.xz', '.lzma', '.zst')
+
+# RotatingFileHandler的轮转备份: wechat_monitor.log.1 ~ wechat_monitor.log.N
+ROTATED_LOG_PATTERN = re.compile(r'\.log\.\d+$')
+
+# 当前生效的异步日志管道: (queue_handler, listener, 原处理器列表)
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+# 进程共享的状态变化日志记录器，延迟创建
+_state_logger = None
+_state_logger_lock = threading.Lock()
+
+# 后台日志目录清理线程和最近一次清理结果
+_rotation_thread = None
+_rotation_lock = threading.Lock()
+_last_rotation = {}
+
+# 本进程累计的日志压缩统计
+_compression_totals = {'files': 0, 'original_bytes': 0, 'compressed_bytes': 0}
+_compression_lock = threading.Lock()
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    BoundedQueueHandler 功能说明:
+    # 有界队列日志处理器，监控线程只做入队，格式化和I/O交给后台监听线程
+    # 队列满时按溢出策略处理，并在恢复后补一条汇总警告说明丢弃了多少条
+    # 输入: log_queue (有界队列), overflow_policy (drop_new/drop_oldest/block),
+    #       block_timeout (block策略的最长等待秒数) | 输出: 无
+
+    属性说明:
+    - dropped: 累计丢弃的日志条数
+    - enqueued: 累计入队的日志条数
+    """
+
+    def __init__(self, log_queue, overflow_policy='drop_oldest', block_timeout=0.5):
+        super().__init__(log_queue)
+        if overflow_policy not in OVERFLOW_POLICIES:
+            overflow_policy = 'drop_oldest'
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.enqueued = 0
+        self._reported_dropped = 0
+        self._counter_lock = threading.Lock()
+
+    def enqueue(self, record):
+        """
+        enqueue 功能说明:
+        # 把日志记录放入队列，队列满时按溢出策略处理
+        # 输入: record (已预处理的日志记录) | 输出: 无
+        """
+        if not self._put(record):
+            with self._counter_lock:
+                self.dropped += 1
+            return
+
+        # 溢出缓解后（队列低于九成）补一条汇总警告，便于事后知道日志不完整
+        # 溢出期间不补发，避免汇总记录本身继续挤占队列
+        with self._counter_lock:
+            self.enqueued += 1
+            unreported = 0
+            if self.dropped > self._reported_dropped and self.queue.qsize() < self.queue.maxsize * 0.9:
+                unreported = self.dropped - self._reported_dropped
+                self._reported_dropped = self.dropped
+
+        if unreported:
+            summary = logging.LogRecord(
+                record.name, logging.WARNING, __file__, 0,
+                f"⚠️ 日志队列溢出({self.overflow_policy})，已丢弃 {unreported} 条日志", None, None
+            )
+            self._put(summary)
+
+    def _put(self, record):
+        """按溢出策略入队，返回是否成功"""
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            pass
+
+        if self.overflow_policy == 'block':
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+                return True
+            except queue.Full:
+                return False
+
+        if self.overflow_policy == 'drop_oldest':
+            try:
+                self.queue.get_nowait()
+                with self._counter_lock:
+                    self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(record)
+                return True
+            except queue.Full:
+                return False
+
+        return False
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """停止时阻塞放入结束标记，队列满时也能等监听线程腾出空间后正常退出"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+def start_async_logging(queue_size=None, overflow_policy=None, block_timeout=None):
+    """
+    start_async_logging 功能说明:
+    # 启用异步日志：把根日志器现有的处理器交给后台QueueListener，
+    # 根日志器只保留一个BoundedQueueHandler，日志调用只做入队
+    # 输入: queue_size (队列容量), overflow_policy (溢出策略), block_timeout (block策略等待秒数)
+    #       均默认取自LOG_CONFIG | 输出: bool (True=已启用)
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is not None:
+            return True
+
+        if queue_size is None:
+            queue_size = LOG_CONFIG.get('log_queue_size', 10000)
+        if overflow_policy is None:
+            overflow_policy = LOG_CONFIG.get('log_overflow_policy', 'drop_oldest')
+        if block_timeout is None:
+            block_timeout = LOG_CONFIG.get('log_block_timeout', 0.5)
+
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        if not handlers:
+            return False
+
+        log_queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        queue_handler = BoundedQueueHandler(log_queue, overflow_policy, block_timeout)
+        listener = _DrainingQueueListener(log_queue, *handlers, respect_handler_level=True)
+
+        for handler in handlers:
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        listener.start()
+
+        _pipeline = (queue_handler, listener, handlers)
+        logging.debug(f"异步日志已启用 - 队列容量: {queue_size}, 溢出策略: {queue_handler.overflow_policy}")
+        return True
+
+
+def stop_async_logging():
+    """
+    stop_async_logging 功能说明:
+    # 停止异步日志：等待监听线程写完队列中剩余的记录，
+    # 然后把原处理器重新挂回根日志器，之后的日志恢复同步写入，不会丢失
+    # 输入: 无 | 输出: dict (停止前的队列统计)，未启用时返回空字典
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            return {}
+        queue_handler, listener, handlers = _pipeline
+        stats = async_logging_stats()
+
+        root = logging.getLogger()
+        root.removeHandler(queue_handler)
+        for handler in handlers:
+            root.addHandler(handler)
+
+        # QueueListener.stop会先处理完队列中剩余的记录再退出
+        listener.stop()
+        for handler in handlers:
+            try:
+                handler.flush()
+            except Exception:
+                pass
+        _pipeline = None
+        return stats
+
+
+def async_logging_stats():
+    """
+    async_logging_stats 功能说明:
+    # 返回异步日志队列的统计信息
+    # 输入: 无 | 输出: dict (队列深度、容量、入队数、丢弃数、溢出策略)，未启用时返回空字典
+    """
+    pipeline = _pipeline
+    if pipeline is None:
+        return {}
+    queue_handler = pipeline[0]
+    return {
+        'queue_depth': queue_handler.queue.qsize(),
+        'queue_size': queue_handler.queue.maxsize,
+        'enqueued': queue_handler.enqueued,
+        'dropped': queue_handler.dropped,
+        'overflow_policy': queue_handler.overflow_policy,
+    }
+
+
+class StateTransitionLogger:
+    """
+    StateTransitionLogger 功能说明:
+    # 状态变化日志记录器：每个检查点（key）记住最近一次状态，
+    # 状态变化时输出完整信息，状态不变时只计数，按汇总间隔输出一条带次数的汇总
+    # 错误信息作为状态的一部分，因此相同的错误会被折叠，不同的错误仍然完整输出
+    # verbose模式下保持原有行为，每次都输出完整信息
+    # 输入: mode (transition/verbose，默认取LOG_CONFIG['log_mode']),
+    #       summary_interval (汇总间隔秒数，默认取LOG_CONFIG['log_summary_interval']) | 输出: 无
+
+    属性说明:
+    - suppressed: 累计被折叠（未输出完整信息）的日志次数
+    """
+
+    def __init__(self, mode=None, summary_interval=None):
+        self._mode = mode
+        self._summary_interval = summary_interval
+        self._states = {}  # key -> {state, level, first_line, repeats, since, last_emit}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    @property
+    def mode(self):
+        """当前日志模式，未显式指定时每次读取配置，配置重载后立即生效"""
+        mode = self._mode or LOG_CONFIG.get('log_mode', 'transition')
+        return mode if mode in LOG_MODES else 'transition'
+
+    @property
+    def summary_interval(self):
+        """重复状态的汇总间隔（秒）"""
+        if self._summary_interval is not None:
+            return self._summary_interval
+        return LOG_CONFIG.get('log_summary_interval', 300)
+
+    def log(self, key, state, level, *lines):
+        """
+        log 功能说明:
+        # 记录检查点的当前状态，状态变化时输出全部lines，状态未变化时折叠
+        # 输入: key (检查点名称), state (状态标识，错误时建议包含错误信息),
+        #       level (日志级别), lines (完整信息的各行) | 输出: bool (True=输出了完整信息)
+        """
+        if self.mode == 'verbose':
+            for line in lines:
+                logging.log(level, line)
+            return True
+
+        now = time.monotonic()
+        summary = None
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is not None and entry['state'] == state:
+                entry['repeats'] += 1
+                self.suppressed += 1
+                if now - entry['last_emit'] >= self.summary_interval:
+                    summary = self._summary(entry, now, '状态未变化')
+                    entry['repeats'] = 0
+                    entry['last_emit'] = now
+                changed = False
+            else:
+                if entry is not None and entry['repeats']:
+                    summary = self._summary(entry, now, '之后状态变化')
+                self._states[key] = {
+                    'state': state, 'level': level, 'first_line': lines[0] if lines else str(state),
+                    'repeats': 0, 'since': now, 'last_emit': now,
+                }
+                changed = True
+
+        if summary:
+            logging.log(*summary)
+        if changed:
+            for line in lines:
+                logging.log(level, line)
+        return changed
+
+    def routine(self, message, level=logging.INFO):
+        """
+        routine 功能说明:
+        # 记录每个周期都会出现的例行日志（检查开始、等待时间等）
+        # transition模式下降为DEBUG，verbose模式下按原级别输出
+        # 输入: message (日志内容), level (verbose模式下的日志级别) | 输出: 无
+        """
+        logging.log(level if self.mode == 'verbose' else logging.DEBUG, message)
+
+    def recovered(self, key, *lines, level=logging.INFO):
+        """
+        recovered 功能说明:
+        # 记录检查点已恢复：先输出尚未汇总的重复次数，再完整输出恢复信息，并清除状态
+        # 恢复总是状态变化，因此两种模式下都会输出
+        # 输入: key (检查点名称), lines (恢复信息各行), level (日志级别) | 输出: 无
+        """
+        self.reset(key)
+        for line in lines:
+            logging.log(level, line)
+
+    def reset(self, key):
+        """
+        reset 功能说明:
+        # 清除检查点的状态，之后的第一条记录按状态变化完整输出
+        # 输入: key (检查点名称) | 输出: 无
+        """
+        with self._lock:
+            entry = self._states.pop(key, None)
+            summary = self._summary(entry, time.monotonic(), '之后已恢复') if entry and entry['repeats'] else None
+        if summary:
+            logging.log(*summary)
+
+    def flush(self):
+        """
+        flush 功能说明:
+        # 输出所有检查点尚未汇总的重复次数，程序关闭前调用，保证计数不丢失
+        # 输入: 无 | 输出: 无
+        """
+        now = time.monotonic()
+        summaries = []
+        with self._lock:
+            for entry in self._states.values():
+                if entry['repeats']:
+                    summaries.append(self._summary(entry, now, '截至目前'))
+                    entry['repeats'] = 0
+                    entry['last_emit'] = now
+        for summary in summaries:
+            logging.log(*summary)
+
+    def _summary(self, entry, now, suffix):
+        """生成一条重复汇总日志 (level, message)"""
+        return (
+            entry['level'],
+            f"🔁 {entry['first_line']} —— 已重复 {entry['repeats']} 次，"
+            f"持续 {now - entry['since']:.0f}秒 ({suffix})"
+        )
+
+
+def get_state_logger():
+    """
+    get_state_logger 功能说明:
+    # 获取进程共享的状态变化日志记录器，第一次调用时创建
+    # 输入: 无 | 输出: StateTransitionLogger实例
+    """
+    global _state_logger
+    with _state_logger_lock:
+        if _state_logger is None:
+            _state_logger = StateTransitionLogger()
+        return _state_logger
+
+
+def _active_file_handlers():
+    """根日志器和异步管道中的文件处理器"""
+    handlers = list(logging.getLogger().handlers)
+    pipeline = _pipeline
+    if pipeline is not None:
+        handlers.extend(pipeline[2])
+    return [handler for handler in handlers if isinstance(handler, logging.FileHandler)]
+
+
+def _active_log_files():
+    """正在写入的日志文件（根日志器和异步管道中文件处理器的路径），清理时跳过"""
+    return {os.path.normcase(handler.baseFilename) for handler in _active_file_handlers()}
+
+
+def rotate_log_dir(log_dir='logs', retention_days=None, max_total_mb=None, now=None):
+    """
+    rotate_log_dir 功能说明:
+    # 清理日志目录：一次scandir遍历取得所有日志文件（名称含.log）的修改时间和大小，按修改时间从旧到新处理，
+    # 超过保留天数的删除，剩余总大小仍超过上限时继续删除最旧的文件，直到不超过上限
+    # 正在写入的日志文件不删除，但计入总大小；检查历史数据库等其他文件不处理
+    # 输入: log_dir (日志目录), retention_days (保留天数，默认LOG_CONFIG['log_retention_days']，0表示不按天数删除),
+    #       max_total_mb (总大小上限MB，默认LOG_CONFIG['log_dir_max_size_mb']，0表示不限制), now (当前时间戳，测试用)
+    # 输出: dict {scanned, deleted, expired, over_budget, freed_bytes, total_bytes, failed}
+    """
+    if retention_days is None:
+        retention_days = LOG_CONFIG.get('log_retention_days', 7)
+    if max_total_mb is None:
+        max_total_mb = LOG_CONFIG.get('log_dir_max_size_mb', 0)
+    now = time.time() if now is None else now
+    cutoff = now - retention_days * 86400 if retention_days else None
+    budget = int(max_total_mb * 1024 * 1024) if max_total_mb else None
+    result = {'scanned': 0, 'deleted': 0, 'expired': 0, 'over_budget': 0, 'freed_bytes': 0, 'total_bytes': 0, 'failed': 0}
+
+    files = []
+    try:
+        with os.scandir(log_dir) as entries:
+            for entry in entries:
+                if '.log' not in entry.name or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue  # 扫描期间被删除或改名
+                files.append((stat.st_mtime, stat.st_size, entry.path, entry.name))
+    except FileNotFoundError:
+        return result
+    files.sort()
+    result['scanned'] = len(files)
+    total = sum(size for mtime, size, path, name in files)
+
+    active = _active_log_files()
+    for mtime, size, path, name in files:
+        expired = cutoff is not None and mtime < cutoff
+        over_budget = budget is not None and total > budget
+        if not expired and not over_budget:
+            break  # 之后的文件更新，也不会过期
+        if os.path.normcase(os.path.abspath(path)) in active:
+            continue
+        try:
+            os.remove(path)
+        except OSError as e:
+            result['failed'] += 1
+            logging.warning(f"⚠️ 无法删除日志文件 {name}: {e}")
+            continue
+        total -= size
+        result['deleted'] += 1
+        result['freed_bytes'] += size
+        result['expired' if expired else 'over_budget'] += 1
+        reason = f"超过{retention_days}天" if expired else f"日志目录超过{max_total_mb}MB"
+        logging.info(f"🗑️ 已删除日志: {name} ({reason}, 修改时间: "
+                     f"{datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')}, {size / 1024 / 1024:.2f} MB)")
+
+    result['total_bytes'] = total
+    _last_rotation.clear()
+    _last_rotation.update(result, finished=now)
+    return result
+
+
+def _resolve_codec(codec=None):
+    """把压缩方式配置解析为实际使用的gzip/zstd，不压缩时返回None"""
+    if codec is None:
+        codec = LOG_CONFIG.get('log_compression', 'auto')
+    if codec == 'none':
+        return None
+    if codec in ('auto', 'zstd') and zstandard is not None:
+        return 'zstd'
+    if codec == 'zstd':
+        logging.debug("未安装zstandard，日志改用gzip压缩")
+    return 'gzip'
+
+
+def _compressed_name(name, mtime, suffix, existing):
+    """
+    压缩后的文件名：按天命名的日志直接加扩展名；轮转备份（.log.N）改为按最后修改时间命名，
+    避免下次轮转产生的同名备份与已压缩的文件冲突
+    """
+    if ROTATED_LOG_PATTERN.search(name):
+        stem = f"{name[:name.rindex('.log.') + 4]}.{datetime.fromtimestamp(mtime).strftime('%Y%m%d-%H%M%S')}"
+    else:
+        stem = name
+    candidate = stem + suffix
+    counter = 1
+    while candidate in existing:
+        candidate = f"{stem}-{counter}{suffix}"
+        counter += 1
+    return candidate
+
+
+def _compress_file(path, target, codec):
+    """
+    把path压缩到target：先写入临时文件，然后在日志处理器锁内确认源文件在压缩期间没有变化
+    （没有继续写入，也没有被轮转改名替换），再替换为正式文件并删除源文件；有变化时放弃并返回None
+    """
+    before = os.stat(path)
+    temp = target + '.tmp'
+    try:
+        with open(path, 'rb') as source:
+            if codec == 'zstd':
+                with zstandard.open(temp, 'wb') as output:
+                    shutil.copyfileobj(source, output, 1024 * 1024)
+            else:
+                with gzip.open(temp, 'wb', compresslevel=6) as output:
+                    shutil.copyfileobj(source, output, 1024 * 1024)
+
+        # 同一进程的轮转在处理器锁内进行，持锁期间确认和替换不会与改名交错
+        handler = next((handler for handler in _active_file_handlers()
+                        if os.path.normcase(os.path.abspath(path)).startswith(os.path.normcase(handler.baseFilename) + '.')),
+                       None)
+        if handler is not None:
+            handler.acquire()
+        try:
+            after = os.stat(path)
+            if (after.st_ino, after.st_size, after.st_mtime_ns) != (before.st_ino, before.st_size, before.st_mtime_ns):
+                os.remove(temp)
+                return None
+            os.utime(temp, ns=(before.st_atime_ns, before.st_mtime_ns))  # 保留天数和分析按原日志时间计算
+            os.replace(temp, target)
+            try:
+                os.remove(path)
+            except OSError:
+                os.remove(target)  # 源文件被其他进程占用，保留未压缩的文件
+                raise
+        finally:
+            if handler is not None:
+                handler.release()
+        return before.st_size, os.path.getsize(target)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def compress_logs(log_dir='logs', codec=None, min_idle=None, now=None):
+    """
+    compress_logs 功能说明:
+    # 压缩日志目录中不再写入的日志：轮转备份（.log.N）和最后修改时间在今天零点之前的日志，
+    # 正在写入的日志、最后修改不足min_idle秒的日志（本进程轮转出的备份除外）和已压缩的文件不处理；压缩后保留原修改时间
+    # 由后台清理线程调用，不在监控线程中执行；上次中断留下的临时文件在空闲后删除
+    # 输入: log_dir (日志目录), codec (auto/gzip/zstd/none，默认LOG_CONFIG['log_compression']),
+    #       min_idle (默认LOG_CONFIG['log_compress_min_idle']), now (当前时间戳，测试用)
+    # 输出: dict {codec, compressed, skipped, failed, original_bytes, compressed_bytes, saved_bytes}
+    """
+    codec = _resolve_codec(codec)
+    if min_idle is None:
+        min_idle = LOG_CONFIG.get('log_compress_min_idle', 60)
+    now = time.time() if now is None else now
+    today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    result = {'codec': codec, 'compressed': 0, 'skipped': 0, 'failed': 0,
+              'original_bytes': 0, 'compressed_bytes': 0, 'saved_bytes': 0}
+    if codec is None:
+        return result
+
+    active = _active_log_files()
+    candidates = []
+    try:
+        with os.scandir(log_dir) as entries:
+            names = set()
+            for entry in entries:
+                names.add(entry.name)
+                if '.log' not in entry.name or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                except OSError:
+                    continue
+                rotated = ROTATED_LOG_PATTERN.search(entry.name) is not None
+                # 本进程处理器轮转出的备份已关闭，不需要等待空闲
+                own_backup = rotated and os.path.normcase(os.path.abspath(entry.path[:entry.path.rindex('.')])) in active
+                if now - mtime < min_idle and not own_backup:
+                    continue
+                if entry.name.endswith('.tmp'):
+                    try:
+                        os.remove(entry.path)  # 上次压缩中断留下的临时文件
+                    except OSError:
+                        pass
+                    continue
+                if entry.name.endswith(COMPRESSED_LOG_SUFFIXES):
+                    continue
+                if rotated or mtime < today:
+                    candidates.append((mtime, entry.path, entry.name))
+    except FileNotFoundError:
+        return result
+
+    suffix = '.zst' if codec == 'zstd' else '.gz'
+    for mtime, path, name in sorted(candidates):
+        if os.path.normcase(os.path.abspath(path)) in active:
+            continue
+        target_name = _compressed_name(name, mtime, suffix, names)
+        try:
+            sizes = _compress_file(path, os.path.join(log_dir, target_name), codec)
+        except OSError as e:
+            result['failed'] += 1
+            logging.warning(f"⚠️ 压缩日志失败 {name}: {e}")
+            continue
+        if sizes is None:
+            result['skipped'] += 1
+            logging.debug(f"日志 {name} 在压缩期间有变化，下次再压缩")
+            continue
+        names.add(target_name)
+        result['compressed'] += 1
+        result['original_bytes'] += sizes[0]
+        result['compressed_bytes'] += sizes[1]
+        logging.debug(f"🗜️ 已压缩日志: {name} -> {target_name} ({sizes[0] / 1024 / 1024:.2f} MB -> {sizes[1] / 1024 / 1024:.2f} MB)")
+
+    result['saved_bytes'] = result['original_bytes'] - result['compressed_bytes']
+    with _compression_lock:
+        _compression_totals['files'] += result['compressed']
+        _compression_totals['original_bytes'] += result['original_bytes']
+        _compression_totals['compressed_bytes'] += result['compressed_bytes']
+    return result
+
+
+def log_compression_stats():
+    """
+    log_compression_stats 功能说明:
+    # 返回本进程累计的日志压缩统计
+    # 输入: 无 | 输出: dict {files, original_bytes, compressed_bytes, saved_bytes}
+    """
+    with _compression_lock:
+        stats = dict(_compression_totals)
+    stats['saved_bytes'] = stats['original_bytes'] - stats['compressed_bytes']
+    return stats
+
+
+def format_compression_result(result):
+    """压缩结果的日志描述: N 个文件 X MB -> Y MB，节省 Z MB (P%)"""
+    original = result['original_bytes']
+    saved = original - result['compressed_bytes']
+    ratio = saved / original * 100 if original else 0.0
+    return (f"{result.get('compressed', result.get('files', 0))} 个文件 {original / 1024 / 1024:.2f} MB -> "
+            f"{result['compressed_bytes'] / 1024 / 1024:.2f} MB，节省 {saved / 1024 / 1024:.2f} MB ({ratio:.0f}%)")
+
+
+def _run_rotation(log_dir):
+    """后台清理线程入口：先压缩不再写入的日志，再按保留天数和总大小上限删除"""
+    try:
+        compressed = compress_logs(log_dir)
+        if compressed['compressed']:
+            logging.info(f"🗜️ 日志压缩完成({compressed['codec']})：{format_compression_result(compressed)}")
+        result = rotate_log_dir(log_dir)
+        if result['deleted']:
+            logging.info(f"✅ 日志清理完成：删除 {result['deleted']} 个文件，释放 {result['freed_bytes'] / 1024 / 1024:.2f} MB，"
+                         f"日志目录现有 {result['total_bytes'] / 1024 / 1024:.2f} MB")
+    except Exception as e:
+        logging.error(f"❌ 日志清理失败: {e}")
+
+
+def schedule_log_rotation(log_dir='logs'):
+    """
+    schedule_log_rotation 功能说明:
+    # 在后台线程执行一次日志目录清理（压缩不再写入的日志，再删除过期和超出总大小上限的日志），
+    # 供日志处理器切换文件和程序启动时调用，压缩和删除不在监控线程中执行
+    # 输入: log_dir (日志目录) | 输出: bool (True=已启动, False=已有清理在进行)
+    """
+    global _rotation_thread
+    with _rotation_lock:
+        if _rotation_thread is not None and _rotation_thread.is_alive():
+            return False
+        _rotation_thread = threading.Thread(target=_run_rotation, args=(log_dir,), name="log-rotation", daemon=True)
+        _rotation_thread.start()
+        return True
+
+
+def wait_log_rotation(timeout=None):
+    """等待进行中的后台清理结束（关闭程序和测试时使用），返回最近一次清理结果"""
+    thread = _rotation_thread
+    if thread is not None:
+        thread.join(timeout)
+    return dict(_last_rotation)
+
+
+def rotate_then_clean(source, dest):
+    """
+    rotate_then_clean 功能说明:
+    # RotatingFileHandler.rotator：与默认行为一样把当前文件改名为备份，然后在后台清理日志目录
+    # 输入: source (当前日志文件), dest (备份文件名) | 输出: 无
+    """
+    if os.path.exists(source):
+        os.rename(source, dest)
+    schedule_log_rotation(os.path.dirname(source) or '.')
+
+
+class DailyFileHandler(logging.handlers.BaseRotatingHandler):
+    """
+    DailyFileHandler 功能说明:
+    # 按天命名的日志文件处理器：写入 {log_dir}/{prefix}_YYYYMMDD.log，记录时间跨过本地零点时
+    # 关闭当前文件并打开新一天的文件，之后在后台清理日志目录（保留天数和总大小上限）
+    # 与TimedRotatingFileHandler不同，不对旧文件改名，文件名始终是写入当天的日期
+    # 输入: log_dir (日志目录), prefix (文件名前缀), encoding (文件编码), cleanup (切换后是否清理日志目录)
+    # 输出: 无
+
+    属性说明:
+    - rollover_at: 下一次切换的时间戳（下一个本地零点）
+    - rollovers: 已切换次数
+    """
+
+    def __init__(self, log_dir='logs', prefix='wechat_monitor', encoding='utf-8', cleanup=True):
+        self.log_dir = log_dir
+        self.prefix = prefix
+        self.cleanup = cleanup
+        self.rollovers = 0
+        now = time.time()
+        super().__init__(self._path_for(now), 'a', encoding=encoding, delay=False)
+        self.rollover_at = self._next_midnight(now)
+
+    def shouldRollover(self, record):
+        return record.created >= self.rollover_at
+
+    def doRollover(self):
+        """切换到当前日期的文件，在emit中持有处理器锁时调用"""
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        # 按切换时间点计算日期：记录时间已过零点而系统时间稍慢时也写入新一天的文件
+        now = max(time.time(), self.rollover_at)
+        self.baseFilename = os.path.abspath(self._path_for(now))
+        self.stream = self._open()
+        self.rollover_at = self._next_midnight(now)
+        self.rollovers += 1
+        if self.cleanup:
+            schedule_log_rotation(self.log_dir)
+
+    def _path_for(self, ts):
+        return os.path.join(self.log_dir, f"{self.prefix}_{datetime.fromtimestamp(ts).strftime('%Y%m%d')}.log")
+
+    @staticmethod
+    def _next_midnight(ts):
+        tomorrow = datetime.fromtimestamp(ts).date() + timedelta(days=1)
+        return datetime(tomorrow.year, tomorrow.month, tomorrow.day).timestamp()
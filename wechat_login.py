@@ -0,0 +1,186 @@
+##########wechat_login.py: [登录完成等待] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建登录等待器：先快后慢轮询，复用共享连接，多个等待方共用一次轮询，可被关闭请求取消]########
+# 变更记录: [2026-10-16] @李祥光 [登录轮询的IsOnline经后端调用线程池执行，超过期限按未登录处理]########
+# 变更记录: [2026-10-16] @李祥光 [poll改为公开方法，asyncio引擎在线程池中逐次调用]########
+# 输入: 微信连接、等待超时 | 输出: 登录检测结果和检测耗时分布###############
+
+
+###########################文件下的所有函数###########################
+"""
+LoginWatcher：登录状态轮询器，所有等待方共用同一轮询结果，轮询间隔先短后长
+get_login_watcher：获取进程共享的登录状态轮询器（基于共享微信连接）
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[auto_login_wechat / WeChatMonitor.auto_login] --> B[get_login_watcher]
+    B --> C[LoginWatcher.wait]
+    C --> D{已有新的在线轮询结果?}
+    D -->|是| E[记录login_detect/login_detect_lag，返回已登录]
+    D -->|否| F{轮询到期且无人正在轮询?}
+    F -->|是| G[由当前等待方执行一次轮询: backend_call在online期限内调用共享连接IsOnline]
+    G --> H[发布结果并唤醒所有等待方，间隔按倍数增长]
+    H --> D
+    F -->|否| I[在条件变量上等待下一次结果]
+    I --> D
+    J[关闭请求] --> K[LoginWatcher.cancel唤醒并结束所有等待]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import logging
+import threading
+
+from config import MONITOR_CONFIG
+from wechat_connection import get_shared_connection
+from wechat_metrics import get_latency_recorder
+from wechat_backend import backend_call
+
+# 进程共享的登录状态轮询器；关闭信号处理函数也会获取它，因此使用可重入锁
+_watcher = None
+_watcher_lock = threading.RLock()
+
+
+class LoginWatcher:
+    """
+    LoginWatcher 功能说明:
+    # 等待用户扫码登录完成，替代固定2秒一次的轮询：
+    # 1. 轮询间隔从login_poll_interval开始，每次按login_poll_backoff倍增长，不超过login_poll_max_interval，
+    #    扫码后很快完成的登录能在几百毫秒内被发现
+    # 2. 所有检查复用同一个微信连接，只有调用异常时才标记失效重连
+    # 3. 多个等待方同时等待时，同一时刻只有一个等待方执行轮询，结果通过条件变量广播给所有等待方
+    # 4. cancel()立即唤醒并结束所有等待（关闭请求），此后的等待直接返回
+    # 每次检测到登录时记录两个耗时：login_detect（开始等待到检测到登录）和
+    # login_detect_lag（检测到登录的轮询与上一次轮询的间隔，即登录完成到被发现的延迟上限）
+    # 输入: connection (WeChatConnection，默认共享连接), initial_interval / max_interval (秒), backoff (倍数)
+    # 输出: wait返回dict {online, cancelled, elapsed, polls}
+
+    说明:
+    - 条件变量使用可重入锁，关闭信号处理函数在主线程中调用cancel不会与wait死锁
+    - 新加入的等待方只认可加入之后的轮询结果，不会把之前的在线结果当作本次登录成功
+    """
+
+    def __init__(self, connection=None, initial_interval=None, max_interval=None, backoff=None):
+        self.connection = connection or get_shared_connection()
+        self.initial_interval = initial_interval or MONITOR_CONFIG.get('login_poll_interval', 0.2)
+        self.max_interval = max_interval or MONITOR_CONFIG.get('login_poll_max_interval', 2.0)
+        self.backoff = backoff or MONITOR_CONFIG.get('login_poll_backoff', 1.5)
+        self._cond = threading.Condition(threading.RLock())
+        self._waiters = 0
+        self._polling = False
+        self._generation = 0  # 已发布的轮询结果编号
+        self._online = False  # 最近一次轮询结果
+        self._last_poll_at = None  # 最近一次轮询完成时间（monotonic）
+        self._detect_lag = 0.0  # 最近一次轮询与上一次轮询的间隔
+        self._interval = self.initial_interval
+        self._next_poll = 0.0
+        self._cancelled = False
+        self.poll_count = 0
+
+    @property
+    def cancelled(self):
+        """是否已取消（请求关闭）"""
+        return self._cancelled
+
+    def cancel(self):
+        """
+        cancel 功能说明:
+        # 取消所有进行中和之后的等待，用于程序关闭
+        # 输入: 无 | 输出: 无
+        """
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+
+    def wait(self, timeout, wakeup=None):
+        """
+        wait 功能说明:
+        # 等待登录完成，检测到在线、超时或被取消时返回
+        # 输入: timeout (最长等待秒数), wakeup (可选的MonitorWakeup，请求关闭后放弃等待)
+        # 输出: dict {online: 是否检测到登录, cancelled: 是否被取消, elapsed: 等待秒数, polls: 本次等待期间的轮询次数}
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        with self._cond:
+            if self._waiters == 0:
+                # 没有其他等待方时重新开始先快后慢的节奏
+                self._interval = self.initial_interval
+                self._next_poll = started + self.initial_interval
+            self._waiters += 1
+            seen = self._generation
+            polls_before = self.poll_count
+
+        try:
+            while True:
+                with self._cond:
+                    while True:
+                        now = time.monotonic()
+                        result = {'online': False, 'cancelled': False, 'elapsed': now - started,
+                                  'polls': self.poll_count - polls_before}
+                        if self._cancelled or (wakeup is not None and wakeup.is_shutdown):
+                            result['cancelled'] = True
+                            return result
+                        if self._generation > seen and self._online:
+                            result['online'] = True
+                            recorder = get_latency_recorder()
+                            recorder.observe('login_detect', result['elapsed'])
+                            recorder.observe('login_detect_lag', self._detect_lag)
+                            return result
+                        if now >= deadline:
+                            return result
+                        if not self._polling and now >= self._next_poll:
+                            self._polling = True
+                            break
+                        wake_at = deadline if self._polling else min(deadline, self._next_poll)
+                        self._cond.wait(max(0.0, wake_at - now))
+
+                # 在锁外执行轮询，其他等待方只等待结果
+                online = False
+                try:
+                    online = self.poll()
+                finally:
+                    with self._cond:
+                        now = time.monotonic()
+                        self._detect_lag = now - self._last_poll_at if self._last_poll_at else now - started
+                        self._last_poll_at = now
+                        self._polling = False
+                        self._online = online
+                        self._generation += 1
+                        self.poll_count += 1
+                        self._interval = min(self._interval * self.backoff, self.max_interval)
+                        self._next_poll = now + self._interval
+                        self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._waiters -= 1
+                if self._waiters == 0:
+                    self._last_poll_at = None
+
+    def poll(self):
+        """
+        poll 功能说明:
+        # 通过共享连接检查一次登录状态，调用异常或超过online期限时标记连接失效，下次轮询自动重连
+        # 输入: 无 | 输出: bool 是否已登录
+        """
+        try:
+            with get_latency_recorder().timer('login_poll'):
+                return bool(backend_call('online', self.connection.get().IsOnline))
+        except Exception as e:
+            self.connection.invalidate(f"登录状态检查异常: {e}")
+            logging.debug(f"登录状态检查时出现异常: {e}")
+            return False
+
+
+def get_login_watcher():
+    """
+    get_login_watcher 功能说明:
+    # 获取进程共享的登录状态轮询器，第一次调用时创建，复用共享微信连接
+    # 输入: 无 | 输出: LoginWatcher实例
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            _watcher = LoginWatcher()
+        return _watcher
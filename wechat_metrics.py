@@ -0,0 +1,603 @@
+##########wechat_metrics.py: [探测与登录各阶段耗时统计] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建固定分桶耗时直方图，统计各探测和登录阶段的p50/p95/p99/max]########
+# 变更记录: [2026-10-16] @李祥光 [添加检查/登录计数器，支持导出直方图快照供指标端点使用]########
+# 变更记录: [2026-10-16] @李祥光 [添加cold_start阶段：从启动微信到客户端可连接的耗时]########
+# 变更记录: [2026-10-16] @李祥光 [添加login_detect/login_detect_lag阶段：登录完成检测耗时分布]########
+# 变更记录: [2026-10-16] @李祥光 [添加按账号的检查和登录计数器，供多账号监管和指标端点使用]########
+# 变更记录: [2026-10-16] @李祥光 [添加schedule_lag阶段：多目标调度的派发延迟]########
+# 变更记录: [2026-10-16] @李祥光 [LatencyRecorder支持耗时监听函数，供历史记录存储记录每次阶段耗时]########
+# 变更记录: [2026-10-16] @李祥光 [添加最近检查环形缓冲RecentChecks，MonitorStats提供5分钟/1小时/24小时滚动成功率]########
+# 输入: 各阶段调用耗时、检查和登录结果 | 输出: 分位数统计、日志摘要和计数器快照###############
+
+
+###########################文件下的所有函数###########################
+"""
+LatencyHistogram：固定分桶的耗时直方图，内存占用固定，按桶估算分位数
+LatencyRecorder：按阶段名称管理多个耗时直方图，提供计时上下文和统计摘要
+RecentChecks：最近N次检查的环形缓冲（时间戳、耗时、状态位分别存放在数组中），增量维护各滚动窗口的成功率
+get_latency_recorder：获取进程共享的耗时记录器
+MonitorStats：检查和登录计数器（检查次数、成功次数、连续失败、登录尝试和结果、最后成功时间）
+get_monitor_stats：获取进程共享的检查和登录计数器
+get_account_stats：获取指定账号的检查和登录计数器（多账号监管模式）
+account_stats_snapshot：返回所有账号计数器的快照
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ProcessManager.is_process_running] --> R[LatencyRecorder.observe]
+    B[WeChatConnection._connect] --> R
+    C[ProbePipeline: IsOnline/GetSession/整次探测] --> R
+    D[自动登录: LoginWnd.login/登录轮询/整次登录] --> R
+    S[wait_for_client_ready冷启动就绪] --> R
+    T[LoginWatcher检测到登录] --> R
+    R --> H[LatencyHistogram.observe按阶段落桶]
+    R --> U[耗时监听函数: HistoryStore.record_stage]
+    E[监控循环周期统计/关闭汇总] --> F[LatencyRecorder.format_summary]
+    F --> G[LatencyHistogram.summary计算p50/p95/p99/max]
+    I[check_wechat_status/WeChatMonitor.check_status] --> J[MonitorStats.record_check]
+    J --> J1[RecentChecks.record写入环形缓冲，各窗口计数增量更新]
+    E --> J2[MonitorStats.rolling: 5m/1h/24h滚动成功率]
+    M --> J2
+    K[auto_login_wechat/WeChatMonitor.auto_login] --> L[MonitorStats.record_login]
+    M[指标端点] --> N[LatencyRecorder.snapshot/MonitorStats.snapshot]
+    O[AccountMonitor检查/登录] --> P[get_account_stats账号计数器]
+    O --> J
+    M --> Q[account_stats_snapshot按账号导出]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import bisect
+import logging
+import threading
+from array import array
+from contextlib import contextmanager
+
+from config import MONITOR_CONFIG
+
+# 默认分桶上界（毫秒），覆盖从进程遍历的毫秒级到登录等待的分钟级
+DEFAULT_LATENCY_BUCKETS_MS = (
+    1, 2, 5, 10, 20, 50, 100, 200, 500,
+    1000, 2000, 5000, 10000, 30000, 60000, 120000,
+)
+
+# 阶段名称及日志中的中文描述，未列出的阶段直接显示名称
+STAGE_NAMES = {
+    'process': '进程检查',
+    'connect': '连接微信',
+    'online': 'IsOnline',
+    'session': 'GetSession',
+    'check': '整次检查',
+    'login_window': 'LoginWnd.login',
+    'login_poll': '登录轮询',
+    'login': '整次登录',
+    'cold_start': '冷启动就绪',
+    'login_detect': '登录检测',
+    'login_detect_lag': '登录检测延迟上限',
+    'schedule_lag': '调度延迟',
+}
+
+# 默认滚动成功率窗口（秒）：5分钟、1小时、24小时
+DEFAULT_AVAILABILITY_WINDOWS = (300, 3600, 86400)
+
+# 登录结果分类：success=登录成功, failure=超时或登录窗口打开失败, error=登录过程抛出异常
+LOGIN_OUTCOMES = ('success', 'failure', 'error')
+
+# 进程共享的耗时记录器和计数器，延迟创建
+_recorder = None
+_recorder_lock = threading.Lock()
+_monitor_stats = None
+_monitor_stats_lock = threading.Lock()
+_account_stats = {}  # 账号名 -> MonitorStats，多账号监管模式下使用
+_account_stats_lock = threading.Lock()
+
+
+class LatencyHistogram:
+    """
+    LatencyHistogram 功能说明:
+    # 固定分桶的耗时直方图：每次记录只做一次二分查找和计数，内存占用与记录次数无关
+    # 分位数在所在桶内线性插值估算，并限制在实际最小值和最大值之间
+    # 输入: buckets_ms (递增的分桶上界，毫秒) | 输出: 分位数统计
+
+    属性说明:
+    - bounds: 分桶上界（秒），最后隐含一个无上界的溢出桶
+    - counts: 各桶计数，长度为len(bounds)+1
+    - count / total: 记录次数和累计耗时（秒）
+    - min / max: 实际最小和最大耗时（秒）
+    """
+
+    def __init__(self, buckets_ms=None):
+        buckets_ms = buckets_ms or DEFAULT_LATENCY_BUCKETS_MS
+        self.bounds = tuple(sorted(float(b) / 1000.0 for b in buckets_ms))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """
+        observe 功能说明:
+        # 记录一次耗时
+        # 输入: seconds (耗时秒数) | 输出: 无
+        """
+        seconds = max(0.0, seconds)
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        percentile 功能说明:
+        # 按分桶估算分位数
+        # 输入: q (0~1之间的分位，例如0.95) | 输出: float 耗时秒数，无数据时返回0.0
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.counts):
+            if not bucket_count:
+                continue
+            if cumulative + bucket_count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                # 桶边界外的部分用实际最小/最大值收紧，样本少时估算更准确
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * max(0.0, min(1.0, fraction))
+            cumulative += bucket_count
+        return self.max
+
+    def summary(self):
+        """
+        summary 功能说明:
+        # 返回直方图统计摘要
+        # 输入: 无 | 输出: dict {count, avg_ms, p50_ms, p95_ms, p99_ms, max_ms}
+        """
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 2),
+            'p95_ms': round(self.percentile(0.95) * 1000, 2),
+            'p99_ms': round(self.percentile(0.99) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+class LatencyRecorder:
+    """
+    LatencyRecorder 功能说明:
+    # 按阶段名称管理耗时直方图，阶段第一次记录时自动创建
+    # 多个线程（监控循环、登录轮询、指标导出）可同时使用
+    # 监听函数（如历史记录存储）在锁外收到每一次耗时，监听函数不应阻塞
+    # 输入: buckets_ms (分桶上界，默认取MONITOR_CONFIG['latency_buckets_ms']) | 输出: 各阶段统计
+    """
+
+    def __init__(self, buckets_ms=None):
+        self.buckets_ms = buckets_ms or MONITOR_CONFIG.get('latency_buckets_ms') or DEFAULT_LATENCY_BUCKETS_MS
+        self._histograms = {}
+        self._listeners = ()
+        self._lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """
+        add_listener 功能说明:
+        # 添加耗时监听函数，每次observe后以listener(stage, seconds)调用
+        # 输入: listener (监听函数) | 输出: 无
+        """
+        with self._lock:
+            self._listeners = self._listeners + (listener,)
+
+    def remove_listener(self, listener):
+        """
+        remove_listener 功能说明:
+        # 移除耗时监听函数，未添加过时不做任何操作
+        # 输入: listener (监听函数) | 输出: 无
+        """
+        with self._lock:
+            self._listeners = tuple(item for item in self._listeners if item != listener)
+
+    def observe(self, stage, seconds):
+        """
+        observe 功能说明:
+        # 记录某个阶段的一次耗时
+        # 输入: stage (阶段名称), seconds (耗时秒数) | 输出: 无
+        """
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram(self.buckets_ms)
+            histogram.observe(seconds)
+            listeners = self._listeners
+        for listener in listeners:
+            try:
+                listener(stage, seconds)
+            except Exception as e:
+                logging.debug(f"耗时监听函数出错: {e}")
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        timer 功能说明:
+        # 计时上下文，代码块结束（包括抛出异常）时记录耗时
+        # 输入: stage (阶段名称) | 输出: 无
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    def summary(self):
+        """
+        summary 功能说明:
+        # 返回所有阶段的统计摘要
+        # 输入: 无 | 输出: dict {阶段名: {count, avg_ms, p50_ms, p95_ms, p99_ms, max_ms}}
+        """
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in self._histograms.items()}
+
+    def format_summary(self):
+        """
+        format_summary 功能说明:
+        # 生成单行的耗时统计，用于周期统计日志和关闭汇总
+        # 输入: 无 | 输出: str，例如 "进程检查 p50=1.2ms p95=3.0ms p99=4.1ms max=5.0ms (n=20); ..."
+        """
+        parts = []
+        for stage, stats in self.summary().items():
+            parts.append(
+                f"{STAGE_NAMES.get(stage, stage)} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                f"p99={stats['p99_ms']}ms max={stats['max_ms']}ms (n={stats['count']})"
+            )
+        return '; '.join(parts) if parts else '暂无数据'
+
+    def snapshot(self):
+        """
+        snapshot 功能说明:
+        # 复制所有阶段的原始分桶数据，供指标端点在锁外格式化
+        # 输入: 无 | 输出: dict {阶段名: {bounds, counts, count, total}}，bounds单位为秒
+        """
+        with self._lock:
+            return {
+                stage: {
+                    'bounds': histogram.bounds,
+                    'counts': list(histogram.counts),
+                    'count': histogram.count,
+                    'total': histogram.total,
+                }
+                for stage, histogram in self._histograms.items()
+            }
+
+    def reset(self):
+        """清空所有阶段的统计"""
+        with self._lock:
+            self._histograms.clear()
+
+
+def _window_label(seconds):
+    """把窗口秒数格式化为标签，例如 300 -> 5m, 3600 -> 1h, 86400 -> 24h"""
+    seconds = int(seconds)
+    if seconds % 3600 == 0:
+        return f"{seconds // 3600}h"
+    if seconds % 60 == 0:
+        return f"{seconds // 60}m"
+    return f"{seconds}s"
+
+
+class RecentChecks:
+    """
+    RecentChecks 功能说明:
+    # 最近capacity次检查的环形缓冲，每次检查只占13字节：
+    # 时间戳（array('d')，8字节）、耗时毫秒（array('f')，4字节）、状态位（bytearray，1字节）分别连续存放，不为每次检查创建对象
+    # 每个滚动窗口维护一个尾指针和窗口内的成功次数、状态翻转次数、耗时合计（检查次数为总序号减尾指针）：
+    # 新记录加入所有窗口，过期和被覆盖的记录从窗口中减去，每条记录在每个窗口中只进出一次，记录和查询均摊O(1)
+    # 不加锁，由调用方（MonitorStats）在自己的锁内调用
+    # 输入: capacity (保留的检查次数，默认MONITOR_CONFIG['recent_checks_capacity']),
+    #       windows (滚动窗口秒数，默认MONITOR_CONFIG['availability_windows']) | 输出: 各窗口成功率统计
+
+    属性说明:
+    - count: 累计记录次数（也是下一条记录的序号），缓冲内保留最近min(count, capacity)条
+    - windows: 滚动窗口秒数，升序
+
+    说明:
+    - 时间戳按time.time()记录，时钟回拨时窗口只会推迟过期，计数不会出错
+    - 检查频率高到缓冲装不下整个窗口时，窗口只统计仍在缓冲中的记录，window_stats的complete为False
+    """
+
+    OK = 1  # 检查通过
+    FLAP = 2  # 与上一次检查的结果不同（在线/离线翻转）
+    TIMED = 4  # 记录了耗时
+
+    def __init__(self, capacity=None, windows=None):
+        self.capacity = max(1, int(capacity or MONITOR_CONFIG.get('recent_checks_capacity', 20000)))
+        self.windows = tuple(sorted(int(w) for w in (windows or MONITOR_CONFIG.get('availability_windows')
+                                                     or DEFAULT_AVAILABILITY_WINDOWS)))
+        self.timestamps = array('d')
+        self.latencies = array('f')
+        self.flags = bytearray()
+        self.count = 0
+        self._evicted_ts = None  # 最近一条被覆盖记录的时间戳
+        self._rolling = [_RollingWindow(window) for window in self.windows]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, ok, latency=None, ts=None):
+        """
+        record 功能说明:
+        # 记录一次检查结果，缓冲已满时覆盖最早的一条
+        # 输入: ok (检查是否通过), latency (可选的检查耗时，秒), ts (时间戳，默认当前时间) | 输出: 无
+        """
+        ts = time.time() if ts is None else ts
+        seq = self.count
+        capacity = self.capacity
+        flags = self.OK if ok else 0
+        if seq and (self.flags[(seq - 1) % capacity] ^ flags) & self.OK:
+            flags |= self.FLAP
+        latency_ms = 0.0
+        if latency is not None:
+            flags |= self.TIMED
+            latency_ms = latency * 1000
+
+        if seq < capacity:
+            self._expire(ts)
+            self.timestamps.append(ts)
+            self.latencies.append(latency_ms)
+            self.flags.append(flags)
+        else:
+            # 过期的记录和即将被覆盖的最早一条记录在同一趟中从各窗口减去
+            self._expire(ts, seq - capacity + 1)
+            slot = seq % capacity
+            self._evicted_ts = self.timestamps[slot]
+            self.timestamps[slot] = ts
+            self.latencies[slot] = latency_ms
+            self.flags[slot] = flags
+        self.count = seq + 1
+
+        flap = flags & self.FLAP
+        for rolling in self._rolling:
+            if ok:
+                rolling.successes += 1
+            if flap:
+                rolling.flaps += 1
+            if latency is not None:
+                rolling.timed += 1
+                rolling.latency_ms += latency_ms
+
+    def window_stats(self, window, now=None):
+        """
+        window_stats 功能说明:
+        # 返回一个滚动窗口（now-window, now]内的统计，窗口必须是构造时指定的窗口之一
+        # 输入: window (窗口秒数), now (可选的当前时间戳) | 输出: dict {window, checks, successes, rate, flaps,
+        #       avg_latency_ms, complete}，窗口内没有检查时rate和avg_latency_ms为None
+        # 异常处理: 窗口未被跟踪时抛出ValueError
+        """
+        rolling = self._rolling[self.windows.index(int(window))]
+        now = time.time() if now is None else now
+        self._expire(now)
+        checks = self.count - rolling.tail
+        return {
+            'window': rolling.seconds,
+            'checks': checks,
+            'successes': rolling.successes,
+            'rate': rolling.successes / checks if checks else None,
+            'flaps': rolling.flaps,
+            'avg_latency_ms': round(rolling.latency_ms / rolling.timed, 2) if rolling.timed else None,
+            'complete': self._evicted_ts is None or self._evicted_ts <= now - rolling.seconds,
+        }
+
+    def rate(self, window, now=None):
+        """
+        rate 功能说明:
+        # 滚动窗口内的成功率
+        # 输入: window (窗口秒数), now (可选的当前时间戳) | 输出: float 0~1，窗口内没有检查时为None
+        """
+        return self.window_stats(window, now)['rate']
+
+    def summary(self, now=None):
+        """
+        summary 功能说明:
+        # 返回所有滚动窗口的统计
+        # 输入: now (可选的当前时间戳) | 输出: dict {窗口标签(5m/1h/24h): window_stats结果}
+        """
+        now = time.time() if now is None else now
+        return {_window_label(window): self.window_stats(window, now) for window in self.windows}
+
+    def memory_bytes(self):
+        """
+        memory_bytes 功能说明:
+        # 缓冲数据占用的字节数（不含对象头）
+        # 输入: 无 | 输出: int
+        """
+        return (len(self.timestamps) * self.timestamps.itemsize + len(self.latencies) * self.latencies.itemsize
+                + len(self.flags))
+
+    def _expire(self, now, min_tail=0):
+        """从各窗口中减去已超出窗口时间的记录，以及序号小于min_tail（即将被覆盖）的记录"""
+        count = self.count
+        capacity = self.capacity
+        timestamps = self.timestamps
+        for rolling in self._rolling:
+            tail = rolling.tail
+            if tail >= min_tail and (tail >= count or timestamps[tail % capacity] > now - rolling.seconds):
+                continue
+            cutoff = now - rolling.seconds
+            while tail < count and (tail < min_tail or timestamps[tail % capacity] <= cutoff):
+                slot = tail % capacity
+                flags = self.flags[slot]
+                if flags & self.OK:
+                    rolling.successes -= 1
+                if flags & self.FLAP:
+                    rolling.flaps -= 1
+                if flags & self.TIMED:
+                    rolling.timed -= 1
+                    rolling.latency_ms -= self.latencies[slot]
+                tail += 1
+            rolling.tail = tail
+
+
+class _RollingWindow:
+    """RecentChecks中一个滚动窗口的尾指针（窗口内最早一条记录的序号）和窗口内的计数"""
+
+    __slots__ = ('seconds', 'tail', 'successes', 'flaps', 'timed', 'latency_ms')
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.tail = 0
+        self.successes = 0
+        self.flaps = 0
+        self.timed = 0
+        self.latency_ms = 0.0
+
+
+class MonitorStats:
+    """
+    MonitorStats 功能说明:
+    # 进程级的检查和登录计数器，在实际执行检查和登录的函数中记录，
+    # 不依赖监控循环的局部变量，指标端点和日志可随时读取
+    # 输入: 无 | 输出: 计数器快照
+
+    属性说明:
+    - checks / successes: 检查总次数和成功次数
+    - consecutive_failures: 当前连续失败次数，成功后归零
+    - login_outcomes: 各登录结果的次数 {success, failure, error}
+    - last_success_time: 最近一次检查成功的时间戳（time.time()），从未成功时为None
+    - recent: 最近检查的环形缓冲（RecentChecks），提供滚动成功率
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recent = RecentChecks()
+        self.checks = 0
+        self.successes = 0
+        self.consecutive_failures = 0
+        self.login_outcomes = {outcome: 0 for outcome in LOGIN_OUTCOMES}
+        self.last_success_time = None
+
+    def record_check(self, ok, result=None):
+        """
+        record_check 功能说明:
+        # 记录一次状态检查结果，同时写入最近检查的环形缓冲
+        # 输入: ok (bool, 检查是否通过), result (可选的ProbeResult，提供检查耗时) | 输出: 无
+        """
+        latency = result.total_time if result is not None else None
+        with self._lock:
+            self.recent.record(ok, latency)
+            self.checks += 1
+            if ok:
+                self.successes += 1
+                self.consecutive_failures = 0
+                self.last_success_time = time.time()
+            else:
+                self.consecutive_failures += 1
+
+    def record_login(self, outcome):
+        """
+        record_login 功能说明:
+        # 记录一次自动登录尝试的结果
+        # 输入: outcome (success/failure/error) | 输出: 无
+        """
+        with self._lock:
+            self.login_outcomes[outcome if outcome in LOGIN_OUTCOMES else 'error'] += 1
+
+    def rolling(self, now=None):
+        """
+        rolling 功能说明:
+        # 返回各滚动窗口（默认5分钟、1小时、24小时）的检查次数、成功率、翻转次数和平均耗时
+        # 输入: now (可选的当前时间戳) | 输出: dict {窗口标签: RecentChecks.window_stats结果}
+        """
+        with self._lock:
+            return self.recent.summary(now)
+
+    def format_rolling(self, now=None):
+        """
+        format_rolling 功能说明:
+        # 把滚动成功率格式化为一行日志，例如 "5m 98.3%(60次) | 1h 99.1%(700次) | 24h 无检查"
+        # 输入: now (可选的当前时间戳) | 输出: str
+        """
+        parts = []
+        for label, data in self.rolling(now).items():
+            if data['checks']:
+                flaps = f", 翻转{data['flaps']}次" if data['flaps'] else ''
+                parts.append(f"{label} {data['rate'] * 100:.1f}%({data['checks']}次{flaps})")
+            else:
+                parts.append(f"{label} 无检查")
+        return ' | '.join(parts)
+
+    def snapshot(self):
+        """
+        snapshot 功能说明:
+        # 返回计数器快照
+        # 输入: 无 | 输出: dict {checks, successes, consecutive_failures, login_attempts, login_outcomes, last_success_time,
+        #       availability: {窗口标签: 滚动成功率或None}}
+        """
+        with self._lock:
+            rolling = self.recent.summary()
+            return {
+                'checks': self.checks,
+                'successes': self.successes,
+                'consecutive_failures': self.consecutive_failures,
+                'login_attempts': sum(self.login_outcomes.values()),
+                'login_outcomes': dict(self.login_outcomes),
+                'last_success_time': self.last_success_time,
+                'availability': {label: data['rate'] for label, data in rolling.items()},
+            }
+
+
+def get_latency_recorder():
+    """
+    get_latency_recorder 功能说明:
+    # 获取进程共享的耗时记录器，第一次调用时创建
+    # 输入: 无 | 输出: LatencyRecorder实例
+    """
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = LatencyRecorder()
+        return _recorder
+
+
+def get_monitor_stats():
+    """
+    get_monitor_stats 功能说明:
+    # 获取进程共享的检查和登录计数器，第一次调用时创建
+    # 输入: 无 | 输出: MonitorStats实例
+    """
+    global _monitor_stats
+    with _monitor_stats_lock:
+        if _monitor_stats is None:
+            _monitor_stats = MonitorStats()
+        return _monitor_stats
+
+
+def get_account_stats(name):
+    """
+    get_account_stats 功能说明:
+    # 获取指定账号的检查和登录计数器，第一次调用时创建
+    # 账号计数器只记录该账号的结果，汇总结果仍由共享的MonitorStats记录
+    # 输入: name (账号名称) | 输出: MonitorStats实例
+    """
+    with _account_stats_lock:
+        stats = _account_stats.get(name)
+        if stats is None:
+            stats = _account_stats[name] = MonitorStats()
+        return stats
+
+
+def account_stats_snapshot():
+    """
+    account_stats_snapshot 功能说明:
+    # 返回所有账号计数器的快照，未启用多账号监管时为空字典
+    # 输入: 无 | 输出: dict {账号名: MonitorStats.snapshot()}
+    """
+    with _account_stats_lock:
+        accounts = list(_account_stats.items())
+    return {name: stats.snapshot() for name, stats in accounts}
@@ -1,5 +1,20 @@
 ##########wechat_monitor_enhanced.py: [增强版微信监控程序] ##################
 # 变更记录: [2024-06-24] @李祥光 [完善详细注释和文档]########
+# 变更记录: [2026-10-16] @李祥光 [监控循环接入自适应调度器]########
+# 变更记录: [2026-10-16] @李祥光 [等待改为事件唤醒，关闭/重载配置/立即检查可立即打断等待]########
+# 变更记录: [2026-10-16] @李祥光 [支持异步日志模式，关闭时清空日志队列]########
+# 变更记录: [2026-10-16] @李祥光 [监控循环改为状态变化日志，重复异常和错误折叠为周期汇总]########
+# 变更记录: [2026-10-16] @李祥光 [周期统计和结束统计输出各阶段耗时p50/p95/p99/max]########
+# 变更记录: [2026-10-16] @李祥光 [可选启动本地Prometheus指标端点，关闭时停止]########
+# 变更记录: [2026-10-16] @李祥光 [关闭请求同时取消正在进行的登录等待]########
+# 变更记录: [2026-10-16] @李祥光 [添加多账号监管模式（--supervisor/--accounts），各账号独立线程和调度]########
+# 变更记录: [2026-10-16] @李祥光 [结束统计输出各操作wxautox调用/超时次数]########
+# 变更记录: [2026-10-16] @李祥光 [添加--engine async，选择asyncio监控引擎]########
+# 变更记录: [2026-10-16] @李祥光 [监控循环改为驱动MonitorStateMachine.tick，不再调用不返回的monitor_wechat，连续失败计数恢复生效]########
+# 变更记录: [2026-10-16] @李祥光 [启动检查历史存储（--history-db/HISTORY_CONFIG），关闭时写入剩余记录]########
+# 变更记录: [2026-10-16] @李祥光 [周期统计和结束统计输出5分钟/1小时/24小时滚动成功率]########
+# 变更记录: [2026-10-16] @李祥光 [启动前日志清理和按大小轮转后的清理改用rotate_log_dir，按保留天数和日志目录总大小上限删除]########
+# 变更记录: [2026-10-16] @李祥光 [启动后在后台压缩不再写入的日志，关闭时输出本次运行压缩节省的空间]########
 # 输入: [命令行参数] | 输出: [监控状态和日志]###############
 
 
@@ -8,8 +23,14 @@
 setup_enhanced_logging：设置增强版日志系统，支持多级别日志和文件轮转
 parse_arguments：解析命令行参数，支持版本信息和配置选项
 load_custom_config：动态加载自定义配置，支持配置验证和更新
+reload_base_config：重新读取config.py，原地更新各配置字典
 monitor_loop：智能监控主循环，实现7x24小时微信状态监控
+supervisor_loop：多账号监管主循环，各账号到期后由有界工作线程池检查，主线程负责卡住检测、汇总和关闭
+engine_loop：asyncio引擎主循环，单账号或多账号都由AsyncMonitorEngine的任务完成检查、登录等待和通知
 handle_shutdown：优雅关闭处理器，确保资源正确释放和状态保存
+request_shutdown：关闭信号处理器，只记录信号、唤醒监控循环并取消登录等待，关闭流程回到主流程执行
+request_config_reload：请求重新加载配置，立即唤醒监控循环
+request_check_now：请求立即执行一次检查，立即唤醒监控循环
 main：程序主入口，协调所有组件的初始化和运行
 """
 ###########################文件下的所有函数###########################
@@ -24,13 +45,27 @@ flowchart TD
     E --> F[load_custom_config加载自定义配置]
     F --> G[记录程序启动信息]
     G --> H[初始化核心组件]
-    H --> I[注册系统信号处理器]
-    I --> J[执行启动前日志清理]
+    H --> H1[start_metrics_server可选启动指标端点]
+    H1 --> H2[start_history_store启动检查历史存储]
+    H2 --> I[注册系统信号处理器]
+    I --> J[执行启动前日志清理: rotate_log_dir按保留天数和总大小上限删除]
+    J --> J1[schedule_log_rotation后台压缩轮转备份和前一天的日志]
     J --> K[发送启动完成通知]
     K --> L[monitor_loop启动主监控循环]
+    K -->|--supervisor/--accounts| L1[supervisor_loop多账号监管]
+    L1 --> L2[AccountSupervisor: DeadlineScheduler按到期时间派发到有界工作线程池]
+    L2 --> O
+    K -->|--engine async| L3[engine_loop: AsyncMonitorEngine探测/登录/通知任务]
+    L3 --> O
     L --> M{监控循环运行中}
-    M -->|正常运行| N[微信状态检查]
-    M -->|接收到关闭信号| O[handle_shutdown优雅关闭]
+    M -->|正常运行| M3[MonitorStateMachine.tick: 到期时检查或自动登录]
+    M3 --> N[微信状态检查]
+    M -->|接收到关闭信号| M0[request_shutdown唤醒循环并取消登录等待]
+    M0 --> O[handle_shutdown优雅关闭]
+    M -->|SIGHUP| M1[request_config_reload重载配置]
+    M -->|SIGUSR1/SIGBREAK| M2[request_check_now立即检查]
+    M1 --> M
+    M2 --> M
     N --> P{微信状态}
     P -->|正常| Q[等待下次检查]
     P -->|异常| R[自动登录恢复]
@@ -49,36 +84,59 @@ flowchart TD
 
 import os
 import sys
-import time
 import signal
+import asyncio
 import logging
 import argparse
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
 
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import MONITOR_CONFIG
+from config import MONITOR_CONFIG, LOG_CONFIG
 from wechat_utils import NotificationManager, setup_logging
-from wechat_auto_login import monitor_wechat
+from wechat_auto_login import check_wechat_status, auto_login_wechat, get_probe_pipeline
+from wechat_connection import get_shared_connection
+from wechat_scheduler import CheckScheduler, MonitorWakeup
+from wechat_logging import start_async_logging, stop_async_logging, async_logging_stats, get_state_logger
+from wechat_logging import rotate_log_dir, rotate_then_clean, schedule_log_rotation, wait_log_rotation
+from wechat_logging import log_compression_stats, format_compression_result
+from wechat_metrics import get_latency_recorder
+from wechat_exporter import start_metrics_server, stop_metrics_server
+from wechat_login import get_login_watcher
+from wechat_supervisor import AccountSupervisor, load_accounts, default_account
+from wechat_async import AsyncMonitorEngine
+from wechat_backend import backend_pool_stats
+from wechat_state import MonitorStateMachine, probe_state, ONLINE, DEGRADED, LOGGING_IN, BACKOFF
+from wechat_metrics import get_monitor_stats
+from config import METRICS_CONFIG, ACCOUNTS_CONFIG, HISTORY_CONFIG
+from wechat_history import start_history_store, stop_history_store
 
 # 全局变量
 notification_manager = None
 shutdown_flag = False
+shutdown_signal = None  # 触发关闭的信号编号
 start_time = None
+config_path = None  # 自定义配置文件路径，重载配置时使用
+wakeup = MonitorWakeup()  # 监控循环等待唤醒器
+supervisor = None  # 多账号监管器，仅监管模式下创建
+engine = None  # asyncio监控引擎，仅--engine async时创建
 
-def setup_enhanced_logging(log_level: str = "INFO", enable_file_rotation: bool = True) -> None:
+def setup_enhanced_logging(log_level: str = "INFO", enable_file_rotation: bool = True,
+                           async_logging: Optional[bool] = None) -> None:
     """
     setup_enhanced_logging 功能说明:
     # 核心业务逻辑：设置增强版日志系统，支持多级别日志记录和文件轮转管理
-    # 输入: [log_level: 日志级别字符串, enable_file_rotation: 是否启用文件轮转] | 输出: [无返回值，配置全局日志系统]
+    # 输入: [log_level: 日志级别字符串, enable_file_rotation: 是否启用文件轮转,
+    #        async_logging: 是否启用异步日志，默认取LOG_CONFIG['async_logging']] | 输出: [无返回值，配置全局日志系统]
     # 核心职责：
     # 1. 创建logs目录结构
     # 2. 配置多级别日志处理器（控制台+文件）
     # 3. 设置日志格式和轮转策略
     # 4. 支持调试模式和生产模式切换
+    # 5. 异步模式下监控线程只入队，由后台线程完成格式化和文件/控制台写入
     """
     try:
         # 创建日志目录
@@ -108,9 +166,11 @@ def setup_enhanced_logging(log_level: str = "INFO", enable_file_rotation: bool =
             from logging.handlers import RotatingFileHandler
             file_handler = RotatingFileHandler(
                 log_dir / "wechat_monitor.log",
-                maxBytes=10*1024*1024,  # 10MB
+                maxBytes=int(LOG_CONFIG.get('log_file_max_size', 10) * 1024 * 1024),  # 默认10MB
                 backupCount=5
             )
+            # 轮转后在后台按保留天数和日志目录总大小上限清理
+            file_handler.rotator = rotate_then_clean
         else:
             file_handler = logging.FileHandler(log_dir / "wechat_monitor.log")
         
@@ -122,6 +182,14 @@ def setup_enhanced_logging(log_level: str = "INFO", enable_file_rotation: bool =
         logging.root.addHandler(console_handler)
         logging.root.addHandler(file_handler)
         
+        # 异步日志：处理器交给后台监听线程，根日志器只保留有界队列处理器
+        if async_logging is None:
+            async_logging = LOG_CONFIG.get('async_logging', False)
+        if async_logging and start_async_logging():
+            logging.info(f"📝 增强版日志系统初始化完成 - 级别: {log_level}, 模式: 异步 "
+                         f"(队列 {LOG_CONFIG.get('log_queue_size', 10000)}, 溢出策略 {LOG_CONFIG.get('log_overflow_policy', 'drop_oldest')})")
+            return
+        
         logging.info(f"📝 增强版日志系统初始化完成 - 级别: {log_level}")
         
     except Exception as e:
@@ -148,6 +216,12 @@ def parse_arguments() -> argparse.Namespace:
   python wechat_monitor_enhanced.py                    # 使用默认配置启动
   python wechat_monitor_enhanced.py --version         # 显示版本信息
   python wechat_monitor_enhanced.py --log-level DEBUG # 启用调试模式
+  python wechat_monitor_enhanced.py --sync-logging    # 关闭异步日志，同步写入
+  python wechat_monitor_enhanced.py --metrics-port 9464 # 在本机9464端口提供Prometheus指标
+  python wechat_monitor_enhanced.py --supervisor      # 按ACCOUNTS_CONFIG同时监控多个账号
+  python wechat_monitor_enhanced.py --accounts accounts.json # 从JSON文件读取账号定义
+  python wechat_monitor_enhanced.py --engine async    # 使用asyncio监控引擎
+  python wechat_monitor_enhanced.py --history-db logs/history.db # 检查历史写入指定数据库
         """
     )
     
@@ -183,6 +257,48 @@ def parse_arguments() -> argparse.Namespace:
         help='启用调试模式（等同于 --log-level DEBUG）'
     )
     
+    # 同步日志参数
+    parser.add_argument(
+        '--sync-logging',
+        action='store_true',
+        help='关闭异步日志，日志在调用线程中同步写入（默认按LOG_CONFIG配置）'
+    )
+    
+    # 指标端点参数
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        help='在本机指定端口启动Prometheus指标端点 /metrics（默认按METRICS_CONFIG配置）'
+    )
+    
+    # 多账号监管参数
+    parser.add_argument(
+        '--supervisor',
+        action='store_true',
+        help='启用多账号监管模式，按ACCOUNTS_CONFIG同时监控多个账号（默认按ACCOUNTS_CONFIG配置）'
+    )
+    
+    parser.add_argument(
+        '--accounts',
+        type=str,
+        help='从指定JSON文件读取账号定义并启用多账号监管模式'
+    )
+    
+    # 监控引擎参数
+    parser.add_argument(
+        '--engine',
+        choices=['thread', 'async'],
+        default='thread',
+        help='监控引擎：thread=线程版监控循环/多账号监管，async=asyncio引擎 (默认: thread)'
+    )
+    
+    # 检查历史存储参数
+    parser.add_argument(
+        '--history-db',
+        type=str,
+        help='把检查、登录和通知历史写入指定SQLite数据库（默认按HISTORY_CONFIG配置）'
+    )
+    
     args = parser.parse_args()
     
     # 调试模式处理
@@ -250,6 +366,26 @@ def load_custom_config(config_path: Optional[str] = None) -> Dict[str, Any]:
     logging.info(f"📋 配置加载完成 - 监控间隔: {config['check_interval']}秒")
     return config
 
+def reload_base_config() -> None:
+    """
+    reload_base_config 功能说明:
+    # 核心业务逻辑：重新读取config.py并原地更新各配置字典
+    # 输入: [无] | 输出: [无返回值，MONITOR_CONFIG等字典被原地更新]
+    # 说明：各模块通过from config import引用的是同一个字典对象，
+    #       原地update后所有模块都能看到新配置，无需重新导入
+    """
+    try:
+        import runpy
+        import config as base_config
+        fresh = runpy.run_path(base_config.__file__)
+        for name in ('MONITOR_CONFIG', 'LOG_CONFIG', 'WECHAT_CONFIG', 'NOTIFICATION_CONFIG', 'METRICS_CONFIG',
+                     'ACCOUNTS_CONFIG', 'HISTORY_CONFIG'):
+            if isinstance(fresh.get(name), dict):
+                getattr(base_config, name).update(fresh[name])
+        logging.info("✅ 已重新读取 config.py")
+    except Exception as e:
+        logging.warning(f"⚠️ 重新读取 config.py 失败: {e}，继续使用当前配置")
+
 def monitor_loop(config: Dict[str, Any]) -> None:
     """
     monitor_loop 功能说明:
@@ -263,8 +399,8 @@ def monitor_loop(config: Dict[str, Any]) -> None:
     # 5. 实现智能等待和资源管理
     # 监控策略：
     # - 定期检查微信进程状态
-    # - 连续失败时触发自动登录
-    # - 智能调整检查间隔
+    # - 连续失败时触发自动登录（MonitorStateMachine决定检查或登录，状态变化时输出日志和通知）
+    # - 智能调整检查间隔（CheckScheduler：健康时拉长、首次失败快速复查、登录失败指数退避、随机抖动）
     # - 异常情况下的容错处理
     # 容错机制：
     # - 网络异常重试
@@ -281,10 +417,41 @@ def monitor_loop(config: Dict[str, Any]) -> None:
     # 初始化监控参数
     check_interval = config.get('check_interval', 30)
     max_retry_count = config.get('max_retry_count', 3)
-    continuous_failure_count = 0
-    last_check_time = datetime.now()
     total_checks = 0
     successful_checks = 0
+    state_log = get_state_logger()  # 状态变化日志，重复状态折叠为周期汇总
+    
+    def on_transition(machine, old, new):
+        # 自动登录开始、成功、失败的日志和通知由状态变化触发
+        if new == LOGGING_IN:
+            state_log.log('monitor_loop.login', 'started', logging.ERROR,
+                          f"🚨 连续 {machine.failure_count} 次检查失败，尝试自动登录恢复...")
+            if notification_manager:
+                notification_manager.send_notification(
+                    "🚨 微信状态异常", 
+                    f"连续 {machine.failure_count} 次检查失败\n正在尝试自动恢复..."
+                )
+        elif old == LOGGING_IN and new == ONLINE:
+            state_log.reset('monitor_loop.login')
+            state_log.reset('monitor_loop.status')
+            state_log.recovered('monitor_loop.login_result', "✅ 自动登录成功，微信状态已恢复")
+            if notification_manager:
+                notification_manager.send_notification(
+                    "✅ 微信状态恢复", 
+                    "自动登录成功\n微信状态已恢复正常"
+                )
+        elif new == BACKOFF:
+            state_log.log('monitor_loop.login_result', 'failed', logging.ERROR,
+                          "❌ 自动登录失败，将在下次检查时重试")
+    
+    # 监控状态机：连续失败max_retry_count次后自动登录，会话检查失败只快速复查
+    machine = MonitorStateMachine(
+        check=lambda: probe_state(check_wechat_status(), get_probe_pipeline().last_result),
+        login=lambda: auto_login_wechat(wakeup),
+        config=config,
+        scheduler=CheckScheduler(config, base_interval=check_interval),
+    )
+    machine.on_transition.append(on_transition)
     
     logging.info(f"🚀 监控循环启动 - 检查间隔: {check_interval}秒, 最大重试: {max_retry_count}次")
     
@@ -296,84 +463,74 @@ def monitor_loop(config: Dict[str, Any]) -> None:
         )
     
     try:
-        # 主监控循环
-        while not shutdown_flag:
+        # 主监控循环：每轮推进一次状态机，再按返回的秒数等待
+        while not shutdown_flag and not wakeup.is_shutdown:
             try:
-                current_time = datetime.now()
-                total_checks += 1
-                
-                logging.debug(f"🔍 执行第 {total_checks} 次状态检查...")
+                failures_before = machine.failure_count
+                checks_before = machine.checks
+                if machine.next_action() == machine.CHECK:
+                    logging.debug(f"🔍 执行第 {machine.checks + 1} 次状态检查...")
                 
-                # 微信状态检查
-                wechat_status = monitor_wechat()
+                # 到期时执行一次状态检查或自动登录（登录等待可被关闭请求立即打断）
+                wait_time = machine.tick()
                 
-                if wechat_status:
-                    # 微信状态正常
-                    successful_checks += 1
-                    continuous_failure_count = 0
-                    
-                    if total_checks % 10 == 0:  # 每10次检查记录一次统计
-                        success_rate = (successful_checks / total_checks) * 100
-                        logging.info(f"📊 监控统计 - 总检查: {total_checks}, 成功率: {success_rate:.1f}%")
-                
-                else:
-                    # 微信状态异常
-                    continuous_failure_count += 1
-                    logging.warning(f"⚠️ 微信状态异常 - 连续失败: {continuous_failure_count}/{max_retry_count}")
-                    
-                    # 连续失败处理
-                    if continuous_failure_count >= max_retry_count:
-                        logging.error(f"🚨 连续 {continuous_failure_count} 次检查失败，尝试自动登录恢复...")
-                        
-                        # 发送告警通知
-                        if notification_manager:
-                            notification_manager.send_notification(
-                                "🚨 微信状态异常", 
-                                f"连续 {continuous_failure_count} 次检查失败\n正在尝试自动恢复..."
-                            )
+                if machine.checks > checks_before:
+                    total_checks = machine.checks
+                    if machine.state in (ONLINE, DEGRADED):
+                        # 微信状态正常，从异常中恢复时输出一次恢复信息
+                        successful_checks += 1
+                        if failures_before:
+                            state_log.recovered('monitor_loop.status',
+                                                f"✅ 微信状态已恢复正常 (此前连续异常 {failures_before} 次)")
                         
-                        # 自动登录恢复
-                        try:
-                            from wechat_auto_login import auto_login_wechat
-                            login_result = auto_login_wechat()
-                            
-                            if login_result:
-                                logging.info("✅ 自动登录成功，微信状态已恢复")
-                                continuous_failure_count = 0
-                                
-                                # 发送恢复通知
-                                if notification_manager:
-                                    notification_manager.send_notification(
-                                        "✅ 微信状态恢复", 
-                                        "自动登录成功\n微信状态已恢复正常"
-                                    )
-                            else:
-                                logging.error("❌ 自动登录失败，将在下次检查时重试")
-                                
-                        except Exception as login_error:
-                            logging.error(f"💥 自动登录过程中发生错误: {login_error}")
+                        if total_checks % 10 == 0:  # 每10次检查记录一次统计
+                            success_rate = (successful_checks / total_checks) * 100
+                            logging.info(f"📊 监控统计 - 总检查: {total_checks}, 成功率: {success_rate:.1f}%, "
+                                         f"滚动成功率: {get_monitor_stats().format_rolling()}, "
+                                         f"阶段耗时: {get_latency_recorder().format_summary()}")
+                    else:
+                        # 微信状态异常
+                        state_log.log('monitor_loop.status', 'failing', logging.WARNING,
+                                      f"⚠️ 微信状态异常 - 连续失败: {machine.failure_count}/{max_retry_count}")
+                
+                state_log.reset('monitor_loop.error')  # 本轮未出现循环错误
                 
-                last_check_time = current_time
+                # 进入自动登录状态时立即执行登录
+                if wait_time <= 0:
+                    continue
+                logging.debug(f"⏱️ 下次检查等待 {wait_time:.1f}秒 ({machine.scheduler.last_reason})")
                 
-                # 分段等待，支持优雅关闭
-                wait_segments = max(1, check_interval // 5)  # 将等待时间分成5段
-                segment_time = check_interval / wait_segments
+                # 事件唤醒等待：关闭、配置重载、立即检查请求都会立即打断等待
+                reason = wakeup.wait(wait_time)
+                if reason is not None:
+                    logging.info(f"🔔 等待被唤醒: {wakeup.describe(reason)}")
                 
-                for _ in range(wait_segments):
-                    if shutdown_flag:
-                        break
-                    time.sleep(segment_time)
+                if reason == MonitorWakeup.SHUTDOWN:
+                    break
+                elif reason == MonitorWakeup.RELOAD:
+                    # 重新加载配置并按新参数更新调度器，状态、连续失败次数和登录退避保留
+                    reload_base_config()
+                    config = load_custom_config(config_path)
+                    check_interval = config.get('check_interval', 30)
+                    max_retry_count = config.get('max_retry_count', 3)
+                    machine.reload(config, base_interval=check_interval)
+                    logging.info(f"🔄 配置已重新加载 - 检查间隔: {check_interval}秒, 最大重试: {max_retry_count}次")
+                if reason is not None:
+                    machine.check_now()  # 被唤醒后立即执行下一次动作
                 
             except KeyboardInterrupt:
                 logging.info("⌨️ 接收到键盘中断信号")
                 break
                 
             except Exception as loop_error:
-                logging.error(f"💥 监控循环中发生错误: {loop_error}")
-                logging.error(f"🔍 错误类型: {type(loop_error).__name__}")
+                state_log.log('monitor_loop.error', f"error:{type(loop_error).__name__}:{loop_error}",
+                              logging.ERROR,
+                              f"💥 监控循环中发生错误: {loop_error}",
+                              f"🔍 错误类型: {type(loop_error).__name__}")
                 
-                # 错误恢复等待
-                time.sleep(min(30, check_interval))
+                # 错误恢复等待，关闭请求会立即打断
+                if wakeup.wait(min(30, check_interval)) == MonitorWakeup.SHUTDOWN:
+                    break
                 continue
     
     except Exception as e:
@@ -386,11 +543,21 @@ def monitor_loop(config: Dict[str, Any]) -> None:
         runtime = (end_time - start_time).total_seconds() if start_time else 0
         success_rate = (successful_checks / total_checks * 100) if total_checks > 0 else 0
         
+        # 先输出尚未汇总的重复日志计数
+        state_log.flush()
         logging.info(f"📊 监控循环结束统计:")
         logging.info(f"   ⏱️ 运行时间: {runtime:.2f}秒")
         logging.info(f"   🔍 总检查次数: {total_checks}")
         logging.info(f"   ✅ 成功次数: {successful_checks}")
         logging.info(f"   📈 成功率: {success_rate:.1f}%")
+        logging.info(f"   🕒 滚动成功率: {get_monitor_stats().format_rolling()}")
+        logging.info(f"   🔌 微信连接: {get_shared_connection().stats()}")
+        logging.info(f"   🧪 探测阶段耗时: {get_probe_pipeline().stage_stats()}")
+        logging.info(f"   ⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
+        logging.info(f"   ⏳ 微信调用: {backend_pool_stats()}")
+        logging.info(f"   🔁 折叠的重复日志: {state_log.suppressed} 条 (日志模式: {state_log.mode})")
+        if notification_manager:
+            logging.info(f"   📨 通知投递: {notification_manager.metrics()}")
         
         # 发送结束通知
         if notification_manager:
@@ -399,6 +566,105 @@ def monitor_loop(config: Dict[str, Any]) -> None:
                 f"运行时间: {runtime:.0f}秒\n检查次数: {total_checks}\n成功率: {success_rate:.1f}%"
             )
 
+def supervisor_loop(config: Dict[str, Any], accounts: list) -> None:
+    """
+    supervisor_loop 功能说明:
+    # 核心业务逻辑：多账号监管主循环，各账号按自己的调度器到期后由有界工作线程池检查和自动登录
+    # 输入: [config: 配置字典, accounts: load_accounts返回的账号定义列表] | 输出: [无返回值，收到关闭请求后返回]
+    # 说明：
+    # - 某个账号变慢或卡住只占用一个工作线程，主线程定期检查并对卡住的账号告警
+    # - 各账号的检查和登录结果计入账号计数器，同时汇总到共享计数器和指标端点
+    # - 立即检查请求转发给所有账号；配置重载后各账号按新配置更新调度器参数
+    """
+    global supervisor
+    
+    supervisor = AccountSupervisor(accounts, notification_manager)
+    state_log = get_state_logger()
+    names = ', '.join(account['name'] for account in accounts)
+    logging.info(f"👥 多账号监管模式启动 - 账号数: {len(accounts)} ({names})")
+    
+    if notification_manager:
+        notification_manager.send_notification(
+            "🤖 微信监控启动", 
+            f"多账号监管已启动\n账号: {names}\n启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+    
+    try:
+        supervisor.run(wakeup, on_reload=reload_base_config)
+    finally:
+        # 调度已停止（卡在微信调用中的检查不再等待），输出汇总统计
+        end_time = datetime.now()
+        runtime = (end_time - start_time).total_seconds() if start_time else 0
+        totals = get_monitor_stats().snapshot()
+        success_rate = (totals['successes'] / totals['checks'] * 100) if totals['checks'] else 0
+        
+        state_log.flush()
+        logging.info(f"📊 多账号监管结束统计:")
+        logging.info(f"   ⏱️ 运行时间: {runtime:.2f}秒")
+        logging.info(f"   🔍 总检查次数: {totals['checks']} (全部账号)")
+        logging.info(f"   📈 成功率: {success_rate:.1f}%")
+        logging.info(f"   🕒 滚动成功率: {get_monitor_stats().format_rolling()}")
+        for name, snap in supervisor.snapshot().items():
+            logging.info(f"   👤 {name}: 状态 {snap['state']}, 检查 {snap['checks']}, 成功 {snap['successes']}, "
+                         f"连续失败 {snap['failure_count']}, 登录尝试 {snap['login_attempts']}")
+        logging.info(f"   🗓️ 账号调度: {supervisor.scheduler.stats()}")
+        logging.info(f"   ⏳ 微信调用: {backend_pool_stats()}")
+        logging.info(f"   ⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
+        if notification_manager:
+            logging.info(f"   📨 通知投递: {notification_manager.metrics()}")
+            notification_manager.send_notification(
+                "🏁 监控程序结束", 
+                f"运行时间: {runtime:.0f}秒\n账号数: {len(accounts)}\n检查次数: {totals['checks']}\n成功率: {success_rate:.1f}%"
+            )
+
+def engine_loop(config: Dict[str, Any], accounts: list) -> None:
+    """
+    engine_loop 功能说明:
+    # 核心业务逻辑：asyncio引擎主循环，在主线程中运行事件循环直到收到关闭请求
+    # 输入: [config: 配置字典, accounts: 账号定义列表，单账号模式为[default_account()]] | 输出: [无返回值，收到关闭请求后返回]
+    # 说明：
+    # - 阻塞的wxautox调用在引擎线程池中执行，检查间隔和登录轮询间隔都是可取消的等待
+    # - 信号处理函数仍只唤醒MonitorWakeup，由引擎的唤醒任务转发关闭、重载和立即检查请求
+    """
+    global engine
+    
+    engine = AsyncMonitorEngine(accounts, notification_manager)
+    state_log = get_state_logger()
+    names = ', '.join(account['name'] for account in accounts)
+    logging.info(f"⚡ asyncio引擎模式启动 - 账号数: {len(accounts)} ({names})")
+    
+    if notification_manager:
+        notification_manager.send_notification(
+            "🤖 微信监控启动", 
+            f"asyncio引擎已启动\n账号: {names}\n启动时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        )
+    
+    try:
+        asyncio.run(engine.run(wakeup, on_reload=reload_base_config))
+    finally:
+        end_time = datetime.now()
+        runtime = (end_time - start_time).total_seconds() if start_time else 0
+        totals = get_monitor_stats().snapshot()
+        success_rate = (totals['successes'] / totals['checks'] * 100) if totals['checks'] else 0
+        
+        state_log.flush()
+        logging.info(f"📊 asyncio引擎结束统计:")
+        logging.info(f"   ⏱️ 运行时间: {runtime:.2f}秒")
+        logging.info(f"   🔍 总检查次数: {totals['checks']} (全部账号)")
+        logging.info(f"   📈 成功率: {success_rate:.1f}%")
+        logging.info(f"   🕒 滚动成功率: {get_monitor_stats().format_rolling()}")
+        for name, snap in engine.snapshot().items():
+            logging.info(f"   👤 {name}: 状态 {snap['state']}, 检查 {snap['checks']}, 成功 {snap['successes']}, "
+                         f"连续失败 {snap['failure_count']}, 登录尝试 {snap['login_attempts']}")
+        logging.info(f"   ⏱️ 阶段耗时分位数: {get_latency_recorder().format_summary()}")
+        logging.info(f"   ⏳ 微信调用: {backend_pool_stats()}")
+        if notification_manager:
+            logging.info(f"   📨 通知投递: {notification_manager.metrics()}")
+            notification_manager.send_notification(
+                "🏁 监控程序结束", 
+                f"运行时间: {runtime:.0f}秒\n账号数: {len(accounts)}\n检查次数: {totals['checks']}\n成功率: {success_rate:.1f}%"
+            )
+
 def handle_shutdown(signum: int = None, frame = None) -> None:
     """
     handle_shutdown 功能说明:
@@ -427,6 +693,12 @@ def handle_shutdown(signum: int = None, frame = None) -> None:
         return
     
     shutdown_flag = True
+    wakeup.notify(MonitorWakeup.SHUTDOWN)  # 立即打断监控循环中的等待
+    get_login_watcher().cancel()  # 立即结束正在进行的登录等待
+    if supervisor is not None:
+        supervisor.request_stop()  # 多账号监管：结束各账号的监控和登录等待
+    if engine is not None:
+        engine.request_stop()  # asyncio引擎：结束所有任务
     
     # 记录关闭信号信息
     if signum:
@@ -443,6 +715,9 @@ def handle_shutdown(signum: int = None, frame = None) -> None:
         # 日志系统清理
         logging.info("🧹 开始执行优雅关闭流程...")
         
+        # 停止指标端点，释放端口
+        stop_metrics_server()
+        
         # 发送关闭通知
         if notification_manager:
             try:
@@ -454,9 +729,24 @@ def handle_shutdown(signum: int = None, frame = None) -> None:
                     f"程序已安全关闭\n运行时间: {runtime:.0f}秒\n关闭时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}"
                 )
                 logging.info("📱 关闭通知已发送")
+                
+                # 等待后台投递线程发送完剩余通知
+                notification_manager.close()
             except Exception as notify_error:
                 logging.warning(f"⚠️ 发送关闭通知失败: {notify_error}")
         
+        # 写入剩余的检查历史并关闭数据库
+        history_stats = stop_history_store()
+        if history_stats:
+            logging.info(f"🗄️ 检查历史已保存: {history_stats['path']} "
+                         f"(写入 {history_stats['written']} 条, 丢弃 {history_stats['dropped']} 条)")
+        
+        # 等待进行中的日志压缩和清理结束，输出本次运行压缩节省的空间
+        wait_log_rotation(timeout=5)
+        compression = log_compression_stats()
+        if compression['files']:
+            logging.info(f"🗜️ 本次运行压缩日志: {format_compression_result(compression)}")
+        
         # 资源清理和状态保存
         try:
             # 清理临时文件
@@ -517,6 +807,12 @@ def handle_shutdown(signum: int = None, frame = None) -> None:
     finally:
         # 最终清理和退出确认
         try:
+            # 异步日志：等待后台线程写完队列中剩余的日志，并把处理器还原为同步写入
+            log_stats = async_logging_stats()
+            if log_stats:
+                logging.info(f"📝 异步日志统计: 入队 {log_stats['enqueued']} 条, 丢弃 {log_stats['dropped']} 条")
+                stop_async_logging()
+            
             # 刷新所有日志处理器
             for handler in logging.root.handlers:
                 handler.flush()
@@ -528,6 +824,44 @@ def handle_shutdown(signum: int = None, frame = None) -> None:
         except Exception as final_error:
             print(f"⚠️ 最终清理时发生错误: {final_error}")
 
+def request_shutdown(signum: int = None, frame = None) -> None:
+    """
+    request_shutdown 功能说明:
+    # 核心业务逻辑：SIGINT/SIGTERM信号处理器，只记录信号并立即唤醒监控循环
+    # 输入: [signum: 信号编号, frame: 信号帧] | 输出: [无返回值]
+    # 说明：信号处理函数中不写日志，避免与异步日志队列的锁发生重入死锁；
+    #       监控循环退出后由main在主流程中调用handle_shutdown完成关闭；
+    #       再次收到关闭信号时抛出KeyboardInterrupt，强制打断仍在进行的阻塞操作
+    """
+    global shutdown_signal
+    if wakeup.is_shutdown:
+        raise KeyboardInterrupt
+    shutdown_signal = signum
+    wakeup.notify(MonitorWakeup.SHUTDOWN)
+    get_login_watcher().cancel()  # 立即结束正在进行的登录等待
+    if supervisor is not None:
+        supervisor.request_stop()  # 多账号监管：同时打断各账号的登录等待
+    if engine is not None:
+        engine.request_stop()  # asyncio引擎：打断所有等待
+
+def request_config_reload(signum: int = None, frame = None) -> None:
+    """
+    request_config_reload 功能说明:
+    # 核心业务逻辑：请求监控循环重新加载配置，可作为SIGHUP信号处理器或由外部直接调用
+    # 输入: [signum: 信号编号, frame: 信号帧] | 输出: [无返回值，立即唤醒监控循环]
+    # 说明：唤醒原因由监控循环记录日志，这里不写日志以保证信号处理函数安全
+    """
+    wakeup.notify(MonitorWakeup.RELOAD)
+
+def request_check_now(signum: int = None, frame = None) -> None:
+    """
+    request_check_now 功能说明:
+    # 核心业务逻辑：请求监控循环立即执行一次检查，可作为SIGUSR1/SIGBREAK信号处理器或由外部直接调用
+    # 输入: [signum: 信号编号, frame: 信号帧] | 输出: [无返回值，立即唤醒监控循环]
+    # 说明：唤醒原因由监控循环记录日志，这里不写日志以保证信号处理函数安全
+    """
+    wakeup.notify(MonitorWakeup.CHECK_NOW)
+
 def main() -> None:
     """
     main 功能说明:
@@ -574,7 +908,7 @@ def main() -> None:
     # - 运行统计信息的汇总
     # - 退出状态和原因的记录
     """
-    global notification_manager, start_time
+    global notification_manager, start_time, config_path
     
     try:
         # 第一步：显示启动信息
@@ -596,14 +930,23 @@ def main() -> None:
         
         # 第四步：初始化日志系统
         print("📝 正在初始化增强版日志系统...")
-        setup_enhanced_logging(args.log_level)
+        setup_enhanced_logging(args.log_level, async_logging=False if args.sync_logging else None)
         print("✅ 日志系统初始化完成")
         
         # 第五步：加载自定义配置
         print("⚙️ 正在加载配置文件...")
-        config = load_custom_config(args.config)
+        config_path = args.config
+        config = load_custom_config(config_path)
         print(f"✅ 配置加载完成 - 监控间隔: {config['check_interval']}秒")
         
+        # 多账号监管模式：启动前读取并校验账号定义，定义有误时直接退出
+        accounts = None
+        if args.supervisor or args.accounts or ACCOUNTS_CONFIG.get('enabled'):
+            accounts = load_accounts(args.accounts)
+            print(f"✅ 多账号监管模式 - 账号数: {len(accounts)}")
+        if args.engine == 'async':
+            print("✅ 监控引擎: asyncio")
+        
         # 第六步：记录程序启动信息
         logging.info("🚀 " + "="*50)
         logging.info("🚀 微信监控程序启动 - Enhanced Edition v2.1.0")
@@ -629,6 +972,16 @@ def main() -> None:
             print(f"⚠️ 通知管理器初始化失败: {notify_error}")
             notification_manager = None
         
+        # 可选的本地指标端点，在后台线程中提供服务
+        if args.metrics_port is not None or METRICS_CONFIG.get('enabled'):
+            if start_metrics_server(port=args.metrics_port):
+                print("✅ 指标端点已启动")
+        
+        # 检查历史存储，由后台线程批量写入SQLite
+        if args.history_db or HISTORY_CONFIG.get('enabled'):
+            if start_history_store(args.history_db):
+                print("✅ 检查历史存储已启动")
+        
         logging.info("✅ 核心组件初始化完成")
         print("✅ 核心组件初始化完成")
         
@@ -636,10 +989,22 @@ def main() -> None:
         print("📡 正在注册系统信号处理器...")
         logging.info("📡 注册系统信号处理器...")
         
-        signal.signal(signal.SIGINT, handle_shutdown)   # Ctrl+C
-        signal.signal(signal.SIGTERM, handle_shutdown)  # 终止信号
+        signal.signal(signal.SIGINT, request_shutdown)   # Ctrl+C
+        signal.signal(signal.SIGTERM, request_shutdown)  # 终止信号
+        registered_signals = ["SIGINT", "SIGTERM"]
+        
+        # 配置重载和立即检查信号（按平台可用性注册）
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, request_config_reload)
+            registered_signals.append("SIGHUP(重载配置)")
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, request_check_now)
+            registered_signals.append("SIGUSR1(立即检查)")
+        elif hasattr(signal, 'SIGBREAK'):
+            signal.signal(signal.SIGBREAK, request_check_now)  # Windows: Ctrl+Break
+            registered_signals.append("SIGBREAK(立即检查)")
         
-        logging.info("✅ 信号处理器注册完成 (SIGINT, SIGTERM)")
+        logging.info(f"✅ 信号处理器注册完成 ({', '.join(registered_signals)})")
         print("✅ 信号处理器注册完成")
         
         # 第九步：执行启动前日志清理
@@ -647,16 +1012,15 @@ def main() -> None:
         logging.info("🧹 执行启动前日志清理...")
         
         try:
-            # 清理过期日志文件（保留最近7天）
-            log_dir = Path("logs")
-            if log_dir.exists():
-                cutoff_date = datetime.now() - timedelta(days=7)
-                for log_file in log_dir.glob("*.log*"):
-                    if log_file.stat().st_mtime < cutoff_date.timestamp():
-                        log_file.unlink()
-                        logging.debug(f"🗑️ 已清理过期日志: {log_file}")
+            # 清理日志文件：超过LOG_CONFIG['log_retention_days']天的，以及超出日志目录总大小上限的最旧日志
+            result = rotate_log_dir("logs")
             
-            logging.info("✅ 启动前清理完成")
+            logging.info(f"✅ 启动前清理完成 - 删除日志: {result['deleted']} 个, "
+                         f"释放: {result['freed_bytes'] / 1024 / 1024:.2f} MB, "
+                         f"日志目录: {result['total_bytes'] / 1024 / 1024:.2f} MB")
+            
+            # 压缩轮转备份和前一天及更早的日志耗时与日志大小有关，放到后台线程执行
+            schedule_log_rotation("logs")
             print("✅ 启动前清理完成")
             
         except Exception as cleanup_error:
@@ -688,8 +1052,13 @@ def main() -> None:
         logging.info("🎯 启动主监控循环...")
         logging.info(f"⏱️ 监控参数 - 间隔: {config['check_interval']}秒, 重试: {config['max_retry_count']}次")
         
-        # 执行主监控循环
-        monitor_loop(config)
+        # 执行主监控循环（多账号监管模式下由各账号线程检查，asyncio引擎下由引擎任务检查）
+        if args.engine == 'async':
+            engine_loop(config, accounts or [default_account()])
+        elif accounts:
+            supervisor_loop(config, accounts)
+        else:
+            monitor_loop(config)
         
     except KeyboardInterrupt:
         # 键盘中断处理
@@ -727,8 +1096,12 @@ def main() -> None:
             logging.info(f"⏱️ 程序总运行时间: {total_runtime:.2f}秒")
             logging.info(f"🏁 程序结束时间: {end_time.strftime('%Y-%m-%d %H:%M:%S')}")
             
-            # 调用优雅关闭处理器
-            handle_shutdown()
+            # 调用优雅关闭处理器（由信号触发时带上信号编号）
+            handle_shutdown(shutdown_signal)
+            
+            # 发送完关闭后产生的通知（如监控循环结束通知）
+            if notification_manager:
+                notification_manager.close()
             
         except Exception as cleanup_error:
             print(f"⚠️ 清理过程中发生错误: {cleanup_error}")
@@ -0,0 +1,267 @@
+##########wechat_probe.py: [微信分级状态探测] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建分级探测流水线，廉价检查每次执行，会话列表检查按需执行]########
+# 变更记录: [2026-10-16] @李祥光 [IsOnline、GetSession和整次探测耗时计入阶段直方图]########
+# 变更记录: [2026-10-16] @李祥光 [IsOnline、GetSession经后端调用线程池执行，超过期限按该阶段失败处理]########
+# 变更记录: [2026-10-16] @李祥光 [保留最近一次探测结果last_result，状态机据此区分离线和功能异常]########
+# 输入: 微信连接、进程管理器、阶段调度配置 | 输出: 探测结果和各阶段耗时统计###############
+
+
+###########################文件下的所有函数###########################
+"""
+ProbeResult：单次探测结果，记录是否通过、失败阶段和各阶段耗时
+ProbePipeline：分级探测流水线，按 进程 -> 在线 -> 会话列表 的顺序由廉价到昂贵执行
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[调用方] --> B[ProbePipeline.run]
+    B --> C[process阶段: 进程是否运行]
+    C -->|失败| R[返回ProbeResult]
+    C -->|通过| D[online阶段: 获取连接+IsOnline]
+    D -->|失败| R
+    D -->|通过| E{会话阶段到期或出现可疑迹象?}
+    E -->|是| F[session阶段: GetSession]
+    E -->|否| G[跳过session阶段]
+    F --> R
+    G --> R
+    A --> H[ProbePipeline.stage_stats各阶段耗时]
+    D --> M[LatencyRecorder: online]
+    F --> M2[LatencyRecorder: session]
+    R --> M3[LatencyRecorder: check]
+    D --> T[backend_call: online/session期限，超时抛出CallTimeout按阶段失败]
+    F --> T
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import logging
+
+from config import MONITOR_CONFIG, WECHAT_CONFIG
+from wechat_metrics import get_latency_recorder
+from wechat_backend import backend_call
+
+# 默认阶段调度：every表示每N次检查执行一次
+DEFAULT_PROBE_STAGES = {
+    'process': {'enabled': True, 'every': 1},
+    'online': {'enabled': True, 'every': 1},
+    'session': {'enabled': True, 'every': 10},
+}
+
+
+class ProbeResult:
+    """
+    ProbeResult 功能说明:
+    # 单次分级探测的结果
+    # 输入: 无 | 输出: 探测结果属性
+
+    属性说明:
+    - ok: 所有已执行阶段是否都通过
+    - failed_stage: 第一个失败的阶段名称，全部通过时为None
+    - reason: 失败原因描述
+    - error: 阶段调用抛出的异常，正常返回否定结果时为None
+    - stages_run: 本次实际执行的阶段列表
+    - timings: 各阶段耗时（秒）
+    - session_count: 会话数量，session阶段未执行时为None
+    - suspicious: 本次是否因可疑迹象强制执行了会话检查
+    """
+
+    def __init__(self):
+        self.ok = True
+        self.failed_stage = None
+        self.reason = ''
+        self.error = None
+        self.stages_run = []
+        self.timings = {}
+        self.session_count = None
+        self.suspicious = False
+
+    def fail(self, stage, reason, error=None):
+        """
+        fail 功能说明:
+        # 记录失败阶段和原因
+        # 输入: stage (阶段名称), reason (失败原因), error (可选的异常对象) | 输出: 自身，便于直接返回
+        """
+        self.ok = False
+        self.failed_stage = stage
+        self.reason = reason
+        self.error = error
+        return self
+
+    @property
+    def total_time(self):
+        """本次探测所有阶段的总耗时（秒）"""
+        return sum(self.timings.values())
+
+
+class ProbePipeline:
+    """
+    ProbePipeline 功能说明:
+    # 分级探测流水线：廉价阶段每次执行，昂贵的GetSession会话列表检查按配置间隔执行
+    # 当廉价阶段出现可疑迹象（上次探测失败、连接刚重建、在线检查变慢）时立即执行会话检查
+    # 每个阶段的执行次数、跳过次数、失败次数和耗时都会被统计
+    # 输入: connection (WeChatConnection), process_manager (可选的ProcessManager),
+    #       process_name (进程名), stage_config (阶段调度配置) | 输出: ProbeResult
+
+    属性说明:
+    - stage_config: 合并默认值后的阶段调度配置
+    - suspicious_latency: 在线检查耗时超过该值（秒）视为可疑
+    - tick_count: 已执行的探测次数
+    - last_result: 最近一次探测结果（ProbeResult），尚未探测时为None
+    """
+
+    STAGES = ('process', 'online', 'session')
+
+    def __init__(self, connection, process_manager=None, process_name=None, stage_config=None):
+        self.connection = connection
+        self.process_manager = process_manager
+        self.process_name = process_name or WECHAT_CONFIG['process_name']
+
+        if stage_config is None:
+            stage_config = MONITOR_CONFIG.get('probe_stages', {})
+        self.stage_config = {}
+        for stage in self.STAGES:
+            merged = dict(DEFAULT_PROBE_STAGES[stage])
+            merged.update(stage_config.get(stage, {}))
+            merged['every'] = max(1, int(merged.get('every', 1)))
+            self.stage_config[stage] = merged
+
+        self.suspicious_latency = MONITOR_CONFIG.get('probe_suspicious_latency_ms', 2000) / 1000.0
+        self.tick_count = 0
+        self._last_ok = True
+        self.last_result = None
+        self._since_last_run = {stage: None for stage in self.STAGES}  # None表示从未执行
+        self._stats = {
+            stage: {'runs': 0, 'skipped': 0, 'failures': 0, 'total_time': 0.0, 'last_time': 0.0}
+            for stage in self.STAGES
+        }
+
+    def run(self):
+        """
+        run 功能说明:
+        # 执行一次分级探测，按廉价到昂贵的顺序，任一阶段失败立即返回
+        # 输入: 无 | 输出: ProbeResult
+        """
+        self.tick_count += 1
+        self.last_result = None  # 本次探测异常退出时不保留上一次的结果
+        result = ProbeResult()
+        suspicious = not self._last_ok
+
+        # 第一步：进程检查（只遍历进程名，最廉价）
+        if self._due('process'):
+            running = self._timed('process', result, self.process_manager.is_process_running, self.process_name)
+            if not running:
+                return self._finish(result.fail('process', f"微信进程 {self.process_name} 未运行"))
+
+        # 第二步：获取连接并检查登录状态
+        if self._due('online'):
+            connects_before = self.connection.connect_count
+            try:
+                online = self._timed('online', result, self._check_online)
+            except Exception as e:
+                self.connection.invalidate(f"在线检查异常: {e}")
+                return self._finish(result.fail('online', f"在线检查异常: {e}", e))
+            if not online:
+                return self._finish(result.fail('online', "微信已启动但用户未登录"))
+            # 连接刚重建或在线检查明显变慢，都需要更深层的会话检查确认
+            if self.connection.connect_count != connects_before:
+                suspicious = True
+            if result.timings.get('online', 0.0) > self.suspicious_latency:
+                suspicious = True
+
+        # 第三步：会话列表检查（昂贵，按间隔或可疑时执行）
+        if self.stage_config['session']['enabled'] and (suspicious or self._due('session')):
+            result.suspicious = suspicious
+            try:
+                sessions = self._timed('session', result, self._get_sessions)
+            except Exception as e:
+                self.connection.invalidate(f"会话检查异常: {e}")
+                return self._finish(result.fail('session', f"获取会话列表异常: {e}", e))
+            result.session_count = len(sessions) if hasattr(sessions, '__len__') else None
+            if not sessions:
+                return self._finish(result.fail('session', "会话列表为空，可能登录状态异常或网络连接问题"))
+
+        return self._finish(result)
+
+    def stage_stats(self):
+        """
+        stage_stats 功能说明:
+        # 返回各阶段的执行统计，用于日志输出和成本分析
+        # 输入: 无 | 输出: dict {阶段名: {runs, skipped, failures, avg_ms, last_ms, total_ms}}
+        """
+        report = {}
+        for stage, stats in self._stats.items():
+            runs = stats['runs']
+            report[stage] = {
+                'runs': runs,
+                'skipped': stats['skipped'],
+                'failures': stats['failures'],
+                'avg_ms': round(stats['total_time'] / runs * 1000, 2) if runs else 0.0,
+                'last_ms': round(stats['last_time'] * 1000, 2),
+                'total_ms': round(stats['total_time'] * 1000, 2),
+            }
+        return report
+
+    def _due(self, stage):
+        """
+        _due 功能说明:
+        # 判断阶段本次是否应执行：启用且距上次执行已达到every次
+        # 输入: stage (阶段名称) | 输出: bool
+        """
+        config = self.stage_config[stage]
+        if not config['enabled'] or (stage == 'process' and self.process_manager is None):
+            return False
+        since = self._since_last_run[stage]
+        return since is None or since + 1 >= config['every']
+
+    def _timed(self, stage, result, func, *args):
+        """
+        _timed 功能说明:
+        # 执行阶段函数并记录耗时，异常和失败都会计入阶段失败次数
+        # 输入: stage (阶段名称), result (ProbeResult), func (阶段函数) | 输出: 阶段函数返回值
+        """
+        stats = self._stats[stage]
+        started = time.perf_counter()
+        ok = False
+        try:
+            value = func(*args)
+            ok = bool(value)
+            return value
+        finally:
+            elapsed = time.perf_counter() - started
+            stats['runs'] += 1
+            stats['total_time'] += elapsed
+            stats['last_time'] = elapsed
+            if not ok:
+                stats['failures'] += 1
+            self._since_last_run[stage] = 0
+            result.stages_run.append(stage)
+            result.timings[stage] = elapsed
+
+    def _check_online(self):
+        # 连接耗时由连接持有者单独记录，这里只统计IsOnline调用本身；超过期限抛出CallTimeout
+        wx = self.connection.get()
+        with get_latency_recorder().timer('online'):
+            return backend_call('online', wx.IsOnline)
+
+    def _get_sessions(self):
+        wx = self.connection.get()
+        with get_latency_recorder().timer('session'):
+            return backend_call('session', wx.GetSession)
+
+    def _finish(self, result):
+        # 本次未执行的阶段累加间隔计数和跳过次数
+        for stage in self.STAGES:
+            if stage not in result.timings:
+                self._stats[stage]['skipped'] += 1
+                if self._since_last_run[stage] is not None:
+                    self._since_last_run[stage] += 1
+        self._last_ok = result.ok
+        self.last_result = result
+        get_latency_recorder().observe('check', result.total_time)
+        logging.debug(
+            f"分级探测完成: ok={result.ok}, 执行阶段={result.stages_run}, "
+            f"耗时={result.total_time * 1000:.1f}ms"
+        )
+        return result
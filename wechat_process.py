@@ -0,0 +1,370 @@
+##########wechat_process.py: [进程查找与PID跟踪] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建PID跟踪器，记住匹配进程的PID，只在PID失效时才全量遍历进程]########
+# 变更记录: [2026-10-16] @李祥光 [添加Linux /proc快速查找后端，只读取comm和stat，其他平台回退psutil]########
+# 变更记录: [2026-10-16] @李祥光 [添加批量终止：同时发送terminate，共用一个等待期限，到期后强制结束剩余进程]########
+# 输入: 进程名称 | 输出: 匹配进程的PID/psutil.Process列表、扫描统计和终止结果###############
+
+
+###########################文件下的所有函数###########################
+"""
+PsutilBackend：基于psutil.process_iter的进程查找后端，所有平台可用
+ProcFSBackend：Linux /proc快速查找后端，遍历时只读取/proc/<pid>/comm，匹配后读取/proc/<pid>/stat
+create_backend：按配置创建进程查找后端（auto/procfs/psutil），/proc不可用时回退psutil
+ProcessTracker：按进程名记住匹配进程的PID和创建时间，复查时只验证这些PID，失效时才全量遍历
+get_process_tracker：获取进程共享的PID跟踪器
+terminate_processes：批量终止进程，同时发送terminate并共用一个等待期限，返回每个PID的结果
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[ProcessManager.is_process_running] --> B[get_process_tracker]
+    A2[ProcessManager.kill_process] --> B
+    B --> C[ProcessTracker.find_pids / find]
+    C --> D{已记住该进程名的PID?}
+    D -->|否| S[scan全量遍历]
+    D -->|是| E{backend.identity: PID仍存在且创建时间未变?}
+    E -->|是| F[直接返回缓存的PID]
+    E -->|否| S
+    S --> K{后端}
+    K -->|Linux| P[ProcFSBackend: 读取comm匹配，命中后读取stat]
+    K -->|其他平台| Q[PsutilBackend: process_iter]
+    S --> G[更新缓存，记录扫描次数]
+    A2 --> H[ProcessTracker.forget终止进程后清除缓存]
+    A2 --> T[terminate_processes]
+    T --> T1[同时向所有进程发送terminate]
+    T1 --> T2[wait_procs共用一个期限等待]
+    T2 --> T3[仍存活的进程kill后短暂等待]
+    T3 --> T4[返回每个PID的结果]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import logging
+import threading
+
+import psutil
+
+from config import MONITOR_CONFIG
+
+# 支持的进程查找后端
+PROCESS_BACKENDS = ('auto', 'procfs', 'psutil')
+
+# Linux进程名（comm）最长15个字节，更长的名称会被截断
+PROCFS_COMM_LEN = 15
+
+# 批量终止的结果分类:
+# terminated=收到terminate后在期限内退出, killed=期限到后被强制结束, gone=发送前已退出,
+# access_denied=无权限终止, survived=强制结束后仍未退出
+TERMINATE_OUTCOMES = ('terminated', 'killed', 'gone', 'access_denied', 'survived')
+
+# 进程共享的PID跟踪器
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+class PsutilBackend:
+    """
+    PsutilBackend 功能说明:
+    # 基于psutil的进程查找后端，所有平台可用
+    # 输入: 无 | 输出: 提供scan/identity方法
+    """
+
+    name = 'psutil'
+
+    def scan(self, key):
+        """
+        scan 功能说明:
+        # 遍历全部进程，psutil.process_iter(['name'])只获取进程名称信息
+        # 输入: key (小写进程名) | 输出: (匹配的[(pid, 创建时间)], 遍历的进程数量)
+        # 异常处理: 忽略遍历过程中已结束、无权限访问和僵尸进程
+        """
+        matches = []
+        scanned = 0
+        for proc in psutil.process_iter(['name']):
+            scanned += 1
+            try:
+                name = proc.info['name']
+                if name and name.lower() == key:
+                    # process_iter会复用缓存的进程对象，创建时间重新读取，避免PID复用时沿用旧值
+                    identity = self.identity(proc.pid)
+                    if identity is not None:
+                        matches.append((proc.pid, identity))
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+        return matches, scanned
+
+    def identity(self, pid):
+        """
+        identity 功能说明:
+        # 读取进程创建时间，PID与创建时间共同标识一个进程
+        # 输入: pid | 输出: float 创建时间，进程不存在或无法访问时返回None
+        """
+        try:
+            return psutil.Process(pid).create_time()
+        except psutil.Error:
+            return None
+
+
+class ProcFSBackend:
+    """
+    ProcFSBackend 功能说明:
+    # Linux /proc快速查找后端（例如在Wine下运行微信客户端）：
+    # 遍历时每个进程只读取一次/proc/<pid>/comm（os.open/os.read，不创建文件对象和psutil.Process），
+    # 名称匹配后才读取/proc/<pid>/stat中的启动时间作为创建时间标识
+    # 进程名超过15个字节时comm会被截断，前缀匹配后再用psutil读取完整名称确认
+    # 输入: root (procfs挂载路径，默认/proc) | 输出: 提供scan/identity方法
+    """
+
+    name = 'procfs'
+
+    def __init__(self, root='/proc'):
+        self.root = root
+
+    @staticmethod
+    def available(root='/proc'):
+        """当前系统是否提供可读取的procfs"""
+        return os.path.isfile(os.path.join(root, str(os.getpid()), 'stat'))
+
+    def _read(self, pid, filename, size):
+        """读取/proc/<pid>/<filename>的前size个字节，进程已结束或无权限时返回None"""
+        try:
+            fd = os.open(f"{self.root}/{pid}/{filename}", os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            return os.read(fd, size)
+        except OSError:
+            return None
+        finally:
+            os.close(fd)
+
+    def scan(self, key):
+        """
+        scan 功能说明:
+        # 遍历/proc下的数字目录，读取comm并按名称（不区分大小写）匹配
+        # 输入: key (小写进程名) | 输出: (匹配的[(pid, 启动时间)], 遍历的进程数量)
+        """
+        target = key.encode('utf-8', 'replace')
+        truncated = len(target) >= PROCFS_COMM_LEN
+        if truncated:
+            target = target[:PROCFS_COMM_LEN]
+        matches = []
+        scanned = 0
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if not entry.name.isdigit():
+                    continue
+                scanned += 1
+                comm = self._read(entry.name, 'comm', 64)
+                if comm is None or comm.rstrip(b'\n').lower() != target:
+                    continue
+                pid = int(entry.name)
+                if truncated and not self._full_name_matches(pid, key):
+                    continue
+                identity = self.identity(pid)
+                if identity is not None:
+                    matches.append((pid, identity))
+        return matches, scanned
+
+    def identity(self, pid):
+        """
+        identity 功能说明:
+        # 读取/proc/<pid>/stat第22个字段（进程启动时间，单位为时钟周期）
+        # 进程名可能包含空格和括号，从最后一个')'之后开始解析
+        # 输入: pid | 输出: int 启动时间，进程不存在时返回None
+        """
+        stat = self._read(pid, 'stat', 1024)
+        if not stat:
+            return None
+        try:
+            fields = stat[stat.rindex(b')') + 2:].split(b' ', 20)
+            return int(fields[19])
+        except (ValueError, IndexError):
+            return None
+
+    @staticmethod
+    def _full_name_matches(pid, key):
+        """comm被截断时，用psutil读取完整进程名确认"""
+        try:
+            return psutil.Process(pid).name().lower() == key
+        except psutil.Error:
+            return False
+
+
+def create_backend(kind=None, root='/proc'):
+    """
+    create_backend 功能说明:
+    # 按配置创建进程查找后端：
+    # auto: Linux且/proc可读时使用ProcFSBackend，否则使用PsutilBackend
+    # procfs: 强制使用ProcFSBackend，/proc不可用时记录警告并回退psutil
+    # psutil: 始终使用PsutilBackend
+    # 输入: kind (auto/procfs/psutil，默认取MONITOR_CONFIG['process_backend']), root (procfs路径) | 输出: 后端实例
+    """
+    kind = kind or MONITOR_CONFIG.get('process_backend', 'auto')
+    if kind not in PROCESS_BACKENDS:
+        logging.warning(f"⚠️ 未知的进程查找后端 {kind}，使用auto")
+        kind = 'auto'
+    if kind == 'psutil':
+        return PsutilBackend()
+    if ProcFSBackend.available(root):
+        return ProcFSBackend(root)
+    if kind == 'procfs':
+        logging.warning("⚠️ 当前系统没有可用的/proc，进程查找回退到psutil")
+    return PsutilBackend()
+
+
+class ProcessTracker:
+    """
+    ProcessTracker 功能说明:
+    # 按进程名记住上次全量遍历找到的匹配进程PID及其创建时间，下一次查找只验证这些PID：
+    # PID不存在或创建时间变化（进程退出、PID被系统复用）都会判定为失效
+    # 只有缓存为空、任一缓存PID失效时才重新全量遍历，进程稳定运行时每次检查只读取少量进程信息
+    # 注意：目标进程未运行时没有可验证的PID，每次查找仍会全量遍历，以便及时发现进程启动
+    # 输入: backend (进程查找后端，默认按配置创建) | 输出: 提供find_pids/find/scan/forget/stats方法
+
+    属性说明:
+    - backend: 进程查找后端（ProcFSBackend或PsutilBackend）
+    - scan_count: 全量遍历次数
+    - cache_hits: 只验证缓存PID即完成查找的次数
+    - scanned_processes: 全量遍历累计检查的进程数量
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+        self._tracked = {}  # 小写进程名 -> {pid: 创建时间}
+        self._lock = threading.Lock()
+        self.scan_count = 0
+        self.cache_hits = 0
+        self.scanned_processes = 0
+
+    def find_pids(self, process_name):
+        """
+        find_pids 功能说明:
+        # 查找指定名称（不区分大小写）的运行中进程PID，优先验证缓存的PID
+        # 输入: process_name (进程名称，如'WeChat.exe') | 输出: list[int]，未找到时为空列表
+        """
+        key = process_name.lower()
+        with self._lock:
+            tracked = self._tracked.get(key)
+        if tracked and all(self.backend.identity(pid) == identity for pid, identity in tracked.items()):
+            with self._lock:
+                self.cache_hits += 1
+            return list(tracked)
+        return self.scan(process_name)
+
+    def find(self, process_name):
+        """
+        find 功能说明:
+        # 查找指定名称的运行中进程，返回psutil.Process对象，供终止进程等操作使用
+        # 输入: process_name (进程名称) | 输出: list[psutil.Process]
+        """
+        procs = []
+        for pid in self.find_pids(process_name):
+            try:
+                procs.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                continue
+        return procs
+
+    def scan(self, process_name):
+        """
+        scan 功能说明:
+        # 通过后端全量遍历系统进程，按名称匹配后更新缓存
+        # 输入: process_name (进程名称) | 输出: list[int] 匹配的PID
+        """
+        key = process_name.lower()
+        matches, scanned = self.backend.scan(key)
+        with self._lock:
+            self.scan_count += 1
+            self.scanned_processes += scanned
+            if matches:
+                self._tracked[key] = dict(matches)
+            else:
+                self._tracked.pop(key, None)
+        return [pid for pid, _ in matches]
+
+    def forget(self, process_name=None):
+        """
+        forget 功能说明:
+        # 清除缓存，下一次查找会全量遍历（例如终止进程之后）
+        # 输入: process_name (进程名称，None表示清除全部) | 输出: 无
+        """
+        with self._lock:
+            if process_name is None:
+                self._tracked.clear()
+            else:
+                self._tracked.pop(process_name.lower(), None)
+
+    def stats(self):
+        """
+        stats 功能说明:
+        # 返回查找统计
+        # 输入: 无 | 输出: dict {backend, scans, cache_hits, scanned_processes, tracked}
+        """
+        with self._lock:
+            return {
+                'backend': self.backend.name,
+                'scans': self.scan_count,
+                'cache_hits': self.cache_hits,
+                'scanned_processes': self.scanned_processes,
+                'tracked': {name: list(pids) for name, pids in self._tracked.items()},
+            }
+
+
+def get_process_tracker():
+    """
+    get_process_tracker 功能说明:
+    # 获取进程共享的PID跟踪器，第一次调用时按MONITOR_CONFIG['process_backend']创建
+    # 每次检查都会新建ProcessManager的调用方也能共享同一份缓存
+    # 输入: 无 | 输出: ProcessTracker实例
+    """
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = ProcessTracker()
+        return _tracker
+
+
+def terminate_processes(procs, timeout=None, kill_timeout=1.0):
+    """
+    terminate_processes 功能说明:
+    # 批量终止进程，总等待时间不超过 timeout + kill_timeout，与进程数量无关：
+    # 1. 同时向所有进程发送terminate
+    # 2. psutil.wait_procs共用一个期限等待全部进程退出
+    # 3. 期限到后仍存活的进程统一kill，再短暂等待确认
+    # 输入: procs (psutil.Process列表), timeout (terminate后的等待期限，秒，默认取MONITOR_CONFIG['process_terminate_timeout']),
+    #       kill_timeout (kill后的确认等待，秒) | 输出: dict {pid: 结果}，结果见TERMINATE_OUTCOMES
+    """
+    if timeout is None:
+        timeout = MONITOR_CONFIG.get('process_terminate_timeout', 5)
+    outcomes = {}
+
+    def signal_all(targets, method):
+        sent = []
+        for proc in targets:
+            try:
+                getattr(proc, method)()
+                sent.append(proc)
+            except psutil.NoSuchProcess:
+                outcomes[proc.pid] = 'gone' if method == 'terminate' else 'terminated'
+            except psutil.AccessDenied:
+                outcomes[proc.pid] = 'access_denied'
+        return sent
+
+    pending = signal_all(procs, 'terminate')
+    if not pending:
+        return outcomes
+    gone, alive = psutil.wait_procs(pending, timeout=timeout)
+    for proc in gone:
+        outcomes[proc.pid] = 'terminated'
+
+    survivors = signal_all(alive, 'kill')
+    if survivors:
+        gone, alive = psutil.wait_procs(survivors, timeout=kill_timeout)
+        for proc in gone:
+            outcomes[proc.pid] = 'killed'
+        for proc in alive:
+            outcomes[proc.pid] = 'survived'
+    return outcomes
@@ -0,0 +1,508 @@
+##########wechat_scheduler.py: [自适应检查调度器] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建自适应检查调度器，支持健康拉长间隔、失败快速复查、登录失败指数退避和随机抖动]########
+# 变更记录: [2026-10-16] @李祥光 [添加MonitorWakeup事件唤醒，关闭/重载配置/立即检查可随时打断等待]########
+# 变更记录: [2026-10-16] @李祥光 [添加DeadlineScheduler：按到期时间排序的最小堆+有界工作线程池，支持数千个监控目标]########
+# 变更记录: [2026-10-17] @李祥光 [DeadlineScheduler.add替换正在执行的目标时，新条目等旧任务结束后再派发，同一目标不会同时执行两个任务]########
+# 变更记录: [2026-10-17] @李祥光 [CheckScheduler添加configure：重新加载配置时只更新参数，保留显式传入的基础间隔、随机数生成器和连续计数]########
+# 输入: MONITOR_CONFIG中的调度参数 | 输出: 下一次检查前的等待时间###############
+
+
+###########################文件下的所有函数###########################
+"""
+CheckScheduler：自适应检查调度器，根据检查和登录结果计算下一次检查的等待时间
+CheckScheduler.configure：按配置读取调度参数，配置重载时原地更新，连续计数保留
+MonitorWakeup：监控等待唤醒器，关闭信号、配置重载、立即检查请求可立即打断等待并给出唤醒原因
+DeadlineScheduler：多目标到期调度器，目标按下次到期时间保存在最小堆中，只把到期的目标派发给有界工作线程池
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[监控循环] --> B[执行状态检查]
+    B --> C[CheckScheduler.on_check记录检查结果]
+    B -->|需要登录| D[CheckScheduler.on_login记录登录结果]
+    C --> E[CheckScheduler.next_delay]
+    D --> E
+    E --> F{当前状态}
+    F -->|登录连续失败| G[指数退避]
+    F -->|首次失败/登录刚成功| H[快速复查]
+    F -->|持续健康| I[逐步拉长间隔]
+    F -->|其他| J[基础检查间隔]
+    G --> K[加入随机抖动]
+    H --> K
+    I --> K
+    J --> K
+    K --> L[MonitorWakeup.wait等待]
+    M[信号处理/外部请求] --> N[MonitorWakeup.notify]
+    N -->|shutdown/reload/check_now| L
+    L -->|超时或被唤醒| A
+    O[多目标调度] --> P[DeadlineScheduler.add加入目标]
+    P --> Q[最小堆按到期时间排序]
+    Q --> R[派发线程只查看堆顶: 到期且有空闲工作线程时弹出]
+    R --> S[有界工作线程池执行目标函数]
+    S --> T[返回下次等待秒数，按结束时间重新入堆]
+    T --> Q
+    R -->|未到期或池满| U[在条件变量上等待到堆顶到期/工作线程空闲]
+    U --> R
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import os
+import time
+import queue
+import heapq
+import random
+import logging
+import itertools
+import threading
+
+from config import MONITOR_CONFIG
+from wechat_metrics import LatencyHistogram, get_latency_recorder
+
+
+class CheckScheduler:
+    """
+    CheckScheduler 功能说明:
+    # 根据最近的检查和登录结果动态计算下一次检查的等待时间
+    # 1. 连续健康时逐步拉长检查间隔，最长不超过max_check_interval
+    # 2. 第一次检查失败或刚登录成功时快速复查，尽快确认状态
+    # 3. 自动登录连续失败时按指数退避，避免频繁弹出登录窗口
+    # 4. 每次等待时间加入随机抖动，避免同一台机器上的多个监控同时探测
+    # 输入: config (配置字典，默认MONITOR_CONFIG), base_interval (基础检查间隔), rng (随机数生成器) | 输出: 等待秒数
+
+    属性说明:
+    - healthy_streak: 连续检查成功次数
+    - failure_streak: 连续检查失败次数
+    - login_failures: 连续自动登录失败次数
+    - last_reason: 最近一次计算等待时间的依据，便于日志输出
+    """
+
+    def __init__(self, config=None, base_interval=None, rng=None):
+        self._base_override = base_interval  # 显式传入的基础间隔，配置重载时保留
+        self._rng = rng or random.Random()
+        self.configure(config)
+
+        self.healthy_streak = 0
+        self.failure_streak = 0
+        self.login_failures = 0
+        self._confirm_pending = False  # 登录成功后需要快速复查确认
+        self.last_reason = '基础间隔'
+
+    def configure(self, config=None, base_interval=None):
+        """
+        configure 功能说明:
+        # 按配置读取调度参数，配置重载时原地调用：连续成功/失败/登录失败计数和随机数生成器保留
+        # 显式传入的基础间隔优先于配置中的check_interval，重载时不传base_interval则继续使用原来的值
+        # 输入: config (配置字典，默认MONITOR_CONFIG), base_interval (可选，新的显式基础间隔) | 输出: 无
+        """
+        config = MONITOR_CONFIG if config is None else config
+        if base_interval is not None:
+            self._base_override = base_interval
+        self.base_interval = float(self._base_override or config.get('check_interval', 30))
+        self.min_interval = float(config.get('min_check_interval', 5))
+        self.max_interval = max(self.base_interval, float(config.get('max_check_interval', 120)))
+        self.healthy_growth = max(1.0, float(config.get('healthy_interval_growth', 1.5)))
+        self.healthy_stretch_after = max(1, int(config.get('healthy_stretch_after', 3)))
+        self.fast_reprobe_interval = float(config.get('fast_reprobe_interval', 5))
+        self.retry_interval = float(config.get('retry_interval', 10))
+        self.backoff_factor = max(1.0, float(config.get('login_backoff_factor', 2.0)))
+        self.max_backoff = float(config.get('max_login_backoff', 600))
+        self.jitter_ratio = min(0.5, max(0.0, float(config.get('check_jitter_ratio', 0.1))))
+
+    def on_check(self, ok):
+        """
+        on_check 功能说明:
+        # 记录一次状态检查结果
+        # 输入: ok (bool, 检查是否通过) | 输出: 无
+        """
+        self._confirm_pending = False
+        if ok:
+            self.healthy_streak += 1
+            self.failure_streak = 0
+            self.login_failures = 0
+        else:
+            self.healthy_streak = 0
+            self.failure_streak += 1
+
+    def on_login(self, ok):
+        """
+        on_login 功能说明:
+        # 记录一次自动登录结果，成功后快速复查，失败则累加退避次数
+        # 输入: ok (bool, 登录是否成功) | 输出: 无
+        """
+        if ok:
+            self.login_failures = 0
+            self.failure_streak = 0
+            self._confirm_pending = True
+        else:
+            self.login_failures += 1
+
+    def next_delay(self):
+        """
+        next_delay 功能说明:
+        # 计算下一次检查前的等待时间（秒），已包含随机抖动
+        # 输入: 无 | 输出: float 等待秒数
+        """
+        if self.login_failures > 0:
+            delay = self.retry_interval * (self.backoff_factor ** (self.login_failures - 1))
+            delay = min(self.max_backoff, delay)
+            self.last_reason = f'登录失败退避(第{self.login_failures}次)'
+        elif self._confirm_pending:
+            delay = self.fast_reprobe_interval
+            self.last_reason = '登录成功后快速复查'
+        elif self.failure_streak == 1:
+            delay = self.fast_reprobe_interval
+            self.last_reason = '首次失败快速复查'
+        elif self.healthy_streak >= self.healthy_stretch_after:
+            steps = self.healthy_streak - self.healthy_stretch_after + 1
+            # 指数增长很快就会达到上限，限制指数避免浮点溢出
+            delay = min(self.max_interval, self.base_interval * (self.healthy_growth ** min(steps, 64)))
+            self.last_reason = f'持续健康拉长间隔(连续{self.healthy_streak}次正常)'
+        else:
+            delay = self.base_interval
+            self.last_reason = '基础间隔'
+
+        delay = max(self.min_interval, delay)
+        if self.jitter_ratio:
+            delay *= 1 + self._rng.uniform(-self.jitter_ratio, self.jitter_ratio)
+        logging.debug(f"下次检查等待 {delay:.1f}秒 ({self.last_reason})")
+        return delay
+
+
+class MonitorWakeup:
+    """
+    MonitorWakeup 功能说明:
+    # 监控循环的等待唤醒器，基于条件变量实现，替代分段sleep轮询
+    # 关闭信号、配置重载、外部"立即检查"请求都会立即打断正在进行的等待，
+    # wait返回唤醒原因，超时返回None
+    # 关闭是粘滞状态：一旦请求关闭，之后所有wait都立即返回SHUTDOWN
+    # 输入: 无 | 输出: 唤醒原因字符串或None
+
+    说明:
+    - 条件变量使用可重入锁，信号处理函数在主线程中调用notify不会与wait死锁
+    - Windows上阻塞中的锁等待无法被Ctrl+C打断，因此按1秒切片等待以便信号处理函数及时执行；
+      切片只用于让解释器处理信号，唤醒本身仍由notify立即完成
+    """
+
+    SHUTDOWN = 'shutdown'
+    RELOAD = 'reload'
+    CHECK_NOW = 'check_now'
+
+    # 唤醒原因的日志描述
+    REASON_NAMES = {
+        SHUTDOWN: '关闭请求',
+        RELOAD: '配置重载',
+        CHECK_NOW: '立即检查请求',
+    }
+
+    _WAIT_SLICE = 1.0 if os.name == 'nt' else None
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.RLock())
+        self._pending = []  # 待处理的非关闭唤醒原因，按到达顺序去重
+        self._shutdown = False
+
+    @property
+    def is_shutdown(self):
+        """是否已请求关闭"""
+        return self._shutdown
+
+    def notify(self, reason):
+        """
+        notify 功能说明:
+        # 发出唤醒请求，立即打断正在进行的wait
+        # 输入: reason (SHUTDOWN/RELOAD/CHECK_NOW) | 输出: 无
+        """
+        with self._cond:
+            if reason == self.SHUTDOWN:
+                self._shutdown = True
+            elif reason not in self._pending:
+                self._pending.append(reason)
+            self._cond.notify_all()
+
+    def wait(self, timeout):
+        """
+        wait 功能说明:
+        # 等待指定时间，期间收到唤醒请求立即返回
+        # 输入: timeout (最长等待秒数) | 输出: 唤醒原因，等满超时返回None
+        """
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while not self._shutdown and not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                if self._WAIT_SLICE:
+                    remaining = min(remaining, self._WAIT_SLICE)
+                self._cond.wait(remaining)
+            if self._shutdown:
+                return self.SHUTDOWN
+            return self._pending.pop(0)
+
+    def describe(self, reason):
+        """
+        describe 功能说明:
+        # 返回唤醒原因的中文描述，用于日志
+        # 输入: reason (唤醒原因或None) | 输出: str
+        """
+        if reason is None:
+            return '等待超时'
+        return self.REASON_NAMES.get(reason, str(reason))
+
+
+class DeadlineScheduler:
+    """
+    DeadlineScheduler 功能说明:
+    # 多目标到期调度器，替代"每个目标一个线程"或"每个周期遍历全部目标"：
+    # 1. 目标按下次到期时间保存在最小堆中，派发线程只查看堆顶，每次派发和重新入堆都是O(log n)
+    # 2. 到期的目标交给有界工作线程池执行；池满时到期目标留在堆中，直到有工作线程空闲
+    # 3. 同一目标同一时刻最多只有一个任务在执行，任务结束后按目标函数返回的等待秒数重新入堆，返回None时移除
+    # 4. remove/reschedule只增加目标版本号，堆中的旧条目在弹出时丢弃，无需线性查找
+    # 5. 统计派发次数、派发延迟（实际派发时间-到期时间）分布和调度记账耗时
+    # 输入: max_workers (工作线程数上限), name (线程名前缀), lag_stage (可选，派发延迟同时计入共享耗时记录器的阶段名),
+    #       error_delay (目标函数抛出异常后的重试等待秒数) | 输出: 无
+
+    属性说明:
+    - dispatched / completed / errors: 派发次数、完成次数、目标函数异常次数
+    - overhead: 调度记账（堆操作和派发）累计耗时（秒），不含目标函数本身
+    - lag: 派发延迟直方图
+
+    说明:
+    - 卡住的目标只占用一个工作线程，在它返回之前不会被再次派发，其他目标使用剩余的工作线程
+    - 工作线程是守护线程，卡在外部调用中的线程不会阻止程序退出（ThreadPoolExecutor退出时会等待所有工作线程）
+    - 只在有空闲工作线程时才提交任务，任务队列中不会积压
+    """
+
+    def __init__(self, max_workers=4, name='DeadlineScheduler', lag_stage=None, error_delay=10.0):
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.lag_stage = lag_stage
+        self.error_delay = error_delay
+        self._cond = threading.Condition(threading.Lock())
+        self._heap = []  # (到期时间, 序号, 目标键, 版本号)
+        self._targets = {}  # 目标键 -> {'func', 'version', 'running', 'pending'}
+        self._seq = itertools.count()
+        self._idle = self.max_workers
+        self._jobs = None  # 派发线程到工作线程的任务队列
+        self._thread = None
+        self._stopping = False
+
+        self.dispatched = 0
+        self.completed = 0
+        self.errors = 0
+        self.overhead = 0.0
+        self.lag = LatencyHistogram()
+
+    def __len__(self):
+        return len(self._targets)
+
+    def add(self, key, func, delay=0.0):
+        """
+        add 功能说明:
+        # 加入一个目标，delay秒后第一次执行；同名目标已存在时替换
+        # 被替换的目标正在执行时，新条目沿用执行中标记，首次执行时间记为待执行，旧任务结束后再入堆
+        # 输入: key (目标键), func (无参可调用对象，返回下一次等待秒数或None), delay (首次等待秒数) | 输出: 无
+        """
+        with self._cond:
+            old = self._targets.get(key)
+            due = time.monotonic() + max(0.0, delay)
+            running = bool(old and old['running'])
+            entry = {'func': func, 'version': old['version'] + 1 if old else 0, 'running': running,
+                     'pending': due if running else None}
+            self._targets[key] = entry
+            if not running:
+                self._push(key, entry, due)
+                self._cond.notify()
+
+    def remove(self, key):
+        """
+        remove 功能说明:
+        # 移除目标；正在执行的任务照常结束，但不再重新入堆
+        # 输入: key (目标键) | 输出: bool 目标是否存在
+        """
+        with self._cond:
+            return self._targets.pop(key, None) is not None
+
+    def reschedule(self, key, delay=0.0):
+        """
+        reschedule 功能说明:
+        # 把目标提前到delay秒后执行（例如立即检查请求）；目标正在执行时，结束后按该时间再次执行
+        # 输入: key (目标键), delay (等待秒数) | 输出: bool 目标是否存在
+        """
+        with self._cond:
+            entry = self._targets.get(key)
+            if entry is None:
+                return False
+            due = time.monotonic() + max(0.0, delay)
+            if entry['running']:
+                entry['pending'] = due if entry['pending'] is None else min(entry['pending'], due)
+            else:
+                entry['version'] += 1
+                self._push(key, entry, due)
+                self._cond.notify()
+            return True
+
+    def reschedule_all(self, delay=0.0):
+        """
+        reschedule_all 功能说明:
+        # 把所有目标提前到delay秒后执行，用于立即检查请求（遍历全部目标，只在外部请求时调用）
+        # 输入: delay (等待秒数) | 输出: 无
+        """
+        with self._cond:
+            keys = list(self._targets)
+        for key in keys:
+            self.reschedule(key, delay)
+
+    def start(self):
+        """
+        start 功能说明:
+        # 启动工作线程和派发线程，已启动时直接返回
+        # 输入: 无 | 输出: 无
+        """
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._jobs = queue.SimpleQueue()
+            for index in range(self.max_workers):
+                threading.Thread(target=self._worker, args=(self._jobs,), name=f'{self.name}-worker-{index}',
+                                 daemon=True).start()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """
+        stop 功能说明:
+        # 停止派发并在期限内等待正在执行的任务结束；仍未结束的任务（卡住的目标）不再等待
+        # 输入: timeout (最长等待秒数) | 输出: list 期限到达时仍在执行的目标键
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread, jobs = self._thread, self._jobs
+            self._thread = self._jobs = None
+        if thread is None:
+            return []
+        thread.join(max(0.0, deadline - time.monotonic()))
+        # 每个工作线程取到一个结束标记后退出，卡住的线程返回后也会取到剩余的结束标记
+        for _ in range(self.max_workers):
+            jobs.put(None)
+        with self._cond:
+            while self._idle < self.max_workers:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [key for key, entry in self._targets.items() if entry['running']]
+
+    def stats(self):
+        """
+        stats 功能说明:
+        # 返回调度统计
+        # 输入: 无 | 输出: dict {targets, running, dispatched, completed, errors, overhead_us_per_dispatch, lag}
+        """
+        with self._cond:
+            return {
+                'targets': len(self._targets),
+                'running': self.max_workers - self._idle,
+                'dispatched': self.dispatched,
+                'completed': self.completed,
+                'errors': self.errors,
+                'overhead_us_per_dispatch': round(self.overhead / self.dispatched * 1e6, 2) if self.dispatched else 0.0,
+                'lag': self.lag.summary(),
+            }
+
+    def _push(self, key, entry, due):
+        heapq.heappush(self._heap, (due, next(self._seq), key, entry['version']))
+
+    def _run(self):
+        """
+        _run 功能说明:
+        # 派发线程主循环：弹出所有已到期的目标交给工作线程，然后等待到堆顶到期、工作线程空闲或有新目标
+        # 输入: 无 | 输出: 无
+        """
+        with self._cond:
+            while not self._stopping:
+                started = time.perf_counter()
+                now = time.monotonic()
+                self._dispatch_due(now)
+                self.overhead += time.perf_counter() - started
+                if self._idle and self._heap:
+                    timeout = self._heap[0][0] - now
+                    if timeout <= 0:
+                        continue
+                else:
+                    timeout = None  # 没有目标或工作线程全忙，等待通知
+                self._cond.wait(timeout)
+
+    def _dispatch_due(self, now):
+        """
+        _dispatch_due 功能说明:
+        # 在持有锁的情况下弹出到期目标并提交给工作线程池，过期版本的条目直接丢弃
+        # 输入: now (当前monotonic时间) | 输出: 无
+        """
+        heap = self._heap
+        while heap and self._idle and heap[0][0] <= now:
+            due, _, key, version = heapq.heappop(heap)
+            entry = self._targets.get(key)
+            if entry is None or entry['version'] != version or entry['running']:
+                continue
+            entry['running'] = True
+            self._idle -= 1
+            self.dispatched += 1
+            self.lag.observe(now - due)
+            if self.lag_stage:
+                get_latency_recorder().observe(self.lag_stage, now - due)
+            self._jobs.put((key, entry))
+
+    def _worker(self, jobs):
+        """工作线程：依次执行派发的任务，取到结束标记时退出"""
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            self._execute(*job)
+
+    def _execute(self, key, entry):
+        """
+        _execute 功能说明:
+        # 在工作线程中执行目标函数，结束后按返回的等待秒数重新入堆
+        # 执行期间目标被add替换时，不再为旧条目入堆，改为按新条目的待执行时间把新条目入堆
+        # 输入: key (目标键), entry (目标条目) | 输出: 无
+        """
+        delay = self.error_delay
+        failed = False
+        try:
+            delay = entry['func']()
+        except Exception as e:
+            failed = True
+            logging.error(f"💥 调度目标 {key} 执行出错: {e}")
+        finally:
+            with self._cond:
+                started = time.perf_counter()
+                entry['running'] = False
+                self._idle += 1
+                self.completed += 1
+                if failed:
+                    self.errors += 1
+                current = self._targets.get(key)
+                if current is entry:
+                    if delay is None:
+                        del self._targets[key]
+                    else:
+                        due = time.monotonic() + max(0.0, delay)
+                        if entry['pending'] is not None:
+                            due = min(due, entry['pending'])
+                            entry['pending'] = None
+                        entry['version'] += 1
+                        self._push(key, entry, due)
+                elif current is not None and current['running']:
+                    # 替换后的条目沿用了本任务的执行中标记，本任务结束后才可以派发
+                    current['running'] = False
+                    due, current['pending'] = current['pending'], None
+                    current['version'] += 1
+                    self._push(key, current, due)
+                self.overhead += time.perf_counter() - started
+                self._cond.notify_all()
@@ -0,0 +1,289 @@
+##########wechat_state.py: [统一监控状态机] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建统一监控状态机：UNKNOWN/ONLINE/DEGRADED/OFFLINE/LOGGING_IN/BACKOFF，tick(now)不等待，由调用方决定如何等待]########
+# 变更记录: [2026-10-16] @李祥光 [状态变化日志改为INFO级别，供日志分析工具重建状态区间]########
+# 变更记录: [2026-10-17] @李祥光 [reload改为原地更新调度器参数，不再重建调度器，退避和连续计数保留]########
+# 输入: 检查函数、登录函数、监控配置、当前时间 | 输出: 当前状态、下一次动作前的等待秒数和状态变化回调###############
+
+
+###########################文件下的所有函数###########################
+"""
+probe_state：把检查结果（bool）和探测结果换算为ONLINE/DEGRADED/OFFLINE
+MonitorStateMachine：统一监控状态机，检查和登录结果驱动状态转换，CheckScheduler计算下一次动作时间
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[monitor_wechat / monitor_loop / WeChatMonitor.run / AccountMonitor.tick] --> B[MonitorStateMachine.tick]
+    B --> C{已到期?}
+    C -->|否| D[返回剩余等待秒数，不执行任何动作]
+    C -->|是，状态为LOGGING_IN| E[执行登录函数 -> on_login]
+    C -->|是，其他状态| F[执行检查函数 -> on_check]
+    F -->|在线| S1[ONLINE]
+    F -->|已登录但会话检查失败| S2[DEGRADED]
+    F -->|失败且未达到重试上限| S3[OFFLINE]
+    F -->|失败达到重试上限且允许自动登录| S4[LOGGING_IN 立即到期]
+    E -->|成功| S1
+    E -->|失败| S5[BACKOFF 按登录失败退避]
+    S5 -->|到期后检查| F
+    S1 --> G[CheckScheduler.next_delay计算下一次到期时间]
+    S2 --> G
+    S3 --> G
+    S5 --> G
+    B --> H[状态变化时调用on_transition回调: 日志和通知由调用方输出]
+    I[AsyncMonitorEngine] --> J[next_action / on_check / on_login: 动作由引擎在线程池或任务中执行]
+    J --> B
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import time
+import logging
+
+from config import MONITOR_CONFIG
+from wechat_scheduler import CheckScheduler
+
+# 监控状态
+UNKNOWN = 'unknown'  # 尚未检查
+ONLINE = 'online'  # 已登录且正常
+DEGRADED = 'degraded'  # 已登录但会话检查失败，功能可能异常，自动登录无法修复，只快速复查
+OFFLINE = 'offline'  # 检查失败，连续失败次数未达到自动登录条件
+LOGGING_IN = 'logging_in'  # 连续失败达到上限，下一次动作是自动登录
+BACKOFF = 'backoff'  # 自动登录失败，按退避间隔等待后重新检查
+
+MONITOR_STATES = (UNKNOWN, ONLINE, DEGRADED, OFFLINE, LOGGING_IN, BACKOFF)
+
+# 状态的日志描述
+STATE_NAMES = {
+    UNKNOWN: '未知',
+    ONLINE: '在线',
+    DEGRADED: '功能异常',
+    OFFLINE: '离线',
+    LOGGING_IN: '自动登录中',
+    BACKOFF: '登录失败退避',
+}
+
+
+def probe_state(ok, result=None):
+    """
+    probe_state 功能说明:
+    # 把检查函数的bool结果换算为状态：本次探测在会话阶段失败（已登录但功能异常）时为DEGRADED，
+    # 不论检查函数把这种情况当作通过（check_wechat_status）还是失败（WeChatMonitor.check_status）
+    # 输入: ok (检查是否通过), result (可选的ProbeResult，通常为ProbePipeline.last_result) | 输出: ONLINE/DEGRADED/OFFLINE
+    """
+    if result is not None and result.failed_stage == 'session':
+        return DEGRADED
+    return ONLINE if ok else OFFLINE
+
+
+class MonitorStateMachine:
+    """
+    MonitorStateMachine 功能说明:
+    # 统一监控状态机，单账号主循环、WeChatMonitor、多账号监管和asyncio引擎都由它决定下一步做什么：
+    # 1. tick(now)从不等待：未到期时直接返回剩余秒数；到期时执行一个动作（检查或登录）并返回下一次动作前的等待秒数
+    # 2. 检查失败累加连续失败次数，达到max_retry_count且允许自动登录时进入LOGGING_IN并立即到期，下一次tick执行登录
+    # 3. 登录成功回到ONLINE（快速复查确认），失败进入BACKOFF，等待时间按登录失败指数退避
+    # 4. 状态变化时依次调用on_transition回调（machine, 旧状态, 新状态），日志和通知由调用方决定
+    # 5. 需要自行执行动作的调用方（asyncio引擎）使用next_action/on_check/on_login，不经过tick
+    # 输入: check (检查函数，返回bool或ONLINE/DEGRADED/OFFLINE), login (登录函数，返回bool),
+    #       config (监控配置，默认MONITOR_CONFIG), auto_login (是否允许自动登录), scheduler (可选的CheckScheduler),
+    #       clock (时间函数，默认time.monotonic), name (日志名称) | 输出: tick返回等待秒数
+
+    属性说明:
+    - state: 当前状态（MONITOR_STATES之一）
+    - failure_count: 连续检查失败次数（DEGRADED不计入）
+    - login_attempts: 本次连续失败以来的自动登录次数，回到ONLINE后归零
+    - checks / logins: 累计执行的检查和登录次数
+    - next_due: 下一次动作的时间（与clock同一时间轴）
+    - last_error: 最近一次动作抛出的异常，动作正常结束后清空
+
+    说明:
+    - 传入now时下一次到期时间按now计算，便于基准测试和测试中使用虚拟时间；
+      未传入时按动作结束后的clock()计算，与原来"检查结束后再等待"的节奏一致
+    """
+
+    CHECK = 'check'
+    LOGIN = 'login'
+
+    def __init__(self, check=None, login=None, config=None, auto_login=True, scheduler=None,
+                 clock=time.monotonic, name='wechat'):
+        self.check = check
+        self.login = login
+        self.config = MONITOR_CONFIG if config is None else config
+        self.auto_login = auto_login
+        self.scheduler = scheduler or CheckScheduler(self.config)
+        self.clock = clock
+        self.name = name
+        self.on_transition = []
+
+        self.state = UNKNOWN
+        self.state_since = clock()
+        self.failure_count = 0
+        self.login_attempts = 0
+        self.checks = 0
+        self.logins = 0
+        self.next_due = self.state_since  # 创建后立即到期
+        self.last_delay = 0.0
+        self.last_error = None
+
+    @property
+    def max_retry(self):
+        """连续失败达到该次数后自动登录"""
+        return max(1, int(self.config.get('max_retry_count', 3)))
+
+    def due_in(self, now=None):
+        """
+        due_in 功能说明:
+        # 距离下一次动作的秒数，已到期时为0
+        # 输入: now (可选的当前时间) | 输出: float
+        """
+        now = self.clock() if now is None else now
+        return max(0.0, self.next_due - now)
+
+    def next_action(self):
+        """
+        next_action 功能说明:
+        # 到期后应执行的动作：LOGGING_IN状态下为登录，其余为检查
+        # 输入: 无 | 输出: MonitorStateMachine.CHECK 或 MonitorStateMachine.LOGIN
+        """
+        return self.LOGIN if self.state == LOGGING_IN else self.CHECK
+
+    def tick(self, now=None):
+        """
+        tick 功能说明:
+        # 推进状态机：未到期时只返回剩余秒数；到期时执行一个动作并返回下一次动作前的等待秒数
+        # 动作抛出的异常记入last_error并按失败处理，不向外抛出
+        # 输入: now (可选的当前时间，用于虚拟时间) | 输出: float 等待秒数（LOGGING_IN时为0，调用方应立即再次tick）
+        """
+        current = self.clock() if now is None else now
+        remaining = self.next_due - current
+        if remaining > 0:
+            return remaining
+
+        if self.next_action() == self.LOGIN:
+            try:
+                ok = bool(self.login())
+                self.last_error = None
+            except Exception as e:
+                ok = False
+                self.last_error = e
+                logging.error(f"💥 [{self.name}] 自动登录过程中发生错误: {e}")
+            return self.on_login(ok, now)
+
+        try:
+            result = self.check()
+            self.last_error = None
+        except Exception as e:
+            result = OFFLINE
+            self.last_error = e
+            logging.error(f"💥 [{self.name}] 状态检查过程中发生错误: {e}")
+        return self.on_check(result, now)
+
+    def on_check(self, result, now=None):
+        """
+        on_check 功能说明:
+        # 应用一次检查结果并计算下一次到期时间
+        # 输入: result (bool或ONLINE/DEGRADED/OFFLINE), now (可选的当前时间) | 输出: float 等待秒数
+        """
+        if result is True or result is False:
+            result = ONLINE if result else OFFLINE
+        if result not in (ONLINE, DEGRADED, OFFLINE):
+            raise ValueError(f"未知的检查结果: {result!r}")
+        self.checks += 1
+
+        if result == ONLINE:
+            self.scheduler.on_check(True)
+            self.failure_count = 0
+            self.login_attempts = 0
+            self._transition(ONLINE)
+        elif result == DEGRADED:
+            # 已登录，自动登录无法修复；按失败调度以快速复查，但不计入连续失败
+            self.scheduler.on_check(False)
+            self.failure_count = 0
+            self._transition(DEGRADED)
+        else:
+            self.scheduler.on_check(False)
+            self.failure_count += 1
+            if self.auto_login and self.login is not None and self.failure_count >= self.max_retry:
+                self.login_attempts += 1
+                self._transition(LOGGING_IN)
+                return self._schedule(0.0, now)
+            self._transition(OFFLINE)
+        return self._schedule(self.scheduler.next_delay(), now)
+
+    def on_login(self, ok, now=None):
+        """
+        on_login 功能说明:
+        # 应用一次自动登录结果：成功回到ONLINE并快速复查确认，失败进入BACKOFF按退避间隔等待
+        # 输入: ok (登录是否成功), now (可选的当前时间) | 输出: float 等待秒数
+        """
+        self.logins += 1
+        self.scheduler.on_login(ok)
+        if ok:
+            self.failure_count = 0
+            self.login_attempts = 0
+            self._transition(ONLINE)
+        else:
+            self._transition(BACKOFF)
+        return self._schedule(self.scheduler.next_delay(), now)
+
+    def check_now(self, now=None):
+        """
+        check_now 功能说明:
+        # 立即检查请求：下一次动作立即到期（LOGGING_IN状态下即立即登录）
+        # 输入: now (可选的当前时间) | 输出: 无
+        """
+        self.next_due = min(self.next_due, self.clock() if now is None else now)
+
+    def reload(self, config, base_interval=None):
+        """
+        reload 功能说明:
+        # 配置重载：原地更新调度器参数（CheckScheduler.configure），状态、失败计数、下一次到期时间、
+        # 调度器的连续计数和登录退避次数保留；显式传入的基础间隔除非给出新的base_interval否则不变
+        # 输入: config (新的监控配置), base_interval (可选，新的显式基础间隔) | 输出: 无
+        """
+        self.config = config
+        self.scheduler.configure(config, base_interval)
+
+    def snapshot(self, now=None):
+        """
+        snapshot 功能说明:
+        # 返回状态机当前状态，用于日志和测试
+        # 输入: now (可选的当前时间) | 输出: dict
+        """
+        now = self.clock() if now is None else now
+        return {
+            'state': self.state,
+            'state_seconds': round(now - self.state_since, 1),
+            'failure_count': self.failure_count,
+            'login_attempts': self.login_attempts,
+            'checks': self.checks,
+            'logins': self.logins,
+            'due_in': round(self.due_in(now), 2),
+            'next_reason': self.scheduler.last_reason,
+        }
+
+    def describe(self):
+        """返回当前状态的中文描述"""
+        return STATE_NAMES.get(self.state, self.state)
+
+    def _schedule(self, delay, now):
+        """按动作结束时间（或传入的now）计算下一次到期时间"""
+        self.last_delay = delay
+        self.next_due = (self.clock() if now is None else now) + delay
+        return delay
+
+    def _transition(self, state):
+        """切换状态，状态变化时调用回调；回调异常只记录日志"""
+        old = self.state
+        if old == state:
+            return
+        self.state = state
+        self.state_since = self.clock()
+        # 固定格式，日志分析工具（wechat_log_analyzer）按这一行重建在线/离线/登录区间
+        logging.info(f"[{self.name}] 状态变化: {STATE_NAMES.get(old, old)} -> {STATE_NAMES.get(state, state)}")
+        for callback in self.on_transition:
+            try:
+                callback(self, old, state)
+            except Exception as e:
+                logging.error(f"[{self.name}] 状态变化回调出错: {e}")
@@ -0,0 +1,631 @@
+##########wechat_supervisor.py: [多账号监管] ##################
+# 变更记录: [2026-10-16] @李祥光 [创建多账号监管模式：每个账号独立线程、独立调度、独立失败计数和登录状态，结果汇总到共享计数器和通知]########
+# 变更记录: [2026-10-16] @李祥光 [账号不再各占一个线程，改由DeadlineScheduler按到期时间派发到有界工作线程池]########
+# 变更记录: [2026-10-16] @李祥光 [LoginWnd.login经后端调用线程池执行，超过期限按登录失败处理]########
+# 变更记录: [2026-10-16] @李祥光 [拆分检查结果处理和登录步骤，供asyncio引擎复用；添加default_account单账号定义]########
+# 变更记录: [2026-10-16] @李祥光 [账号状态改由MonitorStateMachine管理，状态统一为MONITOR_STATES，通知由状态变化触发]########
+# 变更记录: [2026-10-16] @李祥光 [账号检查结果和登录结果按账号名写入检查历史存储]########
+# 变更记录: [2026-10-16] @李祥光 [账号汇总日志带上最短滚动窗口的成功率]########
+# 变更记录: [2026-10-17] @李祥光 [LoginWnd改为在后端工作线程内创建，UIA对象不跨线程使用]########
+# 输入: ACCOUNTS_CONFIG或账号定义JSON文件 | 输出: 各账号状态、汇总统计和通知###############
+
+
+###########################文件下的所有函数###########################
+"""
+default_account：单账号模式的账号定义，进程名和安装路径取WECHAT_CONFIG
+load_accounts：读取账号定义列表（ACCOUNTS_CONFIG或JSON文件），校验并补全默认值
+AccountMonitor：单个账号的监控器，持有独立的连接、探测流水线、调度器、登录等待器和计数器
+AccountSupervisor：多账号监管器，各账号按自己的节奏到期后由有界工作线程池执行检查，监管线程负责卡住检测和周期汇总
+"""
+###########################文件下的所有函数###########################
+
+#########mermaid格式说明所有函数的调用关系说明开始#########
+"""
+flowchart TD
+    A[main --supervisor/--accounts] --> B[load_accounts读取账号定义]
+    B --> C[AccountSupervisor]
+    C --> D[AccountSupervisor.start: 所有账号加入DeadlineScheduler]
+    D --> E[到期的账号派发到有界工作线程池: AccountMonitor.tick]
+    E --> F[AccountMonitor.run_once]
+    F --> F1[MonitorStateMachine.tick: 账号自己的状态机决定检查或登录]
+    F1 --> G[AccountMonitor.check_state -> check: 账号自己的ProbePipeline]
+    G -->|进程未运行且可自动启动| G1[start_process后wait_for_client_ready]
+    F1 -->|连续失败达到上限，同一轮立即| H[AccountMonitor.login]
+    H --> H1[open_login_window: 登录窗口互斥打开]
+    H1 --> H2[账号自己的LoginWatcher等待]
+    H2 --> H3[on_login_waited处理等待结果，end_login记录登录结果]
+    G --> I[账号计数器 + 共享MonitorStats]
+    H --> I
+    I --> I1[record_history_check / record_history_login按账号名写入检查历史]
+    F1 --> J[on_transition: 状态变化时发送带账号名的通知]
+    F --> J1[after_step: 输出连续失败进度和恢复信息]
+    F1 --> K[CheckScheduler.next_delay账号自己的等待时间]
+    K --> L[按等待时间重新加入DeadlineScheduler]
+    L --> E
+    C --> M[AccountSupervisor.run监管线程]
+    M --> N[check_hung: 检查或登录超时的账号告警，不影响其他账号]
+    M --> O[周期输出各账号汇总]
+    M -->|立即检查| M1[DeadlineScheduler.reschedule_all]
+    M -->|关闭请求| P[AccountSupervisor.stop停止派发并打断各账号的等待]
+"""
+#########mermaid格式说明所有函数的调用关系说明结束#########
+
+import json
+import time
+import logging
+import threading
+
+from config import MONITOR_CONFIG, WECHAT_CONFIG, ACCOUNTS_CONFIG
+from wechat_connection import WeChatConnection, wait_for_client_ready
+from wechat_probe import ProbePipeline
+from wechat_scheduler import MonitorWakeup, DeadlineScheduler
+from wechat_login import LoginWatcher
+from wechat_logging import get_state_logger
+from wechat_metrics import get_latency_recorder, get_monitor_stats, get_account_stats
+from wechat_backend import call_login_window
+from wechat_state import MonitorStateMachine, probe_state, ONLINE, LOGGING_IN
+from wechat_history import record_history_check, record_history_login
+
+# 账号定义中除MONITOR_CONFIG/WECHAT_CONFIG键以外允许的字段
+ACCOUNT_FIELDS = ('name', 'nickname', 'auto_login')
+
+# 登录窗口是桌面上的独占界面，同一时刻只为一个账号打开；等待扫码在各账号线程中并行进行
+_login_window_lock = threading.Lock()
+
+
+def default_account(name='wechat'):
+    """
+    default_account 功能说明:
+    # 单账号模式的账号定义，也是load_accounts补全各账号字段的默认值
+    # 输入: name (账号名称) | 输出: dict 账号定义
+    """
+    account = {key: WECHAT_CONFIG[key] for key in ('process_name', 'install_path', 'auto_start_wechat')}
+    account.update({'name': name, 'nickname': None, 'auto_login': True})
+    return account
+
+
+def load_accounts(path=None):
+    """
+    load_accounts 功能说明:
+    # 读取账号定义列表并补全默认值
+    # 1. 指定path时读取JSON文件，内容可以是账号列表，也可以是 {"accounts": [...]}
+    # 2. 未指定时使用ACCOUNTS_CONFIG['accounts']
+    # 3. 每个账号必须有唯一的name；process_name/install_path/auto_start_wechat默认取WECHAT_CONFIG，
+    #    其余MONITOR_CONFIG中的键（如check_interval、max_retry_count、login_timeout）可按账号覆盖
+    # 输入: path (可选的JSON文件路径) | 输出: list[dict] 补全后的账号定义
+    # 异常处理: 文件无法读取、格式错误、缺少name、name重复或包含未知字段时抛出ValueError
+    """
+    if path:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"读取账号定义文件失败: {path}: {e}")
+        if isinstance(data, dict):
+            data = data.get('accounts')
+    else:
+        data = ACCOUNTS_CONFIG.get('accounts')
+
+    if not isinstance(data, list) or not data:
+        raise ValueError("账号定义为空，请在ACCOUNTS_CONFIG['accounts']或账号定义文件中至少配置一个账号")
+
+    accounts = []
+    seen = set()
+    for index, entry in enumerate(data, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"第{index}个账号定义不是字典: {entry!r}")
+        name = str(entry.get('name') or '').strip()
+        if not name:
+            raise ValueError(f"第{index}个账号定义缺少name")
+        if name in seen:
+            raise ValueError(f"账号名称重复: {name}")
+        unknown = [key for key in entry
+                   if key not in ACCOUNT_FIELDS and key not in WECHAT_CONFIG and key not in MONITOR_CONFIG]
+        if unknown:
+            raise ValueError(f"账号 {name} 包含未知字段: {', '.join(unknown)}")
+        seen.add(name)
+
+        account = default_account(name)
+        account.update(entry)
+        account['name'] = name
+        accounts.append(account)
+    return accounts
+
+
+class AccountMonitor:
+    """
+    AccountMonitor 功能说明:
+    # 单个账号的监控器，所有状态都属于该账号，与其他账号互不影响：
+    # 1. 独立的WeChatConnection（nickname不为空时传给wxautox.WeChat区分多开实例）和ProbePipeline
+    # 2. 独立的MonitorStateMachine和CheckScheduler：账号的check_interval等配置覆盖MONITOR_CONFIG，
+    #    健康拉长、失败复查、登录退避各自计算
+    # 3. 独立的连续失败计数和登录状态，连续失败达到max_retry_count后为该账号自动登录
+    # 4. 检查和登录结果同时计入账号计数器（get_account_stats）和进程共享的MonitorStats
+    # 输入: account (load_accounts返回的账号定义), notification_manager (可选的NotificationManager),
+    #       connection / process_manager (可选，默认按账号定义创建) | 输出: tick/run_once返回下一次检查的等待秒数
+
+    属性说明:
+    - name: 账号名称，用于日志、通知标题和指标标签
+    - machine: 账号的监控状态机，决定下一次动作是检查还是登录
+    - state / failure_count / login_attempts: 状态机的当前状态（MONITOR_STATES之一）、连续失败次数和自动登录次数
+    - activity / activity_since: 正在进行的操作（check/login）及开始时间（monotonic），空闲时为None
+    - hung_reported: 当前操作是否已经按卡住告警过，操作结束后复位
+    """
+
+    def __init__(self, account, notification_manager=None, connection=None, process_manager=None):
+        self.account = account
+        self.name = account['name']
+        self.notification_manager = notification_manager
+        self.config = self._merge_config()
+        if connection is None:
+            connect_kwargs = {'nickname': account['nickname']} if account.get('nickname') else None
+            connection = WeChatConnection(connect_kwargs=connect_kwargs)
+        if process_manager is None:
+            from wechat_utils import ProcessManager
+            process_manager = ProcessManager()
+        self.connection = connection
+        self.process_manager = process_manager
+        self.probe_pipeline = ProbePipeline(connection, process_manager, account['process_name'],
+                                            self.config.get('probe_stages'))
+        self.machine = MonitorStateMachine(check=self.check_state, login=self.login, config=self.config,
+                                           auto_login=account.get('auto_login', True), name=self.name)
+        self.machine.on_transition.append(self._on_transition)
+        self.login_watcher = LoginWatcher(connection)
+        self.stats = get_account_stats(self.name)
+        self.state_log = get_state_logger()
+        self.wakeup = MonitorWakeup()  # 关闭请求，打断登录等待
+        self._stop_event = threading.Event()  # 供wait_for_client_ready使用的关闭标志
+
+        self.activity = None
+        self.activity_since = None
+        self.hung_reported = False
+        self.last_check_time = None
+
+    @property
+    def state(self):
+        return self.machine.state
+
+    @property
+    def failure_count(self):
+        return self.machine.failure_count
+
+    @property
+    def login_attempts(self):
+        return self.machine.login_attempts
+
+    @property
+    def scheduler(self):
+        return self.machine.scheduler
+
+    def _merge_config(self):
+        """
+        _merge_config 功能说明:
+        # 账号定义中的MONITOR_CONFIG键覆盖全局配置，得到该账号的监控配置
+        # 输入: 无 | 输出: dict
+        """
+        config = dict(MONITOR_CONFIG)
+        config.update({key: value for key, value in self.account.items() if key in MONITOR_CONFIG})
+        return config
+
+    def reload(self):
+        """
+        reload 功能说明:
+        # 配置重载后按新配置更新调度器参数，失败计数和登录状态保留
+        # 输入: 无 | 输出: 无
+        """
+        self.config = self._merge_config()
+        self.machine.reload(self.config)
+
+    def request_stop(self):
+        """
+        request_stop 功能说明:
+        # 请求结束该账号的监控：打断就绪等待和登录等待，之后tick不再执行检查
+        # 只做置位和唤醒，可在信号处理函数中调用
+        # 输入: 无 | 输出: 无
+        """
+        self._stop_event.set()
+        self.wakeup.notify(MonitorWakeup.SHUTDOWN)
+        self.login_watcher.cancel()
+
+    def tick(self):
+        """
+        tick 功能说明:
+        # 由DeadlineScheduler在工作线程中调用：执行一轮检查并返回下一次等待时间
+        # 单次检查或登录的异常只影响本账号，记录后按重试间隔继续；请求关闭后返回None，不再调度
+        # 输入: 无 | 输出: float 等待秒数，或None
+        """
+        if self.wakeup.is_shutdown:
+            return None
+        key = f'account.{self.name}.error'
+        try:
+            delay = self.run_once()
+            self.state_log.reset(key)
+        except Exception as e:
+            delay = self.config.get('retry_interval', 10)
+            self.state_log.log(key, f"error:{type(e).__name__}:{e}", logging.ERROR,
+                               f"💥 [{self.name}] 账号检查过程中发生错误: {e}")
+        finally:
+            self.end_activity()
+        return None if self.wakeup.is_shutdown else delay
+
+    def run_once(self):
+        """
+        run_once 功能说明:
+        # 执行一轮：推进状态机一次；连续失败达到max_retry_count进入自动登录时，同一轮立即执行登录
+        # 输入: 无 | 输出: float 下一次检查前的等待秒数
+        """
+        failures = self.failure_count
+        delay = self.machine.tick()
+        self.after_step(failures)
+        if delay <= 0 and not self.wakeup.is_shutdown:
+            delay = self.machine.tick()
+            self.after_step(failures)
+        return delay
+
+    def after_step(self, failures_before):
+        """
+        after_step 功能说明:
+        # 状态机执行一次检查或登录之后输出该账号的失败进度：失败次数增加时输出连续失败次数，
+        # 连续失败后恢复在线时输出恢复信息
+        # 输入: failures_before (动作之前的连续失败次数) | 输出: 无
+        """
+        key = f'account.{self.name}.failing'
+        if self.failure_count > failures_before:
+            self.state_log.log(key, 'failing', logging.WARNING,
+                               f"⚠️ [{self.name}] 微信状态异常 - 连续失败: {self.failure_count}/{self.machine.max_retry}")
+        elif failures_before and not self.failure_count:
+            self.state_log.reset(key)
+            if self.state == ONLINE:
+                self.state_log.recovered(f'account.{self.name}.status',
+                                         f"✅ [{self.name}] 微信状态已恢复正常 (此前连续异常 {failures_before} 次)")
+
+    def check_state(self):
+        """
+        check_state 功能说明:
+        # 状态机的检查函数：执行check并换算为在线、功能异常（会话检查失败，不触发自动登录）或离线
+        # 输入: 无 | 输出: ONLINE/DEGRADED/OFFLINE
+        """
+        return probe_state(self.check(), self.probe_pipeline.last_result)
+
+    def check(self):
+        """
+        check 功能说明:
+        # 用账号自己的探测流水线检查一次状态，进程未运行且账号允许自动启动时启动并等待客户端就绪
+        # 结果计入账号计数器和共享计数器，并按账号名写入检查历史存储
+        # 输入: 无 | 输出: bool (True=账号在线可用)
+        """
+        self.begin_activity('check')
+        ok = self._check()
+        self.last_check_time = time.time()
+        result = self.probe_pipeline.last_result
+        self.stats.record_check(ok, result)
+        get_monitor_stats().record_check(ok, result)
+        record_history_check(ok, result, self.name)
+        return ok
+
+    def _check(self):
+        """
+        _check 功能说明:
+        # check的具体检查逻辑，日志键带账号名，各账号的状态变化日志互不折叠
+        # 输入: 无 | 输出: bool
+        """
+        key = f'account.{self.name}.status'
+        process_name = self.account['process_name']
+        install_path = self.account['install_path']
+        result = self.probe_pipeline.run()
+
+        if result.failed_stage == 'process':
+            auto_start = self.account['auto_start_wechat'] and install_path
+            self.state_log.log(key, 'process_down', logging.INFO,
+                               f"[{self.name}] 微信进程 {process_name} 未运行",
+                               f"[{self.name}] 根据配置自动启动微信: {install_path}" if auto_start
+                               else f"[{self.name}] 未配置自动启动微信，请手动启动微信")
+            if not auto_start:
+                return False
+            started_at = time.monotonic()
+            if not self.process_manager.start_process(install_path):
+                return False
+            readiness = wait_for_client_ready(self.connection, process_name=process_name,
+                                              started_at=started_at, cancel_event=self._stop_event)
+            if not readiness['ready']:
+                logging.warning(f"⚠️ [{self.name}] 微信启动后 {readiness['elapsed']:.1f}秒 内未就绪"
+                                f"（阶段: {readiness['stage']}），下次检查继续")
+                return False
+            logging.info(f"✅ [{self.name}] 微信客户端已就绪，冷启动耗时 {readiness['elapsed']:.1f}秒")
+            result = self.probe_pipeline.run()
+
+        if result.ok:
+            message = f"[{self.name}] 微信状态正常，已在线"
+            if result.session_count is not None:
+                message += f"，当前有 {result.session_count} 个会话"
+            if not self.state_log.log(key, 'online', logging.INFO, message):
+                self.state_log.routine(message)
+            return True
+
+        if result.error is not None:
+            self.state_log.log(key, f"error:{type(result.error).__name__}:{result.error}", logging.ERROR,
+                               f"[{self.name}] 检查微信状态时发生错误: {result.error}")
+        elif result.failed_stage == 'online':
+            self.state_log.log(key, 'offline', logging.INFO, f"[{self.name}] 微信已启动但用户未登录，需要登录")
+        elif result.failed_stage != 'process':
+            self.state_log.log(key, f"{result.failed_stage}_failed:{result.reason}", logging.INFO,
+                               f"[{self.name}] 微信检查失败: {result.reason}")
+        return False
+
+    def login(self):
+        """
+        login 功能说明:
+        # 为该账号自动登录：登录窗口在账号间互斥打开，等待扫码由账号自己的LoginWatcher完成
+        # 其他账号正在打开登录窗口且超过login_timeout仍未释放时，本次登录按失败处理，由调度器退避后重试
+        # 输入: 无 | 输出: bool (True=登录成功)
+        """
+        started = self.begin_login()
+        outcome = 'failure'
+        try:
+            if self.open_login_window():
+                waited = self.login_watcher.wait(self.config.get('login_timeout', 60), wakeup=self.wakeup)
+                outcome = self.on_login_waited(waited)
+            return outcome == 'success'
+        except Exception as e:
+            outcome = 'error'
+            logging.error(f"[{self.name}] 自动登录微信时发生错误: {e}")
+            return False
+        finally:
+            self.end_login(outcome, started)
+
+    def begin_login(self):
+        """
+        begin_login 功能说明:
+        # 开始一次自动登录：记录正在进行的操作（登录尝试次数由状态机进入LOGGING_IN时累加）
+        # 输入: 无 | 输出: float 开始时间（perf_counter），传给end_login
+        """
+        self.begin_activity('login')
+        logging.info(f"[{self.name}] 开始第 {self.login_attempts} 次自动登录尝试")
+        return time.perf_counter()
+
+    def open_login_window(self):
+        """
+        open_login_window 功能说明:
+        # 打开登录窗口（阻塞调用）：登录窗口在账号间互斥，最多等待login_timeout；打开成功后通知用户扫码
+        # 输入: 无 | 输出: bool 登录窗口是否已打开
+        """
+        timeout = self.config.get('login_timeout', 60)
+        if not _login_window_lock.acquire(timeout=timeout):
+            logging.warning(f"⚠️ [{self.name}] 其他账号的登录窗口 {timeout}秒 内未关闭，稍后重试")
+            return False
+        try:
+            with get_latency_recorder().timer('login_window'):
+                login_result = call_login_window(timeout)
+        finally:
+            _login_window_lock.release()
+
+        if not (login_result and getattr(login_result, 'success', False)):
+            logging.error(f"[{self.name}] 无法打开微信登录窗口")
+            return False
+        self._notify("微信需要登录", "请扫描二维码完成微信登录")
+        return True
+
+    def on_login_waited(self, waited):
+        """
+        on_login_waited 功能说明:
+        # 处理登录等待结果：等待超时时通知用户，被取消时不通知；状态和失败计数由状态机按登录结果更新
+        # 输入: waited (LoginWatcher.wait格式的dict {online, cancelled, elapsed}) | 输出: str 'success'或'failure'
+        """
+        if waited['online']:
+            logging.info(f"🎉 [{self.name}] 微信登录成功（检测耗时 {waited['elapsed']:.1f}秒）")
+            self.state_log.reset(f'account.{self.name}.status')
+            return 'success'
+        if not waited['cancelled']:
+            timeout = self.config.get('login_timeout', 60)
+            logging.warning(f"[{self.name}] 登录等待超时({timeout}秒)")
+            self._notify("微信登录超时", "登录等待超时，请重新尝试扫码登录")
+        return 'failure'
+
+    def end_login(self, outcome, started):
+        """
+        end_login 功能说明:
+        # 结束一次自动登录：记录登录耗时，结果计入账号计数器和共享计数器，并按账号名写入检查历史存储
+        # 输入: outcome ('success'/'failure'/'error'), started (begin_login返回的开始时间) | 输出: 无
+        """
+        login_seconds = time.perf_counter() - started
+        get_latency_recorder().observe('login', login_seconds)
+        self.stats.record_login(outcome)
+        get_monitor_stats().record_login(outcome)
+        record_history_login(outcome, login_seconds, self.name)
+
+    def snapshot(self):
+        """
+        snapshot 功能说明:
+        # 返回账号当前状态和计数器，用于汇总日志和结束统计
+        # 输入: 无 | 输出: dict
+        """
+        busy = time.monotonic() - self.activity_since if self.activity_since is not None else None
+        snapshot = {
+            'state': self.state,
+            'failure_count': self.failure_count,
+            'login_attempts': self.login_attempts,
+            'activity': self.activity,
+            'busy_seconds': round(busy, 1) if busy is not None else None,
+            'next_reason': self.scheduler.last_reason,
+        }
+        snapshot.update(self.stats.snapshot())
+        return snapshot
+
+    def begin_activity(self, activity):
+        self.activity = activity
+        self.activity_since = time.monotonic()
+        self.hung_reported = False
+
+    def end_activity(self):
+        self.activity = None
+        self.activity_since = None
+
+    def _on_transition(self, machine, old, new):
+        """状态变化时发送带账号名的通知：第一次进入自动登录时告警，自动登录成功时通知恢复"""
+        if new == LOGGING_IN and machine.login_attempts == 1:
+            self._notify("🚨 微信状态异常", f"连续 {machine.failure_count} 次检查失败\n正在尝试自动恢复...")
+        elif old == LOGGING_IN and new == ONLINE:
+            self._notify("✅ 微信状态恢复", "自动登录成功\n微信状态已恢复正常")
+
+    def _notify(self, title, message):
+        """通知标题带账号名，不同账号的同类通知不会被合并"""
+        if self.notification_manager is not None:
+            self.notification_manager.send_notification(f"[{self.name}] {title}", message)
+
+
+class AccountSupervisor:
+    """
+    AccountSupervisor 功能说明:
+    # 多账号监管器：所有账号加入一个DeadlineScheduler，按各自调度器给出的到期时间派发到有界工作线程池
+    # 线程数由ACCOUNTS_CONFIG['max_workers']限制，与账号数量无关；
+    # 某个账号的wxautox调用变慢或卡住只占用一个工作线程，在它返回前不会被再次派发，其他账号使用剩余的工作线程；
+    # 监管线程定期检查各账号正在进行的操作，超过hang_timeout（登录另加login_timeout）时告警一次
+    # 输入: accounts (load_accounts返回的账号定义列表), notification_manager (可选),
+    #       monitors (可选，直接传入AccountMonitor列表，主要用于测试) | 输出: 无
+
+    属性说明:
+    - monitors: {账号名: AccountMonitor}
+    - hang_timeout: 单次检查超过该秒数未返回视为卡住
+    - summary_interval: 汇总日志间隔（秒）
+    - scheduler: 派发各账号检查的DeadlineScheduler
+    """
+
+    def __init__(self, accounts=None, notification_manager=None, monitors=None):
+        if monitors is None:
+            monitors = [AccountMonitor(account, notification_manager) for account in accounts or []]
+        self.monitors = {monitor.name: monitor for monitor in monitors}
+        self.notification_manager = notification_manager
+        self.hang_timeout = float(ACCOUNTS_CONFIG.get('hang_timeout', 120))
+        self.summary_interval = float(ACCOUNTS_CONFIG.get('summary_interval', 300))
+        self.state_log = get_state_logger()
+        workers = int(ACCOUNTS_CONFIG.get('max_workers', 8))
+        self.scheduler = DeadlineScheduler(max(1, min(workers, len(self.monitors))), name='AccountScheduler',
+                                           lag_stage='schedule_lag',
+                                           error_delay=MONITOR_CONFIG.get('retry_interval', 10))
+
+    def start(self):
+        """
+        start 功能说明:
+        # 把所有账号加入调度器（立即到期）并启动派发
+        # 输入: 无 | 输出: 无
+        """
+        for name, monitor in self.monitors.items():
+            self.scheduler.add(name, monitor.tick)
+        self.scheduler.start()
+        logging.info(f"👥 多账号监管已启动: {', '.join(self.monitors)} (工作线程: {self.scheduler.max_workers})")
+
+    def notify(self, reason):
+        """
+        notify 功能说明:
+        # 处理唤醒请求：立即检查时所有账号立即到期；配置重载时各账号按新配置更新调度器参数
+        # 输入: reason (MonitorWakeup.CHECK_NOW/RELOAD) | 输出: 无
+        """
+        if reason == MonitorWakeup.RELOAD:
+            for monitor in self.monitors.values():
+                monitor.reload()
+        elif reason == MonitorWakeup.CHECK_NOW:
+            for monitor in self.monitors.values():
+                monitor.machine.check_now()
+            self.scheduler.reschedule_all()
+
+    def request_stop(self):
+        """
+        request_stop 功能说明:
+        # 请求所有账号结束监控，只做置位和唤醒不等待，可在信号处理函数中调用
+        # 输入: 无 | 输出: 无
+        """
+        for monitor in self.monitors.values():
+            monitor.request_stop()
+
+    def stop(self, timeout=5.0):
+        """
+        stop 功能说明:
+        # 停止派发并在期限内等待正在执行的检查结束；仍卡在wxautox调用中的工作线程是守护线程，不阻止程序退出
+        # 输入: timeout (最长等待秒数) | 输出: list 期限到达时仍在执行的账号名
+        """
+        self.request_stop()
+        stuck = self.scheduler.stop(timeout)
+        if stuck:
+            logging.warning(f"⚠️ 以下账号的检查未能按时结束（卡在微信调用中）: {', '.join(map(str, stuck))}")
+        return stuck
+
+    def check_hung(self):
+        """
+        check_hung 功能说明:
+        # 检查各账号正在进行的操作是否超时，每次卡住只告警一次
+        # 检查操作的期限为hang_timeout，登录操作另加账号的login_timeout（等待扫码本身就很长）
+        # 输入: 无 | 输出: list 本次新发现卡住的账号名
+        """
+        now = time.monotonic()
+        hung = []
+        for name, monitor in self.monitors.items():
+            since, activity = monitor.activity_since, monitor.activity
+            if since is None or monitor.hung_reported:
+                continue
+            limit = self.hang_timeout
+            if activity == 'login':
+                limit += monitor.config.get('login_timeout', 60)
+            if now - since < limit:
+                continue
+            monitor.hung_reported = True
+            hung.append(name)
+            logging.warning(f"⏳ [{name}] {activity} 已进行 {now - since:.1f}秒 未返回，该账号可能卡住，其他账号不受影响")
+            if self.notification_manager is not None:
+                self.notification_manager.send_notification(
+                    f"[{name}] ⏳ 微信检查无响应",
+                    f"{activity} 已进行 {now - since:.0f}秒 未返回，请检查该账号的微信窗口"
+                )
+        return hung
+
+    def snapshot(self):
+        """
+        snapshot 功能说明:
+        # 返回各账号的状态快照
+        # 输入: 无 | 输出: dict {账号名: AccountMonitor.snapshot()}
+        """
+        return {name: monitor.snapshot() for name, monitor in self.monitors.items()}
+
+    def format_summary(self):
+        """
+        format_summary 功能说明:
+        # 把各账号状态格式化为一行日志，带上最短滚动窗口（默认5分钟）的成功率
+        # 输入: 无 | 输出: str，如 "客服1: online 12/12 5m 100.0%, 客服2: offline 3/5(连续失败2) 5m 40.0%"
+        """
+        parts = []
+        for name, snap in self.snapshot().items():
+            text = f"{name}: {snap['state']} {snap['successes']}/{snap['checks']}"
+            if snap['failure_count']:
+                text += f"(连续失败{snap['failure_count']})"
+            for label, rate in list(snap['availability'].items())[:1]:
+                if rate is not None:
+                    text += f" {label} {rate * 100:.1f}%"
+            parts.append(text)
+        return ', '.join(parts) or '无账号'
+
+    def run(self, wakeup, on_reload=None):
+        """
+        run 功能说明:
+        # 监管线程主循环：启动调度器，定期检查卡住的账号并输出汇总，收到关闭请求后停止调度
+        # 立即检查请求转发给所有账号；配置重载先调用on_reload，再让各账号按新配置更新调度器参数
+        # 输入: wakeup (MonitorWakeup，主程序的唤醒器), on_reload (可选的配置重载回调) | 输出: 无
+        """
+        self.start()
+        tick = max(1.0, min(self.summary_interval, self.hang_timeout / 4))
+        next_summary = time.monotonic() + self.summary_interval
+        try:
+            while True:
+                reason = wakeup.wait(tick)
+                if reason == MonitorWakeup.SHUTDOWN:
+                    break
+                if reason is not None:
+                    logging.info(f"🔔 等待被唤醒: {wakeup.describe(reason)}")
+                    if reason == MonitorWakeup.RELOAD and on_reload is not None:
+                        on_reload()
+                    self.notify(reason)
+                self.check_hung()
+                if time.monotonic() >= next_summary:
+                    next_summary = time.monotonic() + self.summary_interval
+                    logging.info(f"👥 账号状态汇总 - {self.format_summary()}")
+                    logging.debug(f"👥 账号调度统计 - {self.scheduler.stats()}")
+        finally:
+            self.stop()
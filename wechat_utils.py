@@ -1,6 +1,27 @@
 ##########wechat_utils.py: [微信监控工具类集合] ##################
 # 变更记录: [2025-06-24] @李祥光 [创建微信自动登录工具类]########
 # 变更记录: [2025-06-24] @李祥光 [修复API调用错误：使用IsOnline和LoginWnd类]########
+# 变更记录: [2026-10-16] @李祥光 [WeChatMonitor改为复用共享微信连接]########
+# 变更记录: [2026-10-16] @李祥光 [check_status改为分级探测流水线]########
+# 变更记录: [2026-10-16] @李祥光 [通知改为后台队列投递，支持合并和令牌桶限流]########
+# 变更记录: [2026-10-16] @李祥光 [check_status改为状态变化日志，重复状态和错误折叠为周期汇总]########
+# 变更记录: [2026-10-16] @李祥光 [进程检查和自动登录各步骤记录耗时直方图]########
+# 变更记录: [2026-10-16] @李祥光 [检查结果和登录结果计入进程级计数器]########
+# 变更记录: [2026-10-16] @李祥光 [进程检查和终止改为PID跟踪，只在缓存PID失效时全量遍历进程]########
+# 变更记录: [2026-10-16] @李祥光 [进程名称匹配在Linux下改用/proc快速查找后端]########
+# 变更记录: [2026-10-16] @李祥光 [添加批量终止terminate_all，kill_process改为终止全部匹配进程并共用一个等待期限]########
+# 变更记录: [2026-10-16] @李祥光 [自动启动微信后改为就绪等待，客户端可用后立即继续检查]########
+# 变更记录: [2026-10-16] @李祥光 [auto_login登录等待改为共享LoginWatcher，先快后慢轮询]########
+# 变更记录: [2026-10-16] @李祥光 [IsOnline和LoginWnd.login经后端调用线程池执行，超过期限按失败处理]########
+# 变更记录: [2026-10-16] @李祥光 [WeChatMonitor添加统一状态机和tick，检查和登录由状态机决定]########
+# 变更记录: [2026-10-16] @李祥光 [检查结果、登录结果和通知发送结果写入检查历史存储]########
+# 变更记录: [2026-10-16] @李祥光 [LogRotator改用rotate_log_dir：单次scandir，按保留天数和总大小上限删除]########
+# 变更记录: [2026-10-16] @李祥光 [LogRotator删除前先压缩不再写入的日志，输出节省的空间]########
+# 变更记录: [2026-10-16] @李祥光 [terminate_all终止前全量遍历进程，缓存之后新启动的同名进程也被终止]########
+# 变更记录: [2026-10-17] @李祥光 [LoginWnd改为在后端工作线程内创建，UIA对象不跨线程使用]########
+# 变更记录: [2026-10-17] @李祥光 [rate_limited改为按被限流推迟的通知条数计数，每条只计一次]########
+# 变更记录: [2026-10-17] @李祥光 [删除已无调用方的WeChatMonitor._is_online，登录状态由探测流水线和LoginWatcher检查]########
+# 变更记录: [2026-10-17] @李祥光 [WeChatMonitor添加关闭标志和request_stop，冷启动就绪等待可被关闭请求打断]########
 # 输入: 无 | 输出: 工具类方法###############
 
 
@@ -8,6 +29,7 @@
 """
 WeChatMonitor：微信监控工具类
 NotificationManager：通知管理工具类
+NotificationDispatcher：后台通知投递器，有界队列+同标题合并+令牌桶限流
 ProcessManager：进程管理工具类
 LogRotator：日志轮转工具类
 """
@@ -18,24 +40,48 @@ LogRotator：日志轮转工具类
 flowchart TD
     A[主程序] --> B[WeChatMonitor类]
     B --> C[check_status检查状态]
+    C --> C1[StateTransitionLogger只在状态变化时输出完整信息]
     B --> D[auto_login自动登录]
+    B --> B1[tick推进MonitorStateMachine]
+    B --> B3[request_stop: 置位关闭标志打断就绪等待，取消登录等待]
+    B1 --> B2[check_state: 在线/功能异常/离线]
+    B2 --> C
+    B1 -->|LOGGING_IN| D
     B --> E[NotificationManager类]
     E --> F[send_notification发送通知]
+    F --> F1[NotificationDispatcher入队]
+    F1 --> F2[后台线程合并/限流后发送]
+    F2 --> F3[_deliver发送结果写入检查历史]
+    C2 --> C4[record_history_check / record_history_login写入检查历史]
+    D2 --> C4
     B --> G[ProcessManager类]
     G --> H[start_process启动进程]
     G --> I[kill_process终止进程]
+    I --> I1[terminate_all批量终止，返回每个PID的结果]
     G --> J[is_process_running检查进程]
+    J --> J1[LatencyRecorder记录process耗时]
+    J --> J2[ProcessTracker验证缓存PID，失效时经/proc或psutil全量遍历]
+    I --> J2
+    D --> D1[LatencyRecorder记录login_window/login_poll/login耗时]
+    D --> D3[LoginWatcher.wait等待登录完成]
+    D --> D4[call_login_window: 工作线程内创建LoginWnd并在login_window期限内执行login]
+    C --> C2[MonitorStats.record_check]
+    C --> C3[进程未运行: start_process后wait_for_client_ready，就绪后重新探测]
+    D --> D2[MonitorStats.record_login]
     B --> K[LogRotator类]
     K --> L[rotate_logs轮转日志]
+    L --> L0[compress_logs: 轮转备份和前一天的日志压缩为.gz/.zst]
+    L0 --> L1[rotate_log_dir: scandir一次，过期和超出总大小上限的日志从最旧开始删除]
 """
 #########mermaid格式说明所有函数的调用关系说明结束#########
 
 import os
 import time
+import queue
 import logging
+import threading
 import subprocess
 import psutil
-from datetime import datetime, timedelta
 from config import MONITOR_CONFIG, LOG_CONFIG, WECHAT_CONFIG, NOTIFICATION_CONFIG
 
 try:
@@ -45,6 +91,16 @@ except ImportError:
     print("请先安装所需库: pip install wxautox plyer psutil")
     exit(1)
 
+from wechat_connection import get_shared_connection, wait_for_client_ready
+from wechat_probe import ProbePipeline
+from wechat_logging import get_state_logger, rotate_log_dir, compress_logs, format_compression_result
+from wechat_metrics import get_latency_recorder, get_monitor_stats
+from wechat_process import get_process_tracker, terminate_processes
+from wechat_login import get_login_watcher
+from wechat_backend import call_login_window
+from wechat_state import MonitorStateMachine, probe_state
+from wechat_history import record_history_check, record_history_login, record_history_notification
+
 class WeChatMonitor:
     """
     WeChatMonitor 功能说明:
@@ -57,7 +113,13 @@ class WeChatMonitor:
     - process_manager: 进程管理器实例，用于检查和管理微信进程
     - notification_manager: 通知管理器实例，用于发送桌面通知
     - retry_count: 当前重试次数计数器，用于控制自动登录重试逻辑
-    - wx_instance: wxautox.WeChat实例，用于与微信进行交互
+    - connection: 共享的微信连接持有者，负责复用和按需重连wxautox.WeChat实例
+    - probe_pipeline: 分级探测流水线，廉价阶段每次执行，会话列表检查按需执行
+    - state_log: 状态变化日志记录器，状态不变时折叠重复日志
+    - wx_instance: 最近一次initialize_wechat取得的wxautox.WeChat实例，只供外部调用方使用；
+      状态检查和登录等待都经共享连接进行（ProbePipeline/LoginWatcher），不使用该属性
+    - state_machine: 监控状态机，tick时决定执行check_state还是auto_login
+    - _stop_event: 关闭标志，request_stop置位后冷启动就绪等待立即返回
     """
     def __init__(self):
         """
@@ -67,14 +129,19 @@ class WeChatMonitor:
         self.process_manager = ProcessManager()  # 初始化进程管理器
         self.notification_manager = NotificationManager()  # 初始化通知管理器
         self.retry_count = 0  # 重试计数器，用于控制登录重试次数
-        self.wx_instance = None  # 微信实例，延迟初始化
+        self.connection = get_shared_connection()  # 共享连接，实例失效时才重连
+        self.probe_pipeline = ProbePipeline(self.connection, self.process_manager)  # 分级探测
+        self.state_log = get_state_logger()  # 状态变化日志
+        self.wx_instance = None  # initialize_wechat取得的微信实例，检查和登录流程不使用
+        self.state_machine = MonitorStateMachine(check=self.check_state, login=self.auto_login)  # 监控状态机
+        self._stop_event = threading.Event()  # 供wait_for_client_ready使用的关闭标志
         
     def initialize_wechat(self):
         """
         initialize_wechat 功能说明:
-        # 初始化wxautox.WeChat实例，建立与微信客户端的连接
-        # 这是与微信进行所有交互操作的基础，必须在其他微信操作之前调用
-        # 如果微信未启动或连接失败，会抛出异常
+        # 从共享连接获取wxautox.WeChat实例，已有实例存活时直接复用
+        # 供需要直接操作微信实例的外部调用方使用；check_status和auto_login经共享连接自行获取实例，不依赖本方法
+        # 只有实例失效或尚未连接时才会真正重新连接微信客户端
         # 输入: 无 | 输出: bool (True=初始化成功, False=初始化失败)
         
         返回值说明:
@@ -82,11 +149,12 @@ class WeChatMonitor:
         - False: 初始化失败，通常是微信未启动或权限不足
         """
         try:
-            # 创建wxautox.WeChat实例，自动连接到当前运行的微信客户端
-            self.wx_instance = wxautox.WeChat()
+            # 获取wxautox.WeChat实例，必要时自动重连当前运行的微信客户端
+            self.wx_instance = self.connection.get()
             logging.debug("微信实例初始化成功")
             return True
         except Exception as e:
+            self.wx_instance = None
             # 记录详细的错误信息，便于问题排查
             logging.error(f"初始化微信实例失败: {str(e)}")
             logging.error("可能原因：1.微信未启动 2.权限不足 3.微信版本不兼容")
@@ -99,66 +167,127 @@ class WeChatMonitor:
         # 这是监控系统的核心方法，通过多层检查确保微信处于可用状态
         # 输入: 无 | 输出: bool (True=微信完全在线可用, False=微信离线或不可用)
         
-        检查流程:
+        检查流程（由ProbePipeline按廉价到昂贵的顺序执行）:
         1. 检查微信进程是否在系统中运行
         2. 如果进程未运行且配置了自动启动，则尝试启动微信
-        3. 初始化微信实例（如果尚未初始化）
+        3. 获取微信实例（已有实例存活则复用，否则重连）
         4. 检查微信是否已登录（IsOnline状态）
-        5. 验证会话列表是否可获取（确认登录状态正常）
+        5. 验证会话列表是否可获取（按probe_stages配置的间隔执行，出现可疑迹象时立即执行）
         
         返回值说明:
         - True: 微信进程运行中、已登录、会话列表正常，可以正常使用
         - False: 任一检查项失败，微信不可用
+        
+        日志说明:
+        - 各状态只在变化时完整输出，相同状态和相同错误折叠为周期汇总（LOG_CONFIG['log_mode']）
+        - 检查结果计入进程级计数器（MonitorStats），供指标端点导出，并写入检查历史存储
+        """
+        ok = self._check_status()
+        get_monitor_stats().record_check(ok, self.probe_pipeline.last_result)
+        record_history_check(ok, self.probe_pipeline.last_result)
+        return ok
+    
+    def request_stop(self):
+        """
+        request_stop 功能说明:
+        # 请求结束监控：打断冷启动就绪等待和登录等待，正在进行的检查或登录随即返回失败
+        # 只做置位和唤醒，可在信号处理函数中调用
+        # 输入: 无 | 输出: 无
+        """
+        self._stop_event.set()
+        get_login_watcher().cancel()
+    
+    def check_state(self):
+        """
+        check_state 功能说明:
+        # 执行一次check_status并换算为状态机的检查结果：会话阶段失败时为功能异常（DEGRADED），不触发自动登录
+        # 输入: 无 | 输出: ONLINE/DEGRADED/OFFLINE
+        """
+        return probe_state(self.check_status(), self.probe_pipeline.last_result)
+    
+    def tick(self, now=None):
+        """
+        tick 功能说明:
+        # 推进监控状态机：到期时执行一次检查或自动登录，不等待
+        # 连续失败达到max_retry_count时下一次tick执行auto_login，登录失败后按退避间隔重新检查
+        # 输入: now (可选的当前时间，time.monotonic时间轴) | 输出: float 下一次tick前应等待的秒数
+        """
+        return self.state_machine.tick(now)
+    
+    def _check_status(self):
+        """
+        _check_status 功能说明:
+        # check_status的具体检查逻辑，返回值含义与check_status相同
+        # 输入: 无 | 输出: bool
         """
+        result = self.probe_pipeline.run()
+        
         # 第一步：检查微信进程是否在系统中运行
         # 这是最基础的检查，如果进程都没有运行，后续操作都无法进行
-        if not self.process_manager.is_process_running(WECHAT_CONFIG['process_name']):
-            logging.info(f"微信进程 {WECHAT_CONFIG['process_name']} 未运行")
+        if result.failed_stage == 'process':
+            auto_start = WECHAT_CONFIG['auto_start_wechat'] and WECHAT_CONFIG['install_path']
+            self.state_log.log(
+                'wechat_monitor.status', 'process_down', logging.INFO,
+                f"微信进程 {WECHAT_CONFIG['process_name']} 未运行",
+                f"根据配置自动启动微信: {WECHAT_CONFIG['install_path']}" if auto_start
+                else "未配置自动启动微信，请手动启动微信"
+            )
             
             # 如果配置了自动启动微信，尝试启动微信进程
             # 这个功能可以在微信意外关闭时自动重启
-            if WECHAT_CONFIG['auto_start_wechat'] and WECHAT_CONFIG['install_path']:
-                logging.info(f"根据配置自动启动微信: {WECHAT_CONFIG['install_path']}")
-                self.process_manager.start_process(WECHAT_CONFIG['install_path'])
-                time.sleep(5)  # 等待微信启动完成，给足够的启动时间
-                logging.info("微信启动等待完成，继续检查状态")
-            else:
-                logging.info("未配置自动启动微信，请手动启动微信")
+            if not auto_start:
+                return False
+            started_at = time.monotonic()
+            if not self.process_manager.start_process(WECHAT_CONFIG['install_path']):
+                return False
             
-            return False
+            # 按递增间隔轮询进程和可连接的实例，客户端可用后立即继续检查，不再固定等待；请求关闭后立即返回
+            readiness = wait_for_client_ready(self.connection, started_at=started_at, cancel_event=self._stop_event)
+            if readiness['stage'] == 'cancelled':
+                logging.info("已请求关闭，放弃等待微信客户端就绪")
+                return False
+            if not readiness['ready']:
+                stage = '进程未出现' if readiness['stage'] == 'process' else '无法连接微信'
+                logging.warning(f"⚠️ 微信启动后 {readiness['elapsed']:.1f}秒 内未就绪（{stage}），下次检查继续")
+                return False
+            logging.info(f"✅ 微信客户端已就绪，冷启动耗时 {readiness['elapsed']:.1f}秒，继续检查状态")
+            result = self.probe_pipeline.run()
+            if result.failed_stage == 'process':
+                return False
         
-        # 第二步：初始化微信实例（如果尚未初始化）
-        # 只有微信进程运行后，才能建立与微信的连接
-        if not self.wx_instance and not self.initialize_wechat():
-            logging.warning("微信进程运行中但无法建立连接，可能微信正在启动中")
+        # 第二步：检查微信是否已登录 - 使用IsOnline方法
+        # 连接失败通常是微信正在启动中；即使微信启动了，用户没有登录也会返回False
+        if result.failed_stage == 'online':
+            if result.error is not None:
+                error = result.error
+                self.state_log.log(
+                    'wechat_monitor.status', f"error:{type(error).__name__}:{error}", logging.ERROR,
+                    f"检查微信状态时发生错误: {str(error)}",
+                    "微信进程运行中但无法建立连接，可能微信正在启动中"
+                )
+            else:
+                self.state_log.log('wechat_monitor.status', 'offline', logging.INFO,
+                                   "微信已启动但用户未登录，需要登录")
             return False
         
-        try:
-            # 第三步：检查微信是否已登录 - 使用IsOnline方法
-            # IsOnline()方法检查微信是否处于已登录状态
-            # 即使微信启动了，如果用户没有登录，这里也会返回False
-            if not self.wx_instance.IsOnline():
-                logging.info("微信已启动但用户未登录，需要登录")
-                return False
-            
-            # 第四步：检查微信会话列表是否可获取
-            # 这是一个更深层的检查，确保微信不仅登录了，而且功能正常
-            # 如果会话列表为空，可能表示登录状态异常或网络问题
-            sessions = self.wx_instance.GetSession()
-            if not sessions:
-                logging.info("微信会话列表获取失败，可能登录状态异常或网络连接问题")
-                return False
-                
-            # 所有检查都通过，微信状态完全正常
-            logging.info(f"微信状态正常，已在线，当前有 {len(sessions)} 个会话")
-            self.retry_count = 0  # 重置重试计数，因为状态正常
-            return True
-            
-        except Exception as e:
-            # 捕获所有可能的异常，记录详细错误信息
-            logging.error(f"检查微信状态时发生错误: {str(e)}")
-            logging.error("可能原因：1.微信版本不兼容 2.权限不足 3.微信功能异常")
+        # 第三步：检查微信会话列表是否可获取
+        # 这是一个更深层的检查，确保微信不仅登录了，而且功能正常
+        # 如果会话列表为空，可能表示登录状态异常或网络问题
+        if result.failed_stage == 'session':
+            self.state_log.log('wechat_monitor.status', f"session_failed:{result.reason}", logging.INFO,
+                               f"微信会话列表获取失败: {result.reason}")
             return False
+        
+        # 所有已执行的检查都通过，微信状态正常
+        # 会话数每次都可能不同，只在进入正常状态时输出，之后按例行日志记录
+        if result.session_count is not None:
+            message = f"微信状态正常，已在线，当前有 {result.session_count} 个会话"
+        else:
+            message = "微信状态正常，已在线"
+        if not self.state_log.log('wechat_monitor.status', 'online', logging.INFO, message):
+            self.state_log.routine(message)
+        self.retry_count = 0  # 重置重试计数，因为状态正常
+        return True
     
     def auto_login(self):
         """
@@ -171,7 +300,7 @@ class WeChatMonitor:
         1. 检查重试次数是否超过限制
         2. 使用LoginWnd类打开登录窗口
         3. 发送通知提醒用户扫码
-        4. 循环检查登录状态直到成功或超时
+        4. 由共享的LoginWatcher先快后慢地轮询登录状态，直到成功、超时或程序关闭
         5. 根据结果发送相应通知
         
         重试机制:
@@ -201,20 +330,19 @@ class WeChatMonitor:
             self.retry_count = 0  # 重置重试计数，允许后续重新尝试
             return False
         
+        recorder = get_latency_recorder()  # 记录各登录步骤耗时
+        login_started = time.perf_counter()
+        outcome = 'failure'  # 登录结果，退出时计入进程级计数器
         try:
             logging.info("开始执行自动登录流程...")
             
-            # 第二步：使用wxautox的LoginWnd类进行登录
+            # 第二步：使用wxautox的LoginWnd类打开登录窗口
             # LoginWnd是专门用于处理微信登录的类，支持二维码登录
-            from wxautox import LoginWnd
-            
-            # 创建登录窗口实例
-            # 这个实例将负责打开微信登录界面并处理登录流程
-            login_wnd = LoginWnd()
-            
-            # 第三步：调用登录方法，打开登录窗口
-            # timeout参数控制登录窗口的超时时间
-            login_result = login_wnd.login(timeout=MONITOR_CONFIG['login_timeout'])
+            # 登录窗口实例在后端工作线程内创建，负责打开微信登录界面并处理登录流程
+            # timeout参数控制登录窗口的超时时间；超过期限（登录超时+宽限）按异常处理
+            login_timeout = MONITOR_CONFIG['login_timeout']
+            with recorder.timer('login_window'):
+                login_result = call_login_window(login_timeout)
             
             # 检查登录窗口是否成功打开
             if login_result and hasattr(login_result, 'success') and login_result.success:
@@ -225,31 +353,25 @@ class WeChatMonitor:
                     "请扫描二维码完成微信登录"
                 )
                 
-                # 第四步：等待用户完成登录操作
-                # 使用轮询方式检查登录状态，避免阻塞程序
-                wait_time = 0
+                # 第三步：等待用户完成登录操作
+                # 通过共享连接检查登录状态，实例失效时连接持有者会自动重连，无需每次重新创建
+                # 轮询间隔先短后长，扫码完成后很快就能检测到
                 max_wait = MONITOR_CONFIG['login_timeout']
-                check_interval = 2  # 每2秒检查一次登录状态
-                
                 logging.info(f"开始等待登录完成，最大等待时间: {max_wait}秒")
-                while wait_time < max_wait:
-                    time.sleep(check_interval)
-                    wait_time += check_interval
-                    
-                    # 重新初始化微信实例并检查登录状态
-                    # 需要重新初始化是因为登录状态可能已经改变
-                    if self.initialize_wechat() and self.wx_instance.IsOnline():
-                        logging.info("🎉 微信登录成功！用户已完成扫码登录")
-                        # 发送成功通知
-                        self.notification_manager.send_notification(
-                            "微信登录成功", 
-                            "微信已成功登录，监控程序继续运行"
-                        )
-                        self.retry_count = 0  # 登录成功，重置重试计数
-                        return True
-                        
-                    # 显示等待进度，让用户了解当前状态
-                    logging.info(f"等待用户扫码登录中... ({wait_time}/{max_wait}秒)")
+                waited = get_login_watcher().wait(max_wait)
+                if waited['online']:
+                    logging.info(f"🎉 微信登录成功！用户已完成扫码登录（检测耗时 {waited['elapsed']:.1f}秒）")
+                    # 发送成功通知
+                    self.notification_manager.send_notification(
+                        "微信登录成功", 
+                        "微信已成功登录，监控程序继续运行"
+                    )
+                    self.retry_count = 0  # 登录成功，重置重试计数
+                    outcome = 'success'
+                    return True
+                if waited['cancelled']:
+                    logging.info("程序正在关闭，停止等待登录")
+                    return False
                 
                 # 超时处理：用户在规定时间内未完成登录
                 logging.warning(f"登录等待超时({max_wait}秒)，请检查是否已完成扫码")
@@ -265,9 +387,17 @@ class WeChatMonitor:
                 
         except Exception as e:
             # 捕获登录过程中的所有异常
+            outcome = 'error'
             logging.error(f"自动登录微信时发生错误: {str(e)}")
             logging.error("可能原因：1.微信版本不兼容 2.系统权限不足 3.网络连接问题")
             return False
+        
+        finally:
+            # 整次登录耗时（打开窗口+等待扫码），无论成功、超时还是异常都记录
+            login_seconds = time.perf_counter() - login_started
+            recorder.observe('login', login_seconds)
+            get_monitor_stats().record_login(outcome)
+            record_history_login(outcome, login_seconds)
 
 class NotificationManager:
     """
@@ -275,39 +405,331 @@ class NotificationManager:
     # 桌面通知管理器，负责向用户发送系统通知
     # 主要用于微信状态变化时的用户提醒（如需要登录、登录成功等）
     # 支持Windows系统的桌面通知功能
-    # 输入: 无 | 输出: 无
+    # 启用async_dispatch时通知由后台NotificationDispatcher投递，不阻塞监控线程
+    # 输入: config (可选的通知配置，覆盖NOTIFICATION_CONFIG中的同名项) | 输出: 无
     """
     
+    def __init__(self, config=None):
+        """
+        __init__ 功能说明:
+        # 初始化通知管理器，合并通知配置并按需创建后台投递器
+        # 输入: config (可选字典；兼容load_custom_config生成的{'enabled': bool}写法) | 输出: 无
+        """
+        self.config = dict(NOTIFICATION_CONFIG)
+        if config:
+            self.config.update(config)
+            if 'enabled' in config:
+                self.config['enable_desktop_notification'] = bool(config['enabled'])
+        
+        self.dispatcher = None
+        if self.config.get('async_dispatch', True):
+            self.dispatcher = NotificationDispatcher(
+                self._deliver,
+                queue_size=self.config.get('queue_size', 100),
+                coalesce_window=self.config.get('coalesce_window', 60),
+                rate_per_minute=self.config.get('rate_limit_per_minute', 6),
+                burst=self.config.get('rate_limit_burst', 3)
+            )
+    
     def send_notification(self, title, message):
         """
         send_notification 功能说明:
         # 发送桌面通知给用户，提醒重要的微信状态变化
         # 通知会显示在系统托盘区域，用户可以看到标题和详细消息
         # 只有在配置文件中启用通知功能时才会实际发送
+        # 启用后台投递时只把通知放入队列立即返回，由后台线程合并、限流后发送
         # 输入: title (通知标题，简短描述), message (通知内容，详细信息) | 输出: 无
         # 异常处理: 如果通知发送失败，会记录错误日志但不影响主程序运行
         """
         # 检查是否启用了桌面通知功能
         # 这个配置项允许用户选择是否接收桌面通知
-        if NOTIFICATION_CONFIG['enable_desktop_notification']:
-            try:
-                # 使用plyer库发送跨平台桌面通知
-                notification.notify(
-                    title=title,              # 通知标题，显示在通知顶部
-                    message=message,          # 通知内容，显示详细信息
-                    app_name="微信自动登录监控",  # 应用名称，标识通知来源
-                    timeout=10                # 通知显示时间（秒），10秒后自动消失
-                )
-                # 记录通知发送成功的日志
-                logging.info(f"✅ 桌面通知已发送: {title} - {message}")
-            except Exception as e:
-                # 通知发送失败时的错误处理
-                # 常见失败原因：系统权限不足、通知服务未启动等
-                logging.error(f"❌ 桌面通知发送失败: {str(e)}")
-                logging.error("可能原因：1.系统通知服务未启动 2.应用权限不足 3.plyer库未正确安装")
+        if self.config['enable_desktop_notification']:
+            if self.dispatcher is not None:
+                if not self.dispatcher.submit(title, message):
+                    logging.warning(f"⚠️ 通知队列已满，丢弃通知: {title}")
+            else:
+                self._deliver(title, message)
         else:
             # 通知功能被禁用时的日志记录
             logging.debug(f"通知功能已禁用，跳过发送: {title} - {message}")
+    
+    def metrics(self):
+        """
+        metrics 功能说明:
+        # 返回通知投递指标（队列深度、丢弃数、投递延迟等）
+        # 输入: 无 | 输出: dict，未启用后台投递时返回空字典
+        """
+        return self.dispatcher.metrics() if self.dispatcher is not None else {}
+    
+    def close(self, timeout=5.0):
+        """
+        close 功能说明:
+        # 关闭后台投递器，尽量在超时前发送完队列中剩余的通知
+        # 输入: timeout (最长等待秒数) | 输出: 无
+        """
+        if self.dispatcher is not None:
+            self.dispatcher.stop(timeout)
+    
+    def _deliver(self, title, message):
+        """
+        _deliver 功能说明:
+        # 实际调用plyer发送桌面通知，后台投递时在投递线程中执行；发送结果写入检查历史存储
+        # 输入: title (通知标题), message (通知内容) | 输出: bool (True=发送成功)
+        """
+        try:
+            # 使用plyer库发送跨平台桌面通知
+            notification.notify(
+                title=title,              # 通知标题，显示在通知顶部
+                message=message,          # 通知内容，显示详细信息
+                app_name="微信自动登录监控",  # 应用名称，标识通知来源
+                timeout=10                # 通知显示时间（秒），10秒后自动消失
+            )
+            # 记录通知发送成功的日志
+            logging.info(f"✅ 桌面通知已发送: {title} - {message}")
+            record_history_notification(title, message, True)
+            return True
+        except Exception as e:
+            # 通知发送失败时的错误处理
+            # 常见失败原因：系统权限不足、通知服务未启动等
+            logging.error(f"❌ 桌面通知发送失败: {str(e)}")
+            logging.error("可能原因：1.系统通知服务未启动 2.应用权限不足 3.plyer库未正确安装")
+            record_history_notification(title, message, False)
+            return False
+
+class NotificationDispatcher:
+    """
+    NotificationDispatcher 功能说明:
+    # 后台通知投递器：调用方只入队，投递线程负责合并、限流和实际发送
+    # 1. 有界队列：队列满时直接丢弃新通知并计数，绝不阻塞调用方
+    # 2. 合并：合并窗口内标题相同的通知合并为一条，附带合并条数
+    # 3. 令牌桶限流：每分钟最多rate_per_minute条，允许burst条突发；
+    #    被限流的通知留在待发送列表中继续合并，令牌恢复后再发送
+    # 输入: deliver (实际发送函数 deliver(title, message)), queue_size, coalesce_window (秒),
+    #       rate_per_minute, burst | 输出: 提供submit/stop/metrics方法
+    """
+    
+    _STOP = object()  # 停止标记
+    
+    def __init__(self, deliver, queue_size=100, coalesce_window=60, rate_per_minute=6, burst=3):
+        self._deliver = deliver
+        self.queue_size = max(1, int(queue_size))
+        self.coalesce_window = max(0.0, float(coalesce_window))
+        self.rate = max(0.0, float(rate_per_minute)) / 60.0  # 每秒补充的令牌数，0表示不限流
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._token_time = time.monotonic()
+        
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._pending = {}  # 标题 -> 待发送条目，仅由投递线程访问
+        self._last_sent = {}  # 标题 -> 最近一次发送时间
+        self._thread = None
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.submitted = 0
+        self.delivered = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.rate_limited = 0  # 因令牌不足而推迟发送的通知条数，每条待发送通知只计一次
+        self.max_depth = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._backend_total = 0.0
+        self._backend_max = 0.0
+    
+    def submit(self, title, message):
+        """
+        submit 功能说明:
+        # 把通知放入队列，立即返回
+        # 输入: title (通知标题), message (通知内容) | 输出: bool (False=队列已满被丢弃)
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((title, message, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+            self.max_depth = max(self.max_depth, self._queue.qsize())
+        return True
+    
+    def stop(self, timeout=5.0):
+        """
+        stop 功能说明:
+        # 停止投递线程，退出前不再等待合并窗口和限流，直接发送剩余通知
+        # 输入: timeout (最长等待秒数) | 输出: 无
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self._queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            logging.warning("⚠️ 通知队列已满，无法发送停止标记")
+            return
+        thread.join(timeout)
+    
+    def metrics(self):
+        """
+        metrics 功能说明:
+        # 返回投递指标
+        # 输入: 无 | 输出: dict (队列深度、提交/发送/合并/丢弃次数、被限流推迟的通知条数、延迟统计)
+        """
+        with self._lock:
+            delivered = self.delivered + self.failed
+            return {
+                'queue_depth': self._queue.qsize(),
+                'queue_max_depth': self.max_depth,
+                'queue_size': self.queue_size,
+                'submitted': self.submitted,
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'rate_limited': self.rate_limited,
+                # 端到端延迟：入队到发送完成，包含合并窗口和限流等待
+                'latency_avg_ms': round(self._latency_total / delivered * 1000, 2) if delivered else 0.0,
+                'latency_max_ms': round(self._latency_max * 1000, 2),
+                # 后端耗时：plyer发送本身的耗时
+                'backend_avg_ms': round(self._backend_total / delivered * 1000, 2) if delivered else 0.0,
+                'backend_max_ms': round(self._backend_max * 1000, 2),
+            }
+    
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+                self._thread.start()
+    
+    def _run(self):
+        """
+        _run 功能说明:
+        # 投递线程主循环：取队列 -> 合并到待发送列表 -> 发送到期且有令牌的条目
+        # 输入: 无 | 输出: 无
+        """
+        while True:
+            timeout = self._next_wakeup()
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            if item is self._STOP:
+                # 退出前把剩余通知全部发送
+                while True:
+                    try:
+                        rest = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if rest is not self._STOP:
+                        self._accept(*rest)
+                self._flush(force=True)
+                return
+            
+            if item is not None:
+                self._accept(*item)
+            self._flush()
+    
+    def _accept(self, title, message, enqueued_at):
+        """
+        _accept 功能说明:
+        # 把一条通知合并进待发送列表
+        # 同标题已在待发送列表中则累加条数；窗口内刚发送过则推迟到窗口结束
+        # 输入: title, message, enqueued_at (入队时间) | 输出: 无
+        """
+        entry = self._pending.get(title)
+        if entry is not None:
+            entry['message'] = message
+            entry['count'] += 1
+            with self._lock:
+                self.coalesced += 1
+            return
+        
+        if len(self._pending) >= self.queue_size:
+            with self._lock:
+                self.dropped += 1
+            return
+        
+        last_sent = self._last_sent.get(title)
+        due = enqueued_at
+        if last_sent is not None and enqueued_at - last_sent < self.coalesce_window:
+            due = last_sent + self.coalesce_window
+        self._pending[title] = {'message': message, 'count': 1, 'first': enqueued_at, 'due': due,
+                                'throttled': False}
+    
+    def _flush(self, force=False):
+        """
+        _flush 功能说明:
+        # 发送所有已到期的待发送通知，令牌不足时留待下次
+        # 令牌不足时剩余已到期的通知都被推迟，每条通知第一次被推迟时计入rate_limited
+        # 输入: force (True=忽略合并窗口和限流，用于退出前清空) | 输出: 无
+        """
+        now = time.monotonic()
+        for title in list(self._pending):
+            entry = self._pending[title]
+            if not force and entry['due'] > now:
+                continue
+            if not force and not self._take_token(now):
+                throttled = [pending for pending in self._pending.values()
+                             if pending['due'] <= now and not pending['throttled']]
+                for pending in throttled:
+                    pending['throttled'] = True
+                with self._lock:
+                    self.rate_limited += len(throttled)
+                break
+            del self._pending[title]
+            
+            message = entry['message']
+            if entry['count'] > 1:
+                message = f"{message}\n（{self.coalesce_window:.0f}秒内共 {entry['count']} 条相同通知）"
+            
+            started = time.monotonic()
+            ok = False
+            try:
+                ok = bool(self._deliver(title, message))
+            except Exception as e:
+                logging.error(f"❌ 通知投递线程发送失败: {e}")
+            finished = time.monotonic()
+            self._last_sent[title] = finished
+            
+            with self._lock:
+                if ok:
+                    self.delivered += 1
+                else:
+                    self.failed += 1
+                latency = finished - entry['first']
+                backend = finished - started
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+                self._backend_total += backend
+                self._backend_max = max(self._backend_max, backend)
+            now = finished
+    
+    def _take_token(self, now):
+        """令牌桶：补充令牌后尝试取一个，rate为0时不限流"""
+        if not self.rate:
+            return True
+        self._tokens = min(self.burst, self._tokens + (now - self._token_time) * self.rate)
+        self._token_time = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+    
+    def _next_wakeup(self):
+        """计算投递线程下一次需要醒来的时间：最早到期的通知或下一个令牌"""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        wait = min(entry['due'] for entry in self._pending.values()) - now
+        if self.rate and self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return max(0.05, wait)
 
 class ProcessManager:
     """
@@ -322,30 +744,22 @@ class ProcessManager:
         """
         is_process_running 功能说明:
         # 检查指定名称的进程是否正在系统中运行
-        # 通过遍历系统所有进程，匹配进程名称（不区分大小写）
+        # 匹配进程名称（不区分大小写），由共享的PID跟踪器完成：
+        # 上次找到的PID仍存在且创建时间未变时直接判定运行中，否则才全量遍历系统进程
+        # Linux下遍历只读取/proc/<pid>/comm，其他平台使用psutil
         # 主要用于检查微信进程(WeChat.exe)是否已启动
         # 输入: process_name (进程名称，如'WeChat.exe') | 输出: bool (True=进程运行中, False=进程未运行)
         # 异常处理: 忽略进程访问权限错误和僵尸进程
         """
-        # 遍历系统中所有正在运行的进程
-        # psutil.process_iter(['name'])只获取进程名称信息，提高性能
-        for proc in psutil.process_iter(['name']):
-            try:
-                # 进程名称比较（不区分大小写）
-                # 例如：'wechat.exe' 和 'WeChat.exe' 都会匹配成功
-                if proc.info['name'].lower() == process_name.lower():
-                    logging.debug(f"✅ 找到运行中的进程: {process_name}")
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                # 处理进程访问异常：
-                # NoSuchProcess: 进程在检查过程中已结束
-                # AccessDenied: 没有权限访问该进程信息
-                # ZombieProcess: 僵尸进程（已结束但未被清理）
-                continue
-        
-        # 未找到匹配的进程
-        logging.debug(f"❌ 未找到运行中的进程: {process_name}")
-        return False
+        # 查找耗时计入'process'阶段直方图
+        with get_latency_recorder().timer('process'):
+            if get_process_tracker().find_pids(process_name):
+                logging.debug(f"✅ 找到运行中的进程: {process_name}")
+                return True
+
+            # 未找到匹配的进程
+            logging.debug(f"❌ 未找到运行中的进程: {process_name}")
+            return False
     
     def start_process(self, process_path):
         """
@@ -379,54 +793,69 @@ class ProcessManager:
             logging.error("可能原因：1.权限不足 2.文件损坏 3.系统资源不足 4.路径包含特殊字符")
             return False
     
+    def terminate_all(self, process_name, timeout=None):
+        """
+        terminate_all 功能说明:
+        # 批量终止所有匹配名称的进程：同时发送terminate，共用一个等待期限，到期后强制结束剩余进程
+        # 多进程客户端卡死时，总耗时只有一个超时时间，不会逐个等待
+        # 终止前全量遍历进程，不使用PID缓存：缓存只验证已知PID，上次遍历之后新启动的同名进程不在其中
+        # 输入: process_name (进程名称), timeout (等待正常退出的期限，秒，默认取MONITOR_CONFIG['process_terminate_timeout'])
+        # 输出: dict {pid: 结果}，结果为 terminated/killed/gone/access_denied/survived，未找到进程时为空dict
+        """
+        tracker = get_process_tracker()
+        procs = []
+        for pid in tracker.scan(process_name):
+            try:
+                procs.append(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                continue
+        if not procs:
+            return {}
+        
+        logging.info(f"🔄 正在终止 {len(procs)} 个 {process_name} 进程: {[proc.pid for proc in procs]}")
+        started = time.time()
+        outcomes = terminate_processes(procs, timeout)
+        # 进程已退出，清除缓存，下一次检查重新遍历
+        tracker.forget(process_name)
+        
+        for pid, outcome in sorted(outcomes.items()):
+            if outcome == 'terminated':
+                logging.info(f"✅ 进程 {process_name} (PID: {pid}) 已正常结束")
+            elif outcome == 'killed':
+                logging.warning(f"⚠️ 进程 {process_name} (PID: {pid}) 未在期限内结束，已强制终止")
+            elif outcome == 'gone':
+                logging.info(f"进程 {process_name} (PID: {pid}) 在终止前已结束")
+            elif outcome == 'access_denied':
+                logging.error(f"❌ 没有权限终止进程 {process_name} (PID: {pid})")
+            else:
+                logging.error(f"❌ 进程 {process_name} (PID: {pid}) 强制终止后仍未结束")
+        logging.info(f"批量终止耗时 {time.time() - started:.1f}秒")
+        return outcomes
+    
     def kill_process(self, process_name):
         """
         kill_process 功能说明:
-        # 强制终止指定名称的进程
+        # 强制终止指定名称的所有进程
         # 主要用于处理微信程序异常或需要重启微信的情况
-        # 使用psutil.terminate()优雅地终止进程，避免数据丢失
-        # 输入: process_name (进程名称，如'WeChat.exe') | 输出: bool (True=终止成功, False=终止失败或进程不存在)
+        # 委托terminate_all：先用terminate()优雅地终止，避免数据丢失，期限到后仍未结束的进程强制终止
+        # 输入: process_name (进程名称，如'WeChat.exe') | 输出: bool (True=至少终止了一个进程且没有残留, False=终止失败或进程不存在)
         # 异常处理: 进程访问权限错误、进程已结束等情况
         """
         try:
-            # 遍历系统中所有进程，查找匹配的进程名
-            killed_count = 0  # 记录成功终止的进程数量
-            
-            for proc in psutil.process_iter(['name']):
-                try:
-                    # 进程名称匹配（不区分大小写）
-                    if proc.info['name'].lower() == process_name.lower():
-                        # 使用terminate()优雅地终止进程
-                        proc.terminate()
-                        killed_count += 1
-                        logging.info(f"🔄 已终止进程: {process_name} (PID: {proc.pid})")
-                        
-                        # 等待进程完全结束
-                        try:
-                            proc.wait(timeout=5)  # 等待最多5秒
-                            logging.info(f"✅ 进程 {process_name} 已完全结束")
-                        except psutil.TimeoutExpired:
-                            # 如果进程5秒内没有结束，强制杀死
-                            logging.warning(f"⚠️ 进程 {process_name} 未在5秒内结束，强制终止")
-                            proc.kill()
-                        
-                        return True
-                        
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    # 处理进程访问异常：
-                    # NoSuchProcess: 进程在终止过程中已结束
-                    # AccessDenied: 没有权限终止该进程（如系统进程）
-                    # ZombieProcess: 僵尸进程（已结束但未被清理）
-                    continue
+            outcomes = self.terminate_all(process_name)
             
             # 未找到匹配的进程
-            if killed_count == 0:
+            if not outcomes:
                 logging.warning(f"⚠️ 未找到需要终止的进程: {process_name}")
                 logging.info("进程可能已经结束或进程名称不正确")
                 return False
-            else:
-                logging.info(f"✅ 成功终止 {killed_count} 个 {process_name} 进程")
-                return True
+            
+            killed_count = sum(1 for outcome in outcomes.values() if outcome in ('terminated', 'killed', 'gone'))
+            if killed_count < len(outcomes):
+                logging.error(f"❌ {process_name} 进程未能全部终止: {killed_count}/{len(outcomes)}")
+                return False
+            logging.info(f"✅ 成功终止 {killed_count} 个 {process_name} 进程")
+            return True
                 
         except Exception as e:
             # 终止进程时的异常处理
@@ -437,9 +866,9 @@ class ProcessManager:
 class LogRotator:
     """
     LogRotator 功能说明:
-    # 日志文件轮转管理器，负责自动清理过期的日志文件
+    # 日志文件轮转管理器，负责压缩不再写入的日志和自动清理过期的日志文件
     # 防止日志文件无限增长占用过多磁盘空间
-    # 根据配置的保留天数自动删除过期日志
+    # 根据配置的保留天数和日志目录总大小上限自动删除旧日志
     # 输入: log_dir (日志目录路径) | 输出: 无
     """
     
@@ -457,9 +886,11 @@ class LogRotator:
     def rotate_logs(self):
         """
         rotate_logs 功能说明:
-        # 执行日志文件轮转，删除超过保留期限的日志文件
-        # 根据LOG_CONFIG中的log_retention_days配置确定保留天数
-        # 通过文件修改时间判断是否过期，过期文件将被自动删除
+        # 执行日志文件轮转：先按LOG_CONFIG['log_compression']压缩轮转备份和前一天及更早的日志，
+        # 再一次scandir遍历日志目录，删除超过保留期限的日志文件（含已压缩的），
+        # 日志总大小超过LOG_CONFIG['log_dir_max_size_mb']时再从最旧的日志开始删除
+        # 根据LOG_CONFIG中的log_retention_days配置确定保留天数，正在写入的日志文件不压缩也不删除
+        # 压缩耗时与日志大小有关，监控线程中请改用wechat_logging.schedule_log_rotation在后台执行
         # 输入: 无 | 输出: bool (True=轮转成功, False=轮转失败)
         # 异常处理: 目录不存在、文件访问权限、磁盘空间等问题
         """
@@ -468,52 +899,29 @@ class LogRotator:
             if not os.path.exists(self.log_dir):
                 logging.debug(f"日志目录不存在，跳过轮转: {self.log_dir}")
                 return True
-                
-            # 第二步：计算过期日期
-            # 从配置文件获取日志保留天数
-            retention_days = LOG_CONFIG['log_retention_days']
-            expire_date = datetime.now() - timedelta(days=retention_days)
             
-            logging.info(f"开始日志轮转，保留最近 {retention_days} 天的日志")
-            logging.info(f"过期日期: {expire_date.strftime('%Y-%m-%d %H:%M:%S')}")
+            retention_days = LOG_CONFIG['log_retention_days']
+            max_total_mb = LOG_CONFIG.get('log_dir_max_size_mb', 0)
+            logging.info(f"开始日志轮转，保留最近 {retention_days} 天的日志"
+                         + (f"，总大小上限 {max_total_mb} MB" if max_total_mb else ""))
             
-            # 第三步：遍历日志目录中的所有文件
-            deleted_count = 0  # 记录删除的文件数量
-            total_size_freed = 0  # 记录释放的磁盘空间
+            # 第二步：压缩不再写入的日志
+            compressed = compress_logs(self.log_dir)
+            if compressed['compressed'] > 0:
+                logging.info(f"🗜️ 日志压缩完成({compressed['codec']})：{format_compression_result(compressed)}")
             
-            for filename in os.listdir(self.log_dir):
-                file_path = os.path.join(self.log_dir, filename)
-                
-                # 只处理文件，跳过子目录
-                if os.path.isfile(file_path):
-                    # 获取文件的最后修改时间
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
-                    # 第四步：检查文件是否过期
-                    if file_time < expire_date:
-                        # 记录文件大小（用于统计释放的空间）
-                        try:
-                            file_size = os.path.getsize(file_path)
-                            total_size_freed += file_size
-                        except OSError:
-                            file_size = 0
-                        
-                        # 删除过期的日志文件
-                        os.remove(file_path)
-                        deleted_count += 1
-                        
-                        logging.info(f"🗑️ 已删除过期日志: {filename} (修改时间: {file_time.strftime('%Y-%m-%d %H:%M:%S')})")
-                    else:
-                        logging.debug(f"保留日志文件: {filename} (修改时间: {file_time.strftime('%Y-%m-%d %H:%M:%S')})")
+            # 第三步：按修改时间从旧到新删除过期和超出总大小上限的日志
+            result = rotate_log_dir(self.log_dir, retention_days, max_total_mb)
             
-            # 第五步：输出轮转结果统计
-            if deleted_count > 0:
-                size_mb = total_size_freed / (1024 * 1024)  # 转换为MB
-                logging.info(f"✅ 日志轮转完成：删除了 {deleted_count} 个过期文件，释放空间 {size_mb:.2f} MB")
+            # 第四步：输出轮转结果统计
+            if result['deleted'] > 0:
+                size_mb = result['freed_bytes'] / (1024 * 1024)  # 转换为MB
+                logging.info(f"✅ 日志轮转完成：删除了 {result['deleted']} 个文件（过期 {result['expired']} 个，"
+                             f"超出总大小 {result['over_budget']} 个），释放空间 {size_mb:.2f} MB")
             else:
-                logging.info("✅ 日志轮转完成：没有发现过期的日志文件")
+                logging.info("✅ 日志轮转完成：没有发现需要删除的日志文件")
             
-            return True
+            return result['failed'] == 0 and compressed['failed'] == 0
             
         except Exception as e:
             # 日志轮转过程中的异常处理